@@ -140,7 +140,103 @@ print("  - vw_revenue_growth")
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Step 4: Dashboard query building blocks
+# MAGIC ## Step 4: Materialize dashboard aggregate tables
+# MAGIC
+# MAGIC The app's dashboard endpoints read these small summary tables instead of
+# MAGIC re-aggregating `vw_sales_enriched` on every request. Re-run this step after
+# MAGIC reloading data (and call `POST /api/cache/invalidate`); until the tables
+# MAGIC exist the app falls back to querying the views directly.
+# MAGIC
+# MAGIC Averages are stored as `satisfaction_sum` / `satisfaction_count` so they
+# MAGIC can be rolled up further without skewing the result.
+
+# COMMAND ----------
+
+aggregate_tables = {
+    # One row per month: revenue, units and satisfaction totals
+    "agg_monthly_sales": """
+        SELECT
+          date_trunc('month', date) AS month,
+          MAX(date) AS max_date,
+          SUM(total_amount) AS revenue,
+          SUM(quantity) AS units,
+          SUM(CASE WHEN category = 'Tire' THEN quantity END) AS tire_units,
+          COUNT(*) AS sales_count,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY date_trunc('month', date)
+    """,
+    # Month-over-month growth, materialized from the window-heavy view
+    "agg_monthly_revenue": """
+        SELECT month, revenue, prior_revenue, revenue_growth
+        FROM vw_revenue_growth
+    """,
+    # One row per store and calendar quarter
+    "agg_store_sales": """
+        SELECT
+          store_id,
+          store_name,
+          store_region,
+          quarter(date) AS quarter,
+          SUM(total_amount) AS revenue,
+          SUM(quantity) AS units,
+          SUM(CASE WHEN quantity > 1 THEN quantity ELSE 0 END) AS healthy_units,
+          SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END) AS single_unit_sales,
+          SUM(CASE WHEN quantity = 0 THEN 1 ELSE 0 END) AS zero_unit_sales,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY store_id, store_name, store_region, quarter(date)
+    """,
+    # One row per product within its category
+    "agg_category_sales": """
+        SELECT
+          category,
+          product_name,
+          SUM(total_amount) AS revenue,
+          SUM(quantity) AS units,
+          COUNT(*) AS sales_count,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY category, product_name
+    """,
+    # One row per customer region
+    "agg_regional_satisfaction": """
+        SELECT
+          customer_region,
+          COUNT(*) AS sales_count,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY customer_region
+    """,
+    # Promoter / Passive / Detractor counts
+    "agg_nps_buckets": """
+        SELECT
+          CASE
+            WHEN satisfaction_score >= 4.5 THEN 'Promoter'
+            WHEN satisfaction_score >= 4.0 THEN 'Passive'
+            ELSE 'Detractor'
+          END AS category,
+          COUNT(*) AS count
+        FROM vw_sales_enriched
+        GROUP BY 1
+    """,
+}
+
+for table_name, query in aggregate_tables.items():
+    spark.sql(f"CREATE OR REPLACE TABLE {table_name} AS {query}")
+
+print("✅ Aggregate tables created successfully!")
+for table_name in aggregate_tables:
+    print(f"  - {table_name}: {spark.table(table_name).count()} rows")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Step 5: Dashboard query building blocks
 
 # COMMAND ----------
 
@@ -208,7 +304,7 @@ display(appointment_metrics)
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Step 5: Genie and voice workflow (outline)
+# MAGIC ## Step 6: Genie and voice workflow (outline)
 # MAGIC
 # MAGIC - Configure Genie to use the `vw_sales_enriched` and `vw_revenue_growth` views.
 # MAGIC - Ask: "What was revenue growth last quarter?" and validate the SQL.
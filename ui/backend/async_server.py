@@ -0,0 +1,486 @@
+"""
+Asyncio server core.
+
+Serves the same routes as server.AppHandler from a single event loop and is
+selected with SERVER_MODE=asyncio. Idle keep-alive connections and Genie
+polling cost a coroutine rather than an OS thread: polling waits with
+asyncio.sleep, outbound HTTPS calls use keep-alive asyncio streams from the
+shared connection pool (http_pool.py), and blocking SQL and parsing work is
+offloaded to a bounded thread pool.
+"""
+import asyncio
+import json
+import mimetypes
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+from http.client import HTTPMessage, parse_headers
+from io import BytesIO
+from types import ModuleType
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    from backend.http_pool import get_http_pool
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from http_pool import get_http_pool
+
+try:
+    from backend.genie_scheduler import INTERACTIVE
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_scheduler import INTERACTIVE
+
+try:
+    from backend.genie_stream import NDJSON_HEADERS, SSE_HEADERS, format_ndjson, format_sse, wants_ndjson
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_stream import NDJSON_HEADERS, SSE_HEADERS, format_ndjson, format_sse, wants_ndjson
+
+try:
+    from backend.genie_polling import GenieConversation, GenieError, PollPolicy, conversation_steps
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_polling import GenieConversation, GenieError, PollPolicy, conversation_steps
+
+try:
+    from backend.tracing import in_context, span
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from tracing import in_context, span
+
+logger = logging.getLogger("discount_tire_demo.async_server")
+
+ASYNC_SQL_WORKERS = int(os.getenv("ASYNC_SQL_WORKERS", "8"))
+ASYNC_KEEPALIVE_TIMEOUT_SECONDS = float(os.getenv("ASYNC_KEEPALIVE_TIMEOUT_SECONDS", "15"))
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+
+async def async_api_response(
+    url: str, method: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str]
+) -> Tuple[int, Dict[str, Any], HTTPMessage]:
+    """
+    Non-blocking counterpart of server.api_response, over the shared keep-alive pool.
+
+    Returns:
+        (status_code, decoded JSON body or {}, response headers)
+    """
+    data = json.dumps(payload).encode("utf-8") if payload else None
+    with span("genie-http", method=method):
+        response = await get_http_pool().async_request(url, method, body=data, headers={"Accept": "application/json", **headers})
+
+    text = response.body.decode("utf-8") if response.body else ""
+    try:
+        return response.status, json.loads(text) if text else {}, response.headers
+    except json.JSONDecodeError:
+        return response.status, {}, response.headers
+
+
+async def async_api_request(
+    url: str, method: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str]
+) -> Tuple[int, Dict[str, Any]]:
+    """Non-blocking counterpart of server.api_request."""
+    status, body, _ = await async_api_response(url, method, payload, headers)
+    return status, body
+
+
+async def async_run_conversation(
+    base_url: str,
+    headers: Dict[str, str],
+    content: str,
+    policy: PollPolicy,
+    on_status: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    deadline: Optional[float] = None,
+) -> GenieConversation:
+    """Drive genie_polling.conversation_steps with non-blocking requests and sleeps."""
+    steps = conversation_steps(base_url, content, policy, on_status, deadline)
+    response = None
+    while True:
+        try:
+            step = steps.send(response)
+        except StopIteration as done:
+            return done.value
+        if isinstance(step, tuple):
+            _, url, method, payload = step
+            response = await async_api_response(url, method, payload, headers)
+        else:
+            await asyncio.sleep(step)
+            response = None
+
+
+async def async_write_events(events: Any, writer: asyncio.StreamWriter) -> None:
+    """Drive genie_stream.answer_events, writing events and fetching result chunks without blocking."""
+    response = None
+    while True:
+        try:
+            step = events.send(response)
+        except StopIteration:
+            return
+        if isinstance(step, bytes):
+            writer.write(step)
+            await writer.drain()
+            response = None
+        else:
+            url, headers = step
+            response = await async_api_response(url, "GET", None, headers)
+
+
+class Response:
+    """
+    An HTTP response: either a materialized body, or a `stream` coroutine
+    function that writes the body to the connection (sent with Connection: close).
+    """
+
+    __slots__ = ("status", "headers", "body", "stream")
+
+    def __init__(
+        self,
+        status: int,
+        headers: Optional[List[Tuple[str, str]]] = None,
+        body: bytes = b"",
+        stream: Optional[Callable[[asyncio.StreamWriter], Awaitable[None]]] = None,
+    ):
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+        self.stream = stream
+
+
+class AsyncAppServer:
+    """Event-loop HTTP/1.1 server exposing the AppHandler routes."""
+
+    def __init__(self, app: ModuleType, sql_workers: int = ASYNC_SQL_WORKERS):
+        """
+        Initialize the server.
+
+        Args:
+            app: The loaded server module providing builders, caches and helpers
+            sql_workers: Threads available for blocking SQL and parsing work
+        """
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=sql_workers, thread_name_prefix="async-sql")
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def run_blocking(self, fn, *args):
+        """Run a blocking callable on the bounded executor, in the current context (and trace)."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, in_context(fn), *args)
+
+    async def start(self, host: str, port: int) -> int:
+        """Start listening; returns the bound port."""
+        self._server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+        # Pooled outbound streams belong to this event loop
+        get_http_pool().close_idle()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), ASYNC_KEEPALIVE_TIMEOUT_SECONDS)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.write_response(writer, self.json_response(431, {"error": "Request headers too large."}), False)
+                    break
+
+                request_line, _, header_blob = head.partition(b"\r\n")
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = parse_headers(BytesIO(header_blob))
+                    length = int(headers.get("Content-Length") or 0)
+                except ValueError:
+                    await self.write_response(writer, self.json_response(400, {"error": "Bad request."}), False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.write_response(writer, self.json_response(413, {"error": "Request body too large."}), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                with self.app.request_trace(method, target, headers.get("X-Request-ID")) as trace:
+                    response = await self.dispatch(method, target, headers, body)
+                    trace.status = response.status
+                    response.headers.extend(self.app.trace_response_headers(trace))
+                    keep_alive = (
+                        version == "HTTP/1.1"
+                        and (headers.get("Connection") or "").lower() != "close"
+                        and response.stream is None
+                    )
+                    try:
+                        await self.write_response(writer, response, keep_alive, head_only=method == "HEAD")
+                    finally:
+                        self.app.observe_request(method, target, response.status, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(
+        self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool, head_only: bool = False
+    ) -> None:
+        try:
+            phrase = HTTPStatus(response.status).phrase
+        except ValueError:
+            phrase = ""
+        lines = [f"HTTP/1.1 {response.status} {phrase}", f"Date: {formatdate(usegmt=True)}"]
+        lines.extend(f"{name}: {value}" for name, value in response.headers)
+        if response.status != 304 and response.stream is None:
+            lines.append(f"Content-Length: {len(response.body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if response.stream is not None and not head_only:
+            await writer.drain()
+            await response.stream(writer)
+        elif response.body and not head_only and response.status != 304:
+            writer.write(response.body)
+        await writer.drain()
+
+    def encoded_response(
+        self,
+        status: int,
+        encoded: Any,
+        request_headers: Optional[HTTPMessage] = None,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        accept = request_headers.get("Accept-Encoding", "") if request_headers is not None else ""
+        encoding, body = encoded.select(accept)
+        headers = [("Content-Type", encoded.content_type)]
+        headers.extend((extra_headers or {}).items())
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+        if encoded.compressible:
+            headers.append(("Vary", "Accept-Encoding"))
+        return Response(status, headers, body)
+
+    def json_response(self, status: int, payload: Any, request_headers: Optional[HTTPMessage] = None) -> Response:
+        return self.encoded_response(status, self.app.EncodedPayload(payload), request_headers)
+
+    async def dispatch(self, method: str, path: str, headers: HTTPMessage, body: bytes) -> Response:
+        try:
+            if method in {"GET", "HEAD"}:
+                return await self.handle_get(path, headers)
+            if method == "POST":
+                if path == "/api/knowledge-assistant":
+                    return await self.handle_knowledge_assistant(headers, body)
+                if path == "/api/genie/query":
+                    return await self.handle_genie_query(headers, body)
+                if path == "/api/genie/stream":
+                    return await self.handle_genie_stream(headers, body)
+                if path == "/api/cache/invalidate":
+                    return await self.handle_cache_invalidate(headers, body)
+                return self.json_response(404, {"error": "Not found"}, headers)
+            return self.json_response(405, {"error": "Method not allowed"}, headers)
+        except Exception:  # pragma: no cover
+            logger.exception(f"Unhandled error processing {method} {path}.")
+            return self.json_response(500, {"error": "An unexpected error occurred. Please try again."}, headers)
+
+    async def handle_get(self, path: str, headers: HTTPMessage) -> Response:
+        app = self.app
+        if path.startswith("/api/"):
+            if path == "/api/user":
+                return self.json_response(200, app.build_user_payload(headers), headers)
+            if path == "/api/cache/clear":
+                await self.run_blocking(app.clear_all_caches)
+                logger.info("All caches cleared successfully")
+                return self.json_response(200, {"message": "All caches cleared successfully"}, headers)
+            if path == "/api/cache/stats":
+                return self.json_response(200, app.build_cache_stats_payload(), headers)
+            if path == "/api/metrics":
+                body = await self.run_blocking(app.build_metrics_text)
+                return Response(200, [("Content-Type", app.Exposition.CONTENT_TYPE)], body.encode("utf-8"))
+            route = app.DASHBOARD_ROUTES.get(path)
+            if route is not None:
+                return await self.handle_dashboard(route[0], route[1], headers)
+            return self.json_response(404, {"error": "Not found"}, headers)
+
+        if not app.DIST_DIR.exists():
+            return self.json_response(500, {"error": "dist/ folder not found."}, headers)
+        file_path = app.resolve_static_file(path)
+        if not file_path.exists():
+            return Response(404)
+        data = await self.run_blocking(file_path.read_bytes)
+        content_type, _ = mimetypes.guess_type(str(file_path))
+        return Response(200, [("Content-Type", content_type or "application/octet-stream")], data)
+
+    async def handle_dashboard(self, cache_key: str, builder: Any, headers: HTTPMessage) -> Response:
+        app = self.app
+        # Cache hits (fresh or stale) are served inline; misses run the warehouse queries off the loop
+        encoded = app.lookup_dashboard_payload(cache_key, builder)
+        if encoded is None:
+            try:
+                encoded = await self.run_blocking(app.rebuild_dashboard_payload, cache_key, builder)
+            except app.PoolSaturated as exc:
+                logger.warning(f"Shedding dashboard request: {exc}")
+                return self.encoded_response(
+                    503, app.EncodedPayload(app.SATURATED_PAYLOAD), headers, {"Retry-After": str(exc.retry_after)}
+                )
+        if encoded is None:
+            return self.json_response(503, {"error": "Dashboard data unavailable. Please try again."}, headers)
+        encoded = app.dashboard_representation(cache_key, encoded, app.negotiate_media_type(headers.get("Accept")))
+        cache_headers = app.dashboard_cache_headers(cache_key, encoded)
+        if app.etag_matches(headers.get("If-None-Match"), encoded.etag):
+            return Response(304, list(cache_headers.items()) + [("Vary", "Accept-Encoding")])
+        return self.encoded_response(200, encoded, headers, cache_headers)
+
+    async def read_question(self, headers: HTTPMessage, body: bytes) -> str:
+        payload = json.loads(body or b"{}")
+        return payload.get("question", "").strip()
+
+    async def run_genie_job(
+        self,
+        base_url: str,
+        genie_headers: Dict[str, str],
+        question: str,
+        on_status: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ) -> GenieConversation:
+        """Async counterpart of server.run_genie_job for interactive questions."""
+        app = self.app
+        deadline = time.monotonic() + app.GENIE_DEADLINE_SECONDS
+        # Queue waits poll on the event loop rather than holding an executor thread
+        await app._GENIE_SCHEDULER.async_acquire(INTERACTIVE, deadline)
+        try:
+            return await async_run_conversation(
+                base_url, genie_headers, question, app._GENIE_POLL_POLICY, on_status, deadline
+            )
+        finally:
+            app._GENIE_SCHEDULER.release()
+
+    async def handle_genie_query(self, headers: HTTPMessage, body: bytes) -> Response:
+        app = self.app
+        question = await self.read_question(headers, body)
+        if not question:
+            return self.json_response(400, {"error": "Question cannot be empty."}, headers)
+
+        ndjson = wants_ndjson(headers.get("Accept"))
+        cached = app.get_cached_stream(question)
+        if cached is not None:
+            answer, continuation = cached
+            if ndjson:
+                events = app.genie_answer_events(answer, continuation, app.genie_context(), format_ndjson)
+                return self.ndjson_response(events, [("X-Answer-Cache", "hit")])
+            return self.encoded_response(200, app.EncodedPayload(answer), headers, {"X-Answer-Cache": "hit"})
+
+        context = app.genie_context()
+        if context is None:
+            return self.json_response(500, {"error": "Missing Genie configuration env vars."}, headers)
+        base_url, genie_headers = context
+
+        try:
+            conversation = await self.run_genie_job(base_url, genie_headers, question)
+        except GenieError as exc:
+            return self.json_response(exc.status_code, {"error": str(exc)}, headers)
+
+        answer = await self.run_blocking(app.answer_conversation, question, conversation)
+        if ndjson:
+            return self.ndjson_response(app.genie_answer_events(answer, conversation.query_result, context, format_ndjson))
+        return self.json_response(200, answer, headers)
+
+    def ndjson_response(self, events: Any, extra_headers: Optional[List[Tuple[str, str]]] = None) -> Response:
+        """Stream answer_events as NDJSON."""
+
+        async def stream(writer: asyncio.StreamWriter) -> None:
+            try:
+                await async_write_events(events, writer)
+            except ConnectionError:
+                raise
+            except Exception:  # pragma: no cover
+                logger.exception("Unhandled error streaming Genie rows.")
+                writer.write(format_ndjson("error", {"status": 500, "error": "An unexpected error occurred. Please try again."}))
+
+        return Response(200, list(NDJSON_HEADERS.items()) + (extra_headers or []), stream=stream)
+
+    async def handle_genie_stream(self, headers: HTTPMessage, body: bytes) -> Response:
+        app = self.app
+        question = await self.read_question(headers, body)
+        if not question:
+            return self.json_response(400, {"error": "Question cannot be empty."}, headers)
+
+        cached = app.get_cached_stream(question)
+        context = app.genie_context()
+        if cached is None and context is None:
+            return self.json_response(500, {"error": "Missing Genie configuration env vars."}, headers)
+
+        async def stream(writer: asyncio.StreamWriter) -> None:
+            # StreamWriter.write only buffers, so it is safe to call from the sync status callback
+            def on_status(status: str, details: Dict[str, Any]) -> None:
+                writer.write(format_sse("status", {"status": status, **details}))
+
+            if cached is not None:
+                on_status("completed", {"cached": True})
+                events = app.genie_answer_events(*cached, context)
+            else:
+                base_url, genie_headers = context
+                try:
+                    conversation = await self.run_genie_job(base_url, genie_headers, question, on_status)
+                    answer = await self.run_blocking(app.answer_conversation, question, conversation)
+                except GenieError as exc:
+                    writer.write(format_sse("error", {"status": exc.status_code, "error": str(exc)}))
+                    return
+                except Exception:  # pragma: no cover
+                    logger.exception("Unhandled error streaming Genie answer.")
+                    writer.write(format_sse("error", {"status": 500, "error": "An unexpected error occurred. Please try again."}))
+                    return
+                events = app.genie_answer_events(answer, conversation.query_result, context)
+            try:
+                await async_write_events(events, writer)
+            except ConnectionError:
+                raise
+            except Exception:  # pragma: no cover
+                logger.exception("Unhandled error streaming Genie answer.")
+                writer.write(format_sse("error", {"status": 500, "error": "An unexpected error occurred. Please try again."}))
+
+        return Response(200, list(SSE_HEADERS.items()), stream=stream)
+
+    async def handle_cache_invalidate(self, headers: HTTPMessage, body: bytes) -> Response:
+        tables = json.loads(body or b"{}").get("tables")
+        if tables is not None and (not isinstance(tables, list) or not all(isinstance(t, str) for t in tables)):
+            return self.json_response(400, {"error": "tables must be a list of table names."}, headers)
+        dropped = await self.run_blocking(self.app.invalidate_refreshed_tables, tables)
+        return self.json_response(200, {"invalidated_answers": dropped}, headers)
+
+    async def handle_knowledge_assistant(self, headers: HTTPMessage, body: bytes) -> Response:
+        app = self.app
+        question = await self.read_question(headers, body)
+        if not question:
+            return self.json_response(400, {"error": "Question cannot be empty."}, headers)
+
+        request = app.knowledge_assistant_request(question)
+        if request is None:
+            logger.error("Missing Databricks configuration for knowledge assistant")
+            return self.json_response(500, {"error": "Missing Databricks configuration."}, headers)
+        endpoint_url, ka_headers, request_payload = request
+
+        logger.info(f"Calling knowledge assistant endpoint: {endpoint_url}")
+        status_code, response_data = await async_api_request(endpoint_url, "POST", request_payload, ka_headers)
+        if status_code != 200:
+            logger.error(f"Knowledge assistant request failed: {status_code}, response: {response_data}")
+            error_msg = response_data.get("error_code", "Unknown error")
+            return self.json_response(status_code, {"error": f"Failed to reach knowledge assistant: {error_msg}"}, headers)
+
+        return self.json_response(200, {"response": app.parse_knowledge_assistant_output(response_data)}, headers)
+
+
+def serve_async(app: ModuleType, port: int, host: str = "0.0.0.0") -> None:
+    """Run the asyncio server until interrupted."""
+
+    async def run() -> None:
+        server = AsyncAppServer(app)
+        await server.start(host, port)
+        print(f"Serving on port {port} (asyncio)")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    asyncio.run(run())
@@ -0,0 +1,12 @@
+"""
+Micro-benchmarks for CPU-bound backend code paths.
+
+- genie_parsing.py: the Genie response parsers (parse_genie_response,
+  extract_summary, collect_texts, pick_best_text, find_sql, extract_table) on
+  realistic and very large payloads, timed with timeit and measured with
+  tracemalloc, and checked against a saved baseline
+
+From ui/:
+
+    python backend/benchmarks/genie_parsing.py
+"""
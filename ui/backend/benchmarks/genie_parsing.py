@@ -0,0 +1,393 @@
+"""
+Micro-benchmarks for the Genie response parsing hot path.
+
+Builds Genie messages and query results shaped like the REST API's, at a
+realistic size (a few dozen rows) and a very large one (tens of thousands of
+rows), and measures each parser on them:
+
+- time: best and median seconds per call over repeated timeit runs
+- memory: peak bytes allocated during one call, via tracemalloc
+
+Results are compared with a baseline JSON; a case regresses when its best time
+grows by more than --time-threshold or its peak memory by more than
+--memory-threshold (fractions). Every run also times a fixed reference walk over
+a nested payload, and times are scaled by how much that reference moved, which
+absorbs most of a busy machine's noise. Timings are still only comparable on the
+machine that recorded the baseline, so save one before changing a parser:
+
+    python backend/benchmarks/genie_parsing.py --save-baseline
+    # ... change server.py ...
+    python backend/benchmarks/genie_parsing.py            # exits 1 on a regression
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "genie_parsing_baseline.json"
+REALISTIC_ROWS = 50
+LARGE_ROWS = 20000
+
+QUESTION = "Which region had the highest revenue growth last quarter?"
+SQL = (
+    "SELECT region, store_name, quarter, SUM(revenue) AS total_revenue, SUM(prior_revenue) AS prior_revenue, "
+    "AVG(revenue_growth) AS revenue_growth, COUNT(*) AS orders, AVG(satisfaction) AS satisfaction "
+    "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched GROUP BY region, store_name, quarter ORDER BY revenue_growth DESC"
+)
+COLUMNS = (
+    ("region", "STRING"),
+    ("store_name", "STRING"),
+    ("quarter", "TIMESTAMP"),
+    ("total_revenue", "DOUBLE"),
+    ("prior_revenue", "DOUBLE"),
+    ("revenue_growth", "DOUBLE"),
+    ("orders", "BIGINT"),
+    ("satisfaction", "DOUBLE"),
+)
+REGIONS = ("West", "Southwest", "Mountain", "Central", "Southeast", "Northeast")
+
+
+def build_message(question: str = QUESTION, with_text: bool = True, with_sql: bool = True) -> Dict[str, Any]:
+    """
+    A COMPLETED Genie message with query and suggested-question attachments.
+
+    Args:
+        question: The user's question, echoed in "content"
+        with_text: Include a text attachment (extract_summary returns it directly)
+        with_sql: Include the generated SQL in the query attachment
+    """
+    conversation_id, message_id = uuid.uuid4().hex, uuid.uuid4().hex
+    query: Dict[str, Any] = {
+        "title": "Revenue growth by region",
+        "description": "You want to compare revenue growth across regions for the last quarter.",
+        "statement_id": uuid.uuid4().hex,
+        "query_result_metadata": {"row_count": REALISTIC_ROWS},
+    }
+    if with_sql:
+        query["query"] = SQL
+    attachments: List[Dict[str, Any]] = []
+    if with_text:
+        attachments.append(
+            {"attachment_id": uuid.uuid4().hex, "text": {"content": "The West region had the highest revenue growth last quarter at 4.12%."}}
+        )
+    attachments.append({"attachment_id": uuid.uuid4().hex, "query": query})
+    attachments.append(
+        {
+            "attachment_id": uuid.uuid4().hex,
+            "suggested_questions": {"questions": ["What drove growth in the West?", "Show revenue by store for the West region"]},
+        }
+    )
+    return {
+        "id": message_id,
+        "message_id": message_id,
+        "conversation_id": conversation_id,
+        "space_id": uuid.uuid4().hex,
+        "user_id": 4211876531,
+        "created_timestamp": 1760572800000,
+        "last_updated_timestamp": 1760572806000,
+        "status": "COMPLETED",
+        "content": question,
+        "attachments": attachments,
+    }
+
+
+def build_query_result(rows: int) -> Dict[str, Any]:
+    """A query-result payload whose statement_response holds `rows` typed rows (with some NULL cells)."""
+    data = []
+    for i in range(rows):
+        growth = (i % 11 - 5) / 100
+        values = [
+            REGIONS[i % len(REGIONS)],
+            f"Store {i % 900:03d} - {REGIONS[(i // 7) % len(REGIONS)]}",
+            f"2025-{1 + 3 * (i % 4):02d}-01T00:00:00.000Z",
+            f"{125000 + 7919 * (i % 1000):.2f}",
+            f"{120000 + 6841 * (i % 1000):.2f}",
+            f"{growth:.4f}",
+            str(400 + 13 * (i % 500)),
+            None if i % 17 == 0 else f"{3.5 + (i % 15) / 10:.1f}",
+        ]
+        data.append({"values": [{} if value is None else {"str": value} for value in values]})
+    return {
+        "statement_response": {
+            "statement_id": uuid.uuid4().hex,
+            "status": {"state": "SUCCEEDED"},
+            "manifest": {
+                "format": "JSON_ARRAY",
+                "schema": {
+                    "column_count": len(COLUMNS),
+                    "columns": [
+                        {"name": name, "type_name": type_name, "type_text": type_name, "position": i}
+                        for i, (name, type_name) in enumerate(COLUMNS)
+                    ],
+                },
+                "total_row_count": rows,
+                "truncated": False,
+            },
+            "result": {"chunk_index": 0, "row_offset": 0, "row_count": rows, "data_typed_array": data},
+        }
+    }
+
+
+class Case:
+    """One parser call on one payload."""
+
+    def __init__(self, name: str, func: Callable[..., Any], *args: Any, **kwargs: Any):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self) -> Any:
+        return self.func(*self.args, **self.kwargs)
+
+
+def build_cases(realistic_rows: int = REALISTIC_ROWS, large_rows: int = LARGE_ROWS) -> List[Case]:
+    """
+    Every benchmark case, at both payload sizes.
+
+    The parsers are looked up on the server module at call time, so patched or
+    replaced implementations are measured as they are.
+    """
+    cases = []
+    for size, rows in (("realistic", realistic_rows), ("large", large_rows)):
+        message = build_message()
+        bare_message = build_message(with_text=False, with_sql=False)
+        query_result = build_query_result(rows)
+        blocked = {message["conversation_id"], message["id"]}
+        bare_blocked = {bare_message["conversation_id"], bare_message["id"]}
+        candidates = server.collect_texts(bare_message) + server.collect_texts(query_result)
+        cases += [
+            Case(f"collect_texts/{size}", lambda payload: server.collect_texts(payload), query_result),
+            Case(
+                f"pick_best_text/{size}",
+                lambda *args, **kwargs: server.pick_best_text(*args, **kwargs),
+                candidates,
+                question=QUESTION,
+                blocked_values=bare_blocked,
+            ),
+            # With a text attachment the summary is found without walking the payload
+            Case(
+                f"extract_summary/text/{size}",
+                lambda *args, **kwargs: server.extract_summary(*args, **kwargs),
+                message,
+                query_result,
+                question=QUESTION,
+                blocked_values=blocked,
+            ),
+            # Without one, every string in the message and the result becomes a candidate
+            Case(
+                f"extract_summary/no_text/{size}",
+                lambda *args, **kwargs: server.extract_summary(*args, **kwargs),
+                bare_message,
+                query_result,
+                question=QUESTION,
+                blocked_values=bare_blocked,
+            ),
+            # No SQL anywhere: find_sql lowercases every string in the result
+            Case(f"find_sql/{size}", lambda payload: server.find_sql(payload), query_result),
+            Case(f"extract_table/{size}", lambda payload: server.extract_table(payload), query_result),
+            # Summary, SQL and table in one walk, as answers are built
+            Case(
+                f"parse_genie_response/text/{size}",
+                lambda *args, **kwargs: server.parse_genie_response(*args, **kwargs),
+                message,
+                query_result,
+                question=QUESTION,
+                blocked_values=blocked,
+            ),
+            Case(
+                f"parse_genie_response/no_text/{size}",
+                lambda *args, **kwargs: server.parse_genie_response(*args, **kwargs),
+                bare_message,
+                query_result,
+                question=QUESTION,
+                blocked_values=bare_blocked,
+            ),
+        ]
+    return cases
+
+
+def _reference_walk(payload: Any) -> int:
+    """Fixed workload shaped like the parsers' (recursive dict/list walk, string checks)."""
+    count = 0
+    if isinstance(payload, dict):
+        for value in payload.values():
+            count += _reference_walk(value)
+    elif isinstance(payload, list):
+        for item in payload:
+            count += _reference_walk(item)
+    elif isinstance(payload, str) and "select" in payload.lower():
+        count += 1
+    return count
+
+
+def reference_case() -> Case:
+    return Case("reference", _reference_walk, build_query_result(2000))
+
+
+def measure(case: Case, repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Time and memory for one case.
+
+    Each of `repeat` timeit runs makes enough calls to take at least `min_time`
+    seconds; peak memory is taken from a separate, traced call.
+
+    Returns:
+        best_us / median_us per call, calls per run, and peak_bytes
+    """
+    timer = timeit.Timer(case)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    per_call = [total / number for total in timer.repeat(repeat, number)]
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline_bytes, _ = tracemalloc.get_traced_memory()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "best_us": round(min(per_call) * 1e6, 2),
+        "median_us": round(statistics.median(per_call) * 1e6, 2),
+        "calls": number,
+        "peak_bytes": peak - baseline_bytes,
+    }
+
+
+def run_benchmarks(cases: Sequence[Case], repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Measure every case, bracketed by two timings of the reference walk.
+
+    Returns:
+        reference_us (the faster of the two reference timings) and per-case results
+    """
+    reference = reference_case()
+    before = measure(reference, repeat, min_time)["best_us"]
+    results = {case.name: measure(case, repeat, min_time) for case in cases}
+    after = measure(reference, repeat, min_time)["best_us"]
+    return {"reference_us": min(before, after), "cases": results}
+
+
+def machine_scale(results: Dict[str, Any], baseline: Dict[str, Any]) -> float:
+    """How much slower this run's reference walk was than the baseline's (1.0 if either is unknown)."""
+    current, previous = results.get("reference_us"), baseline.get("reference_us")
+    return current / previous if current and previous else 1.0
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    time_threshold: float = 0.25,
+    memory_threshold: float = 0.10,
+) -> List[str]:
+    """
+    Regressions of run_benchmarks() results against a saved baseline, one message per problem.
+
+    Baseline times are scaled by machine_scale() first. Cases missing from the
+    baseline are not checked. Times get 1us and peak memory 1 KiB of slack so
+    tiny cases do not flap.
+    """
+    scale = machine_scale(results, baseline)
+    regressions = []
+    for name, result in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous:
+            continue
+        expected = previous["best_us"] * scale
+        if result["best_us"] > expected * (1 + time_threshold) + 1:
+            regressions.append(f"{name}: {result['best_us']:.1f}us per call, expected at most {expected:.1f}us")
+        memory_limit = previous["peak_bytes"] * (1 + memory_threshold) + 1024
+        if result["peak_bytes"] > memory_limit:
+            regressions.append(f"{name}: peak {result['peak_bytes']} bytes, baseline {previous['peak_bytes']} bytes")
+    return regressions
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_baseline(path: Path, results: Dict[str, Any]) -> None:
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **results,
+    }
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump(document, handle, indent=2)
+        handle.write("\n")
+
+
+def format_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """Plain-text table, with the (machine-scaled) change against the baseline when one is given."""
+    header = f"{'case':<40} {'best us':>12} {'median us':>12} {'peak KiB':>10} {'vs baseline':>12}"
+    lines = [f"reference walk: {results['reference_us']:.1f}us", header, "-" * len(header)]
+    scale = machine_scale(results, baseline or {})
+    previous_cases = (baseline or {}).get("cases", {})
+    for name, result in results["cases"].items():
+        previous = previous_cases.get(name)
+        change = f"{result['best_us'] / (previous['best_us'] * scale) - 1:+.1%}" if previous and previous["best_us"] else "-"
+        lines.append(
+            f"{name:<40} {result['best_us']:>12.1f} {result['median_us']:>12.1f} "
+            f"{result['peak_bytes'] / 1024:>10.1f} {change:>12}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Genie response parsers")
+    parser.add_argument("--filter", help="only run cases whose name contains this substring")
+    parser.add_argument("--large-rows", type=int, default=LARGE_ROWS, help="rows in the large query result")
+    parser.add_argument("--repeat", type=int, default=5, help="timeit runs per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timeit run")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed slowdown as a fraction")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="allowed peak memory growth as a fraction")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    cases = build_cases(large_rows=args.large_rows)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.name]
+    results = run_benchmarks(cases, args.repeat, args.min_time)
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    print(format_results(results, baseline), flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Bounded in-memory cache engine.
+
+Each cache is a namespace with its own TTL, LRU eviction and byte budget
+measured on the stored values (SQL tables, Genie tables, dashboard payloads).
+Expired entries are dropped lazily on access and periodically by a sweeper
+thread, so memory stays bounded even for keys that are never read again.
+"""
+import sys
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger("discount_tire_demo.cache")
+
+_CONTAINER_OVERHEAD = sys.getsizeof([])
+_DICT_OVERHEAD = sys.getsizeof({})
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate the memory footprint of a cached value in bytes.
+
+    Walks dicts, lists and tuples recursively and uses sys.getsizeof for
+    leaves, which is accurate for the str/float/int/None cells that make up
+    result tables.
+    """
+    total = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            total += _DICT_OVERHEAD + 8 * len(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            total += _CONTAINER_OVERHEAD + 8 * len(item)
+            stack.extend(item)
+        elif hasattr(item, "nbytes"):
+            total += int(item.nbytes)
+        else:
+            total += sys.getsizeof(item)
+    return total
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "size")
+
+    def __init__(self, value: Any, stored_at: float, size: int):
+        self.value = value
+        self.stored_at = stored_at
+        self.size = size
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a TTL, an optional stale window and a byte budget."""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_bytes: int,
+        max_entries: Optional[int] = None,
+        stale_ttl: float = 0,
+        sizer: Callable[[Any], int] = estimate_size,
+    ):
+        """
+        Initialize a cache namespace.
+
+        Args:
+            name: Namespace label used in logs and stats
+            ttl: Seconds an entry is considered fresh
+            max_bytes: Byte budget for all stored values
+            max_entries: Optional cap on the number of entries
+            stale_ttl: Extra seconds an expired entry may still be read via get_stale
+            sizer: Callable estimating the size of a value in bytes
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizer = sizer
+        self.clock: Callable[[], float] = time.monotonic
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejections = 0
+
+    def _is_dead(self, entry: _Entry, now: float) -> bool:
+        return now - entry.stored_at >= self.ttl + self.stale_ttl
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _lookup(self, key: Hashable, max_age: float) -> Optional[_Entry]:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if self._is_dead(entry, now):
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            if now - entry.stored_at >= max_age:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if now - entry.stored_at < self.ttl:
+                self._hits += 1
+            else:
+                self._stale_hits += 1
+            return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh value for `key`, or None."""
+        entry = self._lookup(key, self.ttl)
+        return entry.value if entry else None
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Return a value that is fresh or still within the stale window, or None."""
+        entry = self._lookup(key, self.ttl + self.stale_ttl)
+        return entry.value if entry else None
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """
+        Return (value, fresh) for a fresh or still-stale value, or (None, False).
+
+        Counts exactly one hit, stale hit or miss, so a stale serve is not
+        also recorded as a miss the way get() followed by get_stale() is.
+        """
+        entry = self._lookup(key, self.ttl + self.stale_ttl)
+        if entry is None:
+            return None, False
+        return entry.value, self.clock() - entry.stored_at < self.ttl
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh value for `key`, or None (does not touch stats or LRU order)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() - entry.stored_at >= self.ttl:
+                return None
+            return entry.value
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since `key` was stored, or None if absent (does not touch stats or LRU order)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else self.clock() - entry.stored_at
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store `value`, evicting least recently used entries to stay within budget."""
+        size = self.sizer(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self._rejections += 1
+                logger.warning(
+                    f"[{self.name}] Value of {size} bytes exceeds cache budget of {self.max_bytes}; not cached"
+                )
+                return
+            self._entries[key] = _Entry(value, self.clock(), size)
+            self._bytes += size
+            self._evict_over_budget()
+
+    def resize(self, key: Hashable, value: Any) -> None:
+        """
+        Re-account the size of `key` after its stored `value` grew in place.
+
+        Values that memoize derived data (e.g. an EncodedPayload's other
+        representations) call this so the added bytes count against the
+        budget. Does nothing if `key` now holds a different value.
+        """
+        size = self.sizer(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.value is not value:
+                return
+            self._bytes += size - entry.size
+            entry.size = size
+            if size > self.max_bytes:
+                self._remove(key)
+                self._rejections += 1
+                logger.warning(
+                    f"[{self.name}] Value of {size} bytes exceeds cache budget of {self.max_bytes}; dropped"
+                )
+                return
+            self._evict_over_budget()
+
+    def _evict_over_budget(self) -> None:
+        """Evict least recently used entries until within budget (caller holds the lock)."""
+        while self._entries and (
+            self._bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._evictions += 1
+            logger.debug(f"[{self.name}] Evicted {str(evicted_key)[:80]!r} ({evicted.size} bytes)")
+
+    def delete(self, key: Hashable) -> None:
+        """Remove `key` if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def discard_if(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove entries for which predicate(key, value) is true; return how many were removed."""
+        with self._lock:
+            doomed = [key for key, entry in self._entries.items() if predicate(key, entry.value)]
+            for key in doomed:
+                self._remove(key)
+        return len(doomed)
+
+    def clear(self) -> None:
+        """Remove every entry (stats are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drop entries past their TTL and stale window; return how many were removed."""
+        now = self.clock()
+        with self._lock:
+            dead = [key for key, entry in self._entries.items() if self._is_dead(entry, now)]
+            for key in dead:
+                self._remove(key)
+            self._expirations += len(dead)
+        return len(dead)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and current memory usage."""
+        with self._lock:
+            lookups = self._hits + self._stale_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "hit_ratio": round((self._hits + self._stale_hits) / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "rejections": self._rejections,
+            }
+
+
+class CacheSweeper:
+    """Background thread that periodically sweeps expired entries from caches."""
+
+    def __init__(self, caches: List[TTLCache], interval: float = 60):
+        """
+        Initialize the sweeper.
+
+        Args:
+            caches: Caches to sweep
+            interval: Seconds between sweeps
+        """
+        self.caches = caches
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep_once(self) -> int:
+        """Sweep every cache once; return the total number of entries removed."""
+        removed = 0
+        for cache in self.caches:
+            count = cache.sweep()
+            if count:
+                logger.debug(f"[{cache.name}] Swept {count} expired entries")
+            removed += count
+        return removed
+
+    def start(self) -> None:
+        """Start sweeping in a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def loop() -> None:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.sweep_once()
+                except Exception:
+                    logger.exception("Cache sweep failed")
+
+        self._thread = threading.Thread(target=loop, name="cache-sweeper", daemon=True)
+        self._thread.start()
+        logger.info(f"Sweeping {len(self.caches)} caches every {self.interval:.0f}s")
+
+    def stop(self) -> None:
+        """Stop the sweeper thread."""
+        self._stop.set()
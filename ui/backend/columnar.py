@@ -0,0 +1,126 @@
+"""
+Columnar encodings for dashboard payloads.
+
+Dashboard series are JSON arrays of row objects, so every column name is
+repeated on every row. Clients that send an Accept header naming one of the
+columnar media types below get each series as {column: [values]} instead:
+
+- application/vnd.dtc.columnar+json: the payload as JSON with columnar series
+- application/vnd.apache.arrow.stream: the same structure as a one-row Arrow
+  IPC stream (each series is a struct of list columns), requires pyarrow
+
+Scalars and nested objects keep their shape and cell values keep the format
+of the JSON payload. Clients that do not ask for a columnar type (including
+browsers sending */*) get plain JSON.
+"""
+import io
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+logger = logging.getLogger("discount_tire_demo.columnar")
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.dtc.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def parse_accept(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept header into {media range: q-value}."""
+    ranges: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        media_range, *params = part.strip().split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges[media_range] = quality
+    return ranges
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    Pick the dashboard representation for an Accept header.
+
+    Columnar types are only chosen when named explicitly; wildcards and a
+    missing header mean JSON. Ties go to Arrow, then columnar JSON.
+    """
+    ranges = parse_accept(accept)
+    if not ranges:
+        return JSON
+    json_quality = max(ranges.get(media_range, 0.0) for media_range in (JSON, "application/*", "*/*"))
+    candidates = [(ranges.get(COLUMNAR_JSON, 0.0), COLUMNAR_JSON)]
+    if pa is not None:
+        candidates.insert(0, (ranges.get(ARROW_STREAM, 0.0), ARROW_STREAM))
+    best_quality, best = max(candidates, key=lambda candidate: candidate[0])
+    return best if best_quality > 0 and best_quality >= json_quality else JSON
+
+
+def _is_series(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def series_to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Turn row objects into {column: [values]}; keys missing from a row become None."""
+    columns: Dict[str, List[Any]] = {}
+    for index, row in enumerate(rows):
+        for key in row:
+            if key not in columns:
+                columns[key] = [None] * index
+        for key, values in columns.items():
+            values.append(row.get(key))
+    return columns
+
+
+def to_columnar(payload: Any) -> Any:
+    """The payload with every series (non-empty list of objects) stored by column."""
+    if _is_series(payload):
+        return series_to_columns(payload)
+    if isinstance(payload, dict):
+        return {key: to_columnar(value) for key, value in payload.items()}
+    return payload
+
+
+def encode_columnar_json(payload: Any) -> bytes:
+    return json.dumps(to_columnar(payload)).encode("utf-8")
+
+
+def encode_arrow_stream(payload: Any) -> Optional[bytes]:
+    """
+    Encode the columnar payload as a one-row Arrow IPC stream.
+
+    Returns:
+        The stream bytes, or None if pyarrow is missing or cannot type the payload
+        (e.g. a column mixing text and numbers)
+    """
+    if pa is None or not isinstance(payload, dict) or not payload:
+        return None
+    try:
+        table = pa.Table.from_pylist([to_columnar(payload)])
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        logger.warning(f"Payload cannot be encoded as Arrow, serving JSON: {e}")
+        return None
+
+
+# Media type -> encoder for payloads served in more than one representation
+ENCODERS = {
+    COLUMNAR_JSON: encode_columnar_json,
+    ARROW_STREAM: encode_arrow_stream,
+}
@@ -0,0 +1,144 @@
+"""
+Routing for dashboard queries over precomputed aggregate tables.
+
+The notebook pipeline materializes small summary Delta tables (agg_*) next to
+vw_sales_enriched. Dashboard handlers query those first and fall back to the
+equivalent view SQL when an aggregate table is missing (e.g. the notebook
+stage has not been run yet in this workspace). Only a missing table or view
+triggers the fallback: a slow or failing warehouse would be just as slow on
+the view SQL, so other failures are returned as they are. Once an aggregate
+table turns out to be missing while its fallback succeeds, aggregates are
+bypassed for a retry window so each rebuild does not pay for a failing
+round-trip.
+"""
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("discount_tire_demo.dashboard_aggregates")
+
+# Aggregate tables built by the notebook and the base tables/views they summarize
+AGGREGATE_SOURCES = {
+    "agg_monthly_sales": "vw_sales_enriched",
+    "agg_monthly_revenue": "vw_revenue_growth",
+    "agg_store_sales": "vw_sales_enriched",
+    "agg_category_sales": "vw_sales_enriched",
+    "agg_regional_satisfaction": "vw_sales_enriched",
+    "agg_nps_buckets": "vw_sales_enriched",
+}
+
+# Error text of a statement reading a table or view that does not exist
+# (Databricks SQL error classes and DuckDB's catalog error)
+MISSING_TABLE_MARKERS = ("table_or_view_not_found", "table or view not found", "catalog error: table with name")
+
+
+def is_missing_table_error(error: BaseException) -> bool:
+    """True when `error` says a statement read a table or view that does not exist."""
+    message = str(error).lower()
+    return any(marker in message for marker in MISSING_TABLE_MARKERS)
+
+
+class AggregateQuery:
+    """
+    Work over aggregate tables paired with equivalent work over the views.
+
+    Usually both sides are SQL strings; a dashboard may also pair whole
+    batches of queries, as long as the runner passed to AggregateRouter.run
+    accepts them.
+    """
+
+    __slots__ = ("sql", "fallback_sql")
+
+    def __init__(self, sql: Any, fallback_sql: Any):
+        self.sql = sql
+        self.fallback_sql = fallback_sql
+
+    @classmethod
+    def from_view(cls, fallback_sql: str, view: str, table: str) -> "AggregateQuery":
+        """Query a materialized copy of `view` that has the same columns."""
+        return cls(fallback_sql.replace(f".{view}", f".{table}"), fallback_sql)
+
+
+class AggregateRouter:
+    """Runs AggregateQuery objects, falling back to the view SQL when aggregates are unavailable."""
+
+    def __init__(self, enabled: bool = True, retry_seconds: float = 300):
+        """
+        Initialize the router.
+
+        Args:
+            enabled: Query aggregate tables at all (False always uses the view SQL)
+            retry_seconds: How long to bypass aggregates after one turned out to be missing
+        """
+        self.enabled = enabled
+        self.retry_seconds = retry_seconds
+        self.clock: Callable[[], float] = time.monotonic
+        self._lock = threading.Lock()
+        self._bypass_until = 0.0
+        self._aggregate_hits = 0
+        self._fallbacks = 0
+
+    def available(self) -> bool:
+        """True when aggregate tables should be tried."""
+        with self._lock:
+            return self.enabled and self.clock() >= self._bypass_until
+
+    def run(
+        self,
+        query: Any,
+        runner: Callable[[Any], Optional[Any]],
+    ) -> Optional[Any]:
+        """
+        Execute `query` with `runner`, preferring the aggregate SQL.
+
+        The view SQL runs only when the aggregate work raised a missing-table
+        error (see is_missing_table_error) or aggregates are bypassed.
+
+        Args:
+            query: Plain work for the runner, or an AggregateQuery with its view fallback
+            runner: Callable executing one unit of work (e.g. run_direct_sql), None on
+                failure; raises the warehouse error when a table or view is missing
+
+        Returns:
+            The runner's result, or None if the statement that ran failed
+        """
+        if not isinstance(query, AggregateQuery):
+            return runner(query)
+
+        tried_aggregate = self.available()
+        if tried_aggregate:
+            try:
+                table = runner(query.sql)
+            except Exception as e:
+                if not is_missing_table_error(e):
+                    raise
+                logger.info(f"Aggregate table missing: {e}")
+            else:
+                if table is not None:
+                    with self._lock:
+                        self._aggregate_hits += 1
+                return table
+
+        table = runner(query.fallback_sql)
+        with self._lock:
+            self._fallbacks += 1
+            # Only blame the aggregates if the warehouse itself is answering
+            if tried_aggregate and table is not None and self.clock() >= self._bypass_until:
+                self._bypass_until = self.clock() + self.retry_seconds
+                logger.warning(
+                    f"Aggregate tables unavailable; using view SQL for {self.retry_seconds:.0f}s "
+                    "(run the notebook's aggregate stage to build them)"
+                )
+        return table
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aggregate hits, view fallbacks and whether aggregates are currently bypassed."""
+        with self._lock:
+            bypassed_for = max(0.0, self._bypass_until - self.clock())
+            return {
+                "enabled": self.enabled,
+                "aggregate_hits": self._aggregate_hits,
+                "fallbacks": self._fallbacks,
+                "bypassed_for_seconds": round(bypassed_for, 1),
+            }
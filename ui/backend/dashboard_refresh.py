@@ -0,0 +1,114 @@
+"""
+Background refresh for dashboard payloads.
+
+Stale dashboard entries are served immediately while a worker thread rebuilds
+them (stale-while-revalidate). A scheduler thread also pre-warms every
+dashboard key on startup and then on a fixed interval so viewers never hit a
+cold cache.
+"""
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger("discount_tire_demo.dashboard_refresh")
+
+Builder = Callable[[], Optional[Dict[str, Any]]]
+
+
+class DashboardRefresher:
+    """Runs dashboard rebuilds off the request path, at most one per key."""
+
+    def __init__(self, refresh_fn: Callable[[str, Builder], Any], max_workers: int = 2):
+        """
+        Initialize the refresher.
+
+        Args:
+            refresh_fn: Callable(cache_key, builder) that rebuilds and stores a payload
+            max_workers: Number of background rebuild threads
+        """
+        self.refresh_fn = refresh_fn
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dashboard-refresh")
+        self._in_progress: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+        self._refreshes = 0
+        self._failures = 0
+
+    def schedule(self, cache_key: str, builder: Builder) -> bool:
+        """
+        Queue a background rebuild for `cache_key` unless one is already running.
+
+        Returns:
+            True if a new rebuild was queued
+        """
+        with self._lock:
+            if cache_key in self._in_progress:
+                return False
+            self._in_progress.add(cache_key)
+        try:
+            self._executor.submit(self._run, cache_key, builder)
+        except RuntimeError:
+            # Executor shut down during interpreter exit
+            with self._lock:
+                self._in_progress.discard(cache_key)
+            return False
+        return True
+
+    def _run(self, cache_key: str, builder: Builder) -> None:
+        try:
+            payload = self.refresh_fn(cache_key, builder)
+            with self._lock:
+                self._refreshes += 1
+                if payload is None:
+                    self._failures += 1
+            if payload is None:
+                logger.warning(f"Background refresh of {cache_key} returned no data")
+            else:
+                logger.debug(f"Refreshed {cache_key} in background")
+        except Exception:
+            with self._lock:
+                self._refreshes += 1
+                self._failures += 1
+            logger.exception(f"Background refresh of {cache_key} failed")
+        finally:
+            with self._lock:
+                self._in_progress.discard(cache_key)
+
+    def start(self, routes: Iterable[Tuple[str, Builder]], interval: float) -> None:
+        """
+        Pre-warm every route now and then every `interval` seconds.
+
+        Args:
+            routes: (cache_key, builder) pairs to keep warm
+            interval: Seconds between refresh rounds
+        """
+        if self._scheduler is not None:
+            return
+        routes = list(routes)
+
+        def loop() -> None:
+            while not self._stop.is_set():
+                for cache_key, builder in routes:
+                    self.schedule(cache_key, builder)
+                self._stop.wait(interval)
+
+        self._scheduler = threading.Thread(target=loop, name="dashboard-prewarm", daemon=True)
+        self._scheduler.start()
+        logger.info(f"Pre-warming {len(routes)} dashboard keys every {interval:.0f}s")
+
+    def stop(self) -> None:
+        """Stop the scheduler; in-flight rebuilds are allowed to finish."""
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get refresh counters."""
+        with self._lock:
+            return {
+                "refreshes": self._refreshes,
+                "failures": self._failures,
+                "in_progress": len(self._in_progress),
+            }
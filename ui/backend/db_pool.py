@@ -2,12 +2,16 @@
 Database connection pool for Databricks SQL Warehouse.
 
 Provides thread-safe connection pooling to reduce overhead of creating
-new connections for each query.
+new connections for each query. The pool opens connections lazily, between
+a minimum and maximum size, and health-checks them in the background.
+Callers beyond a bounded wait queue are rejected with PoolSaturated instead
+of piling more load onto a busy warehouse.
 """
 import os
 import threading
-import queue
-from typing import Optional
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
 import logging
 
 try:
@@ -15,41 +19,131 @@ try:
 except ImportError:
     dbsql = None
 
+try:
+    from backend.tracing import span
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from tracing import span
+
+try:
+    from backend.metrics import Histogram
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from metrics import Histogram
+
 logger = logging.getLogger("discount_tire_demo.db_pool")
 
 
+class PoolSaturated(Exception):
+    """Every connection is busy and the caller could not be queued (or waited too long)."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _PooledConnection:
+    """A warehouse connection plus the timestamps the pool ages it by."""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn: Any):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
 class SQLWarehousePool:
-    """Thread-safe connection pool for Databricks SQL Warehouse."""
-    
-    def __init__(self, pool_size: int = 3, timeout: int = 30):
+    """
+    Elastic, thread-safe connection pool for Databricks SQL Warehouse.
+
+    No connections are opened at construction. The pool grows on demand up to
+    `max_size`, and a background thread keeps at least `min_size` open, closes
+    idle connections above `min_size` and retires connections older than
+    `max_lifetime`. Connections are validated (SELECT 1) when checked out after
+    sitting idle for `idle_check` seconds, not on every return.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 3,
+        timeout: int = 30,
+        min_size: int = 1,
+        idle_check: float = 60,
+        idle_timeout: float = 300,
+        max_lifetime: float = 3600,
+        maintenance_interval: float = 30,
+        max_waiters: int = 16,
+        wait_timeout: float = 5.0,
+        retry_after: int = 2,
+        connect: Optional[Callable[[], Any]] = None,
+    ):
         """
         Initialize connection pool.
-        
+
         Args:
-            pool_size: Number of connections to maintain
+            pool_size: Maximum number of open connections
             timeout: Connection timeout in seconds
+            min_size: Connections kept open (and opened in the background) while idle
+            idle_check: Validate a connection on checkout after this many idle seconds
+            idle_timeout: Close connections above min_size idle this long
+            max_lifetime: Close connections this many seconds after they were opened (0 disables)
+            maintenance_interval: Seconds between background maintenance passes (0 disables)
+            max_waiters: Callers allowed to wait for a connection; further callers are rejected
+            wait_timeout: Seconds run_sql_with_pool waits for a connection
+            retry_after: Seconds rejected callers are told to wait before retrying
+            connect: Opens one connection (default: databricks.sql.connect from the environment)
         """
         self.pool_size = pool_size
+        self.min_size = min(max(0, min_size), pool_size)
         self.timeout = timeout
-        self.connections = queue.Queue(maxsize=pool_size)
+        self.idle_check = idle_check
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.maintenance_interval = maintenance_interval
+        self.max_waiters = max(0, max_waiters)
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
         self.lock = threading.Lock()
+        self._available = threading.Condition(self.lock)
+        # Idle connections, most recently used last (checkout pops from the end)
+        self._idle: Deque[_PooledConnection] = deque()
+        self._in_use: Dict[int, _PooledConnection] = {}
+        # Open connections plus connections being opened
+        self._open = 0
         self._closed = False
-        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Callers waiting for a connection, in arrival order
+        self._waiting: Deque[object] = deque()
+        self._wait_seconds = Histogram("sql_pool_wait_seconds")
+        self._stats = {
+            "created": 0,
+            "create_failures": 0,
+            "validation_failures": 0,
+            "recycled": 0,
+            "shrunk": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "max_waiting": 0,
+        }
+
         # Configuration from environment
         self.host = os.getenv("DATABRICKS_HOST")
         self.http_path = os.getenv("DATABRICKS_SQL_HTTP_PATH")
         self.token = os.getenv("DATABRICKS_TOKEN_FOR_SQL")
-        
-        if self.host and self.http_path and self.token and dbsql:
-            self._initialize_pool()
-        else:
+        self._connect = connect
+
+        if connect is None and not (self.host and self.http_path and self.token and dbsql):
             logger.warning("SQL Warehouse pool not initialized (missing config or databricks-sql-connector)")
-    
+        elif self.maintenance_interval > 0:
+            self._start_maintenance()
+
     def _create_connection(self):
         """Create a new SQL Warehouse connection."""
+        if self._connect is not None:
+            return self._connect()
         if not dbsql:
             return None
-        
+
         try:
             conn = dbsql.connect(
                 server_hostname=self.host,
@@ -62,96 +156,249 @@ class SQLWarehousePool:
         except Exception as e:
             logger.error(f"Failed to create connection: {e}")
             return None
-    
-    def _initialize_pool(self):
-        """Populate the connection pool."""
-        for i in range(self.pool_size):
+
+    def _open_connection(self) -> Optional[_PooledConnection]:
+        """Open a connection for a slot already counted in self._open; frees the slot on failure."""
+        try:
             conn = self._create_connection()
-            if conn:
-                self.connections.put(conn)
-                logger.debug(f"Added connection {i+1}/{self.pool_size} to pool")
-    
+        except Exception as e:
+            logger.error(f"Failed to create connection: {e}")
+            conn = None
+        with self.lock:
+            if conn is None:
+                self._open -= 1
+                self._stats["create_failures"] += 1
+                self._available.notify_all()
+                return None
+            self._stats["created"] += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, pooled: _PooledConnection, reason: str) -> None:
+        """Close a connection that has left the pool and free its slot."""
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self._open -= 1
+            if reason in self._stats:
+                self._stats[reason] += 1
+            self._available.notify_all()
+
+    def _expired(self, pooled: _PooledConnection, now: float) -> bool:
+        return self.max_lifetime > 0 and now - pooled.created_at >= self.max_lifetime
+
+    def _is_alive(self, pooled: _PooledConnection) -> bool:
+        try:
+            cursor = pooled.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Idle connection failed validation: {e}")
+            return False
+
     def get_connection(self, block: bool = True, timeout: Optional[float] = None):
         """
-        Get a connection from the pool.
-        
+        Get a connection from the pool, opening one if none is idle and the pool
+        is below its maximum size. When every connection is in use, callers wait
+        in FIFO order; the wait queue holds at most `max_waiters` callers.
+
         Args:
             block: If True, block until a connection is available
             timeout: Maximum time to wait for a connection
-            
+
         Returns:
-            Connection object or None if unavailable
+            Connection object, or None if the pool is closed or a connection could not be opened
+
+        Raises:
+            PoolSaturated: The wait queue is full, `timeout` passed or `block` is False
         """
-        if self._closed:
-            logger.error("Cannot get connection from closed pool")
-            return None
-        
+        enqueued = time.monotonic()
+        deadline = None if timeout is None else enqueued + timeout
+        ticket = None
         try:
-            conn = self.connections.get(block=block, timeout=timeout)
-            logger.debug("Retrieved connection from pool")
-            return conn
-        except queue.Empty:
-            logger.warning("No connections available in pool")
-            return None
-    
-    def return_connection(self, conn):
+            while True:
+                pooled = None
+                grow = False
+                with self.lock:
+                    if self._closed:
+                        logger.error("Cannot get connection from closed pool")
+                        return None
+                    # Callers already waiting go first
+                    if (self._waiting[0] is ticket) if ticket is not None else not self._waiting:
+                        if self._idle:
+                            pooled = self._idle.pop()
+                        elif self._open < self.pool_size:
+                            self._open += 1
+                            grow = True
+                    if pooled is None and not grow:
+                        if ticket is None:
+                            if not block or len(self._waiting) >= self.max_waiters:
+                                self._stats["rejected"] += 1
+                                raise PoolSaturated("SQL connection pool is saturated", self.retry_after)
+                            ticket = object()
+                            self._waiting.append(ticket)
+                            self._stats["max_waiting"] = max(self._stats["max_waiting"], len(self._waiting))
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise PoolSaturated("Timed out waiting for a SQL connection", self.retry_after)
+                        self._available.wait(remaining)
+                        continue
+                    if ticket is not None:
+                        self._waiting.popleft()
+                        ticket = None
+                        self._available.notify_all()
+
+                if grow:
+                    pooled = self._open_connection()
+                    if pooled is None:
+                        return None
+                else:
+                    now = time.monotonic()
+                    if self._expired(pooled, now):
+                        self._discard(pooled, "recycled")
+                        continue
+                    if now - pooled.last_used >= self.idle_check and not self._is_alive(pooled):
+                        self._discard(pooled, "validation_failures")
+                        continue
+
+                with self.lock:
+                    self._in_use[id(pooled.conn)] = pooled
+                waited = time.monotonic() - enqueued
+                self._wait_seconds.observe(waited)
+                if waited > 1:
+                    logger.info(f"Waited {waited:.1f}s for a SQL connection")
+                logger.debug("Retrieved connection from pool")
+                return pooled.conn
+        finally:
+            if ticket is not None:
+                with self.lock:
+                    self._waiting.remove(ticket)
+                    self._available.notify_all()
+
+    def return_connection(self, conn, validate: bool = False):
         """
         Return a connection to the pool.
-        
+
         Args:
             conn: Connection object to return
+            validate: Check the connection is still alive first (e.g. after a failed statement)
         """
-        if self._closed:
+        with self.lock:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
             try:
                 conn.close()
             except Exception:
                 pass
             return
-        
-        try:
-            # Test connection is still alive
-            conn.cursor().execute("SELECT 1")
-            self.connections.put(conn, block=False)
-            logger.debug("Returned connection to pool")
-        except Exception as e:
-            logger.warning(f"Connection test failed, creating new one: {e}")
-            # Replace dead connection with new one
-            new_conn = self._create_connection()
-            if new_conn:
+
+        if self._closed or self._expired(pooled, time.monotonic()):
+            self._discard(pooled, "recycled")
+            return
+        if validate and not self._is_alive(pooled):
+            self._discard(pooled, "validation_failures")
+            return
+
+        pooled.last_used = time.monotonic()
+        with self.lock:
+            self._idle.append(pooled)
+            self._available.notify_all()
+        logger.debug("Returned connection to pool")
+
+    def maintain(self) -> None:
+        """
+        One maintenance pass: retire idle connections past their lifetime, close
+        idle connections above min_size that have been unused for idle_timeout,
+        then open connections until min_size are open.
+        """
+        now = time.monotonic()
+        retired = []
+        with self.lock:
+            if self._closed:
+                return
+            keep: Deque[_PooledConnection] = deque()
+            # Oldest-used first, so the surplus that is closed is the least recently used
+            for pooled in self._idle:
+                if self._expired(pooled, now):
+                    retired.append((pooled, "recycled"))
+                elif (
+                    self._open - len(retired) > self.min_size
+                    and now - pooled.last_used >= self.idle_timeout
+                ):
+                    retired.append((pooled, "shrunk"))
+                else:
+                    keep.append(pooled)
+            self._idle = keep
+        for pooled, reason in retired:
+            self._discard(pooled, reason)
+
+        while True:
+            with self.lock:
+                if self._closed or self._open >= self.min_size:
+                    return
+                self._open += 1
+            pooled = self._open_connection()
+            if pooled is None:
+                return
+            with self.lock:
+                self._idle.appendleft(pooled)
+                self._available.notify_all()
+
+    def _start_maintenance(self) -> None:
+        def loop() -> None:
+            # The first pass runs right away, opening min_size connections in the background
+            while True:
                 try:
-                    self.connections.put(new_conn, block=False)
-                except queue.Full:
-                    new_conn.close()
-    
+                    self.maintain()
+                except Exception:
+                    logger.exception("SQL pool maintenance failed")
+                if self._stop.wait(self.maintenance_interval):
+                    return
+
+        self._thread = threading.Thread(target=loop, name="sql-pool-maintenance", daemon=True)
+        self._thread.start()
+
     def close_all(self):
         """Close all connections in the pool."""
         with self.lock:
             if self._closed:
                 return
-            
+
             self._closed = True
-            closed_count = 0
-            
-            while not self.connections.empty():
-                try:
-                    conn = self.connections.get_nowait()
-                    conn.close()
-                    closed_count += 1
-                except queue.Empty:
-                    break
-                except Exception as e:
-                    logger.error(f"Error closing connection: {e}")
-            
-            logger.info(f"Closed {closed_count} connections from pool")
-    
+            self._stop.set()
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._available.notify_all()
+
+        closed_count = 0
+        for pooled in idle:
+            try:
+                pooled.conn.close()
+                closed_count += 1
+            except Exception as e:
+                logger.error(f"Error closing connection: {e}")
+
+        logger.info(f"Closed {closed_count} connections from pool")
+
     def get_pool_status(self):
-        """Get current pool status."""
-        return {
-            "pool_size": self.pool_size,
-            "available": self.connections.qsize(),
-            "in_use": self.pool_size - self.connections.qsize(),
-            "closed": self._closed
-        }
+        """Get current pool status, including the wait queue and checkout wait times."""
+        with self.lock:
+            status = {
+                "pool_size": self.pool_size,
+                "min_size": self.min_size,
+                "open": self._open,
+                "available": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": len(self._waiting),
+                "max_waiters": self.max_waiters,
+                "closed": self._closed,
+                **self._stats,
+            }
+        status["wait_seconds"] = self._wait_seconds.get_stats()
+        return status
 
 
 # Global pool instance (singleton)
@@ -162,42 +409,76 @@ _SQL_POOL_LOCK = threading.Lock()
 def get_sql_pool() -> SQLWarehousePool:
     """Get or create the global SQL connection pool."""
     global _SQL_POOL
-    
+
     if _SQL_POOL is None:
         with _SQL_POOL_LOCK:
             if _SQL_POOL is None:
                 pool_size = int(os.getenv("SQL_POOL_SIZE", "3"))
-                _SQL_POOL = SQLWarehousePool(pool_size=pool_size)
-                logger.info(f"Initialized SQL connection pool with size {pool_size}")
-    
+                min_size = int(os.getenv("SQL_POOL_MIN_SIZE", "1"))
+                _SQL_POOL = SQLWarehousePool(
+                    pool_size=pool_size,
+                    min_size=min_size,
+                    idle_check=float(os.getenv("SQL_POOL_IDLE_CHECK_SECONDS", "60")),
+                    idle_timeout=float(os.getenv("SQL_POOL_IDLE_TIMEOUT_SECONDS", "300")),
+                    max_lifetime=float(os.getenv("SQL_POOL_MAX_LIFETIME_SECONDS", "3600")),
+                    maintenance_interval=float(os.getenv("SQL_POOL_MAINTENANCE_INTERVAL_SECONDS", "30")),
+                    max_waiters=int(os.getenv("SQL_POOL_MAX_WAITERS", "16")),
+                    wait_timeout=float(os.getenv("SQL_POOL_WAIT_SECONDS", "5")),
+                    retry_after=int(os.getenv("SQL_POOL_RETRY_AFTER_SECONDS", "2")),
+                )
+                logger.info(f"Initialized SQL connection pool with size {min_size}-{pool_size}")
+
     return _SQL_POOL
 
 
-def run_sql_with_pool(sql_query: str) -> Optional[list]:
+def get_sql_pool_status() -> Optional[dict]:
+    """Status of the global pool, or None if it has not been created yet."""
+    pool = _SQL_POOL
+    return pool.get_pool_status() if pool is not None else None
+
+
+def run_sql_with_pool(
+    sql_query: str,
+    fetch: Optional[Callable[[Any], Any]] = None,
+    raise_if: Optional[Callable[[Exception], bool]] = None,
+) -> Optional[Any]:
     """
     Execute SQL query using connection pool.
     
     Args:
         sql_query: SQL query to execute
+        fetch: Reads the result from the executed cursor (default: cursor.fetchall())
+        raise_if: Statement errors for which raise_if(error) is true are re-raised
+            instead of returning None
         
     Returns:
-        List of rows or None on failure
+        List of rows (or whatever `fetch` returns) or None on failure
+
+    Raises:
+        PoolSaturated: No connection became available; the caller should shed the request
     """
     pool = get_sql_pool()
-    conn = pool.get_connection(timeout=5.0)
+    with span("pool-wait"):
+        conn = pool.get_connection(timeout=pool.wait_timeout)
     
     if conn is None:
         logger.error("Failed to get connection from pool")
         return None
     
+    failed = False
     try:
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        result = cursor.fetchall()
-        cursor.close()
+        with span("sql-exec", pooled=True):
+            cursor = conn.cursor()
+            cursor.execute(sql_query)
+            result = fetch(cursor) if fetch else cursor.fetchall()
+            cursor.close()
         return result
     except Exception as e:
         logger.error(f"SQL execution failed: {e}")
+        failed = True
+        if raise_if is not None and raise_if(e):
+            raise
         return None
     finally:
-        pool.return_connection(conn)
+        # A failed statement may mean a dead connection: check before reusing it
+        pool.return_connection(conn, validate=failed)
@@ -0,0 +1,453 @@
+"""
+Single-pass parsing of completed Genie responses.
+
+A Genie answer is built from three things found in the message and its query
+result: a summary sentence, the generated SQL and the result table.
+parse_genie_response() gathers all three in one iterative, depth-first walk:
+
+- summary candidates are offered to a SummaryPicker as they are visited, in
+  the order collect_texts() would list them; key ranks are precomputed and a
+  candidate is only inspected when it could still beat the current best, so
+  long result sets are skipped without lowercasing or sorting anything
+- SQL is the first string containing "select", as find_sql() finds it
+- table rows are built while the walk passes over data_typed_array
+
+The walk stops as soon as the summary and SQL are settled; the remaining rows
+are then copied directly. collect_texts, pick_best_text, find_sql,
+extract_summary, extract_sql and extract_table keep their original contracts
+and share the same machinery.
+"""
+import re
+from itertools import repeat
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PREFERRED_TEXT_KEYS = (
+    "summary",
+    "answer",
+    "response",
+    "assistant_message",
+    "content",
+    "text",
+    "message",
+    "markdown",
+)
+SKIP_TEXT_KEYS = {"sql", "query", "statement", "status", "suggested_questions", "questions"}
+UUID_RE = re.compile(r"^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$", re.IGNORECASE)
+STATUS_VALUES = {"completed", "failed", "pending", "in_progress", "running"}
+NO_SUMMARY = "Genie returned SQL, but no summary text was found."
+
+# Rank of a candidate's key: lower is preferred, every other key ties last
+_KEY_RANK = {key: index for index, key in enumerate(PREFERRED_TEXT_KEYS)}
+_OTHER_RANK = len(PREFERRED_TEXT_KEYS)
+# Stands in for the key of list items, which are never candidates themselves
+_ITEM = object()
+
+
+def is_probably_sql(text: str) -> bool:
+    lowered = text.strip().lower()
+    if not lowered:
+        return False
+    if lowered.startswith("select"):
+        return True
+    return "select" in lowered and "from" in lowered and ("where" in lowered or "group by" in lowered)
+
+
+class SummaryPicker:
+    """
+    Picks the summary among candidates offered in payload order.
+
+    The winner is the first acceptable candidate with the best-ranked key,
+    which is what sorting every candidate by (looks like SQL, key rank) and
+    taking the first acceptable one returns: SQL-looking text is never
+    acceptable.
+    """
+
+    def __init__(self, question: Optional[str] = None, blocked_values: Optional[set] = None):
+        self._question = question.strip().lower() if question else None
+        self._blocked = {value.strip().lower() for value in (blocked_values or set()) if value}
+        self.best: Optional[str] = None
+        self.best_rank = _OTHER_RANK + 1
+
+    @property
+    def settled(self) -> bool:
+        """No later candidate can win."""
+        return self.best_rank == 0
+
+    def offer(self, key: str, text: str) -> None:
+        rank = _KEY_RANK.get(key, _OTHER_RANK)
+        if rank >= self.best_rank:
+            return
+        cleaned = self.accept(text)
+        if cleaned is not None:
+            self.best, self.best_rank = cleaned, rank
+
+    def accept(self, text: str) -> Optional[str]:
+        """The stripped text if it may serve as a summary, else None."""
+        cleaned = text.strip()
+        if not cleaned:
+            return None
+        lowered = cleaned.lower()
+        if lowered.startswith("select") or (
+            "select" in lowered and "from" in lowered and ("where" in lowered or "group by" in lowered)
+        ):
+            return None
+        if UUID_RE.match(cleaned):
+            return None
+        if lowered in STATUS_VALUES or lowered in self._blocked:
+            return None
+        if cleaned.isupper() and len(cleaned) <= 16:
+            return None
+        question = self._question
+        if question:
+            if lowered == question or lowered.rstrip("?") == question.rstrip("?"):
+                return None
+            if question in lowered and len(cleaned) <= len(question) + 3:
+                return None
+        return cleaned
+
+
+class GeniePayloadVisitor:
+    """
+    Iterative depth-first walk over Genie payloads.
+
+    Visits strings in document order, offering those under dict keys (outside
+    SKIP_TEXT_KEYS subtrees) as summary candidates and checking every string
+    for SQL, until neither is wanted any more. `rows_of` may name one
+    data_typed_array list whose rows are collected while it is walked.
+    """
+
+    def __init__(self, want_texts: bool = False, want_sql: bool = False, picker: Optional[SummaryPicker] = None):
+        self.want_texts = want_texts
+        self.want_sql = want_sql
+        self.picker = picker
+        self.candidates: List[Tuple[str, str]] = []
+        self.sql: Optional[str] = None
+        self.rows_of: Optional[list] = None
+        self.rows: Optional[List[List[Optional[str]]]] = None
+
+    def candidate(self, key: str, text: str) -> None:
+        self.candidates.append((key, text))
+        picker = self.picker
+        if picker is not None and _KEY_RANK.get(key, _OTHER_RANK) < picker.best_rank:
+            picker.offer(key, text)
+            self.want_texts = not picker.settled
+
+    def visit(self, payload: Any) -> None:
+        """Walk one payload (a message or a query result) in document order."""
+        if not self.want_texts:
+            if self.want_sql:
+                self._scan_sql(payload)
+            return
+        if isinstance(payload, dict):
+            self._walk(iter(payload.items()))
+        elif isinstance(payload, list):
+            self._walk(zip(repeat(_ITEM), payload))
+        elif isinstance(payload, str) and self.want_sql:
+            self._scan_sql(payload)
+
+    def _scan_sql(self, payload: Any) -> bool:
+        """Find the first string containing "select" (find_sql's rule); True once found."""
+        stack = [iter((payload,))]
+        while stack:
+            for value in stack[-1]:
+                if isinstance(value, str):
+                    if "select" in value.lower():
+                        self.sql = value
+                        self.want_sql = False
+                        return True
+                elif isinstance(value, dict):
+                    stack.append(iter(value.values()))
+                    break
+                elif isinstance(value, list):
+                    stack.append(iter(value))
+                    break
+            else:
+                stack.pop()
+        return False
+
+    def _walk(self, items: Iterator[Tuple[Any, Any]]) -> None:
+        """
+        Collect candidates from (key, value) pairs and everything below them.
+
+        Subtrees under skipped keys hold no candidates and are only scanned for
+        SQL. Once the summary is settled, the rest is scanned for SQL only.
+        """
+        record, picker, rows_of = self.candidates.append, self.picker, self.rows_of
+        # Runs once per node of large payloads, so the flags live in locals
+        want_texts, want_sql = self.want_texts, self.want_sql
+        stack = [items]
+        while stack and want_texts:
+            for key, value in stack[-1]:
+                if isinstance(value, str):
+                    if key is not _ITEM and key not in SKIP_TEXT_KEYS:
+                        record((key, value))
+                        if picker is not None and _KEY_RANK.get(key, _OTHER_RANK) < picker.best_rank:
+                            picker.offer(key, value)
+                            want_texts = not picker.settled
+                    if want_sql and "select" in value.lower():
+                        self.sql = value
+                        want_sql = False
+                    if not want_texts:
+                        break
+                elif isinstance(value, dict):
+                    if key not in SKIP_TEXT_KEYS:
+                        stack.append(iter(value.items()))
+                        break
+                    if want_sql and self._scan_sql(value):
+                        want_sql = False
+                elif isinstance(value, list):
+                    if key in SKIP_TEXT_KEYS:
+                        if want_sql and self._scan_sql(value):
+                            want_sql = False
+                    elif key != "data_typed_array":
+                        stack.append(zip(repeat(_ITEM), value))
+                        break
+                    else:
+                        self.want_texts, self.want_sql = want_texts, want_sql
+                        if value is rows_of:
+                            self.rows = []
+                        self._visit_rows(value, self.rows if value is rows_of else None)
+                        want_texts, want_sql = self.want_texts, self.want_sql
+                        if not want_texts:
+                            break
+            else:
+                stack.pop()
+        self.want_texts, self.want_sql = want_texts, want_sql
+        if not want_sql:
+            return
+        # Summary settled: finish the remaining (key, value) pairs, innermost first, for SQL
+        while stack:
+            for _, value in stack.pop():
+                if self._scan_sql(value):
+                    return
+
+    def _visit_rows(self, data: list, rows: Optional[list] = None) -> None:
+        """
+        Visit a data_typed_array list, appending its table rows to `rows` if given.
+
+        Rows shaped {"values": [{"str": ...}, ...]} are read inline; anything
+        else is walked like any other node.
+        """
+        record, picker = self.candidates.append, self.picker
+        want_sql = self.want_sql
+        for index, entry in enumerate(data):
+            if rows is not None:
+                rows.append([value.get("str") if isinstance(value, dict) else None for value in entry.get("values", [])])
+            if not self.want_texts:
+                if rows is None:
+                    return
+                continue
+            values = entry.get("values") if isinstance(entry, dict) and len(entry) == 1 else None
+            if not isinstance(values, list):
+                self.visit(entry)
+                want_sql = self.want_sql
+                if not self.want_texts and want_sql:
+                    self._scan_sql(data[index + 1 :])
+                continue
+            for position, value in enumerate(values):
+                if isinstance(value, dict) and len(value) == 1:
+                    text = value.get("str")
+                    if isinstance(text, str):
+                        record(("str", text))
+                        if picker is not None and _OTHER_RANK < picker.best_rank:
+                            picker.offer("str", text)
+                        if want_sql and "select" in text.lower():
+                            self.sql = text
+                            self.want_sql = want_sql = False
+                        continue
+                self.visit([value])
+                want_sql = self.want_sql
+                if not self.want_texts:
+                    # Summary settled inside a cell; the rest of the rows only matter for SQL
+                    if want_sql and not self._scan_sql(values[position + 1 :]):
+                        self._scan_sql(data[index + 1 :])
+                    break
+
+
+class ParsedGenieResponse:
+    """Summary, SQL and table of one Genie response."""
+
+    def __init__(
+        self,
+        summary: str,
+        summary_source: Optional[str],
+        sql: Optional[str],
+        table: Optional[Dict[str, Any]],
+    ):
+        self.summary = summary
+        self.summary_source = summary_source
+        self.sql = sql
+        self.table = table
+
+
+def _attachment_summary(message: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """The first non-empty text or markdown attachment, which is used as is."""
+    for attachment in message.get("attachments", []):
+        text_entry = attachment.get("text")
+        if isinstance(text_entry, dict):
+            content = text_entry.get("content") or text_entry.get("text")
+            if isinstance(content, str) and content.strip():
+                return content.strip(), "text"
+        elif isinstance(text_entry, str) and text_entry.strip():
+            return text_entry.strip(), "text"
+
+        markdown_entry = attachment.get("markdown")
+        if isinstance(markdown_entry, dict):
+            content = markdown_entry.get("content") or markdown_entry.get("text")
+            if isinstance(content, str) and content.strip():
+                return content.strip(), "markdown"
+        elif isinstance(markdown_entry, str) and markdown_entry.strip():
+            return markdown_entry.strip(), "markdown"
+    return None
+
+
+def _attachment_candidates(message: Dict[str, Any], visitor: GeniePayloadVisitor) -> None:
+    """Offer attachment texts and query descriptions ahead of the rest of the message."""
+    for attachment in message.get("attachments", []):
+        for key in ("text", "markdown", "content"):
+            entry = attachment.get(key)
+            if isinstance(entry, dict):
+                content = entry.get("content") or entry.get("text")
+                if isinstance(content, str):
+                    visitor.candidate(key, content)
+            elif isinstance(entry, str):
+                visitor.candidate(key, entry)
+        query_entry = attachment.get("query")
+        if isinstance(query_entry, dict):
+            description = query_entry.get("description")
+            if isinstance(description, str):
+                visitor.candidate("description", description)
+
+
+def _table_parts(query_result: Optional[Dict[str, Any]]) -> Tuple[List[str], Any]:
+    """Column names and data_typed_array of a query result (empty when absent)."""
+    if not query_result:
+        return [], []
+    response = query_result.get("statement_response", {})
+    manifest = response.get("manifest", {})
+    schema = manifest.get("schema", {})
+    columns = [col.get("name") for col in schema.get("columns", []) if col.get("name")]
+    if not columns:
+        return [], []
+    result = response.get("result", {})
+    return columns, result.get("data_typed_array", [])
+
+
+def _build_rows(data: Any) -> List[List[Optional[str]]]:
+    rows = []
+    for entry in data:
+        values = entry.get("values", [])
+        rows.append([value.get("str") if isinstance(value, dict) else None for value in values])
+    return rows
+
+
+def parse_genie_response(
+    message: Dict[str, Any],
+    query_result: Optional[Dict[str, Any]] = None,
+    question: Optional[str] = None,
+    blocked_values: Optional[set] = None,
+) -> ParsedGenieResponse:
+    """
+    Summary, SQL and table of a completed Genie message in one walk.
+
+    Equivalent to extract_summary(), extract_sql() and extract_table() on the
+    same arguments.
+    """
+    picker = SummaryPicker(question, blocked_values)
+    visitor = GeniePayloadVisitor(picker=picker)
+
+    found = _attachment_summary(message)
+    if found is None:
+        visitor.want_texts = True
+        _attachment_candidates(message, visitor)
+    sql_entry = message.get("query") or message.get("sql")
+    if isinstance(sql_entry, str):
+        visitor.sql = sql_entry
+    else:
+        visitor.want_sql = True
+
+    columns, data = _table_parts(query_result)
+    if data and isinstance(data, list):
+        visitor.rows_of = data
+
+    visitor.visit(message)
+    # A falsy query result is neither searched for summaries nor for SQL
+    if query_result:
+        visitor.visit(query_result)
+
+    table = None
+    if data:
+        rows = visitor.rows if visitor.rows is not None else _build_rows(data)
+        table = {"columns": columns, "rows": rows}
+
+    if found is not None:
+        summary, source = found
+    elif picker.best is None:
+        summary, source = NO_SUMMARY, None
+    else:
+        summary = picker.best
+        # Report the key of the first candidate with the same text, as extract_summary always has
+        source = next((key for key, text in visitor.candidates if text.strip() == summary), None)
+    return ParsedGenieResponse(summary, source, visitor.sql, table)
+
+
+def collect_texts(payload: Any, parent_key: str = "") -> list[tuple[str, str]]:
+    """(key, text) for every string under a dict key, outside SKIP_TEXT_KEYS subtrees, in document order."""
+    visitor = GeniePayloadVisitor(want_texts=True)
+    visitor.visit(payload)
+    return visitor.candidates
+
+
+def pick_best_text(
+    candidates: list[tuple[str, str]],
+    question: Optional[str] = None,
+    blocked_values: Optional[set[str]] = None,
+) -> Optional[str]:
+    picker = SummaryPicker(question, blocked_values)
+    for key, text in candidates:
+        picker.offer(key, text)
+        if picker.settled:
+            break
+    return picker.best
+
+
+def extract_summary(
+    message: dict,
+    query_result: Optional[Dict[str, Any]] = None,
+    question: Optional[str] = None,
+    blocked_values: Optional[set[str]] = None,
+) -> tuple[str, Optional[str]]:
+    found = _attachment_summary(message)
+    if found is not None:
+        return found
+    picker = SummaryPicker(question, blocked_values)
+    visitor = GeniePayloadVisitor(want_texts=True, picker=picker)
+    _attachment_candidates(message, visitor)
+    visitor.visit(message)
+    if query_result:
+        visitor.visit(query_result)
+    if picker.best is None:
+        return NO_SUMMARY, None
+    source = next((key for key, text in visitor.candidates if text.strip() == picker.best), None)
+    return picker.best, source
+
+
+def extract_table(query_result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    columns, data = _table_parts(query_result)
+    if not data:
+        return None
+    return {"columns": columns, "rows": _build_rows(data)}
+
+
+def find_sql(payload: Any) -> Optional[str]:
+    """The first string in `payload`, in document order, that contains "select"."""
+    visitor = GeniePayloadVisitor(want_sql=True)
+    visitor.visit(payload)
+    return visitor.sql
+
+
+def extract_sql(message: Dict[str, Any], query_result: Optional[Dict[str, Any]]) -> Optional[str]:
+    candidate = message.get("query") or message.get("sql")
+    if isinstance(candidate, str):
+        return candidate
+    return find_sql(message) or find_sql(query_result or {})
@@ -0,0 +1,250 @@
+"""
+Genie conversation polling.
+
+One Genie question is a start-conversation call, a series of message polls
+and a query-result fetch. The flow is written once as a generator of steps
+(HTTP calls and sleeps) so the threading server and the asyncio server can
+drive the same logic with blocking or non-blocking I/O:
+
+- polls start at a short interval and back off exponentially with jitter
+- 429 responses wait for Retry-After (or the backoff) before retrying
+- the whole conversation is bounded by an overall deadline
+- every call is timed into a per-phase latency histogram
+"""
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Generator, Mapping, Optional, Tuple, Union
+
+try:
+    from backend.metrics import Histogram
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from metrics import Histogram
+
+logger = logging.getLogger("discount_tire_demo.genie_polling")
+
+PHASES = ("start", "poll", "query_result")
+_PHASE_LATENCY = {phase: Histogram(f"genie_{phase}_seconds") for phase in PHASES}
+_THROTTLED = {phase: 0 for phase in PHASES}
+_THROTTLED_LOCK = threading.Lock()
+
+# Genie message statuses reported to streaming clients as "executing"; earlier
+# statuses are "submitted"
+_EXECUTING_STATUSES = {"PENDING_WAREHOUSE", "EXECUTING_QUERY"}
+
+# (status_code, JSON body, response headers)
+Response = Tuple[int, Dict[str, Any], Mapping[str, str]]
+# (phase, url, method, payload) or a number of seconds to sleep
+Step = Union[Tuple[str, str, str, Optional[Dict[str, Any]]], float]
+
+
+class GenieError(RuntimeError):
+    """A Genie conversation failed; `status_code` is the HTTP status to surface."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PollPolicy:
+    """Backoff parameters for one Genie conversation."""
+
+    def __init__(
+        self,
+        initial_interval: float = 0.25,
+        max_interval: float = 3.0,
+        multiplier: float = 1.6,
+        jitter: float = 0.2,
+        deadline: float = 90.0,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            initial_interval: First delay between polls in seconds
+            max_interval: Cap on the delay between polls
+            multiplier: Growth factor applied after every poll
+            jitter: Fraction of each delay randomized (+/-) to spread callers
+            deadline: Seconds the whole conversation may take
+        """
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def interval(self, attempt: int) -> float:
+        """Jittered delay before poll number `attempt` (0-based)."""
+        base = min(self.max_interval, self.initial_interval * self.multiplier**attempt)
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Parse a Retry-After header given as delta-seconds or an HTTP date."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def coarse_status(genie_status: Optional[str]) -> str:
+    """Collapse a Genie message status into submitted / executing / completed."""
+    if genie_status == "COMPLETED":
+        return "completed"
+    if genie_status in _EXECUTING_STATUSES:
+        return "executing"
+    return "submitted"
+
+
+class GenieConversation:
+    """Result of a completed Genie conversation."""
+
+    __slots__ = ("conversation_id", "message_id", "message", "query_result")
+
+    def __init__(
+        self,
+        conversation_id: str,
+        message_id: str,
+        message: Dict[str, Any],
+        query_result: Optional[Dict[str, Any]],
+    ):
+        self.conversation_id = conversation_id
+        self.message_id = message_id
+        self.message = message
+        self.query_result = query_result
+
+
+def _call(
+    phase: str,
+    url: str,
+    method: str,
+    payload: Optional[Dict[str, Any]],
+    policy: PollPolicy,
+    deadline: float,
+) -> Generator[Step, Response, Response]:
+    """Issue one call, retrying 429s after Retry-After or backoff until the deadline."""
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        response = yield (phase, url, method, payload)
+        _PHASE_LATENCY[phase].observe(time.monotonic() - started)
+        if response[0] != 429:
+            return response
+        with _THROTTLED_LOCK:
+            _THROTTLED[phase] += 1
+        delay = retry_after_seconds(response[2])
+        if delay is None:
+            delay = policy.interval(attempt)
+        if time.monotonic() + delay >= deadline:
+            raise GenieError(429, "Genie is throttling requests. Please try again shortly.")
+        logger.info(f"Genie {phase} throttled; retrying in {delay:.2f}s")
+        yield delay
+        attempt += 1
+
+
+def conversation_steps(
+    base_url: str,
+    content: str,
+    policy: PollPolicy,
+    on_status: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    deadline: Optional[float] = None,
+) -> Generator[Step, Response, GenieConversation]:
+    """
+    Steps for one Genie question, to be run by run_conversation or an async driver.
+
+    Args:
+        base_url: Genie space API base URL
+        content: Question or SQL to send
+        policy: Polling and deadline policy
+        on_status: Called with (coarse_status, details) whenever the coarse status changes
+        deadline: time.monotonic() value to finish by (defaults to now + policy.deadline)
+
+    Raises:
+        GenieError: With the status and message to report to the caller
+    """
+    if deadline is None:
+        deadline = time.monotonic() + policy.deadline
+
+    status_code, start_payload, _ = yield from _call(
+        "start", f"{base_url}/start-conversation", "POST", {"content": content}, policy, deadline
+    )
+    if status_code != 200:
+        raise GenieError(status_code, "Failed to start Genie conversation.")
+    conversation_id = start_payload.get("conversation_id")
+    message_id = start_payload.get("message_id")
+    if not conversation_id or not message_id:
+        raise GenieError(500, "Invalid response from Genie.")
+    ids = {"conversation_id": conversation_id, "message_id": message_id}
+    reported = "submitted"
+    if on_status:
+        on_status(reported, ids)
+
+    message_url = f"{base_url}/conversations/{conversation_id}/messages/{message_id}"
+    attempt = 0
+    while True:
+        status_code, message_payload, _ = yield from _call("poll", message_url, "GET", None, policy, deadline)
+        if status_code != 200:
+            raise GenieError(status_code, "Failed to poll Genie status.")
+        status = message_payload.get("status")
+        if on_status and coarse_status(status) != reported:
+            reported = coarse_status(status)
+            on_status(reported, {**ids, "genie_status": status})
+        if status == "COMPLETED":
+            break
+        if status == "FAILED":
+            raise GenieError(500, "Genie query failed.")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise GenieError(504, "Genie query timed out.")
+        yield min(policy.interval(attempt), remaining)
+        attempt += 1
+
+    _, query_result, _ = yield from _call(
+        "query_result", f"{message_url}/query-result", "GET", None, policy, deadline
+    )
+    return GenieConversation(conversation_id, message_id, message_payload, query_result)
+
+
+def run_conversation(
+    base_url: str,
+    headers: Dict[str, str],
+    content: str,
+    request: Callable[[str, str, Optional[Dict[str, Any]], Dict[str, str]], Response],
+    policy: PollPolicy,
+    sleep: Callable[[float], None] = time.sleep,
+    on_status: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    deadline: Optional[float] = None,
+) -> GenieConversation:
+    """Drive conversation_steps with a blocking `request(url, method, payload, headers)`."""
+    steps = conversation_steps(base_url, content, policy, on_status, deadline)
+    response = None
+    while True:
+        try:
+            step = steps.send(response)
+        except StopIteration as done:
+            return done.value
+        if isinstance(step, tuple):
+            _, url, method, payload = step
+            response = request(url, method, payload, headers)
+        else:
+            sleep(step)
+            response = None
+
+
+def get_genie_latency_stats() -> Dict[str, Any]:
+    """Latency histogram and throttle count per Genie phase."""
+    stats = {}
+    for phase in PHASES:
+        stats[phase] = _PHASE_LATENCY[phase].get_stats()
+        stats[phase]["throttled"] = _THROTTLED[phase]
+    return stats
@@ -0,0 +1,192 @@
+"""
+Row-chunked reads of Genie statement results.
+
+A Genie query result carries the first chunk of its statement's rows inline.
+Larger results continue in further chunks: `next_chunk_internal_link` points
+at the next chunk on the workspace (fetched with the Genie token), and chunks
+with the EXTERNAL_LINKS disposition list presigned `external_links` whose
+JSON arrays are fetched without credentials. ResultReader walks those chunks
+one at a time, so a large answer is never held or encoded in full:
+
+- rows come out in slices of `chunk_size`, built from one slice at a time
+- reading stops at `max_rows`; the reader then reports `truncated`
+- a chunk that cannot be fetched ends the read early, also as `truncated`
+
+Like genie_polling, the read is written once as a generator of steps (fetches
+and row slices) so the threading and asyncio servers drive the same logic.
+"""
+import logging
+from typing import Any, Dict, Generator, List, Mapping, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("discount_tire_demo.genie_results")
+
+Row = List[Optional[str]]
+# (status_code, decoded JSON body, response headers)
+Response = Tuple[int, Any, Mapping[str, str]]
+# A GET of (url, headers) to answer with a Response, or rows to emit
+Step = Union[Tuple[str, Dict[str, str]], List[Row]]
+
+
+def page_rows(data: List[Any]) -> List[Row]:
+    """Rows of a data_typed_array slice ({"values": [{"str": ...}]}) or a data_array slice ([...])."""
+    rows = []
+    for entry in data:
+        if isinstance(entry, dict):
+            rows.append([value.get("str") if isinstance(value, dict) else None for value in entry.get("values", [])])
+        else:
+            rows.append(list(entry))
+    return rows
+
+
+def _statement_parts(query_result: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """The manifest and first result chunk of a Genie query result."""
+    response = (query_result or {}).get("statement_response") or {}
+    return response.get("manifest") or {}, response.get("result") or {}
+
+
+def _inline_data(chunk: Dict[str, Any]) -> List[Any]:
+    return chunk.get("data_typed_array") or chunk.get("data_array") or []
+
+
+def _has_more_chunks(chunk: Dict[str, Any]) -> bool:
+    return bool(chunk.get("next_chunk_internal_link") or chunk.get("external_links"))
+
+
+def cap_table(
+    table: Optional[Dict[str, Any]], query_result: Optional[Dict[str, Any]], max_rows: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Limit an answer table built from the first result chunk to `max_rows`.
+
+    Tables that hold the whole result are returned unchanged. Otherwise the
+    copy notes `truncated`, its `row_count` and, when Genie reports it, the
+    statement's `total_row_count`.
+    """
+    if table is None:
+        return None
+    manifest, chunk = _statement_parts(query_result)
+    rows = table["rows"]
+    total = manifest.get("total_row_count")
+    more = (
+        len(rows) > max_rows
+        or _has_more_chunks(chunk)
+        or bool(manifest.get("truncated"))
+        or (isinstance(total, int) and total > len(rows))
+    )
+    if not more:
+        return table
+    capped = {"columns": table["columns"], "rows": rows[:max_rows], "truncated": True}
+    capped["row_count"] = len(capped["rows"])
+    if total is not None:
+        capped["total_row_count"] = total
+    return capped
+
+
+def result_continuation(query_result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    What a reader needs to resume `query_result` after its inline first chunk.
+
+    Returns a query result with the manifest's counts and the first chunk's
+    links but none of its rows (None when the result has no further chunks),
+    small enough to cache next to an answer. Reading it with start_row set to
+    the rows already sent continues with the second chunk.
+    """
+    manifest, chunk = _statement_parts(query_result)
+    if not _has_more_chunks(chunk):
+        return None
+    links = {key: chunk[key] for key in ("next_chunk_internal_link", "external_links") if chunk.get(key)}
+    counts = {key: manifest[key] for key in ("total_row_count", "truncated") if key in manifest}
+    return {"statement_response": {"manifest": counts, "result": links}}
+
+
+class ResultReader:
+    """Reads the rows of one Genie statement result chunk by chunk, up to a row cap."""
+
+    def __init__(self, base_url: str, headers: Dict[str, str], max_rows: int, chunk_size: int = 50):
+        """
+        Initialize the reader.
+
+        Args:
+            base_url: Genie space API base URL (internal chunk links resolve against its host)
+            headers: Headers for internal chunk links (the Genie Authorization header)
+            max_rows: Rows to read at most, counting rows already sent
+            chunk_size: Rows per emitted slice
+        """
+        parts = urlsplit(base_url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.headers = headers
+        self.max_rows = max_rows
+        self.chunk_size = max(chunk_size, 1)
+        self.row_count = 0
+        self.truncated = False
+        self.total_row_count: Optional[int] = None
+        # Chunks fetched after the inline first chunk
+        self.chunks_fetched = 0
+
+    def metadata(self) -> Dict[str, Any]:
+        """Row count and truncation of the read so far, for a stream's `done` event."""
+        metadata = {"row_count": self.row_count, "truncated": self.truncated}
+        if self.total_row_count is not None:
+            metadata["total_row_count"] = self.total_row_count
+        return metadata
+
+    def _slices(self, data: List[Any], start: int = 0) -> Generator[Step, Response, None]:
+        """Row slices of data[start:], stopping (and marking truncated) at max_rows."""
+        end = min(len(data), start + max(self.max_rows - self.row_count, 0))
+        if end < len(data):
+            self.truncated = True
+        for offset in range(start, end, self.chunk_size):
+            rows = page_rows(data[offset : min(offset + self.chunk_size, end)])
+            self.row_count += len(rows)
+            yield rows
+
+    def _give_up(self, what: str, status: int) -> None:
+        logger.warning(f"Stopped reading Genie result after {self.row_count} rows: {what} returned {status}")
+        self.truncated = True
+
+    def steps(self, query_result: Optional[Dict[str, Any]], start_row: int = 0) -> Generator[Step, Response, None]:
+        """
+        Steps reading every chunk of `query_result`, to be driven by a server.
+
+        Yields (url, headers) GETs, to be answered with a Response, and lists
+        of rows to emit.
+
+        Args:
+            query_result: Genie query-result payload ({"statement_response": ...})
+            start_row: Rows of the inline first chunk already sent (e.g. in the answer table)
+        """
+        manifest, chunk = _statement_parts(query_result)
+        self.total_row_count = manifest.get("total_row_count")
+        self.row_count = start_row
+        data = _inline_data(chunk)
+        yield from self._slices(data, min(start_row, len(data)))
+        while not self.truncated:
+            links = chunk.get("external_links") or []
+            for link in links:
+                if self.row_count >= self.max_rows:
+                    self.truncated = True
+                    return
+                status, data, _ = yield (link.get("external_link") or "", {})
+                if status != 200 or not isinstance(data, list):
+                    self._give_up(f"external link for chunk {link.get('chunk_index')}", status)
+                    return
+                yield from self._slices(data)
+                if self.truncated:
+                    return
+            # Each external link names the chunk after it; the last one continues the read
+            next_link = links[-1].get("next_chunk_internal_link") if links else chunk.get("next_chunk_internal_link")
+            if not next_link:
+                # Every chunk was read; Genie may still have cut the statement short
+                total = self.total_row_count
+                self.truncated = bool(manifest.get("truncated")) or (isinstance(total, int) and total > self.row_count)
+                return
+            if self.row_count >= self.max_rows:
+                self.truncated = True
+                return
+            status, chunk, _ = yield (f"{self.origin}{next_link}", self.headers)
+            if status != 200 or not isinstance(chunk, dict):
+                self._give_up(next_link, status)
+                return
+            self.chunks_fetched += 1
+            yield from self._slices(_inline_data(chunk))
@@ -0,0 +1,232 @@
+"""
+Genie job scheduler.
+
+Every Genie conversation (interactive questions from the chat panel and
+background run_genie_sql fallbacks) is admitted through one scheduler:
+
+- a bounded wait queue; callers beyond it are rejected immediately (503)
+- interactive jobs are admitted before background jobs, FIFO within a priority
+- at most `max_concurrent` conversations run at once
+- a token bucket spaces conversation starts to the workspace Genie quota
+- each job carries a deadline; a job still queued at its deadline fails (504)
+
+Threads wait in acquire(); the asyncio server waits in async_acquire(), which
+polls with asyncio.sleep so a queued question never holds an executor thread.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from backend.genie_polling import GenieError
+    from backend.metrics import Histogram
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_polling import GenieError
+    from metrics import Histogram
+
+logger = logging.getLogger("discount_tire_demo.genie_scheduler")
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second (not thread-safe)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.clock = time.monotonic
+        self._tokens = burst
+        self._updated = self.clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> float:
+        """Take a token and return 0, or return seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class GenieScheduler:
+    """Priority admission control for Genie conversations."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 3,
+        max_queue: int = 20,
+        rate_per_minute: float = 5,
+        burst: Optional[float] = None,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrent: Conversations allowed to run at once
+            max_queue: Jobs allowed to wait; further jobs are rejected
+            rate_per_minute: Conversation starts per minute (0 disables rate limiting)
+            burst: Starts allowed back to back (defaults to the per-minute rate)
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst if burst is not None else max(1.0, rate_per_minute))
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._rejected = 0
+        self._expired = 0
+        self._wait_seconds = {name: Histogram(f"genie_queue_wait_{name}_seconds") for name in PRIORITY_NAMES.values()}
+
+    def _remove(self, ticket: Tuple[int, int]) -> None:
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        # The head may have changed; let the new head re-check
+        self._cond.notify_all()
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        """Queue a ticket for a job (caller holds the lock)."""
+        must_wait = bool(self._waiting) or self._running >= self.max_concurrent
+        if must_wait and len(self._waiting) >= self.max_queue:
+            self._rejected += 1
+            raise GenieError(503, "Genie is busy. Please try again shortly.")
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _poll(self, ticket: Tuple[int, int], deadline: Optional[float]) -> Tuple[bool, Optional[float]]:
+        """
+        Admit `ticket` if it may start now (caller holds the lock).
+
+        Returns:
+            (True, None) once admitted, otherwise (False, seconds to wait) where
+            None means until another job finishes or leaves the queue
+
+        Raises:
+            GenieError: 504 (and the ticket leaves the queue) if the deadline has passed
+        """
+        timeout = None
+        if self._waiting[0] == ticket and self._running < self.max_concurrent:
+            timeout = self.bucket.try_take()
+            if timeout == 0:
+                heapq.heappop(self._waiting)
+                self._running += 1
+                self._admitted[PRIORITY_NAMES[ticket[0]]] += 1
+                self._cond.notify_all()
+                return True, None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._remove(ticket)
+                self._expired += 1
+                raise GenieError(504, "Genie query timed out while queued.")
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return False, timeout
+
+    def _observe_wait(self, priority: int, enqueued: float) -> None:
+        name = PRIORITY_NAMES[priority]
+        waited = time.monotonic() - enqueued
+        self._wait_seconds[name].observe(waited)
+        if waited > 1:
+            logger.info(f"Genie {name} job waited {waited:.1f}s for a slot")
+
+    def acquire(self, priority: int = INTERACTIVE, deadline: Optional[float] = None) -> None:
+        """
+        Block until the job may start a conversation.
+
+        Args:
+            priority: INTERACTIVE or BACKGROUND
+            deadline: time.monotonic() value after which the job gives up
+
+        Raises:
+            GenieError: 503 if the queue is full, 504 if the deadline passes while queued
+        """
+        enqueued = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            while True:
+                admitted, timeout = self._poll(ticket, deadline)
+                if admitted:
+                    break
+                self._cond.wait(timeout)
+        self._observe_wait(priority, enqueued)
+
+    async def async_acquire(
+        self, priority: int = INTERACTIVE, deadline: Optional[float] = None, poll_interval: float = 0.05
+    ) -> None:
+        """
+        Wait on the event loop until the job may start a conversation.
+
+        Same contract as acquire. The queue is re-checked every `poll_interval`
+        seconds; a wait cancelled while queued leaves the queue without a slot.
+        """
+        enqueued = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    admitted, timeout = self._poll(ticket, deadline)
+                if admitted:
+                    break
+                await asyncio.sleep(poll_interval if timeout is None else min(timeout, poll_interval))
+        except asyncio.CancelledError:
+            with self._cond:
+                if ticket in self._waiting:
+                    self._remove(ticket)
+            raise
+        self._observe_wait(priority, enqueued)
+
+    def release(self) -> None:
+        """Give back a slot taken by acquire."""
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE, deadline: Optional[float] = None) -> Iterator[None]:
+        """Hold a scheduler slot for the duration of the with-block."""
+        self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, object]:
+        """Queue depth per priority, running jobs, token level and wait-time histograms."""
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                depth[PRIORITY_NAMES[priority]] += 1
+            stats = {
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "queue_depth": depth,
+                "max_queue": self.max_queue,
+                "tokens": round(self.bucket.tokens, 2),
+                "admitted": dict(self._admitted),
+                "rejected": self._rejected,
+                "expired": self._expired,
+            }
+        stats["wait_seconds"] = {name: histogram.get_stats() for name, histogram in self._wait_seconds.items()}
+        return stats
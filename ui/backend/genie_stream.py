@@ -0,0 +1,130 @@
+"""
+Streamed Genie answers: Server-Sent Events and NDJSON.
+
+POST /api/genie/stream answers the same question as /api/genie/query but
+writes events as the conversation progresses instead of one JSON body at the
+end:
+
+    event: status    {"status": "submitted" | "executing" | "completed", ...}
+    event: summary   {"summary": "..."}
+    event: columns   {"columns": [...]}
+    event: rows      {"rows": [[...], ...]}      (repeated, GENIE_STREAM_ROW_CHUNK rows each)
+    event: done      {"row_count": N, "truncated": false, "total_row_count": M}
+    event: error     {"status": 504, "error": "..."}
+
+POST /api/genie/query with `Accept: application/x-ndjson` writes the summary,
+columns, rows and done events of a completed answer as one JSON object per
+line ({"event": "rows", "rows": [...]}). Both streams read result chunks past
+the first one as they go (see genie_results.py), up to GENIE_RESULT_MAX_ROWS;
+`total_row_count` is sent when Genie reports it.
+"""
+import json
+from typing import Any, Callable, Dict, Generator, Optional, Union
+
+try:
+    from backend.columnar import parse_accept
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from columnar import parse_accept
+
+try:
+    from backend.genie_results import ResultReader, Response
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_results import ResultReader, Response
+
+NDJSON = "application/x-ndjson"
+
+SSE_HEADERS = {
+    "Content-Type": "text/event-stream; charset=utf-8",
+    "Cache-Control": "no-cache",
+    # Disable response buffering in reverse proxies
+    "X-Accel-Buffering": "no",
+}
+NDJSON_HEADERS = {**SSE_HEADERS, "Content-Type": f"{NDJSON}; charset=utf-8"}
+
+# Event bytes to write, or a (url, headers) GET of a result chunk to answer with a Response
+Event = Union[bytes, tuple]
+
+
+def format_sse(event: str, data: Any) -> bytes:
+    """Encode one SSE event with a JSON data line."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def format_ndjson(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode one event as an NDJSON line."""
+    return (json.dumps({"event": event, **data}) + "\n").encode("utf-8")
+
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    """True when an Accept header names NDJSON explicitly."""
+    return parse_accept(accept).get(NDJSON, 0.0) > 0
+
+
+def answer_events(
+    answer: Dict[str, Any],
+    chunk_size: int = 50,
+    encode: Callable[[str, Any], bytes] = format_sse,
+    reader: Optional[ResultReader] = None,
+    query_result: Optional[Dict[str, Any]] = None,
+) -> Generator[Event, Optional[Response], None]:
+    """
+    Events for a built Genie answer: summary, then columns and row chunks, then done.
+
+    Without a reader this only yields bytes and can be iterated directly;
+    otherwise drive it with run_events.
+
+    Args:
+        answer: Payload from parse_genie_answer ({"summary", "table"})
+        chunk_size: Rows per `rows` event
+        encode: format_sse or format_ndjson
+        reader: Continues past the answer table through the rest of `query_result`
+        query_result: The Genie query result the answer was built from
+    """
+    yield encode("summary", {"summary": answer.get("summary")})
+    table: Optional[Dict[str, Any]] = answer.get("table")
+    done: Dict[str, Any] = {"row_count": 0, "truncated": False}
+    if table:
+        yield encode("columns", {"columns": table.get("columns") or []})
+        rows = table.get("rows") or []
+        for start in range(0, len(rows), max(chunk_size, 1)):
+            chunk = rows[start : start + chunk_size]
+            done["row_count"] += len(chunk)
+            yield encode("rows", {"rows": chunk})
+        done["truncated"] = bool(table.get("truncated"))
+        if "total_row_count" in table:
+            done["total_row_count"] = table["total_row_count"]
+        if reader is not None and done["truncated"]:
+            steps = reader.steps(query_result, start_row=done["row_count"])
+            response = None
+            while True:
+                try:
+                    step = steps.send(response)
+                except StopIteration:
+                    break
+                if isinstance(step, list):
+                    response = None
+                    yield encode("rows", {"rows": step})
+                else:
+                    response = yield step
+            done = reader.metadata()
+    yield encode("done", done)
+
+
+def run_events(
+    events: Generator[Event, Optional[Response], None],
+    emit: Callable[[bytes], None],
+    request: Callable[[str, str, Optional[Dict[str, Any]], Dict[str, str]], Response],
+) -> None:
+    """Drive answer_events, writing events with `emit` and fetching chunks with a blocking `request`."""
+    response = None
+    while True:
+        try:
+            step = events.send(response)
+        except StopIteration:
+            return
+        if isinstance(step, bytes):
+            emit(step)
+            response = None
+        else:
+            url, headers = step
+            response = request(url, "GET", None, headers)
@@ -0,0 +1,427 @@
+"""
+Persistent outbound HTTP(S) connection pool.
+
+Genie and serving-endpoint calls go to the same workspace host over and over
+(a single Genie question can poll dozens of times). Keeping connections open
+per host and sharing one SSL context means only the first call pays for the
+TCP connect and TLS handshake.
+
+A pooled connection the server has closed while idle is noticed before it is
+used where possible, and otherwise retried once on a fresh connection. The
+retry only repeats a request the server may already have received when the
+method is idempotent, so a POST (e.g. start-conversation) is never sent twice.
+
+The asyncio server sends through the same pool with async_request: the
+connections are asyncio streams, kept per host and event loop, and counted in
+the same reuse stats.
+"""
+import asyncio
+import http.client
+import os
+import select
+import ssl
+import threading
+import time
+import logging
+from http.client import HTTPMessage, parse_headers
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("discount_tire_demo.http_pool")
+
+# Errors that mean a kept-alive connection was closed by the server while idle
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+# Requests that are safe to send again if the server may already have received them
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# The asyncio equivalents: the server closed the stream before (or while) answering
+_ASYNC_STALE_CONNECTION_ERRORS = (
+    asyncio.IncompleteReadError,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+_SSL_CONTEXTS: Dict[bool, ssl.SSLContext] = {}
+_SSL_LOCK = threading.Lock()
+
+
+def insecure_tls() -> bool:
+    """Whether DATABRICKS_INSECURE disables TLS verification."""
+    return os.getenv("DATABRICKS_INSECURE", "").strip().lower() in {"1", "true", "yes"}
+
+
+def get_ssl_context(insecure: bool = False) -> ssl.SSLContext:
+    """Return the shared client SSL context (verified or unverified)."""
+    context = _SSL_CONTEXTS.get(insecure)
+    if context is None:
+        with _SSL_LOCK:
+            context = _SSL_CONTEXTS.get(insecure)
+            if context is None:
+                context = ssl._create_unverified_context() if insecure else ssl.create_default_context()
+                _SSL_CONTEXTS[insecure] = context
+    return context
+
+
+def _is_dropped(conn: http.client.HTTPConnection) -> bool:
+    """True if an idle connection's socket is readable, i.e. the server closed it (or sent junk)."""
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def may_retry(method: str, sent: bool) -> bool:
+    """Whether a request that failed on a stale connection may be sent again."""
+    return not sent or method.upper() in _IDEMPOTENT_METHODS
+
+
+async def _read_async_response(
+    reader: asyncio.StreamReader, method: str
+) -> Tuple[int, HTTPMessage, bytes, bool]:
+    """Read one response from a stream: (status, headers, body, whether the connection can be reused)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, _, header_blob = head.partition(b"\r\n")
+    version, status = status_line.split(b" ", 2)[:2]
+    status = int(status)
+    headers = parse_headers(BytesIO(header_blob))
+    keep_alive = version == b"HTTP/1.1" and "close" not in (headers.get("Connection") or "").lower()
+    if method == "HEAD" or status in (204, 304) or status < 200:
+        return status, headers, b"", keep_alive
+    if "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        return status, headers, b"".join(chunks), keep_alive
+    length = headers.get("Content-Length")
+    if length is not None:
+        return status, headers, await reader.readexactly(int(length)), keep_alive
+    # The body runs to the end of the stream
+    return status, headers, await reader.read(), False
+
+
+class _AsyncConnection:
+    """An asyncio stream pair and the event loop it belongs to."""
+
+    __slots__ = ("reader", "writer", "loop")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop):
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+
+    def usable_on(self, loop: asyncio.AbstractEventLoop) -> bool:
+        """False once the server has closed the stream, or for another loop's streams."""
+        return self.loop is loop and not self.reader.at_eof() and not self.writer.is_closing()
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except RuntimeError:
+            # Its event loop is already closed
+            pass
+
+
+class PooledResponse:
+    """Status, headers and fully read body of a pooled request."""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: http.client.HTTPMessage, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class HTTPConnectionPool:
+    """Thread-safe pool of persistent connections keyed by (scheme, host, port, insecure)."""
+
+    def __init__(self, max_idle_per_host: int = 4, idle_timeout: float = 60, timeout: float = 30):
+        """
+        Initialize the pool.
+
+        Args:
+            max_idle_per_host: Idle connections kept open per host
+            idle_timeout: Seconds an idle connection may sit before it is closed
+            timeout: Socket timeout for connect and reads
+        """
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int, bool], List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._async_idle: Dict[Tuple[str, str, int, bool], List[Tuple[_AsyncConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._created = 0
+        self._reused = 0
+        self._retried = 0
+        self._evicted = 0
+        self._dropped = 0
+        self._discarded = 0
+
+    def _route(self, url: str) -> Tuple[Tuple[str, str, int, bool], str, str]:
+        """Pool key, request target and Host header for `url`, counting the request."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port, scheme == "https" and insecure_tls())
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        with self._lock:
+            self._requests += 1
+        return key, target, parts.netloc
+
+    def _new_connection(self, key: Tuple[str, str, int, bool]) -> http.client.HTTPConnection:
+        scheme, host, port, insecure = key
+        with self._lock:
+            self._created += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=get_ssl_context(insecure))
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _checkout(self, key: Tuple[str, str, int, bool]) -> Optional[http.client.HTTPConnection]:
+        """Pop the most recently used live idle connection for `key`, closing expired and dropped ones."""
+        now = time.monotonic()
+        expired = []
+        dropped = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate, last_used = idle.pop()
+                if now - last_used >= self.idle_timeout:
+                    expired.append(candidate)
+                    continue
+                if _is_dropped(candidate):
+                    dropped.append(candidate)
+                    continue
+                conn = candidate
+                self._reused += 1
+                break
+            self._evicted += len(expired)
+            self._dropped += len(dropped)
+        for stale in expired + dropped:
+            stale.close()
+        return conn
+
+    def _release(self, key: Tuple[str, str, int, bool], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+            self._discarded += 1
+        conn.close()
+
+    def request(
+        self,
+        url: str,
+        method: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> PooledResponse:
+        """
+        Send a request over a pooled connection and read the full response.
+
+        A reused connection that turns out to have been closed by the server is
+        replaced once with a fresh connection: always if the request could not
+        be sent, otherwise only for idempotent methods.
+        """
+        key, target, _ = self._route(url)
+        conn = self._checkout(key)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._new_connection(key)
+            sent = False
+            try:
+                conn.request(method, target, body=body, headers=headers or {})
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused or not may_retry(method, sent):
+                    raise
+                logger.debug(f"Pooled connection to {key[1]} was closed by the server; reconnecting")
+                with self._lock:
+                    self._retried += 1
+                conn, reused = None, False
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return PooledResponse(response.status, response.headers, data)
+
+    def _async_checkout(
+        self, key: Tuple[str, str, int, bool], loop: asyncio.AbstractEventLoop
+    ) -> Optional[_AsyncConnection]:
+        """Like _checkout, for streams of the running event loop."""
+        now = time.monotonic()
+        closed = []
+        conn = None
+        with self._lock:
+            idle = self._async_idle.get(key, [])
+            kept = []
+            while idle:
+                candidate, last_used = idle.pop()
+                if candidate.loop is not loop and not candidate.loop.is_closed():
+                    # Another live loop's stream; leave it for that loop
+                    kept.append((candidate, last_used))
+                elif now - last_used >= self.idle_timeout:
+                    self._evicted += 1
+                    closed.append(candidate)
+                elif not candidate.usable_on(loop):
+                    self._dropped += 1
+                    closed.append(candidate)
+                else:
+                    conn = candidate
+                    self._reused += 1
+                    break
+            idle.extend(reversed(kept))
+        for stale in closed:
+            stale.close()
+        return conn
+
+    def _async_release(self, key: Tuple[str, str, int, bool], conn: _AsyncConnection) -> None:
+        with self._lock:
+            idle = self._async_idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+            self._discarded += 1
+        conn.close()
+
+    async def _async_connect(self, key: Tuple[str, str, int, bool]) -> _AsyncConnection:
+        scheme, host, port, insecure = key
+        with self._lock:
+            self._created += 1
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=get_ssl_context(insecure) if scheme == "https" else None),
+            self.timeout,
+        )
+        return _AsyncConnection(reader, writer, asyncio.get_running_loop())
+
+    async def async_request(
+        self,
+        url: str,
+        method: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> PooledResponse:
+        """Asyncio counterpart of request, with the same reuse and retry rules."""
+        key, target, host = self._route(url)
+        request_headers = {"Host": host, **(headers or {})}
+        if body or method in {"POST", "PUT", "PATCH"}:
+            request_headers["Content-Length"] = str(len(body or b""))
+        head = f"{method} {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in request_headers.items()) + "\r\n"
+        data = head.encode("latin-1") + (body or b"")
+
+        loop = asyncio.get_running_loop()
+        conn = self._async_checkout(key, loop)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = await self._async_connect(key)
+            sent = False
+            try:
+                conn.writer.write(data)
+                await conn.writer.drain()
+                sent = True
+                status, response_headers, response_body, keep_alive = await asyncio.wait_for(
+                    _read_async_response(conn.reader, method), self.timeout
+                )
+            except _ASYNC_STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused or not may_retry(method, sent):
+                    raise
+                logger.debug(f"Pooled connection to {key[1]} was closed by the server; reconnecting")
+                with self._lock:
+                    self._retried += 1
+                conn, reused = None, False
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            if keep_alive:
+                self._async_release(key, conn)
+            else:
+                conn.close()
+            return PooledResponse(status, response_headers, response_body)
+
+    def close_idle(self) -> int:
+        """Close every idle connection; return how many were closed."""
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn, _ in idle]
+            conns += [conn for idle in self._async_idle.values() for conn, _ in idle]
+            self._idle.clear()
+            self._async_idle.clear()
+        for conn in conns:
+            conn.close()
+        return len(conns)
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get connection reuse counters and idle connections per host."""
+        with self._lock:
+            idle: Dict[str, int] = {}
+            for (scheme, host, port, _), conns in [*self._idle.items(), *self._async_idle.items()]:
+                name = f"{scheme}://{host}:{port}"
+                idle[name] = idle.get(name, 0) + len(conns)
+            return {
+                "max_idle_per_host": self.max_idle_per_host,
+                "idle_timeout": self.idle_timeout,
+                "requests": self._requests,
+                "connections_created": self._created,
+                "reused": self._reused,
+                "reuse_ratio": round(self._reused / self._requests, 4) if self._requests else None,
+                "stale_retries": self._retried,
+                "idle_evictions": self._evicted,
+                "idle_dropped": self._dropped,
+                "discarded": self._discarded,
+                "idle": idle,
+            }
+
+
+# Global pool instance
+_http_pool: Optional[HTTPConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HTTPConnectionPool:
+    """Get or create the global outbound connection pool."""
+    global _http_pool
+    if _http_pool is None:
+        with _pool_lock:
+            if _http_pool is None:
+                _http_pool = HTTPConnectionPool(
+                    max_idle_per_host=int(os.getenv("HTTP_POOL_SIZE", "4")),
+                    idle_timeout=float(os.getenv("HTTP_POOL_IDLE_TIMEOUT_SECONDS", "60")),
+                )
+                logger.info(
+                    f"Outbound HTTP pool: {_http_pool.max_idle_per_host} connections per host, "
+                    f"{_http_pool.idle_timeout:.0f}s idle timeout"
+                )
+    return _http_pool
@@ -0,0 +1,15 @@
+"""
+Offline load-testing harness for the dashboard backend.
+
+- fake_genie.py: a stand-in for the Genie REST API (and the knowledge
+  assistant serving endpoint) with configurable latency and 429 rate
+- fake_dbsql/databricks/sql.py: a stand-in for databricks-sql-connector,
+  answering statements from the local DuckDB engine after a tunable delay
+- driver.py: a closed-loop load driver reporting RPS, latency percentiles
+  and error rates per route
+- run.py: starts both stand-ins and the app, then drives load against it
+
+Everything runs on one machine without network access:
+
+    python backend/loadtest/run.py --duration 30 --concurrency 16
+"""
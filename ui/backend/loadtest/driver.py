@@ -0,0 +1,264 @@
+"""
+Closed-loop HTTP load driver for the app's /api/* routes.
+
+Each worker thread keeps one keep-alive connection and issues requests back
+to back, picking routes by weight, until the duration is up. Results are
+reported per route: throughput, latency percentiles and outcome counts, where
+"shed" means the app refused work on purpose (429 or 503) and "errors" are
+other 5xx responses and transport failures.
+
+Usable on its own against any running instance:
+
+    python backend/loadtest/driver.py --url http://127.0.0.1:8000 --duration 30 --concurrency 8
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+QUESTIONS = (
+    "What was total revenue last month?",
+    "Which region had the highest revenue growth last quarter?",
+    "Top 5 tire brands by units sold this year",
+    "How many stores are below their inventory reorder threshold?",
+    "Average customer satisfaction by region",
+    "Revenue trend for the last 6 months",
+    "Which promotions drove the most orders?",
+    "Compare online and in-store sales this quarter",
+)
+
+
+class Route:
+    """One request the driver can issue, with its relative weight."""
+
+    def __init__(self, name: str, method: str, path: str, weight: float, body: Optional[Any] = None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.weight = weight
+        # A JSON body, or a callable returning one (e.g. a fresh question per request)
+        self.body = body
+
+    def payload(self) -> Optional[bytes]:
+        body = self.body() if callable(self.body) else self.body
+        return None if body is None else json.dumps(body).encode("utf-8")
+
+
+def default_routes(unique_questions: bool = False) -> List[Route]:
+    """Every /api/* route, weighted like a dashboard session with occasional Genie questions."""
+    counter = itertools.count()
+
+    def question() -> Dict[str, str]:
+        text = random.choice(QUESTIONS)
+        # Distinct questions bypass the answer cache and reach Genie every time
+        return {"question": f"{text} (#{next(counter)})" if unique_questions else text}
+
+    routes = [Route("GET /api/user", "GET", "/api/user", 2)]
+    for panel in ("kpis", "charts", "revenue", "operations", "customers", "map"):
+        routes.append(Route(f"GET /api/dashboard/{panel}", "GET", f"/api/dashboard/{panel}", 10))
+    routes += [
+        Route("GET /api/cache/stats", "GET", "/api/cache/stats", 1),
+        Route("GET /api/metrics", "GET", "/api/metrics", 1),
+        Route("POST /api/genie/query", "POST", "/api/genie/query", 2, question),
+        Route("POST /api/genie/stream", "POST", "/api/genie/stream", 1, question),
+        Route("POST /api/knowledge-assistant", "POST", "/api/knowledge-assistant", 1, question),
+        Route("POST /api/cache/invalidate", "POST", "/api/cache/invalidate", 0.1, {"tables": ["sales"]}),
+        Route("GET /api/cache/clear", "GET", "/api/cache/clear", 0.05),
+    ]
+    return routes
+
+
+def percentile(ordered: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not ordered:
+        return None
+    rank = max(1, int(round(q * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RouteStats:
+    """Latencies and outcomes recorded for one route."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, status: str, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def merge(self, other: "RouteStats") -> None:
+        self.latencies.extend(other.latencies)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        count = len(ordered)
+        shed = self.statuses.get("429", 0) + self.statuses.get("503", 0)
+        errors = sum(
+            n for status, n in self.statuses.items()
+            if status == "exception" or (status.startswith("5") and status != "503")
+        )
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(1000 * value, 1)
+
+        return {
+            "requests": count,
+            "rps": round(count / elapsed, 1) if elapsed else None,
+            "p50_ms": ms(percentile(ordered, 0.50)),
+            "p95_ms": ms(percentile(ordered, 0.95)),
+            "p99_ms": ms(percentile(ordered, 0.99)),
+            "max_ms": ms(ordered[-1] if ordered else None),
+            "shed": shed,
+            "errors": errors,
+            "error_rate": round((shed + errors) / count, 4) if count else None,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+class LoadDriver:
+    """Drives `concurrency` closed-loop workers against one base URL."""
+
+    def __init__(self, base_url: str, routes: Sequence[Route], concurrency: int = 8, timeout: float = 30):
+        """
+        Initialize the driver.
+
+        Args:
+            base_url: App URL, e.g. http://127.0.0.1:8000
+            routes: Requests to issue, chosen by weight
+            concurrency: Worker threads, each with its own keep-alive connection
+            timeout: Socket timeout per request in seconds
+        """
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.routes = [route for route in routes if route.weight > 0]
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def _worker(self, seed: int, stop_at: float, record_from: float, results: Dict[str, RouteStats]) -> None:
+        rng = random.Random(seed)
+        weights = [route.weight for route in self.routes]
+        conn: Optional[http.client.HTTPConnection] = None
+        while time.monotonic() < stop_at:
+            route = rng.choices(self.routes, weights)[0]
+            if conn is None:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            body = route.payload()
+            headers = {"Accept-Encoding": "gzip, br"}
+            if body is not None:
+                headers["Content-Type"] = "application/json"
+            started = time.monotonic()
+            try:
+                conn.request(route.method, route.path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                status = "exception"
+                conn.close()
+                conn = None
+            if started >= record_from:
+                results.setdefault(route.name, RouteStats()).record(status, time.monotonic() - started)
+        if conn is not None:
+            conn.close()
+
+    def run(self, duration: float, warmup: float = 0) -> Dict[str, Any]:
+        """
+        Drive load for `warmup` + `duration` seconds; requests started during
+        the warmup are not recorded.
+
+        Returns:
+            Report with overall and per-route summaries
+        """
+        started = time.monotonic()
+        record_from = started + warmup
+        stop_at = record_from + duration
+        per_worker: List[Dict[str, RouteStats]] = [{} for _ in range(self.concurrency)]
+        threads = [
+            threading.Thread(target=self._worker, args=(seed, stop_at, record_from, per_worker[seed]), daemon=True)
+            for seed in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Requests in flight at the deadline finish late; measure until the last one did
+        elapsed = max(time.monotonic() - record_from, 1e-9)
+
+        routes: Dict[str, RouteStats] = {}
+        total = RouteStats()
+        for results in per_worker:
+            for name, stats in results.items():
+                routes.setdefault(name, RouteStats()).merge(stats)
+                total.merge(stats)
+        return {
+            "duration_s": round(elapsed, 2),
+            "concurrency": self.concurrency,
+            "total": total.summary(elapsed),
+            "routes": {name: routes[name].summary(elapsed) for name in sorted(routes)},
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Plain-text table of a LoadDriver report."""
+    header = f"{'route':<34} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'shed':>6} {'errors':>6}"
+    lines = [
+        f"{report['duration_s']}s at concurrency {report['concurrency']}",
+        header,
+        "-" * len(header),
+    ]
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for name, stats in rows:
+        cells = [stats["p50_ms"], stats["p95_ms"], stats["p99_ms"]]
+        latency = " ".join(f"{'-' if value is None else value:>9}" for value in cells)
+        lines.append(
+            f"{name:<34} {stats['requests']:>7} {stats['rps']:>8} {latency} {stats['shed']:>6} {stats['errors']:>6}"
+        )
+    return "\n".join(lines)
+
+
+def add_driver_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop workers")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds before a request counts as failed")
+    parser.add_argument("--unique-questions", action="store_true", help="defeat the Genie answer cache")
+    parser.add_argument("--routes", help="comma-separated route name substrings to keep (default: all)")
+    parser.add_argument("--json", help="also write the report to this file")
+
+
+def run_from_arguments(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the driver per parsed arguments, print the report and optionally save it."""
+    routes = default_routes(args.unique_questions)
+    if args.routes:
+        wanted = [part.strip() for part in args.routes.split(",") if part.strip()]
+        routes = [route for route in routes if any(part in route.name for part in wanted)]
+    report = LoadDriver(base_url, routes, args.concurrency, args.timeout).run(args.duration, args.warmup)
+    print(format_report(report), flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load driver for the dashboard backend")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of a running app")
+    add_driver_arguments(parser)
+    args = parser.parse_args()
+    run_from_arguments(args.url, args)
+
+
+if __name__ == "__main__":
+    main()
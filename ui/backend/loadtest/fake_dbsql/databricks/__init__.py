@@ -0,0 +1 @@
+"""Stand-in `databricks` package for load tests; see databricks/sql.py."""
@@ -0,0 +1,98 @@
+"""
+Stand-in for databricks-sql-connector (`databricks.sql`) in load tests.
+
+run.py puts loadtest/fake_dbsql first on the app's PYTHONPATH so that
+`import databricks.sql` finds this module. Statements are answered by the
+local DuckDB engine over LOCAL_DATA_DIR/*.csv (without duckdb every result is
+empty) after a simulated warehouse delay:
+
+- FAKE_DBSQL_LATENCY_MS / FAKE_DBSQL_JITTER_MS: per-statement delay
+- FAKE_DBSQL_CONNECT_MS: delay of each connect()
+- FAKE_DBSQL_MAX_CONCURRENT: statements the "warehouse" runs at once (0 = unlimited);
+  further statements queue, like a saturated warehouse
+"""
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+try:
+    from backend.local_engine import get_local_engine
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from local_engine import get_local_engine
+
+LATENCY_SECONDS = float(os.getenv("FAKE_DBSQL_LATENCY_MS", "150")) / 1000
+JITTER_SECONDS = float(os.getenv("FAKE_DBSQL_JITTER_MS", "50")) / 1000
+CONNECT_SECONDS = float(os.getenv("FAKE_DBSQL_CONNECT_MS", "300")) / 1000
+MAX_CONCURRENT = int(os.getenv("FAKE_DBSQL_MAX_CONCURRENT", "0"))
+DATA_DIR = Path(os.getenv("LOCAL_DATA_DIR", str(Path(__file__).resolve().parents[5] / "data")))
+
+_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT) if MAX_CONCURRENT > 0 else None
+
+
+class Error(Exception):
+    """Raised for failed statements, like the connector's DB-API errors."""
+
+
+class Cursor:
+    def __init__(self):
+        self.description: Optional[List[Tuple[str]]] = None
+        self._rows: List[Tuple[Any, ...]] = []
+
+    def execute(self, operation: str, parameters: Optional[Sequence[Any]] = None) -> "Cursor":
+        if _SLOTS is not None:
+            _SLOTS.acquire()
+        try:
+            time.sleep(LATENCY_SECONDS + random.uniform(0, JITTER_SECONDS))
+            engine = get_local_engine(DATA_DIR)
+            if engine is None:
+                self.description, self._rows = [], []
+                return self
+            table = engine.execute(operation)
+        finally:
+            if _SLOTS is not None:
+                _SLOTS.release()
+        if table is None:
+            raise Error(f"Statement failed: {operation[:80]}")
+        self.description = [(name,) for name in table.columns]
+        self._rows = list(table.iter_rows())
+        return self
+
+    def fetchall(self) -> List[Tuple[Any, ...]]:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self) -> None:
+        self._rows = []
+
+    def __enter__(self) -> "Cursor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class Connection:
+    def __init__(self):
+        self.open = True
+
+    def cursor(self) -> Cursor:
+        if not self.open:
+            raise Error("Connection is closed")
+        return Cursor()
+
+    def close(self) -> None:
+        self.open = False
+
+    def __enter__(self) -> "Connection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def connect(server_hostname: str = "", http_path: str = "", access_token: str = "", **kwargs: Any) -> Connection:
+    time.sleep(CONNECT_SECONDS)
+    return Connection()
@@ -0,0 +1,259 @@
+"""
+Stand-in for the Genie REST API and the knowledge assistant endpoint.
+
+Implements the calls genie_polling.py makes (start-conversation, message
+polling and query-result) plus serving-endpoint invocations. Every call waits
+`latency` (plus up to `jitter`) seconds and is answered with 429 and a
+Retry-After header at `throttle_rate`. A message reports SUBMITTED, then
+EXECUTING_QUERY, and is COMPLETED `answer_seconds` after it was started.
+
+Point the app at it with DATABRICKS_HOST=http://127.0.0.1:<port>:
+
+    python backend/loadtest/fake_genie.py --port 8900 --latency-ms 80 --throttle-rate 0.05
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("discount_tire_demo.loadtest.fake_genie")
+
+_SPACE = r"/api/2\.0/genie/spaces/[^/]+"
+_START = re.compile(rf"^{_SPACE}/start-conversation$")
+_MESSAGE = re.compile(rf"^{_SPACE}/conversations/([^/]+)/messages/([^/]+)$")
+_QUERY_RESULT = re.compile(rf"^{_SPACE}/conversations/([^/]+)/messages/([^/]+)/query-result$")
+_INVOCATIONS = re.compile(r"^/serving-endpoints/[^/]+/invocations$")
+
+RESULT_COLUMNS = ("region", "total_revenue", "revenue_growth", "orders")
+REGIONS = ("West", "Southwest", "Mountain", "Central", "Southeast", "Northeast")
+
+
+class GenieSettings:
+    """Tunable behavior of the fake Genie server."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.5,
+        answer_seconds: float = 1.5,
+        rows: int = 12,
+    ):
+        """
+        Initialize the settings.
+
+        Args:
+            latency: Base seconds added to every call
+            jitter: Up to this many extra seconds, uniformly distributed
+            throttle_rate: Fraction of calls answered with 429
+            retry_after: Retry-After seconds sent with 429 responses
+            answer_seconds: Seconds from start-conversation until the message is COMPLETED
+            rows: Rows in each query result
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.answer_seconds = answer_seconds
+        self.rows = rows
+
+
+def build_query_result(rows: int) -> Dict[str, Any]:
+    """A statement_response shaped like Genie's, with `rows` typed rows."""
+    data = []
+    for i in range(rows):
+        region = REGIONS[i % len(REGIONS)]
+        values = (region, f"{125000 + 7919 * i:.2f}", f"{(i % 7 - 2) / 100:.4f}", str(400 + 13 * i))
+        data.append({"values": [{"str": value} for value in values]})
+    return {
+        "statement_response": {
+            "statement_id": uuid.uuid4().hex,
+            "status": {"state": "SUCCEEDED"},
+            "manifest": {
+                "format": "JSON_ARRAY",
+                "schema": {
+                    "column_count": len(RESULT_COLUMNS),
+                    "columns": [{"name": name, "position": i} for i, name in enumerate(RESULT_COLUMNS)],
+                },
+                "total_row_count": rows,
+            },
+            "result": {"row_count": rows, "data_typed_array": data},
+        }
+    }
+
+
+class FakeGenieServer(ThreadingHTTPServer):
+    """HTTP server holding the fake's settings, messages and call counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], settings: Optional[GenieSettings] = None):
+        super().__init__(address, _GenieHandler)
+        self.settings = settings or GenieSettings()
+        self._messages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+        self._throttled = 0
+
+    def count(self, call: str) -> None:
+        with self._lock:
+            self._calls[call] = self._calls.get(call, 0) + 1
+
+    def throttle(self) -> bool:
+        """Decide whether this call is answered with 429."""
+        if random.random() >= self.settings.throttle_rate:
+            return False
+        with self._lock:
+            self._throttled += 1
+        return True
+
+    def start_message(self, question: str) -> Dict[str, Any]:
+        conversation_id, message_id = uuid.uuid4().hex, uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            # Forget messages nobody has polled for a while
+            for key in [key for key, message in self._messages.items() if now - message["started"] > 300]:
+                del self._messages[key]
+            self._messages[message_id] = {"question": question, "started": now, "conversation_id": conversation_id}
+        return {"conversation_id": conversation_id, "message_id": message_id}
+
+    def message(self, conversation_id: str, message_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._messages.get(message_id)
+        if state is None or state["conversation_id"] != conversation_id:
+            return None
+        elapsed = time.monotonic() - state["started"]
+        payload = {
+            "id": message_id,
+            "conversation_id": conversation_id,
+            "content": state["question"],
+            "status": "SUBMITTED",
+        }
+        if elapsed >= self.settings.answer_seconds:
+            payload["status"] = "COMPLETED"
+            payload["attachments"] = [
+                {"text": {"content": f"Total revenue was highest in the West region for: {state['question']}"}},
+                {
+                    "attachment_id": uuid.uuid4().hex,
+                    "query": {
+                        "description": "Revenue and growth by region for the latest month.",
+                        "query": (
+                            "SELECT region, SUM(revenue) AS total_revenue, AVG(revenue_growth) AS revenue_growth, "
+                            "COUNT(*) AS orders FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched GROUP BY region"
+                        ),
+                    },
+                },
+            ]
+        elif elapsed >= 0.2 * self.settings.answer_seconds:
+            payload["status"] = "EXECUTING_QUERY"
+        return payload
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": dict(self._calls), "throttled": self._throttled, "messages": len(self._messages)}
+
+
+class _GenieHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeGenieServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay_or_throttle(self, call: str) -> bool:
+        """Apply the configured latency; answer 429 and return True if this call is throttled."""
+        settings = self.server.settings
+        time.sleep(settings.latency + random.uniform(0, settings.jitter))
+        self.server.count(call)
+        if self.server.throttle():
+            self._send(429, {"error_code": "RESOURCE_EXHAUSTED"}, {"Retry-After": f"{settings.retry_after:g}"})
+            return True
+        return False
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if _START.match(self.path):
+            if not self._delay_or_throttle("start"):
+                self._send(200, self.server.start_message(payload.get("content", "")))
+            return
+        if _INVOCATIONS.match(self.path):
+            if not self._delay_or_throttle("invocations"):
+                text = "Rotate tires every 5,000 to 7,500 miles and check pressure monthly."
+                self._send(200, {"output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}]})
+            return
+        self._send(404, {"error_code": "ENDPOINT_NOT_FOUND"})
+
+    def do_GET(self) -> None:
+        match = _QUERY_RESULT.match(self.path)
+        if match:
+            if not self._delay_or_throttle("query_result"):
+                self._send(200, build_query_result(self.server.settings.rows))
+            return
+        match = _MESSAGE.match(self.path)
+        if match:
+            if self._delay_or_throttle("poll"):
+                return
+            message = self.server.message(*match.groups())
+            if message is None:
+                self._send(404, {"error_code": "RESOURCE_DOES_NOT_EXIST"})
+            else:
+                self._send(200, message)
+            return
+        self._send(404, {"error_code": "ENDPOINT_NOT_FOUND"})
+
+
+def start_fake_genie(port: int = 0, settings: Optional[GenieSettings] = None) -> FakeGenieServer:
+    """Start the fake on 127.0.0.1:`port` in a daemon thread (port 0 picks a free one)."""
+    server = FakeGenieServer(("127.0.0.1", port), settings)
+    threading.Thread(target=server.serve_forever, name="fake-genie", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Genie REST API for offline load tests")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After seconds on 429")
+    parser.add_argument("--answer-ms", type=float, default=1500, help="time until a message is COMPLETED")
+    parser.add_argument("--rows", type=int, default=12, help="rows per query result")
+    args = parser.parse_args()
+    settings = GenieSettings(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        answer_seconds=args.answer_ms / 1000,
+        rows=args.rows,
+    )
+    server = FakeGenieServer(("127.0.0.1", args.port), settings)
+    print(f"Fake Genie listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.get_stats()), flush=True)
+
+
+if __name__ == "__main__":
+    main()
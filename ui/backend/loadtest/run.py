@@ -0,0 +1,162 @@
+"""
+Run an offline load test: fake Genie, fake SQL warehouse, the app, and the driver.
+
+Starts fake_genie.py and `python backend/server.py` as subprocesses (the app
+finds the fake connector through PYTHONPATH), waits for the app to answer,
+drives load with driver.py and prints the report followed by the app's cache
+and coalescing stats. From ui/:
+
+    python backend/loadtest/run.py --duration 30 --concurrency 16 --mode asyncio
+    python backend/loadtest/run.py --sql-latency-ms 400 --sql-max-concurrent 4 --app-env SQL_POOL_SIZE=2
+
+With the default flags each dashboard miss costs ~150ms of "warehouse" time
+per statement, Genie answers take ~1.5s, and the Genie scheduler's rate limit
+is raised to 600 questions per minute.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List
+
+try:
+    from backend.loadtest.driver import add_driver_arguments, run_from_arguments
+except ImportError:  # pragma: no cover - running as a script from ui/backend/loadtest
+    from driver import add_driver_arguments, run_from_arguments
+
+LOADTEST_DIR = Path(__file__).resolve().parent
+UI_DIR = LOADTEST_DIR.parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} before it was ready")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def fetch_json(url: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def app_environment(args: argparse.Namespace, app_port: int, genie_port: int) -> Dict[str, str]:
+    """Environment for the app subprocess: fake endpoints, fake connector and overrides."""
+    env = dict(os.environ)
+    env.update(
+        {
+            "DATABRICKS_APP_PORT": str(app_port),
+            "DATABRICKS_HOST": f"http://127.0.0.1:{genie_port}",
+            "DATABRICKS_TOKEN_FOR_GENIE": "loadtest",
+            "DATABRICKS_TOKEN_FOR_SQL": "loadtest",
+            "GENIE_SPACE_ID": "loadtest",
+            "DATABRICKS_SQL_HTTP_PATH": "/sql/1.0/warehouses/loadtest",
+            "KNOWLEDGE_ASSISTANT_ENDPOINT": f"http://127.0.0.1:{genie_port}/serving-endpoints/loadtest/invocations",
+            "SQL_BACKEND": "databricks",
+            "SERVER_MODE": args.mode,
+            "LOG_LEVEL": "WARNING",
+            # The fake Genie has no per-workspace quota; pass --app-env GENIE_RATE_PER_MINUTE=5 to model one
+            "GENIE_RATE_PER_MINUTE": "600",
+            "FAKE_DBSQL_LATENCY_MS": str(args.sql_latency_ms),
+            "FAKE_DBSQL_JITTER_MS": str(args.sql_jitter_ms),
+            "FAKE_DBSQL_CONNECT_MS": str(args.sql_connect_ms),
+            "FAKE_DBSQL_MAX_CONCURRENT": str(args.sql_max_concurrent),
+            "PYTHONPATH": os.pathsep.join(
+                [str(LOADTEST_DIR / "fake_dbsql")] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+            ),
+        }
+    )
+    for item in args.app_env:
+        name, _, value = item.partition("=")
+        env[name] = value
+    return env
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test of the dashboard backend")
+    add_driver_arguments(parser)
+    parser.add_argument("--mode", choices=("threading", "asyncio"), default="threading", help="SERVER_MODE of the app")
+    parser.add_argument("--app-env", action="append", default=[], metavar="NAME=VALUE", help="extra app env (repeatable)")
+    parser.add_argument("--app-log", help="write the app's output here (default: a temp file)")
+    parser.add_argument("--genie-latency-ms", type=float, default=50)
+    parser.add_argument("--genie-jitter-ms", type=float, default=20)
+    parser.add_argument("--genie-throttle-rate", type=float, default=0.0, help="fraction of Genie calls answered 429")
+    parser.add_argument("--genie-answer-ms", type=float, default=1500, help="time until a Genie message completes")
+    parser.add_argument("--genie-rows", type=int, default=12, help="rows per Genie query result")
+    parser.add_argument("--sql-latency-ms", type=float, default=150)
+    parser.add_argument("--sql-jitter-ms", type=float, default=50)
+    parser.add_argument("--sql-connect-ms", type=float, default=300)
+    parser.add_argument("--sql-max-concurrent", type=int, default=0, help="warehouse statement slots (0 = unlimited)")
+    args = parser.parse_args()
+
+    genie_port, app_port = free_port(), free_port()
+    log_path = Path(args.app_log) if args.app_log else Path(tempfile.gettempdir()) / "dtc-loadtest-app.log"
+    processes: List[subprocess.Popen] = []
+    with log_path.open("w", encoding="utf-8") as log:
+        try:
+            genie = subprocess.Popen(
+                [
+                    sys.executable, str(LOADTEST_DIR / "fake_genie.py"),
+                    "--port", str(genie_port),
+                    "--latency-ms", str(args.genie_latency_ms),
+                    "--jitter-ms", str(args.genie_jitter_ms),
+                    "--throttle-rate", str(args.genie_throttle_rate),
+                    "--answer-ms", str(args.genie_answer_ms),
+                    "--rows", str(args.genie_rows),
+                ],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+            processes.append(genie)
+            app = subprocess.Popen(
+                [sys.executable, "backend/server.py"],
+                cwd=UI_DIR,
+                env=app_environment(args, app_port, genie_port),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+            processes.append(app)
+            base_url = f"http://127.0.0.1:{app_port}"
+            wait_until_ready(f"{base_url}/api/user", 30, app)
+            print(f"App ({args.mode}) on {base_url}, fake Genie on port {genie_port}, log in {log_path}", flush=True)
+
+            report = run_from_arguments(base_url, args)
+            stats = fetch_json(f"{base_url}/api/cache/stats")
+            hit_ratios = {name: cache.get("hit_ratio") for name, cache in stats["caches"].items()}
+            print(f"Cache hit ratios: {hit_ratios}")
+            print(f"Coalescing: {stats['coalescing']}")
+            if args.json:
+                report["app_stats"] = stats
+                with open(args.json, "w", encoding="utf-8") as handle:
+                    json.dump(report, handle, indent=2)
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+if __name__ == "__main__":
+    main()
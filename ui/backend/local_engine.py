@@ -0,0 +1,255 @@
+"""
+Embedded local SQL backend over the mock CSV data.
+
+Loads the data/*.csv files written by generate_mock_data.py into an in-memory
+DuckDB database laid out like the Databricks deployment: the tables live in
+kaustavpaul_demo.dtc_demo, and the notebook's views and aggregate tables are
+recreated on top of them. The dashboard SQL then runs unchanged without a
+warehouse, which is useful for local development, demos and load tests.
+
+DuckDB is optional. Without it (or without the CSV directory) the engine is
+unavailable and run_direct_sql behaves as before.
+"""
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - optional dependency
+    duckdb = None
+
+try:
+    from backend.result_table import ResultTable, fetch_result_table
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from result_table import ResultTable, fetch_result_table
+
+logger = logging.getLogger("discount_tire_demo.local_engine")
+
+CATALOG = "kaustavpaul_demo"
+SCHEMA = "dtc_demo"
+
+# Step 3 of notebooks/discount_tire_demo.py
+VIEW_SQL = {
+    "vw_sales_enriched": """
+    SELECT
+      s.sale_id,
+      s.date,
+      s.customer_id,
+      s.product_id,
+      s.quantity,
+      s.unit_price,
+      s.total_amount,
+      s.store_id,
+      p.category,
+      p.product_name,
+      c.region AS customer_region,
+      c.satisfaction_score,
+      st.store_name,
+      st.region AS store_region,
+      st.state,
+      pr.promo_name,
+      pr.discount_type,
+      pr.discount_value
+    FROM sales s
+    JOIN products p ON s.product_id = p.product_id
+    JOIN customers c ON s.customer_id = c.customer_id
+    LEFT JOIN stores st ON s.store_id = st.store_id
+    LEFT JOIN promotions pr ON s.promotion_id = pr.promo_id
+    """,
+    "vw_revenue_growth": """
+    SELECT
+      date_trunc('month', date) AS month,
+      SUM(total_amount) AS revenue,
+      LAG(SUM(total_amount)) OVER (ORDER BY date_trunc('month', date)) AS prior_revenue,
+      CASE
+        WHEN LAG(SUM(total_amount)) OVER (ORDER BY date_trunc('month', date)) IS NULL THEN NULL
+        WHEN LAG(SUM(total_amount)) OVER (ORDER BY date_trunc('month', date)) = 0 THEN NULL
+        ELSE
+          (SUM(total_amount) - LAG(SUM(total_amount)) OVER (ORDER BY date_trunc('month', date)))
+          / LAG(SUM(total_amount)) OVER (ORDER BY date_trunc('month', date))
+      END AS revenue_growth
+    FROM sales
+    GROUP BY date_trunc('month', date)
+    """,
+}
+
+# Step 4 of notebooks/discount_tire_demo.py
+AGGREGATE_SQL = {
+    "agg_monthly_sales": """
+        SELECT
+          date_trunc('month', date) AS month,
+          MAX(date) AS max_date,
+          SUM(total_amount) AS revenue,
+          SUM(quantity) AS units,
+          SUM(CASE WHEN category = 'Tire' THEN quantity END) AS tire_units,
+          COUNT(*) AS sales_count,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY date_trunc('month', date)
+    """,
+    "agg_monthly_revenue": """
+        SELECT month, revenue, prior_revenue, revenue_growth
+        FROM vw_revenue_growth
+    """,
+    "agg_store_sales": """
+        SELECT
+          store_id,
+          store_name,
+          store_region,
+          quarter(date) AS quarter,
+          SUM(total_amount) AS revenue,
+          SUM(quantity) AS units,
+          SUM(CASE WHEN quantity > 1 THEN quantity ELSE 0 END) AS healthy_units,
+          SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END) AS single_unit_sales,
+          SUM(CASE WHEN quantity = 0 THEN 1 ELSE 0 END) AS zero_unit_sales,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY store_id, store_name, store_region, quarter(date)
+    """,
+    "agg_category_sales": """
+        SELECT
+          category,
+          product_name,
+          SUM(total_amount) AS revenue,
+          SUM(quantity) AS units,
+          COUNT(*) AS sales_count,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY category, product_name
+    """,
+    "agg_regional_satisfaction": """
+        SELECT
+          customer_region,
+          COUNT(*) AS sales_count,
+          SUM(satisfaction_score) AS satisfaction_sum,
+          COUNT(satisfaction_score) AS satisfaction_count
+        FROM vw_sales_enriched
+        GROUP BY customer_region
+    """,
+    "agg_nps_buckets": """
+        SELECT
+          CASE
+            WHEN satisfaction_score >= 4.5 THEN 'Promoter'
+            WHEN satisfaction_score >= 4.0 THEN 'Passive'
+            ELSE 'Detractor'
+          END AS category,
+          COUNT(*) AS count
+        FROM vw_sales_enriched
+        GROUP BY 1
+    """,
+}
+
+# Spark SQL functions the dashboard queries use that DuckDB spells differently
+MACRO_SQL = [
+    "CREATE MACRO add_months(d, n) AS CAST(d AS DATE) + to_months(CAST(n AS INTEGER))",
+]
+
+
+class LocalEngine:
+    """In-memory DuckDB database with the demo's tables, views and aggregates."""
+
+    def __init__(self, data_dir: Path):
+        """
+        Load every CSV in `data_dir` and build the views and aggregate tables.
+
+        Args:
+            data_dir: Directory containing the generate_mock_data.py output
+
+        Raises:
+            RuntimeError: If DuckDB is not installed or no CSV files are found
+        """
+        if duckdb is None:
+            raise RuntimeError("duckdb is not installed")
+        csv_files = sorted(Path(data_dir).glob("*.csv"))
+        if not csv_files:
+            raise RuntimeError(f"No CSV files in {data_dir}")
+
+        started = time.perf_counter()
+        self._conn = duckdb.connect(":memory:")
+        self._conn.execute(f"ATTACH ':memory:' AS {CATALOG}")
+        self._conn.execute(f"CREATE SCHEMA {CATALOG}.{SCHEMA}")
+        self._conn.execute(f"USE {CATALOG}.{SCHEMA}")
+        for path in csv_files:
+            self._conn.execute(
+                f"CREATE TABLE {path.stem} AS SELECT * FROM read_csv_auto(?, header = true)", [str(path)]
+            )
+        for name, sql in VIEW_SQL.items():
+            self._conn.execute(f"CREATE VIEW {name} AS {sql}")
+        for sql in MACRO_SQL:
+            self._conn.execute(sql)
+        for name, sql in AGGREGATE_SQL.items():
+            self._conn.execute(f"CREATE TABLE {name} AS {sql}")
+        self.tables = [path.stem for path in csv_files]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._errors = 0
+        logger.info(
+            f"Local SQL engine loaded {len(csv_files)} tables from {data_dir} "
+            f"in {1000 * (time.perf_counter() - started):.0f}ms"
+        )
+
+    def _cursor(self):
+        # DuckDB cursors are per-thread connections to the same database
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._conn.cursor()
+            cursor.execute(f"USE {CATALOG}.{SCHEMA}")
+            self._local.cursor = cursor
+        return cursor
+
+    def execute(self, sql: str, raise_if: Optional[Callable[[Exception], bool]] = None) -> Optional[ResultTable]:
+        """
+        Run a statement and return its result table.
+
+        Args:
+            sql: Statement to run
+            raise_if: Errors for which raise_if(error) is true are re-raised instead of returning None
+
+        Returns:
+            The result table, or None if the statement failed
+        """
+        try:
+            cursor = self._cursor()
+            cursor.execute(sql)
+            table = fetch_result_table(cursor)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            logger.warning(f"Local SQL failed: {e}")
+            if raise_if is not None and raise_if(e):
+                raise
+            return None
+        with self._lock:
+            self._queries += 1
+        return table
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tables loaded and statement counters."""
+        with self._lock:
+            return {"tables": len(self.tables), "queries": self._queries, "errors": self._errors}
+
+
+_local_engine: Optional[LocalEngine] = None
+_local_engine_failed = False
+_local_engine_lock = threading.Lock()
+
+
+def get_local_engine(data_dir: Path) -> Optional[LocalEngine]:
+    """Get the global local engine, loading it on first use (None if unavailable)."""
+    global _local_engine, _local_engine_failed
+    if _local_engine is None and not _local_engine_failed:
+        with _local_engine_lock:
+            if _local_engine is None and not _local_engine_failed:
+                try:
+                    _local_engine = LocalEngine(data_dir)
+                except Exception as e:
+                    _local_engine_failed = True
+                    logger.warning(f"Local SQL engine unavailable: {e}")
+    return _local_engine
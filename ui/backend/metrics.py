@@ -0,0 +1,225 @@
+"""
+In-process latency metrics.
+
+Histograms use fixed cumulative buckets (Prometheus style) so observations
+are O(buckets) with no sample retention, and percentiles are estimated from
+the bucket boundaries. Labeled families of histograms and counters back the
+/api/metrics endpoint, which is rendered in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to slow Genie answers
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Thread-safe cumulative-bucket histogram."""
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            name: Metric name used in stats output
+            buckets: Sorted upper bounds; an implicit +Inf bucket is added
+        """
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the wall-clock duration of the with-block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound below which a fraction `q` of observations fall."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, object]:
+        """Count, sum and cumulative bucket counts keyed by upper bound."""
+        with self._lock:
+            counts = list(self._counts)
+            total, total_sum = self._count, self._sum
+        cumulative = 0
+        buckets: Dict[str, int] = {}
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            buckets[f"{bound:g}"] = cumulative
+        buckets["+Inf"] = total
+        return {"count": total, "sum": total_sum, "buckets": buckets}
+
+    def get_stats(self) -> Dict[str, object]:
+        """Snapshot plus mean and estimated p50/p95/p99."""
+        stats = self.snapshot()
+        count = stats["count"]
+        stats["mean"] = round(stats["sum"] / count, 4) if count else None
+        for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[label] = self.quantile(q)
+        return stats
+
+
+# Label value used once a family has reached its series limit
+OVERFLOW_LABEL = "other"
+
+
+class _Family:
+    """Metrics of one kind keyed by label values, created on first use."""
+
+    def __init__(self, name: str, label_names: Sequence[str], max_series: int = 200):
+        self.name = name
+        self.label_names = tuple(label_names)
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """The metric for these label values (folded into "other" past the series limit)."""
+        key = tuple(str(value) for value in values)
+        metric = self._series.get(key)
+        if metric is None:
+            with self._lock:
+                if key not in self._series and len(self._series) >= self.max_series:
+                    key = (OVERFLOW_LABEL,) * len(self.label_names)
+                metric = self._series.get(key)
+                if metric is None:
+                    metric = self._series[key] = self._new()
+        return metric
+
+    def series(self) -> List[Tuple[Dict[str, str], Any]]:
+        """(labels, metric) for every series."""
+        with self._lock:
+            items = list(self._series.items())
+        return [(dict(zip(self.label_names, key)), metric) for key, metric in items]
+
+
+class HistogramFamily(_Family):
+    """Histograms sharing a name and buckets, one per combination of label values."""
+
+    def __init__(
+        self,
+        name: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        max_series: int = 200,
+    ):
+        super().__init__(name, label_names, max_series)
+        self.buckets = buckets
+
+    def _new(self) -> Histogram:
+        return Histogram(self.name, self.buckets)
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        with self._lock:
+            return self._value
+
+
+class CounterFamily(_Family):
+    """Counters sharing a name, one per combination of label values."""
+
+    def _new(self) -> Counter:
+        return Counter()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Exposition:
+    """Builds a scrape body in the Prometheus text exposition format (0.0.4)."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def _header(self, name: str, kind: str, help_text: str) -> None:
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def samples(
+        self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], Optional[float]]]
+    ) -> None:
+        """A counter or gauge; samples whose value is None are skipped."""
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        self._header(name, kind, help_text)
+        for labels, value in samples:
+            self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def histograms(self, name: str, help_text: str, series: Iterable[Tuple[Dict[str, str], Dict[str, Any]]]) -> None:
+        """A histogram family from (labels, Histogram.snapshot()) pairs."""
+        series = list(series)
+        if not series:
+            return
+        self._header(name, "histogram", help_text)
+        for labels, snapshot in series:
+            for bound, count in snapshot["buckets"].items():
+                self._lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,198 @@
+"""
+Parallel query fan-out for dashboard handlers.
+
+Dispatches a handler's independent SQL statements concurrently so that page
+latency tracks the slowest warehouse round-trip instead of the sum of all of
+them. The fan-out runs more workers than the SQL connection pool has
+connections, so statements queue in the pool, whose bounded wait queue and
+wait timeout shed excess load as 503 + Retry-After. Statements waiting for a
+worker are bounded too: a batch arriving behind a deep backlog is rejected
+with FanoutSaturated, and statements that have not started by a batch's
+deadline are cancelled rather than left to run for nobody.
+"""
+import os
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from backend.tracing import in_context
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from tracing import in_context
+
+logger = logging.getLogger("discount_tire_demo.query_fanout")
+
+
+class FanoutSaturated(Exception):
+    """Too many statements are already waiting for a fan-out worker."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FanoutResult:
+    """Outcome of a fan-out: finished tables, the names still running and the errors of failed queries."""
+
+    def __init__(
+        self,
+        completed: Dict[str, Optional[Any]],
+        pending: List[str],
+        errors: Optional[Dict[str, Exception]] = None,
+    ):
+        self.completed = completed
+        self.pending = pending
+        self.errors = errors or {}
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return the table for `name`, or None if it failed or is still pending."""
+        return self.completed.get(name)
+
+
+class QueryFanout:
+    """Bounded thread pool that runs a batch of named queries in parallel."""
+
+    def __init__(self, max_workers: int = 3, max_queued: Optional[int] = None, retry_after: int = 2):
+        """
+        Initialize the fan-out executor.
+
+        Args:
+            max_workers: Maximum number of queries in flight at once
+            max_queued: Statements allowed to wait for a worker before new batches
+                are rejected (defaults to max_workers)
+            retry_after: Seconds clients are told to wait when a batch is rejected
+        """
+        self.max_workers = max_workers
+        self.max_queued = max_workers if max_queued is None else max_queued
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sql-fanout")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._rejected = 0
+        self._cancelled = 0
+
+    def _submit(self, runner: Callable[[str], Optional[Any]], sql: str) -> Future:
+        def start() -> Optional[Any]:
+            with self._lock:
+                self._queued -= 1
+            return runner(sql)
+
+        return self._executor.submit(start)
+
+    def run(
+        self,
+        queries: Dict[str, str],
+        runner: Callable[[str], Optional[Any]],
+        deadline: float,
+    ) -> FanoutResult:
+        """
+        Run every query concurrently and wait up to `deadline` seconds.
+
+        Queries already running at the deadline keep running in the background
+        so their results still land in the SQL cache for the next request;
+        queries still waiting for a worker are cancelled.
+
+        Args:
+            queries: Mapping of result name to SQL text
+            runner: Callable executing one SQL statement (e.g. run_direct_sql)
+            deadline: Seconds to wait for the whole batch
+
+        Returns:
+            FanoutResult with completed tables and pending query names
+
+        Raises:
+            FanoutSaturated: `max_queued` statements are already waiting for a worker
+        """
+        started = time.time()
+        with self._lock:
+            if self._queued >= self.max_queued:
+                self._rejected += 1
+                raise FanoutSaturated(
+                    f"{self._queued} SQL statements already waiting for a fan-out worker", self.retry_after
+                )
+            self._queued += len(queries)
+        # Each query runs in a copy of the caller's context so its spans join the request's trace
+        futures = {name: self._submit(in_context(runner), sql) for name, sql in queries.items()}
+        wait(futures.values(), timeout=deadline)
+
+        completed: Dict[str, Optional[Any]] = {}
+        pending: List[str] = []
+        errors: Dict[str, Exception] = {}
+        cancelled = 0
+        for name, future in futures.items():
+            if not future.done():
+                pending.append(name)
+                if future.cancel():
+                    cancelled += 1
+                continue
+            try:
+                completed[name] = future.result()
+            except Exception as e:
+                logger.error(f"Query '{name}' failed: {e}")
+                completed[name] = None
+                errors[name] = e
+
+        if cancelled:
+            with self._lock:
+                self._queued -= cancelled
+                self._cancelled += cancelled
+        if pending:
+            logger.warning(
+                f"Fan-out deadline of {deadline:.1f}s exceeded; pending queries: {', '.join(pending)} "
+                f"({cancelled} cancelled before starting)"
+            )
+        logger.debug(f"Fan-out of {len(queries)} queries finished in {time.time() - started:.3f}s")
+        return FanoutResult(completed, pending, errors)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Workers, statements waiting for one, and rejected batches and cancelled statements."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "max_queued": self.max_queued,
+                "rejected": self._rejected,
+                "cancelled": self._cancelled,
+            }
+
+    def shutdown(self) -> None:
+        """Stop accepting new work; running queries are allowed to finish."""
+        self._executor.shutdown(wait=False)
+
+
+def fanout_workers() -> int:
+    """
+    Fan-out size from SQL_FANOUT_WORKERS, by default twice what the SQL pool
+    admits (its connections plus its wait queue) so the pool's admission
+    control, not the fan-out, decides when statements are shed.
+    """
+    configured = os.getenv("SQL_FANOUT_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    admitted = int(os.getenv("SQL_POOL_SIZE", "3")) + int(os.getenv("SQL_POOL_MAX_WAITERS", "16"))
+    return max(1, 2 * admitted)
+
+
+# Global fan-out instance (singleton)
+_FANOUT: Optional[QueryFanout] = None
+_FANOUT_LOCK = threading.Lock()
+
+
+def get_query_fanout() -> QueryFanout:
+    """Get or create the global query fan-out executor."""
+    global _FANOUT
+
+    if _FANOUT is None:
+        with _FANOUT_LOCK:
+            if _FANOUT is None:
+                max_workers = fanout_workers()
+                _FANOUT = QueryFanout(
+                    max_workers=max_workers,
+                    max_queued=int(os.getenv("SQL_FANOUT_MAX_QUEUED", str(max_workers))),
+                    retry_after=int(os.getenv("SQL_POOL_RETRY_AFTER_SECONDS", "2")),
+                )
+                logger.info(f"Initialized query fan-out with {_FANOUT.max_workers} workers")
+
+    return _FANOUT
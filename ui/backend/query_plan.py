@@ -0,0 +1,172 @@
+"""
+Single-scan query planning for dashboard panels.
+
+A dashboard's panels are mostly aggregates over the same rows grouped
+different ways. A ScanPlan compiles them into one statement using GROUPING
+SETS, so the warehouse reads the source once instead of once per panel, then
+splits the result back into one table per panel.
+
+Panels share the plan's measures; a panel picks the dimensions it groups by,
+the columns it returns (renamed), an optional filter on dimension values and
+its own ordering and limit. Panels grouping by the same dimensions share one
+grouping set. Anything SQL would compute across panels (ratios against a
+maximum, per-customer rollups) is left to an optional `finish` callable.
+
+Splitting works on the typed columns of the result: each panel is a row
+subset and projection of the statement's ResultTable.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from backend.result_table import ResultTable, format_cell
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from result_table import ResultTable, format_cell
+
+logger = logging.getLogger("discount_tire_demo.query_plan")
+
+GROUPING_SET_COLUMN = "grouping_set"
+
+
+class Panel:
+    """One result table carved out of a ScanPlan."""
+
+    def __init__(
+        self,
+        name: str,
+        dimensions: Sequence[str],
+        columns: Dict[str, str],
+        where: Optional[Dict[str, str]] = None,
+        order_by: Optional[List[Tuple[str, bool]]] = None,
+        limit: Optional[int] = None,
+    ):
+        """
+        Initialize a panel.
+
+        Args:
+            name: Result name (the key handlers read the table from)
+            dimensions: Plan dimensions to group by (empty for a grand total)
+            columns: Output column name -> plan dimension or measure
+            where: Keep only rows whose dimension equals the given value (as formatted on the wire)
+            order_by: (output column, descending) pairs
+            limit: Maximum rows after ordering
+        """
+        self.name = name
+        self.dimensions = tuple(dimensions)
+        self.columns = columns
+        self.where = where or {}
+        self.order_by = order_by or []
+        self.limit = limit
+
+
+def _sort_value(value: Any) -> Tuple[int, Any]:
+    """Order NULLs last, numbers (and numeric strings) numerically and everything else by value."""
+    if value is None:
+        return (2, "")
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, value)
+
+
+class ScanPlan:
+    """Compiles panels over one source into a single GROUPING SETS statement."""
+
+    def __init__(
+        self,
+        source: str,
+        dimensions: Dict[str, str],
+        measures: Dict[str, str],
+        panels: List[Panel],
+        finish: Optional[Callable[[Dict[str, ResultTable]], Dict[str, Any]]] = None,
+    ):
+        """
+        Initialize the plan.
+
+        Args:
+            source: Table or view to scan
+            dimensions: Dimension name -> SQL expression over the source's columns
+            measures: Measure name -> aggregate expression (may reference dimensions)
+            panels: Panels to compute
+            finish: Optional post-processing of the split tables (keyed by panel name)
+        """
+        self.source = source
+        self.dimensions = dimensions
+        self.measures = measures
+        self.panels = panels
+        self.finish = finish
+        self._dimension_bits = {name: 1 << i for i, name in enumerate(dimensions)}
+        for panel in panels:
+            unknown = [name for name in panel.dimensions if name not in dimensions]
+            if unknown:
+                raise ValueError(f"Panel '{panel.name}' groups by unknown dimensions {unknown}")
+
+    def _grouping_sets(self) -> List[Tuple[str, ...]]:
+        sets: List[Tuple[str, ...]] = []
+        for panel in self.panels:
+            if panel.dimensions not in sets:
+                sets.append(panel.dimensions)
+        return sets
+
+    def _grouping_id(self, dimensions: Tuple[str, ...]) -> int:
+        """Value of the grouping-set column for rows grouped by `dimensions`."""
+        return sum(bit for name, bit in self._dimension_bits.items() if name not in dimensions)
+
+    @property
+    def sql(self) -> str:
+        """The compiled statement."""
+        # Source columns used as-is are not re-projected (that would make them ambiguous)
+        derived = [f"{expression} AS {name}" for name, expression in self.dimensions.items() if expression != name]
+        grouping_id = " + ".join(f"GROUPING({name}) * {bit}" for name, bit in self._dimension_bits.items())
+        select = list(self.dimensions) + [f"{expression} AS {name}" for name, expression in self.measures.items()]
+        grouping_sets = ", ".join(f"({', '.join(dimensions)})" for dimensions in self._grouping_sets())
+        return (
+            f"SELECT {', '.join(select)}, {grouping_id} AS {GROUPING_SET_COLUMN} "
+            f"FROM (SELECT {', '.join(['*'] + derived)} FROM {self.source}) s "
+            f"GROUP BY GROUPING SETS ({grouping_sets})"
+        )
+
+    def split(self, table: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Split the statement's result into one table per panel.
+
+        Args:
+            table: Result of running `sql` (a ResultTable or a {"columns", "rows"} dict)
+
+        Returns:
+            Mapping of panel name to its ResultTable, or None if `table` is None
+        """
+        table = ResultTable.coerce(table)
+        if table is None:
+            return None
+        typed: Dict[str, List[Any]] = {}
+
+        def values(name: str) -> List[Any]:
+            if name not in typed:
+                typed[name] = table.column(name)
+            return typed[name]
+
+        by_set: Dict[int, List[int]] = {}
+        for i, grouping_set in enumerate(values(GROUPING_SET_COLUMN)):
+            by_set.setdefault(int(float(grouping_set)), []).append(i)
+
+        tables = {}
+        for panel in self.panels:
+            indices = list(by_set.get(self._grouping_id(panel.dimensions), []))
+            if not indices:
+                tables[panel.name] = ResultTable(list(panel.columns), [[] for _ in panel.columns], 0)
+                continue
+            for name, value in panel.where.items():
+                column = values(name)
+                indices = [i for i in indices if format_cell(column[i]) == value]
+            # Apply the least significant key first; Python's sort is stable
+            for output, descending in reversed(panel.order_by):
+                column = values(panel.columns[output])
+                indices.sort(key=lambda i: _sort_value(column[i]), reverse=descending)
+                if descending:
+                    # Keep NULLs last when reversing
+                    indices.sort(key=lambda i: column[i] is None)
+            if panel.limit is not None:
+                indices = indices[: panel.limit]
+            tables[panel.name] = table.select(panel.columns).take(indices)
+        return self.finish(tables) if self.finish else tables
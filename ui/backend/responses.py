@@ -0,0 +1,201 @@
+"""
+Pre-serialized JSON response bodies.
+
+An EncodedPayload holds the JSON-encoded body of a payload together with its
+compressed variants. Cached dashboard payloads are encoded and compressed once
+when they are built, so a cache hit only has to pick the variant matching the
+client's Accept-Encoding and write it to the socket. Other representations of
+the same payload (the columnar encodings in columnar.py) are encoded and
+compressed on first request and kept alongside it; callers holding the payload
+in a TTLCache re-size its entry when that happens.
+"""
+import gzip
+import hashlib
+import json
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    from backend.columnar import ENCODERS, JSON
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from columnar import ENCODERS, JSON
+
+try:
+    from backend.tracing import span
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from tracing import span
+
+logger = logging.getLogger("discount_tire_demo.responses")
+
+# Bodies at or below this size are always sent uncompressed
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+BROTLI_ENABLED = brotli is not None and os.getenv("ENABLE_BROTLI", "true").strip().lower() in {"1", "true", "yes"}
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q-value}."""
+    codings: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[token] = quality
+    return codings
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag` (RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class EncodedPayload:
+    """A JSON payload with its encoded body and lazily memoized compressed variants."""
+
+    __slots__ = ("payload", "body", "content_type", "_variants", "_etag", "_representations", "_lock")
+
+    def __init__(self, payload: Any, body: Optional[bytes] = None, content_type: str = JSON):
+        """
+        Initialize the encoded payload.
+
+        Args:
+            payload: JSON-serializable payload
+            body: Pre-encoded body (JSON-encoded from `payload` if omitted)
+            content_type: Media type of `body`
+        """
+        self.payload = payload
+        self.body = body if body is not None else json.dumps(payload).encode("utf-8")
+        self.content_type = content_type
+        self._variants: Dict[str, bytes] = {}
+        self._etag: Optional[str] = None
+        self._representations: Dict[str, "EncodedPayload"] = {}
+        # Cached payloads are shared by every request thread; guards the lazy builds
+        self._lock = threading.Lock()
+
+    @classmethod
+    def precompressed(cls, payload: Any) -> "EncodedPayload":
+        """Encode `payload` and compute every supported compressed variant up front."""
+        return cls(payload)._precompute()
+
+    def _precompute(self) -> "EncodedPayload":
+        # Hash the body now so cache hits never pay for it
+        self._etag = self._hash_body()
+        if self.compressible:
+            self.variant("gzip")
+            if BROTLI_ENABLED:
+                self.variant("br")
+        return self
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) > COMPRESSION_MIN_BYTES
+
+    @property
+    def etag(self) -> str:
+        """
+        Weak validator derived from the JSON body.
+
+        Weak because the gzip/br variants are byte-different encodings of the
+        same representation and must revalidate against the same tag.
+        """
+        if self._etag is None:
+            self._etag = self._hash_body()
+        return self._etag
+
+    def _hash_body(self) -> str:
+        return f'W/"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the encoded body, all computed variants and other representations."""
+        with self._lock:
+            variants = list(self._variants.values())
+            representations = list(self._representations.values())
+        return (
+            len(self.body)
+            + sum(len(data) for data in variants)
+            + sum(encoded.nbytes for encoded in representations if encoded is not self)
+        )
+
+    def representation(self, media_type: str) -> "EncodedPayload":
+        """
+        The payload encoded as `media_type`, computed once.
+
+        Returns self for this payload's own type, unknown types, and payloads
+        the encoder cannot represent.
+        """
+        if media_type == self.content_type or media_type not in ENCODERS:
+            return self
+        encoded = self._representations.get(media_type)
+        if encoded is None:
+            with self._lock:
+                # Concurrent first requests wait for one encode
+                encoded = self._representations.get(media_type)
+                if encoded is None:
+                    with span("encode", media_type=media_type):
+                        body = ENCODERS[media_type](self.payload)
+                    # Compressed up front so its bytes all exist when the owning cache entry is re-sized
+                    encoded = self if body is None else EncodedPayload(self.payload, body, media_type)._precompute()
+                    self._representations[media_type] = encoded
+        return encoded
+
+    def variant(self, encoding: str) -> bytes:
+        """Return the body compressed with `encoding` ("gzip" or "br"), computing it once."""
+        data = self._variants.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._variants.get(encoding)
+                if data is None:
+                    if encoding == "gzip":
+                        with span("compress", encoding=encoding):
+                            data = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+                    elif encoding == "br" and brotli is not None:
+                        with span("compress", encoding=encoding):
+                            data = brotli.compress(self.body, quality=BROTLI_QUALITY)
+                    else:
+                        raise ValueError(f"Unsupported content encoding: {encoding}")
+                    self._variants[encoding] = data
+        return data
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[Optional[str], bytes]:
+        """
+        Pick the best body for a request's Accept-Encoding header.
+
+        Returns:
+            (content_encoding, body) where content_encoding is None for identity
+        """
+        if not self.compressible:
+            return None, self.body
+        accepted = parse_accept_encoding(accept_encoding)
+        if BROTLI_ENABLED and accepted.get("br", 0) > 0:
+            return "br", self.variant("br")
+        if accepted.get("gzip", 0) > 0:
+            return "gzip", self.variant("gzip")
+        return None, self.body
@@ -0,0 +1,179 @@
+"""
+Column-oriented, typed query results.
+
+A ResultTable keeps a statement's result as one column per field, either as
+the Arrow arrays the cursor returned (fetchall_arrow / fetch_arrow_table) or
+as plain Python lists. Cells keep their warehouse types (Decimal, datetime,
+int, ...) so handlers can compute on them directly, and projections, renames
+and row subsets share the underlying columns instead of copying rows.
+
+Cells become strings only at the edge: `rows` and `to_dicts()` format them
+exactly the way run_direct_sql always has (str(value), None preserved), so the
+JSON sent to the browser is unchanged. For code that still reads tables as
+{"columns", "rows"} dicts, a ResultTable is also a read-only mapping with
+those two keys.
+"""
+import logging
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+logger = logging.getLogger("discount_tire_demo.result_table")
+
+_LIST_OVERHEAD = sys.getsizeof([])
+# Cursor methods returning the whole result as a pyarrow.Table, in order of preference
+_ARROW_FETCHERS = ("fetchall_arrow", "to_arrow_table", "fetch_arrow_table")
+
+
+def format_cell(value: Any) -> Optional[str]:
+    """The wire format of one cell: str(value), with NULL kept as None."""
+    return None if value is None else str(value)
+
+
+def _is_arrow(column: Any) -> bool:
+    return pa is not None and isinstance(column, (pa.Array, pa.ChunkedArray))
+
+
+class ResultTable(Mapping):
+    """A typed, column-oriented query result."""
+
+    __slots__ = ("columns", "num_rows", "_data")
+
+    def __init__(self, columns: Sequence[str], data: Sequence[Any], num_rows: Optional[int] = None):
+        """
+        Initialize the table.
+
+        Args:
+            columns: Column names
+            data: One column per name, each an Arrow array or a list of Python values
+            num_rows: Row count (taken from the first column if omitted)
+        """
+        if len(columns) != len(data):
+            raise ValueError(f"{len(columns)} column names for {len(data)} columns")
+        self.columns = list(columns)
+        self._data = list(data)
+        self.num_rows = num_rows if num_rows is not None else (len(self._data[0]) if self._data else 0)
+
+    @classmethod
+    def from_arrow(cls, table: Any) -> "ResultTable":
+        """Wrap a pyarrow.Table without copying its buffers."""
+        return cls(table.column_names, table.columns, table.num_rows)
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> "ResultTable":
+        """Build a table from row tuples (e.g. a cursor's fetchall())."""
+        data: List[List[Any]] = [[] for _ in columns]
+        for row in rows:
+            for i, column in enumerate(data):
+                column.append(row[i] if i < len(row) else None)
+        return cls(columns, data, len(rows))
+
+    @classmethod
+    def coerce(cls, table: Optional[Union["ResultTable", Mapping]]) -> Optional["ResultTable"]:
+        """Accept a ResultTable or a {"columns", "rows"} dict (None passes through)."""
+        if table is None or isinstance(table, ResultTable):
+            return table
+        return cls.from_rows(table.get("columns") or [], table.get("rows") or [])
+
+    def column(self, name: str) -> List[Any]:
+        """Typed values of one column (KeyError if it does not exist)."""
+        try:
+            data = self._data[self.columns.index(name)]
+        except ValueError:
+            raise KeyError(name) from None
+        return data.to_pylist() if _is_arrow(data) else list(data)
+
+    def value(self, name: str, row: int = 0) -> Any:
+        """Typed value of one cell, or None if the row or column does not exist."""
+        if name not in self.columns or row >= self.num_rows:
+            return None
+        data = self._data[self.columns.index(name)]
+        return data[row].as_py() if _is_arrow(data) else data[row]
+
+    def select(self, columns: Union[Sequence[str], Dict[str, str]]) -> "ResultTable":
+        """
+        Project (and optionally rename) columns without copying them.
+
+        Args:
+            columns: Column names to keep, or {new name: existing name}
+        """
+        mapping = columns if isinstance(columns, dict) else {name: name for name in columns}
+        data = [self._data[self.columns.index(source)] for source in mapping.values()]
+        return ResultTable(list(mapping), data, self.num_rows)
+
+    def take(self, indices: Sequence[int]) -> "ResultTable":
+        """The rows at `indices`, in that order."""
+        data = [
+            column.take(pa.array(indices, type=pa.int64())) if _is_arrow(column) else [column[i] for i in indices]
+            for column in self._data
+        ]
+        return ResultTable(self.columns, data, len(indices))
+
+    def iter_rows(self) -> Iterator[Tuple[Any, ...]]:
+        """Typed row tuples."""
+        return zip(*(self.column(name) for name in self.columns)) if self.columns else iter(())
+
+    @property
+    def rows(self) -> List[List[Optional[str]]]:
+        """Rows with string cells, as run_direct_sql has always returned them."""
+        return [[format_cell(value) for value in row] for row in self.iter_rows()]
+
+    def to_dicts(self) -> List[Dict[str, Optional[str]]]:
+        """One {column: string cell} dict per row, for JSON payloads."""
+        columns = self.columns
+        return [dict(zip(columns, map(format_cell, row))) for row in self.iter_rows()]
+
+    def to_json_table(self) -> Dict[str, Any]:
+        """The {"columns", "rows"} dict with string cells."""
+        return {"columns": list(self.columns), "rows": self.rows}
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns (used for cache budgets)."""
+        total = 0
+        for column in self._data:
+            if _is_arrow(column):
+                total += column.nbytes
+            else:
+                total += _LIST_OVERHEAD + sum(8 + sys.getsizeof(value) for value in column)
+        return total
+
+    # Read-only {"columns", "rows"} mapping view
+    def __getitem__(self, key: str) -> Any:
+        if key == "columns":
+            return list(self.columns)
+        if key == "rows":
+            return self.rows
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("columns", "rows"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f"ResultTable(columns={self.columns}, num_rows={self.num_rows})"
+
+
+def fetch_result_table(cursor: Any) -> ResultTable:
+    """
+    Read a cursor's full result as a ResultTable.
+
+    Uses the cursor's Arrow fetch when pyarrow is installed (fetchall_arrow on
+    the Databricks connector, to_arrow_table / fetch_arrow_table on DuckDB)
+    and falls back to fetchall().
+    """
+    if pa is not None:
+        for name in _ARROW_FETCHERS:
+            fetch_arrow = getattr(cursor, name, None)
+            if fetch_arrow is not None:
+                return ResultTable.from_arrow(fetch_arrow())
+    rows = cursor.fetchall() or []
+    columns = [column[0] for column in cursor.description] if cursor.description else []
+    return ResultTable.from_rows(columns, rows)
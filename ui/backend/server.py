@@ -1,18 +1,16 @@
-import gzip
+import hashlib
 import json
 import logging
 import mimetypes
 import os
 import re
-import ssl
+import sys
 import time
+import unicodedata
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any, Dict, Optional, List
-from datetime import datetime
-from urllib.error import HTTPError
-from urllib.request import Request, urlopen
-import threading
+from typing import Any, Callable, ContextManager, Dict, Mapping, Optional, List, Tuple
+from datetime import date, datetime
 
 try:
     import databricks.sql as dbsql
@@ -24,12 +22,142 @@ logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger("discount_tire_demo")
 
 try:
-    from backend.db_pool import run_sql_with_pool, get_sql_pool
+    try:
+        from backend.db_pool import PoolSaturated, run_sql_with_pool, get_sql_pool, get_sql_pool_status
+    except ImportError:  # pragma: no cover - running as a script from ui/backend
+        from db_pool import PoolSaturated, run_sql_with_pool, get_sql_pool, get_sql_pool_status
     _USE_POOL = True
 except ImportError:
     _USE_POOL = False
     logger.warning("Connection pool not available, falling back to direct connections")
 
+    class PoolSaturated(Exception):
+        """Never raised without the pool; keeps `except PoolSaturated` clauses valid."""
+
+        retry_after = 1
+
+try:
+    from backend.query_fanout import FanoutResult, FanoutSaturated, get_query_fanout
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from query_fanout import FanoutResult, FanoutSaturated, get_query_fanout
+
+try:
+    from backend.query_plan import Panel, ScanPlan
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from query_plan import Panel, ScanPlan
+
+try:
+    from backend.dashboard_aggregates import AGGREGATE_SOURCES, AggregateQuery, AggregateRouter, is_missing_table_error
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from dashboard_aggregates import AGGREGATE_SOURCES, AggregateQuery, AggregateRouter, is_missing_table_error
+
+try:
+    from backend.singleflight import SingleFlight
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from singleflight import SingleFlight
+
+try:
+    from backend.dashboard_refresh import DashboardRefresher
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from dashboard_refresh import DashboardRefresher
+
+try:
+    from backend.cache import CacheSweeper, TTLCache, estimate_size
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from cache import CacheSweeper, TTLCache, estimate_size
+
+try:
+    from backend.responses import EncodedPayload, etag_matches
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from responses import EncodedPayload, etag_matches
+
+try:
+    from backend.http_pool import get_http_pool
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from http_pool import get_http_pool
+
+try:
+    from backend.genie_scheduler import BACKGROUND, INTERACTIVE, GenieScheduler
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_scheduler import BACKGROUND, INTERACTIVE, GenieScheduler
+
+try:
+    from backend.genie_stream import (
+        NDJSON_HEADERS,
+        SSE_HEADERS,
+        answer_events,
+        format_ndjson,
+        format_sse,
+        run_events,
+        wants_ndjson,
+    )
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_stream import (
+        NDJSON_HEADERS,
+        SSE_HEADERS,
+        answer_events,
+        format_ndjson,
+        format_sse,
+        run_events,
+        wants_ndjson,
+    )
+
+try:
+    from backend.genie_results import ResultReader, cap_table, result_continuation
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_results import ResultReader, cap_table, result_continuation
+
+try:
+    from backend.genie_polling import GenieConversation, GenieError, PollPolicy, get_genie_latency_stats, run_conversation
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_polling import GenieConversation, GenieError, PollPolicy, get_genie_latency_stats, run_conversation
+
+try:
+    from backend.local_engine import get_local_engine
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from local_engine import get_local_engine
+
+try:
+    from backend.result_table import ResultTable, fetch_result_table
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from result_table import ResultTable, fetch_result_table
+
+try:
+    from backend.columnar import negotiate_media_type
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from columnar import negotiate_media_type
+
+try:
+    from backend.metrics import CounterFamily, Exposition, HistogramFamily
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from metrics import CounterFamily, Exposition, HistogramFamily
+
+try:
+    from backend.genie_payload import (
+        collect_texts,
+        extract_sql,
+        extract_summary,
+        extract_table,
+        find_sql,
+        parse_genie_response,
+        pick_best_text,
+    )
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from genie_payload import (
+        collect_texts,
+        extract_sql,
+        extract_summary,
+        extract_table,
+        find_sql,
+        parse_genie_response,
+        pick_best_text,
+    )
+
+try:
+    from backend.tracing import JsonlTraceSink, Trace, current_trace, response_headers, span, trace_request
+except ImportError:  # pragma: no cover - running as a script from ui/backend
+    from tracing import JsonlTraceSink, Trace, current_trace, response_headers, span, trace_request
+
 
 # Configuration constants
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -37,41 +165,133 @@ DIST_DIR = BASE_DIR / "dist"
 GENIE_CACHE_TTL_SECONDS = int(os.getenv("GENIE_CACHE_TTL_SECONDS", "300"))
 SQL_CACHE_TTL_SECONDS = int(os.getenv("SQL_CACHE_TTL_SECONDS", "60"))  # Reduced to 60 seconds
 DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))  # Reduced to 30 seconds
-GENIE_MAX_CONCURRENT = int(os.getenv("GENIE_MAX_CONCURRENT", "1"))
+# How long past its TTL a dashboard payload may still be served while it is rebuilt
+DASHBOARD_STALE_TTL_SECONDS = int(os.getenv("DASHBOARD_STALE_TTL_SECONDS", "600"))
+# Pre-warm interval for all dashboard keys (0 disables the scheduler)
+DASHBOARD_REFRESH_INTERVAL_SECONDS = int(
+    os.getenv("DASHBOARD_REFRESH_INTERVAL_SECONDS", str(max(DASHBOARD_CACHE_TTL_SECONDS - 5, 5)))
+)
+DASHBOARD_REFRESH_WORKERS = int(os.getenv("DASHBOARD_REFRESH_WORKERS", "2"))
+# Last-known Genie results may back a failed call for this long after expiry
+GENIE_CACHE_STALE_TTL_SECONDS = int(os.getenv("GENIE_CACHE_STALE_TTL_SECONDS", "3600"))
+# Per-namespace memory budgets (MB) and sweep interval for expired entries
+GENIE_CACHE_MAX_MB = float(os.getenv("GENIE_CACHE_MAX_MB", "16"))
+SQL_CACHE_MAX_MB = float(os.getenv("SQL_CACHE_MAX_MB", "64"))
+DASHBOARD_CACHE_MAX_MB = float(os.getenv("DASHBOARD_CACHE_MAX_MB", "16"))
+CACHE_SWEEP_INTERVAL_SECONDS = int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60"))
+# Genie job scheduler: concurrent conversations, wait-queue bound and conversation starts per minute
+GENIE_MAX_CONCURRENT = int(os.getenv("GENIE_MAX_CONCURRENT", "3"))
+GENIE_MAX_QUEUE = int(os.getenv("GENIE_MAX_QUEUE", "20"))
+GENIE_RATE_PER_MINUTE = float(os.getenv("GENIE_RATE_PER_MINUTE", "5"))
+GENIE_RATE_BURST = float(os.getenv("GENIE_RATE_BURST", str(max(1.0, GENIE_RATE_PER_MINUTE))))
+# Genie message polling: first interval, backoff cap/growth, jitter and overall deadline
+GENIE_POLL_INITIAL_SECONDS = float(os.getenv("GENIE_POLL_INITIAL_SECONDS", "0.25"))
+GENIE_POLL_MAX_SECONDS = float(os.getenv("GENIE_POLL_MAX_SECONDS", "3"))
+GENIE_POLL_MULTIPLIER = float(os.getenv("GENIE_POLL_MULTIPLIER", "1.6"))
+GENIE_POLL_JITTER = float(os.getenv("GENIE_POLL_JITTER", "0.2"))
+GENIE_DEADLINE_SECONDS = float(os.getenv("GENIE_DEADLINE_SECONDS", "90"))
+# Answers to repeat /api/genie/query questions (keyed on the normalized question)
+GENIE_ANSWER_CACHE_TTL_SECONDS = int(os.getenv("GENIE_ANSWER_CACHE_TTL_SECONDS", "900"))
+GENIE_ANSWER_CACHE_MAX_MB = float(os.getenv("GENIE_ANSWER_CACHE_MAX_MB", "8"))
+# Rows per `rows` event on the Genie streams, and the most rows any Genie answer returns
+GENIE_STREAM_ROW_CHUNK = int(os.getenv("GENIE_STREAM_ROW_CHUNK", "50"))
+GENIE_RESULT_MAX_ROWS = int(os.getenv("GENIE_RESULT_MAX_ROWS", "10000"))
+DASHBOARD_QUERY_DEADLINE_SECONDS = float(os.getenv("DASHBOARD_QUERY_DEADLINE_SECONDS", "20"))
+# Read the notebook's agg_* tables; after one is found missing, use view SQL for this long
+DASHBOARD_AGGREGATES_ENABLED = os.getenv("DASHBOARD_AGGREGATES_ENABLED", "true").strip().lower() in {"1", "true", "yes"}
+DASHBOARD_AGGREGATE_RETRY_SECONDS = float(os.getenv("DASHBOARD_AGGREGATE_RETRY_SECONDS", "300"))
+# Where run_direct_sql runs statements: "databricks", "local" (DuckDB over LOCAL_DATA_DIR/*.csv)
+# or "auto" (the warehouse when configured, otherwise the local engine if it can load)
+SQL_BACKEND = os.getenv("SQL_BACKEND", "auto").strip().lower()
+LOCAL_DATA_DIR = Path(os.getenv("LOCAL_DATA_DIR", str(BASE_DIR.parent / "data")))
+# "threading" (one thread per connection) or "asyncio" (single event loop)
+SERVER_MODE = os.getenv("SERVER_MODE", "threading").strip().lower()
+# Per-request tracing: Server-Timing response header and an optional JSONL file of every span
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").strip().lower() in {"1", "true", "yes"}
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "").strip()
 
 # Cache stores
-_GENIE_CACHE: Dict[str, Dict[str, Any]] = {}
-_GENIE_CACHE_LOCK = threading.Lock()
-_SQL_CACHE: Dict[str, Dict[str, Any]] = {}
-_SQL_CACHE_LOCK = threading.Lock()
-_DASHBOARD_CACHE: Dict[str, Dict[str, Any]] = {}
-_DASHBOARD_CACHE_LOCK = threading.Lock()
-_GENIE_SEMAPHORE = threading.Semaphore(GENIE_MAX_CONCURRENT)
+_GENIE_CACHE = TTLCache(
+    "genie",
+    ttl=GENIE_CACHE_TTL_SECONDS,
+    stale_ttl=GENIE_CACHE_STALE_TTL_SECONDS,
+    max_bytes=int(GENIE_CACHE_MAX_MB * 1024 * 1024),
+)
+_SQL_CACHE = TTLCache("sql", ttl=SQL_CACHE_TTL_SECONDS, max_bytes=int(SQL_CACHE_MAX_MB * 1024 * 1024))
+# Dashboard entries are EncodedPayloads: the payload plus its pre-compressed bodies
+_DASHBOARD_CACHE = TTLCache(
+    "dashboard",
+    ttl=DASHBOARD_CACHE_TTL_SECONDS,
+    stale_ttl=DASHBOARD_STALE_TTL_SECONDS,
+    max_bytes=int(DASHBOARD_CACHE_MAX_MB * 1024 * 1024),
+    sizer=lambda encoded: encoded.nbytes + estimate_size(encoded.payload),
+)
+# Answer entries are {"answer": {"summary", "table"}, "tables": frozenset of referenced tables or None}
+_ANSWER_CACHE = TTLCache(
+    "answer", ttl=GENIE_ANSWER_CACHE_TTL_SECONDS, max_bytes=int(GENIE_ANSWER_CACHE_MAX_MB * 1024 * 1024)
+)
+_CACHE_SWEEPER = CacheSweeper(
+    [_GENIE_CACHE, _SQL_CACHE, _DASHBOARD_CACHE, _ANSWER_CACHE], interval=CACHE_SWEEP_INTERVAL_SECONDS
+)
+_GENIE_SCHEDULER = GenieScheduler(
+    max_concurrent=GENIE_MAX_CONCURRENT,
+    max_queue=GENIE_MAX_QUEUE,
+    rate_per_minute=GENIE_RATE_PER_MINUTE,
+    burst=GENIE_RATE_BURST,
+)
+_GENIE_POLL_POLICY = PollPolicy(
+    initial_interval=GENIE_POLL_INITIAL_SECONDS,
+    max_interval=GENIE_POLL_MAX_SECONDS,
+    multiplier=GENIE_POLL_MULTIPLIER,
+    jitter=GENIE_POLL_JITTER,
+    deadline=GENIE_DEADLINE_SECONDS,
+)
 
+_AGGREGATE_ROUTER = AggregateRouter(
+    enabled=DASHBOARD_AGGREGATES_ENABLED, retry_seconds=DASHBOARD_AGGREGATE_RETRY_SECONDS
+)
 
-def api_request(url: str, method: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str]) -> tuple[int, Dict[str, Any]]:
+# Coalesce concurrent identical work after a cache miss
+_SQL_FLIGHT = SingleFlight("sql")
+_DASHBOARD_FLIGHT = SingleFlight("dashboard")
+
+# Body of dashboard requests shed because every SQL connection is busy (sent with Retry-After)
+SATURATED_PAYLOAD = {"error": "The data warehouse is busy. Please try again shortly."}
+
+# Metrics exposed on /api/metrics (SQL statements are labeled by a short hash of their text)
+_HTTP_REQUESTS = CounterFamily("dtc_http_requests_total", ("method", "route", "status"))
+_HTTP_LATENCY = HistogramFamily("dtc_http_request_duration_seconds", ("method", "route"))
+_SQL_STATEMENTS = CounterFamily("dtc_sql_statements_total", ("statement", "backend", "outcome"))
+_SQL_ROWS = CounterFamily("dtc_sql_rows_total", ("statement",))
+_SQL_LATENCY = HistogramFamily("dtc_sql_statement_duration_seconds", ("statement", "backend"))
+_SQL_STATEMENT_TEXT: Dict[str, str] = {}
+
+_TRACE_SINK = JsonlTraceSink(Path(TRACE_JSONL_PATH)) if TRACE_JSONL_PATH else None
+
+
+def api_response(
+    url: str, method: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str]
+) -> tuple[int, Dict[str, Any], Mapping[str, str]]:
+    """Like api_request, but also returns the response headers (e.g. Retry-After)."""
     data = json.dumps(payload).encode("utf-8") if payload else None
-    request = Request(url, data=data, headers=headers, method=method)
-    insecure = os.getenv("DATABRICKS_INSECURE", "").strip().lower() in {"1", "true", "yes"}
+    # Persistent per-host connections: only the first call to a host pays the TLS handshake
+    with span("genie-http", method=method):
+        response = get_http_pool().request(url, method, body=data, headers=headers)
+    body = response.body.decode("utf-8")
     try:
-        if insecure:
-            context = ssl._create_unverified_context()
-            response = urlopen(request, context=context, timeout=30)
-        else:
-            response = urlopen(request, timeout=30)
-        with response:
-            body = response.read().decode("utf-8")
-            return response.status, json.loads(body) if body else {}
-    except HTTPError as exc:
-        body = exc.read().decode("utf-8") if exc.fp else ""
-        try:
-            payload = json.loads(body) if body else {}
-        except json.JSONDecodeError:
-            payload = {}
-        return exc.code, payload
+        return response.status, json.loads(body) if body else {}, response.headers
+    except json.JSONDecodeError:
+        if response.status < 400:
+            raise
+        return response.status, {}, response.headers
 
 
-def parse_float(value: Optional[str]) -> Optional[float]:
+def api_request(url: str, method: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str]) -> tuple[int, Dict[str, Any]]:
+    status_code, body, _ = api_response(url, method, payload, headers)
+    return status_code, body
+
+
+def parse_float(value: Any) -> Optional[float]:
     if value is None:
         return None
     try:
@@ -80,9 +300,11 @@ def parse_float(value: Optional[str]) -> Optional[float]:
         return None
 
 
-def table_to_dicts(table: Optional[Dict[str, Any]]) -> List[Dict[str, Optional[str]]]:
+def table_to_dicts(table: Optional[Mapping[str, Any]]) -> List[Dict[str, Optional[str]]]:
     if not table:
         return []
+    if isinstance(table, ResultTable):
+        return table.to_dicts()
     columns = table.get("columns") or []
     rows = table.get("rows") or []
     return [
@@ -91,9 +313,16 @@ def table_to_dicts(table: Optional[Dict[str, Any]]) -> List[Dict[str, Optional[s
     ]
 
 
-def table_first_value(table: Optional[Dict[str, Any]], column: str) -> Optional[str]:
+def one_row_table(values: Dict[str, Any]) -> ResultTable:
+    """Single-row table, shaped like a run_direct_sql result."""
+    return ResultTable(list(values), [[value] for value in values.values()], 1)
+
+
+def table_first_value(table: Optional[Mapping[str, Any]], column: str) -> Any:
     if not table:
         return None
+    if isinstance(table, ResultTable):
+        return table.value(column)
     columns = table.get("columns") or []
     rows = table.get("rows") or []
     if not rows:
@@ -105,9 +334,11 @@ def table_first_value(table: Optional[Dict[str, Any]], column: str) -> Optional[
     return rows[0][idx] if idx < len(rows[0]) else None
 
 
-def format_month_label(date_str: Optional[str]) -> Optional[str]:
+def format_month_label(date_str: Any) -> Optional[str]:
     if not date_str:
         return None
+    if isinstance(date_str, date):
+        return date_str.strftime("%b %Y")
     try:
         cleaned = date_str.replace("Z", "+00:00")
         dt = datetime.fromisoformat(cleaned)
@@ -116,30 +347,6 @@ def format_month_label(date_str: Optional[str]) -> Optional[str]:
         return None
 
 
-PREFERRED_TEXT_KEYS = (
-    "summary",
-    "answer",
-    "response",
-    "assistant_message",
-    "content",
-    "text",
-    "message",
-    "markdown",
-)
-SKIP_TEXT_KEYS = {"sql", "query", "statement", "status", "suggested_questions", "questions"}
-UUID_RE = re.compile(r"^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$", re.IGNORECASE)
-STATUS_VALUES = {"completed", "failed", "pending", "in_progress", "running"}
-
-
-def is_probably_sql(text: str) -> bool:
-    lowered = text.strip().lower()
-    if not lowered:
-        return False
-    if lowered.startswith("select"):
-        return True
-    return "select" in lowered and "from" in lowered and ("where" in lowered or "group by" in lowered)
-
-
 def is_probably_metric_name(text: str) -> bool:
     trimmed = text.strip()
     if "_" in trimmed and " " not in trimmed:
@@ -147,111 +354,6 @@ def is_probably_metric_name(text: str) -> bool:
     return trimmed.isidentifier()
 
 
-def collect_texts(payload: Any, parent_key: str = "") -> list[tuple[str, str]]:
-    results: list[tuple[str, str]] = []
-    if isinstance(payload, dict):
-        for key, value in payload.items():
-            if key in SKIP_TEXT_KEYS:
-                continue
-            if isinstance(value, str):
-                results.append((key, value))
-            elif isinstance(value, (dict, list)):
-                results.extend(collect_texts(value, key))
-    elif isinstance(payload, list):
-        for item in payload:
-            results.extend(collect_texts(item, parent_key))
-    return results
-
-
-def pick_best_text(
-    candidates: list[tuple[str, str]],
-    question: Optional[str] = None,
-    blocked_values: Optional[set[str]] = None,
-) -> Optional[str]:
-    def score(item: tuple[str, str]) -> tuple[int, int]:
-        key, text = item
-        key_index = PREFERRED_TEXT_KEYS.index(key) if key in PREFERRED_TEXT_KEYS else len(PREFERRED_TEXT_KEYS)
-        sql_penalty = 1 if is_probably_sql(text) else 0
-        return (sql_penalty, key_index)
-
-    normalized_question = question.strip().lower() if question else None
-    blocked_values = {value.strip().lower() for value in (blocked_values or set()) if value}
-    for _, text in sorted(candidates, key=score):
-        cleaned = text.strip()
-        if not cleaned or is_probably_sql(cleaned):
-            continue
-        if UUID_RE.match(cleaned):
-            continue
-        if cleaned.lower() in STATUS_VALUES:
-            continue
-        if cleaned.isupper() and len(cleaned) <= 16:
-            continue
-        if cleaned.lower() in blocked_values:
-            continue
-        if normalized_question and cleaned.lower() == normalized_question:
-            continue
-        if normalized_question and cleaned.lower().rstrip("?") == normalized_question.rstrip("?"):
-            continue
-        if normalized_question and normalized_question in cleaned.lower() and len(cleaned) <= len(normalized_question) + 3:
-            continue
-        if cleaned:
-            return cleaned
-    return None
-
-
-def extract_summary(
-    message: dict,
-    query_result: Optional[Dict[str, Any]] = None,
-    question: Optional[str] = None,
-    blocked_values: Optional[set[str]] = None,
-) -> tuple[str, Optional[str]]:
-    candidates = []
-    for attachment in message.get("attachments", []):
-        text_entry = attachment.get("text")
-        if isinstance(text_entry, dict):
-            content = text_entry.get("content") or text_entry.get("text")
-            if isinstance(content, str) and content.strip():
-                return content.strip(), "text"
-        elif isinstance(text_entry, str) and text_entry.strip():
-            return text_entry.strip(), "text"
-
-        markdown_entry = attachment.get("markdown")
-        if isinstance(markdown_entry, dict):
-            content = markdown_entry.get("content") or markdown_entry.get("text")
-            if isinstance(content, str) and content.strip():
-                return content.strip(), "markdown"
-        elif isinstance(markdown_entry, str) and markdown_entry.strip():
-            return markdown_entry.strip(), "markdown"
-
-    for attachment in message.get("attachments", []):
-        for key in ("text", "markdown", "content"):
-            entry = attachment.get(key)
-            if isinstance(entry, dict):
-                content = entry.get("content") or entry.get("text")
-                if isinstance(content, str):
-                    candidates.append((key, content))
-            elif isinstance(entry, str):
-                candidates.append((key, entry))
-        query_entry = attachment.get("query")
-        if isinstance(query_entry, dict):
-            description = query_entry.get("description")
-            if isinstance(description, str):
-                candidates.append(("description", description))
-
-    candidates.extend(collect_texts(message))
-    if query_result:
-        candidates.extend(collect_texts(query_result))
-
-    best = pick_best_text(candidates, question=question, blocked_values=blocked_values)
-    if not best:
-        return "Genie returned SQL, but no summary text was found.", None
-
-    for key, value in candidates:
-        if value.strip() == best:
-            return best, key
-    return best, None
-
-
 def format_currency(value: float) -> str:
     return f"${value:,.0f}"
 
@@ -274,104 +376,182 @@ def parse_statement_row(query_result: Dict[str, Any]) -> tuple[list[str], list[O
     return columns, row
 
 
-def extract_table(query_result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    if not query_result:
-        return None
-    response = query_result.get("statement_response", {})
-    manifest = response.get("manifest", {})
-    schema = manifest.get("schema", {})
-    columns = [col.get("name") for col in schema.get("columns", []) if col.get("name")]
-    if not columns:
-        return None
-    result = response.get("result", {})
-    data = result.get("data_typed_array", [])
-    if not data:
+def sql_cache_key(sql: str) -> str:
+    """Compact, fixed-size cache key for a SQL statement."""
+    return "sql::" + hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+_QUESTION_PUNCTUATION = re.compile(r"[^\w\s%$.]")
+# Periods that are not decimal points ("3.5" keeps its period)
+_QUESTION_PERIODS = re.compile(r"(?<!\d)\.|\.(?!\d)")
+_SQL_TABLE_REFERENCE = re.compile(r"\b(?:from|join)\s+([`\w.]+)", re.IGNORECASE)
+
+# Base tables read by the notebook's views, for answer cache invalidation
+VIEW_DEPENDENCIES = {
+    "vw_sales_enriched": {"sales", "products", "customers", "stores", "promotions"},
+    "vw_revenue_growth": {"sales"},
+}
+VIEW_DEPENDENCIES.update(
+    {table: VIEW_DEPENDENCIES[view] | {view} for table, view in AGGREGATE_SOURCES.items()}
+)
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, punctuation (including a trailing "?") and whitespace out of a question."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _QUESTION_PUNCTUATION.sub(" ", text)
+    text = _QUESTION_PERIODS.sub(" ", text)
+    return " ".join(text.split())
+
+
+def expand_view_dependencies(tables) -> frozenset:
+    """Table names plus the base tables of any known views among them."""
+    expanded = set()
+    for table in tables:
+        expanded.add(table)
+        expanded.update(VIEW_DEPENDENCIES.get(table, ()))
+    return frozenset(expanded)
+
+
+def referenced_tables(sql: Optional[str]) -> Optional[frozenset]:
+    """Unqualified, lower-cased tables a statement reads (None if unknown)."""
+    if not sql:
         return None
-    rows = []
-    for entry in data:
-        values = entry.get("values", [])
-        row = [value.get("str") if isinstance(value, dict) else None for value in values]
-        rows.append(row)
-    return {"columns": columns, "rows": rows}
+    names = [match.strip("`").split(".")[-1].strip("`").lower() for match in _SQL_TABLE_REFERENCE.findall(sql)]
+    return expand_view_dependencies(names) if names else None
+
+
+def get_cached_answer(question: str) -> Optional[Dict[str, Any]]:
+    entry = _ANSWER_CACHE.get("answer::" + normalize_question(question))
+    return entry["answer"] if entry else None
+
+
+def get_cached_stream(question: str) -> Optional[tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """A cached answer and the continuation of its result past the answer table (None if there is none)."""
+    entry = _ANSWER_CACHE.get("answer::" + normalize_question(question))
+    return (entry["answer"], entry.get("continuation")) if entry else None
+
+
+def answer_conversation(question: str, conversation: Any) -> Dict[str, Any]:
+    """Build the /api/genie/query payload for a completed conversation and cache it for repeats."""
+    answer, sql = parse_genie_answer(
+        question,
+        conversation.conversation_id,
+        conversation.message_id,
+        conversation.message,
+        conversation.query_result,
+    )
+    # Placeholder answers (no table, no usable summary) are not worth repeating
+    if answer.get("table") is not None or not is_poor_summary(answer.get("summary")):
+        entry = {"answer": answer, "tables": referenced_tables(sql)}
+        # Streams of a repeat question read the same chunks as the first one
+        continuation = result_continuation(conversation.query_result) if answer.get("table") else None
+        if continuation is not None:
+            entry["continuation"] = continuation
+        _ANSWER_CACHE.set("answer::" + normalize_question(question), entry)
+    return answer
+
+
+def run_genie_job(
+    base_url: str,
+    headers: Dict[str, str],
+    content: str,
+    priority: int,
+    on_status: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> GenieConversation:
+    """
+    Run one Genie conversation through the job scheduler.
+
+    Time spent queued counts against the job's GENIE_DEADLINE_SECONDS budget.
+
+    Raises:
+        GenieError: Queue full (503), deadline passed (504) or a Genie failure
+    """
+    deadline = time.monotonic() + GENIE_DEADLINE_SECONDS
+    with _GENIE_SCHEDULER.slot(priority, deadline):
+        return run_conversation(
+            base_url, headers, content, api_response, _GENIE_POLL_POLICY, on_status=on_status, deadline=deadline
+        )
 
 
 def run_genie_sql(base_url: str, headers: Dict[str, str], sql: str) -> Optional[Dict[str, Any]]:
-    now = time.time()
-    with _GENIE_CACHE_LOCK:
-        cached = _GENIE_CACHE.get(sql)
-        if cached and now - cached["ts"] < GENIE_CACHE_TTL_SECONDS:
-            return cached["table"]
+    cache_key = sql_cache_key(sql)
+    cached = _GENIE_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
 
-    _GENIE_SEMAPHORE.acquire()
     try:
-        for attempt in range(8):
-            status_code, start_payload = api_request(
-                f"{base_url}/start-conversation", "POST", {"content": sql}, headers
-            )
-            if status_code == 429:
-                time.sleep(2**attempt)
-                continue
-            if status_code != 200:
-                break
-            break
-        else:
-            pass
-
-        conversation_id = start_payload.get("conversation_id")
-        message_id = start_payload.get("message_id")
-        if not conversation_id or not message_id:
-            raise RuntimeError("Genie conversation start failed.")
-
-        message_payload = None
-        for _ in range(40):
-            status_code, message_payload = api_request(
-                f"{base_url}/conversations/{conversation_id}/messages/{message_id}",
-                "GET",
-                None,
-                headers,
-            )
-            if status_code == 429:
-                time.sleep(1)
-                continue
-            if status_code != 200:
-                raise RuntimeError("Genie message polling failed.")
-            status = message_payload.get("status")
-            if status in {"COMPLETED", "FAILED"}:
-                break
-            time.sleep(2)
-
-        if not message_payload or message_payload.get("status") != "COMPLETED":
-            raise RuntimeError("Genie message not completed.")
-
-        status_code, query_result = api_request(
-            f"{base_url}/conversations/{conversation_id}/messages/{message_id}/query-result",
-            "GET",
-            None,
-            headers,
-        )
-        if status_code == 429:
-            time.sleep(1)
-            raise RuntimeError("Genie query result throttled.")
-
-        table = extract_table(query_result)
-        with _GENIE_CACHE_LOCK:
-            _GENIE_CACHE[sql] = {"ts": time.time(), "table": table}
+        conversation = run_genie_job(base_url, headers, sql, BACKGROUND)
+        table = extract_table(conversation.query_result)
+        if table is not None:
+            _GENIE_CACHE.set(cache_key, table)
         return table
     except Exception:
-        with _GENIE_CACHE_LOCK:
-            cached = _GENIE_CACHE.get(sql)
-            if cached:
-                return cached["table"]
-        return None
-    finally:
-        _GENIE_SEMAPHORE.release()
+        # Fall back to the last known result while it is within the stale window
+        return _GENIE_CACHE.get_stale(cache_key)
 
 
-def run_direct_sql(sql: str) -> Optional[Dict[str, Any]]:
+def run_direct_sql(sql: str) -> Optional[ResultTable]:
     """
     Execute SQL query against Databricks SQL Warehouse.
     Uses connection pool if available for better performance.
+    Returns a typed, columnar ResultTable; cells become strings only when
+    payloads are built (table_to_dicts).
     """
+    backend = sql_backend()
+    if backend is None:
+        return None
+
+    cache_key = sql_cache_key(sql)
+    with span("sql-cache"):
+        cached = _SQL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if backend == "local":
+        def execute() -> Optional[ResultTable]:
+            return _execute_local_sql(sql, cache_key)
+    else:
+        host, http_path, token = warehouse_settings()
+
+        def execute() -> Optional[ResultTable]:
+            return _execute_sql(sql, cache_key, host, http_path, token)
+
+    # Concurrent misses for the same statement share one warehouse round-trip
+    return _SQL_FLIGHT.do(cache_key, lambda: observe_statement(sql, backend, execute))
+
+
+def statement_label(sql: str) -> str:
+    """Short, stable metrics label for a SQL statement."""
+    return sql_cache_key(sql)[5:17]
+
+
+def observe_statement(
+    sql: str, backend: str, execute: Callable[[], Optional[ResultTable]]
+) -> Optional[ResultTable]:
+    """Run `execute` and record the statement's latency, row count and outcome."""
+    label = statement_label(sql)
+    if label not in _SQL_STATEMENT_TEXT and len(_SQL_STATEMENT_TEXT) < _SQL_LATENCY.max_series:
+        _SQL_STATEMENT_TEXT[label] = " ".join(sql.split())[:200]
+    started = time.perf_counter()
+    try:
+        with span("sql", statement=label, backend=backend):
+            table = execute()
+    except PoolSaturated:
+        _SQL_STATEMENTS.labels(label, backend, "rejected").inc()
+        raise
+    except Exception:
+        _SQL_STATEMENTS.labels(label, backend, "error").inc()
+        raise
+    _SQL_LATENCY.labels(label, backend).observe(time.perf_counter() - started)
+    _SQL_STATEMENTS.labels(label, backend, "error" if table is None else "ok").inc()
+    if table is not None:
+        _SQL_ROWS.labels(label).inc(table.num_rows)
+    return table
+
+
+def warehouse_settings() -> Optional[Tuple[str, str, str]]:
+    """(host, http_path, token) for the SQL warehouse, or None if the connector or env is missing."""
     if dbsql is None:
         return None
     host = os.getenv("DATABRICKS_HOST")
@@ -379,71 +559,128 @@ def run_direct_sql(sql: str) -> Optional[Dict[str, Any]]:
     token = os.getenv("DATABRICKS_TOKEN_FOR_SQL") or os.getenv("DATABRICKS_TOKEN_FOR_GENIE")
     if not host or not http_path or not token:
         return None
+    return host, http_path, token
+
+
+def sql_backend() -> Optional[str]:
+    """The backend run_direct_sql uses per SQL_BACKEND: "databricks", "local" or None if neither is usable."""
+    if SQL_BACKEND != "local" and warehouse_settings() is not None:
+        return "databricks"
+    if SQL_BACKEND != "databricks" and get_local_engine(LOCAL_DATA_DIR) is not None:
+        return "local"
+    return None
 
-    cache_key = f"sql::{sql}"
-    now = time.time()
-    with _SQL_CACHE_LOCK:
-        cached = _SQL_CACHE.get(cache_key)
-        if cached and now - cached["ts"] < SQL_CACHE_TTL_SECONDS:
-            return cached["table"]
 
-    # Try connection pool first if available
+def _execute_local_sql(sql: str, cache_key: str) -> Optional[ResultTable]:
+    """Run a statement on the embedded engine and store the table in the SQL cache."""
+    with span("sql-exec"):
+        table = get_local_engine(LOCAL_DATA_DIR).execute(sql, raise_if=is_missing_table_error)
+    if table is not None:
+        _SQL_CACHE.set(cache_key, table)
+    return table
+
+
+def _execute_sql(sql: str, cache_key: str, host: str, http_path: str, token: str) -> Optional[ResultTable]:
+    """Run a statement on the warehouse and store the result table in the SQL cache."""
     if _USE_POOL:
+        # A busy pool raises PoolSaturated and a failed statement returns None:
+        # neither is retried on an unpooled connection
+        table = run_sql_with_pool(sql, fetch=fetch_result_table, raise_if=is_missing_table_error)
+    else:
         try:
-            rows = run_sql_with_pool(sql)
-            if rows is not None:
-                if not rows:
-                    table = {"columns": [], "rows": []}
-                else:
-                    # Extract columns from first row
-                    if hasattr(rows[0], 'asDict'):
-                        columns = list(rows[0].asDict().keys())
-                        formatted_rows = [[row.asDict().get(col) for col in columns] for row in rows]
-                    else:
-                        columns = [f"col_{i}" for i in range(len(rows[0]))]
-                        formatted_rows = [list(row) for row in rows]
-                    
-                    table = {
-                        "columns": columns,
-                        "rows": [[None if value is None else str(value) for value in row] for row in formatted_rows],
-                    }
-                
-                with _SQL_CACHE_LOCK:
-                    _SQL_CACHE[cache_key] = {"ts": time.time(), "table": table}
-                return table
+            with span("sql-exec", pooled=False), dbsql.connect(
+                server_hostname=host, http_path=http_path, access_token=token
+            ) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+                    table = fetch_result_table(cursor)
         except Exception as e:
-            logger.warning(f"Pool query failed, falling back to direct connection: {e}")
+            # A missing table lets the caller fall back to the views
+            if is_missing_table_error(e):
+                raise
+            logger.warning(f"SQL execution failed: {e}")
+            return None
+    if table is not None:
+        _SQL_CACHE.set(cache_key, table)
+    return table
 
-    # Fallback to direct connection
-    try:
-        with dbsql.connect(server_hostname=host, http_path=http_path, access_token=token) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(sql)
-                rows = cursor.fetchall() or []
-                columns = [col[0] for col in cursor.description] if cursor.description else []
-        table = {
-            "columns": columns,
-            "rows": [[None if value is None else str(value) for value in row] for row in rows],
-        }
-        with _SQL_CACHE_LOCK:
-            _SQL_CACHE[cache_key] = {"ts": time.time(), "table": table}
-        return table
-    except Exception:
-        return None
 
+def get_cached_dashboard_payload(cache_key: str) -> Optional[EncodedPayload]:
+    return _DASHBOARD_CACHE.get(cache_key)
 
-def get_cached_dashboard_payload(cache_key: str) -> Optional[Dict[str, Any]]:
-    now = time.time()
-    with _DASHBOARD_CACHE_LOCK:
-        cached = _DASHBOARD_CACHE.get(cache_key)
-        if cached and now - cached["ts"] < DASHBOARD_CACHE_TTL_SECONDS:
-            return cached["payload"]
-    return None
 
+def set_cached_dashboard_payload(cache_key: str, encoded: EncodedPayload) -> None:
+    _DASHBOARD_CACHE.set(cache_key, encoded)
 
-def set_cached_dashboard_payload(cache_key: str, payload: Dict[str, Any]) -> None:
-    with _DASHBOARD_CACHE_LOCK:
-        _DASHBOARD_CACHE[cache_key] = {"ts": time.time(), "payload": payload}
+
+def dashboard_representation(cache_key: str, encoded: EncodedPayload, media_type: str) -> EncodedPayload:
+    """
+    The representation of a dashboard payload negotiated for a request.
+
+    Representations are encoded on first request and kept on the cached
+    payload, so the cache entry is re-sized whenever one is added.
+    """
+    nbytes = encoded.nbytes
+    representation = encoded.representation(media_type)
+    if encoded.nbytes != nbytes:
+        _DASHBOARD_CACHE.resize(cache_key, encoded)
+    return representation
+
+
+def dashboard_max_age(cache_key: str) -> int:
+    """Seconds the cached payload for `cache_key` remains fresh (0 if stale or uncached)."""
+    age = _DASHBOARD_CACHE.age(cache_key)
+    if age is None:
+        return 0
+    return max(0, int(DASHBOARD_CACHE_TTL_SECONDS - age))
+
+
+def dashboard_cache_headers(cache_key: str, encoded: EncodedPayload) -> Dict[str, str]:
+    """Validator and freshness headers for a dashboard response."""
+    return {
+        "ETag": encoded.etag,
+        "Cache-Control": f"private, max-age={dashboard_max_age(cache_key)}",
+        # The representation (JSON or columnar) is negotiated on Accept
+        "Vary": "Accept",
+    }
+
+
+def clear_all_caches() -> None:
+    _GENIE_CACHE.clear()
+    _SQL_CACHE.clear()
+    _DASHBOARD_CACHE.clear()
+    _ANSWER_CACHE.clear()
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss/eviction stats and memory usage for every cache namespace."""
+    return {cache.name: cache.get_stats() for cache in (_GENIE_CACHE, _SQL_CACHE, _DASHBOARD_CACHE, _ANSWER_CACHE)}
+
+
+def invalidate_refreshed_tables(tables: Optional[List[str]]) -> int:
+    """
+    Drop cached data derived from refreshed tables.
+
+    SQL, Genie-SQL and dashboard caches are not tracked per table and are
+    cleared. Cached answers are dropped only if they read one of `tables`
+    (directly or through a view) or their tables are unknown; with no
+    `tables` every answer is dropped.
+
+    Returns:
+        Number of answers invalidated
+    """
+    refreshed = expand_view_dependencies(table.lower() for table in tables) if tables else None
+
+    def is_stale(_key: Any, entry: Dict[str, Any]) -> bool:
+        read = entry["tables"]
+        return refreshed is None or read is None or bool(read & refreshed)
+
+    _GENIE_CACHE.clear()
+    _SQL_CACHE.clear()
+    _DASHBOARD_CACHE.clear()
+    dropped = _ANSWER_CACHE.discard_if(is_stale)
+    logger.info(f"Tables refreshed ({', '.join(tables) if tables else 'all'}); invalidated {dropped} cached answers")
+    return dropped
 
 
 def first_missing_table(tables: Dict[str, Optional[Dict[str, Any]]]) -> Optional[str]:
@@ -453,6 +690,182 @@ def first_missing_table(tables: Dict[str, Optional[Dict[str, Any]]]) -> Optional
     return None
 
 
+def run_dashboard_sql(query: Any) -> Optional[Dict[str, Any]]:
+    """
+    Run plain SQL, an AggregateQuery (aggregate tables first, view SQL as
+    fallback) or a ScanPlan (one statement split into {panel: table}).
+    """
+    if isinstance(query, ScanPlan):
+        return query.split(run_direct_sql(query.sql))
+    return _AGGREGATE_ROUTER.run(query, run_direct_sql)
+
+
+def expand_scan_plans(queries: Dict[str, Any], results: FanoutResult) -> FanoutResult:
+    """Report each ScanPlan in `results` as its individual panels."""
+    completed: Dict[str, Optional[Any]] = {}
+    pending: List[str] = []
+    for name, query in queries.items():
+        names = [panel.name for panel in query.panels] if isinstance(query, ScanPlan) else [name]
+        if name in results.pending:
+            pending.extend(names)
+        elif isinstance(query, ScanPlan):
+            tables = results.get(name) or {}
+            completed.update({panel: tables.get(panel) for panel in names})
+        else:
+            completed[name] = results.get(name)
+    return FanoutResult(completed, pending)
+
+
+def run_dashboard_queries(queries: Dict[str, Any]) -> FanoutResult:
+    """
+    Run a dashboard's independent queries in parallel under one deadline.
+    Queries still running at the deadline are reported as pending.
+    """
+    try:
+        results = get_query_fanout().run(queries, run_dashboard_sql, DASHBOARD_QUERY_DEADLINE_SECONDS)
+    except FanoutSaturated as e:
+        # Served like a saturated SQL pool: 503 + Retry-After
+        raise PoolSaturated(str(e), e.retry_after) from e
+    # A shed statement fails the whole dashboard (served as 503) instead of rendering a partial one
+    for error in results.errors.values():
+        if isinstance(error, PoolSaturated):
+            raise error
+    return expand_scan_plans(queries, results)
+
+
+def run_dashboard_variants(
+    aggregate_queries: Dict[str, Any], view_queries: Dict[str, Any]
+) -> Optional[FanoutResult]:
+    """
+    Run a dashboard's queries over the aggregate tables, or its view queries
+    (typically a ScanPlan covering most panels) when an aggregate table is
+    missing. Both batches must yield the same result names. A batch that is
+    only slow or failing is not rerun on the views.
+
+    Returns:
+        FanoutResult, or None when the dashboard's data is unavailable
+    """
+
+    def run_batch(queries: Dict[str, Any]) -> FanoutResult:
+        results = run_dashboard_queries(queries)
+        for error in results.errors.values():
+            # Lets the router fall back to the view batch
+            if is_missing_table_error(error):
+                raise error
+        return results
+
+    results = _AGGREGATE_ROUTER.run(AggregateQuery(aggregate_queries, view_queries), run_batch)
+    return None if dashboard_data_unavailable(results) else results
+
+
+def dashboard_data_unavailable(results: FanoutResult) -> bool:
+    """True when a query failed outright or nothing finished before the deadline."""
+    return not results.completed or first_missing_table(results.completed) is not None
+
+
+def mark_pending_panels(payload: Dict[str, Any], results: FanoutResult) -> Dict[str, Any]:
+    """Flag panels whose queries were still running at the deadline."""
+    if results.pending:
+        payload["pending"] = sorted(results.pending)
+    return payload
+
+
+def load_dashboard_payload(
+    cache_key: str, builder: Callable[[], Optional[Dict[str, Any]]]
+) -> Optional[EncodedPayload]:
+    """
+    Return the cached payload for `cache_key`, rebuilding it on a miss.
+    Stale payloads are served immediately while a background worker rebuilds
+    them. Concurrent misses for the same key wait on a single rebuild.
+    Partial payloads (with pending panels) are served but not cached.
+    Payloads are JSON-encoded and compressed once, when they are built.
+    """
+    cached = lookup_dashboard_payload(cache_key, builder)
+    if cached is not None:
+        return cached
+    return rebuild_dashboard_payload(cache_key, builder)
+
+
+def lookup_dashboard_payload(
+    cache_key: str, builder: Callable[[], Optional[Dict[str, Any]]]
+) -> Optional[EncodedPayload]:
+    """
+    Return the fresh or stale cached payload for `cache_key`, or None on a miss.
+    A stale payload schedules a background rebuild. Counts one cache lookup.
+    """
+    with span("dashboard-cache"):
+        cached, fresh = _DASHBOARD_CACHE.lookup(cache_key)
+    if cached is not None and not fresh:
+        _DASHBOARD_REFRESHER.schedule(cache_key, builder)
+    return cached
+
+
+def rebuild_dashboard_payload(
+    cache_key: str, builder: Callable[[], Optional[Dict[str, Any]]]
+) -> Optional[EncodedPayload]:
+    """Rebuild a missing dashboard payload; concurrent callers share one rebuild."""
+
+    def rebuild() -> Optional[EncodedPayload]:
+        # Another flight may have refreshed the entry while we were queued
+        cached = _DASHBOARD_CACHE.peek(cache_key)
+        if cached is not None:
+            return cached
+        return _build_and_cache_dashboard(cache_key, builder)
+
+    return _DASHBOARD_FLIGHT.do(cache_key, rebuild)
+
+
+def refresh_dashboard_payload(
+    cache_key: str, builder: Callable[[], Optional[Dict[str, Any]]]
+) -> Optional[EncodedPayload]:
+    """Rebuild a dashboard payload unconditionally (background refresh path)."""
+    return _DASHBOARD_FLIGHT.do(cache_key, lambda: _build_and_cache_dashboard(cache_key, builder))
+
+
+def _build_and_cache_dashboard(
+    cache_key: str, builder: Callable[[], Optional[Dict[str, Any]]]
+) -> Optional[EncodedPayload]:
+    with span("build", key=cache_key):
+        payload = builder()
+    if payload is None:
+        return None
+    encoded = EncodedPayload.precompressed(payload)
+    if not payload.get("pending"):
+        set_cached_dashboard_payload(cache_key, encoded)
+    return encoded
+
+
+def get_coalescing_stats() -> Dict[str, Dict[str, int]]:
+    """Single-flight counters for SQL statements and dashboard rebuilds."""
+    return {"sql": _SQL_FLIGHT.get_stats(), "dashboard": _DASHBOARD_FLIGHT.get_stats()}
+
+
+def get_sql_backend_stats() -> Dict[str, Any]:
+    """Which backend serves dashboard SQL, plus the local engine's counters when it is loaded."""
+    stats: Dict[str, Any] = {"configured": SQL_BACKEND, "active": sql_backend()}
+    if stats["active"] == "local":
+        stats["local"] = get_local_engine(LOCAL_DATA_DIR).get_stats()
+    return stats
+
+
+_DASHBOARD_REFRESHER = DashboardRefresher(refresh_dashboard_payload, max_workers=DASHBOARD_REFRESH_WORKERS)
+
+
+def build_cache_stats_payload() -> Dict[str, Any]:
+    """Payload for GET /api/cache/stats."""
+    return {
+        "caches": get_cache_stats(),
+        "coalescing": get_coalescing_stats(),
+        "refresh": _DASHBOARD_REFRESHER.get_stats(),
+        "http_pool": get_http_pool().get_stats(),
+        "genie_latency": get_genie_latency_stats(),
+        "genie_scheduler": _GENIE_SCHEDULER.get_stats(),
+        "aggregates": _AGGREGATE_ROUTER.get_stats(),
+        "fanout": get_query_fanout().get_stats(),
+        "sql_backend": get_sql_backend_stats(),
+    }
+
+
 def build_summary_from_result(question: str, query_result: Optional[Dict[str, Any]]) -> Optional[str]:
     if not query_result:
         return None
@@ -519,54 +932,1016 @@ def is_poor_summary(summary: str) -> bool:
     return False
 
 
-def find_sql(payload: Any) -> Optional[str]:
-    if isinstance(payload, dict):
-        for value in payload.values():
-            sql_text = find_sql(value)
-            if sql_text:
-                return sql_text
-    elif isinstance(payload, list):
-        for item in payload:
-            sql_text = find_sql(item)
-            if sql_text:
-                return sql_text
-    elif isinstance(payload, str) and "select" in payload.lower():
-        return payload
-    return None
+def workspace_url(host: str) -> str:
+    """Base URL for DATABRICKS_HOST, which may carry its own scheme (e.g. http:// for a local stand-in)."""
+    host = host.strip().rstrip("/")
+    return host if "://" in host else f"https://{host}"
 
 
-def extract_sql(message: Dict[str, Any], query_result: Optional[Dict[str, Any]]) -> Optional[str]:
-    candidate = message.get("query") or message.get("sql")
-    if isinstance(candidate, str):
-        return candidate
-    return find_sql(message) or find_sql(query_result or {})
+def genie_context() -> Optional[tuple[str, Dict[str, str]]]:
+    """Genie space base URL and request headers, or None if not configured."""
+    host = os.getenv("DATABRICKS_HOST")
+    token = os.getenv("DATABRICKS_TOKEN_FOR_GENIE")
+    space_id = os.getenv("GENIE_SPACE_ID")
+    if not host or not token or not space_id:
+        return None
+    base_url = f"{workspace_url(host)}/api/2.0/genie/spaces/{space_id}"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    return base_url, headers
+
+
+def parse_genie_answer(
+    question: str,
+    conversation_id: str,
+    message_id: str,
+    message_payload: Dict[str, Any],
+    query_result: Optional[Dict[str, Any]],
+) -> tuple[Dict[str, Any], Optional[str]]:
+    """The /api/genie/query payload and the generated SQL, from one pass over the Genie response."""
+    parsed = parse_genie_response(
+        message_payload,
+        query_result,
+        question=question,
+        blocked_values={conversation_id, message_id},
+    )
+    summary = parsed.summary
+    if is_poor_summary(summary) or parsed.summary_source == "description":
+        fallback = build_summary_from_result(question, query_result)
+        if fallback:
+            summary = fallback
+    table = cap_table(parsed.table, query_result, GENIE_RESULT_MAX_ROWS)
+    return {"summary": summary, "table": table}, parsed.sql
+
+
+def genie_result_reader(base_url: str, headers: Dict[str, str]) -> ResultReader:
+    """Reader for the result chunks of a streamed Genie answer, capped at GENIE_RESULT_MAX_ROWS."""
+    return ResultReader(base_url, headers, GENIE_RESULT_MAX_ROWS, GENIE_STREAM_ROW_CHUNK)
+
+
+def genie_answer_events(
+    answer: Dict[str, Any],
+    query_result: Optional[Dict[str, Any]],
+    context: Optional[tuple[str, Dict[str, str]]],
+    encode: Callable[[str, Any], bytes] = format_sse,
+) -> Any:
+    """
+    answer_events for a fresh or cached answer, reading the rest of its result when there is more.
+
+    Args:
+        answer: Built (or cached) /api/genie/query payload
+        query_result: The Genie query result, or a cached continuation of it
+        context: genie_context(), needed to fetch further chunks
+        encode: format_sse or format_ndjson
+    """
+    reader = genie_result_reader(*context) if query_result is not None and context is not None else None
+    return answer_events(answer, GENIE_STREAM_ROW_CHUNK, encode, reader, query_result)
+
+
+def knowledge_assistant_request(question: str) -> Optional[tuple[str, Dict[str, str], Dict[str, Any]]]:
+    """Endpoint URL, headers and body for a knowledge assistant call, or None if not configured."""
+    host = os.getenv("DATABRICKS_HOST")
+    # Try to get a dedicated token for serving endpoints, fall back to Genie token, then SQL token
+    token = os.getenv("DATABRICKS_TOKEN_FOR_SERVING") or os.getenv("DATABRICKS_TOKEN_FOR_GENIE") or os.getenv("DATABRICKS_TOKEN_FOR_SQL")
+    endpoint_url = os.getenv("KNOWLEDGE_ASSISTANT_ENDPOINT")
+
+    if not host or not token:
+        return None
+
+    # Default to the provided endpoint if not in env
+    if not endpoint_url:
+        endpoint_url = f"{workspace_url(host)}/serving-endpoints/ka-d3d321f4-endpoint/invocations"
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+
+    # Format for agent/v1/responses: requires "input" field with message array
+    request_payload = {
+        "input": [
+            {
+                "role": "user",
+                "content": question
+            }
+        ]
+    }
+    return endpoint_url, headers, request_payload
+
+
+def parse_knowledge_assistant_output(response_data: Dict[str, Any]) -> str:
+    """Extract the answer text from an agent endpoint response."""
+    # Agent endpoints return: {"output": [{"type": "message", "content": [...]}]}
+    output_array = response_data.get("output", [])
+
+    response_text = ""
+    if output_array and len(output_array) > 0:
+        # Extract content from the first output message
+        content_array = output_array[0].get("content", [])
+        # Concatenate all text pieces from content array
+        text_pieces = [item.get("text", "") for item in content_array if item.get("type") == "output_text"]
+        response_text = "".join(text_pieces).strip()
+
+    if not response_text:
+        response_text = "No response from assistant."
+        logger.warning(f"Unexpected response format from agent: {response_data}")
+    return response_text
+
+
+def build_user_payload(headers: Any) -> Dict[str, str]:
+    """Authenticated user information from Databricks App forwarded headers."""
+    # Databricks Apps inject user context via X-Forwarded headers
+    user_email = headers.get("X-Forwarded-Email", "")
+    user_name = headers.get("X-Forwarded-Preferred-Username", "")
+
+    # Fallback to environment or default if headers not present
+    if not user_email:
+        user_email = os.getenv("USER_EMAIL", "executive@discounttire.com")
+    if not user_name:
+        user_name = os.getenv("USER_NAME", "Executive User")
+
+    # Extract first/last name if email format is first.last@domain
+    display_name = user_name
+    if not user_name or user_name == user_email:
+        # Try to derive name from email
+        local_part = user_email.split("@")[0] if "@" in user_email else user_email
+        name_parts = local_part.replace(".", " ").replace("_", " ").title().split()
+        display_name = " ".join(name_parts) if name_parts else "Executive User"
+
+    return {
+        "name": display_name,
+        "email": user_email,
+        "role": "Executive Viewer"
+    }
+
+
+def resolve_static_file(request_path: str) -> Path:
+    """Map a request path to a file in dist/, falling back to index.html for SPA routes."""
+    if request_path == "/" or request_path == "":
+        return DIST_DIR / "index.html"
+    requested = (DIST_DIR / request_path.lstrip("/")).resolve()
+    if DIST_DIR in requested.parents and requested.is_file():
+        return requested
+    return DIST_DIR / "index.html"
+
+
+def build_kpis_payload() -> Optional[Dict[str, Any]]:
+    kpis_query = AggregateQuery(
+        "WITH monthly AS ("
+        "SELECT *, MAX(month) OVER() AS max_month "
+        "FROM kaustavpaul_demo.dtc_demo.agg_monthly_sales"
+        ") "
+        "SELECT "
+        "(SELECT revenue FROM monthly WHERE month = max_month) AS total_revenue, "
+        "(SELECT SUM(satisfaction_sum) / NULLIF(SUM(satisfaction_count), 0) "
+        "FROM kaustavpaul_demo.dtc_demo.agg_regional_satisfaction) AS avg_satisfaction, "
+        "(SELECT tire_units FROM monthly WHERE month = max_month) AS tire_units, "
+        "(SELECT COUNT(*) "
+        "FROM kaustavpaul_demo.dtc_demo.inventory "
+        "WHERE stock_qty <= reorder_threshold) AS low_stock_items, "
+        "(SELECT revenue_growth "
+        "FROM (SELECT *, MAX(month) OVER() AS max_month "
+        "FROM kaustavpaul_demo.dtc_demo.agg_monthly_revenue) t "
+        "WHERE month = max_month) AS revenue_growth, "
+        "(SELECT MAX(max_date) FROM monthly) AS max_date",
+        fallback_sql=(
+            "WITH sales AS ("
+            "SELECT *, MAX(date) OVER() AS max_date "
+            "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched"
+            ") "
+            "SELECT "
+            "(SELECT SUM(CASE "
+            "WHEN date >= date_trunc('month', max_date) "
+            "AND date < add_months(date_trunc('month', max_date), 1) "
+            "THEN total_amount END) FROM sales) AS total_revenue, "
+            "(SELECT AVG(satisfaction_score) FROM sales) AS avg_satisfaction, "
+            "(SELECT SUM(CASE "
+            "WHEN category = 'Tire' "
+            "AND date >= date_trunc('month', max_date) "
+            "AND date < add_months(date_trunc('month', max_date), 1) "
+            "THEN quantity END) FROM sales) AS tire_units, "
+            "(SELECT COUNT(*) "
+            "FROM kaustavpaul_demo.dtc_demo.inventory "
+            "WHERE stock_qty <= reorder_threshold) AS low_stock_items, "
+            "(SELECT revenue_growth "
+            "FROM (SELECT *, MAX(month) OVER() AS max_month "
+            "FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth) t "
+            "WHERE month = max_month) AS revenue_growth, "
+            "(SELECT MAX(max_date) FROM sales) AS max_date"
+        ),
+    )
+    kpis = run_dashboard_sql(kpis_query)
+    if kpis is None:
+        return None
+    payload = {
+        "totalRevenue": parse_float(table_first_value(kpis, "total_revenue")),
+        "revenueGrowth": parse_float(table_first_value(kpis, "revenue_growth")),
+        "avgSatisfaction": parse_float(table_first_value(kpis, "avg_satisfaction")),
+        "tireUnits": parse_float(table_first_value(kpis, "tire_units")),
+        "inventoryRisk": parse_float(table_first_value(kpis, "low_stock_items")),
+        "currentMonthLabel": format_month_label(table_first_value(kpis, "max_date")),
+    }
+    return payload
+
+
+def build_charts_payload() -> Optional[Dict[str, Any]]:
+    revenue_trend_sql = AggregateQuery(
+        "SELECT month, revenue "
+        "FROM (SELECT *, MAX(month) OVER() AS max_month "
+        "FROM kaustavpaul_demo.dtc_demo.agg_monthly_sales) t "
+        "WHERE month >= add_months(max_month, -5) "
+        "ORDER BY month",
+        fallback_sql=(
+            "SELECT date_trunc('month', date) AS month, SUM(total_amount) AS revenue "
+            "FROM (SELECT *, MAX(date) OVER() AS max_date "
+            "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched) s "
+            "WHERE date >= add_months(date_trunc('month', max_date), -5) "
+            "GROUP BY date_trunc('month', date) "
+            "ORDER BY month"
+        ),
+    )
+    top_tires_sql = AggregateQuery(
+        "SELECT product_name AS model, SUM(units) AS units "
+        "FROM kaustavpaul_demo.dtc_demo.agg_category_sales "
+        "WHERE category = 'Tire' "
+        "GROUP BY product_name "
+        "ORDER BY units DESC "
+        "LIMIT 5",
+        fallback_sql=(
+            "SELECT product_name AS model, SUM(quantity) AS units "
+            "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
+            "WHERE category = 'Tire' "
+            "GROUP BY product_name "
+            "ORDER BY units DESC "
+            "LIMIT 5"
+        ),
+    )
+    inventory_health_sql = AggregateQuery(
+        "SELECT store_name AS store, "
+        "SUM(healthy_units) AS healthy, "
+        "SUM(single_unit_sales) AS low, "
+        "SUM(zero_unit_sales) AS critical "
+        "FROM kaustavpaul_demo.dtc_demo.agg_store_sales "
+        "GROUP BY store_name "
+        "ORDER BY store_name",
+        fallback_sql=(
+            "SELECT store_name AS store, "
+            "SUM(CASE WHEN quantity > 1 THEN quantity ELSE 0 END) AS healthy, "
+            "SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END) AS low, "
+            "SUM(CASE WHEN quantity = 0 THEN 1 ELSE 0 END) AS critical "
+            "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
+            "GROUP BY store_name "
+            "ORDER BY store_name"
+        ),
+    )
+    satisfaction_sql = AggregateQuery(
+        "SELECT customer_region AS region, satisfaction_sum / NULLIF(satisfaction_count, 0) AS score "
+        "FROM kaustavpaul_demo.dtc_demo.agg_regional_satisfaction "
+        "ORDER BY score DESC",
+        fallback_sql=(
+            "SELECT customer_region AS region, AVG(satisfaction_score) AS score "
+            "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
+            "GROUP BY customer_region "
+            "ORDER BY score DESC"
+        ),
+    )
+    results = run_dashboard_queries(
+        {
+            "revenue_trend": revenue_trend_sql,
+            "top_tires": top_tires_sql,
+            "inventory_health": inventory_health_sql,
+            "satisfaction": satisfaction_sql,
+        }
+    )
+    if dashboard_data_unavailable(results):
+        return None
+    payload = {
+        "revenueTrend": table_to_dicts(results.get("revenue_trend")),
+        "topTires": table_to_dicts(results.get("top_tires")),
+        "inventoryHealth": table_to_dicts(results.get("inventory_health")),
+        "satisfactionByRegion": table_to_dicts(results.get("satisfaction")),
+    }
+    return mark_pending_panels(payload, results)
+
+
+def finish_revenue_scan(tables: Dict[str, ResultTable]) -> Dict[str, ResultTable]:
+    """Derive the revenue panels that need more than one grouping of the scan."""
+    names = tables["category"].column("category")
+    amounts = [parse_float(amount) for amount in tables["category"].column("amount")]
+    total = sum(amount or 0 for amount in amounts)
+    category = []
+    for name, value in zip(names, amounts):
+        # Generate realistic Service revenue: 15% of total if Service has no/low data
+        if name == "Service" and value is not None and value < 1000:
+            value = total * 0.15
+        category.append([name, value])
+    category.sort(key=lambda row: row[1] or 0, reverse=True)
+    tables["category"] = ResultTable.from_rows(
+        ["category", "amount"], [[name, None if value is None else f"{value:.2f}"] for name, value in category]
+    )
+
+    monthly = {month: parse_float(revenue) or 0 for month, revenue in tables["stats"].iter_rows() if month}
+    latest = max(monthly, default=None)
+    tables["stats"] = one_row_table(
+        {
+            "current_month_revenue": monthly[latest] if latest else None,
+            "ytd_revenue": sum(v for month, v in monthly.items() if str(month)[:4] == str(latest)[:4]) if latest else None,
+        }
+    )
+    return tables
+
+
+def build_revenue_payload() -> Optional[Dict[str, Any]]:
+    monthly_sql = AggregateQuery.from_view(
+        (
+            "SELECT month, revenue, "
+            # Generate realistic target with base + seasonal variation + trend
+            "CAST(("
+            "  CASE "
+            "    WHEN EXTRACT(QUARTER FROM month) = 1 THEN 24500 "
+            "    WHEN EXTRACT(QUARTER FROM month) = 2 THEN 26000 "
+            "    WHEN EXTRACT(QUARTER FROM month) = 3 THEN 27500 "
+            "    WHEN EXTRACT(QUARTER FROM month) = 4 THEN 25500 "
+            "  END "
+            # Add monthly variation based on month number (deterministic but varied)
+            "  + (EXTRACT(MONTH FROM month) * 150) "
+            # Add some sine-wave pattern for realism
+            "  + (CAST(EXTRACT(MONTH FROM month) AS INT) % 3 * 400) "
+            # Small adjustment based on day of month for uniqueness
+            "  - (CAST(EXTRACT(DAY FROM month) AS INT) * 20)"
+            ") AS DECIMAL(10, 2)) AS target, "
+            # Generate realistic last year with different pattern
+            "CAST(("
+            "  revenue * 0.88 "  # Base: 88% of current (12% YoY growth)
+            # Add variation that differs from current year
+            "  + (EXTRACT(MONTH FROM month) * 100) "
+            # Different seasonal pattern than current year
+            "  - (CAST(EXTRACT(MONTH FROM month) AS INT) % 4 * 300) "
+            # Add month-specific variation
+            "  + CASE EXTRACT(MONTH FROM month) "
+            "      WHEN 1 THEN -500 WHEN 2 THEN 200 WHEN 3 THEN -300 "
+            "      WHEN 4 THEN 400 WHEN 5 THEN -100 WHEN 6 THEN 300 "
+            "      WHEN 7 THEN -200 WHEN 8 THEN 500 WHEN 9 THEN 100 "
+            "      WHEN 10 THEN -400 WHEN 11 THEN 200 WHEN 12 THEN 600 "
+            "    END"
+            ") AS DECIMAL(10, 2)) AS last_year "
+            "FROM (SELECT *, MAX(month) OVER() AS max_month "
+            "FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth) t "
+            "WHERE month >= add_months(date_trunc('month', max_month), -5) "
+            "ORDER BY month"
+        ),
+        "vw_revenue_growth",
+        "agg_monthly_revenue",
+    )
+    regional_sql = (
+        "SELECT store_region AS region, quarter, SUM(revenue) AS revenue "
+        "FROM kaustavpaul_demo.dtc_demo.agg_store_sales "
+        "GROUP BY store_region, quarter "
+        "ORDER BY store_region, quarter"
+    )
+    category_sql = (
+        # Get revenue by category, with synthetic Service revenue
+        "WITH base_revenue AS ("
+        "  SELECT category, SUM(revenue) AS amount "
+        "  FROM kaustavpaul_demo.dtc_demo.agg_category_sales "
+        "  GROUP BY category"
+        "), "
+        "total_revenue AS ("
+        "  SELECT SUM(amount) AS total FROM base_revenue"
+        ") "
+        "SELECT "
+        "  b.category, "
+        "  CASE "
+        # Generate realistic Service revenue: 15% of total if Service has no/low data
+        "    WHEN b.category = 'Service' AND b.amount < 1000 "
+        "      THEN CAST((SELECT total * 0.15 FROM total_revenue) AS DECIMAL(10, 2)) "
+        "    ELSE CAST(b.amount AS DECIMAL(10, 2)) "
+        "  END AS amount "
+        "FROM base_revenue b "
+        "ORDER BY amount DESC"
+    )
+    stats_sql = (
+        "SELECT "
+        "SUM(CASE WHEN month = max_month THEN revenue ELSE 0 END) AS current_month_revenue, "
+        "SUM(CASE WHEN month >= date_trunc('year', max_month) THEN revenue ELSE 0 END) AS ytd_revenue "
+        "FROM (SELECT *, MAX(month) OVER() AS max_month "
+        "FROM kaustavpaul_demo.dtc_demo.agg_monthly_sales) t"
+    )
+    quarterly_growth_sql = AggregateQuery.from_view(
+        (
+            "SELECT AVG(revenue_growth) AS quarterly_growth "
+            "FROM (SELECT *, MAX(month) OVER() AS max_month "
+            "FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth) t "
+            "WHERE month >= date_trunc('quarter', max_month)"
+        ),
+        "vw_revenue_growth",
+        "agg_monthly_revenue",
+    )
+    top_region_sql = (
+        "SELECT store_region AS region, SUM(revenue) AS revenue "
+        "FROM kaustavpaul_demo.dtc_demo.agg_store_sales "
+        "GROUP BY store_region "
+        "ORDER BY revenue DESC "
+        "LIMIT 1"
+    )
+    current_month_sql = "SELECT MAX(max_date) AS max_date FROM kaustavpaul_demo.dtc_demo.agg_monthly_sales"
+    # Without aggregate tables, everything read from vw_sales_enriched comes from one scan
+    sales_scan = ScanPlan(
+        "kaustavpaul_demo.dtc_demo.vw_sales_enriched",
+        dimensions={
+            "month": "date_trunc('month', date)",
+            "quarter": "quarter(date)",
+            "store_region": "store_region",
+            "category": "category",
+        },
+        measures={"revenue": "SUM(total_amount)", "max_date": "MAX(date)"},
+        panels=[
+            Panel(
+                "regional",
+                ["store_region", "quarter"],
+                {"region": "store_region", "quarter": "quarter", "revenue": "revenue"},
+                order_by=[("region", False), ("quarter", False)],
+            ),
+            Panel("category", ["category"], {"category": "category", "amount": "revenue"}),
+            Panel("stats", ["month"], {"month": "month", "revenue": "revenue"}),
+            Panel(
+                "top_region",
+                ["store_region"],
+                {"region": "store_region", "revenue": "revenue"},
+                order_by=[("revenue", True)],
+                limit=1,
+            ),
+            Panel("current_month", [], {"max_date": "max_date"}),
+        ],
+        finish=finish_revenue_scan,
+    )
+    results = run_dashboard_variants(
+        {
+            "monthly": monthly_sql.sql,
+            "regional": regional_sql,
+            "category": category_sql,
+            "stats": stats_sql,
+            "quarterly_growth": quarterly_growth_sql.sql,
+            "top_region": top_region_sql,
+            "current_month": current_month_sql,
+        },
+        {
+            "monthly": monthly_sql.fallback_sql,
+            "quarterly_growth": quarterly_growth_sql.fallback_sql,
+            "sales_scan": sales_scan,
+        },
+    )
+    if results is None:
+        return None
+    stats_row = table_to_dicts(results.get("stats"))
+    top_region_row = table_to_dicts(results.get("top_region"))
+    payload = {
+        "monthly": table_to_dicts(results.get("monthly")),
+        "regional": table_to_dicts(results.get("regional")),
+        "category": table_to_dicts(results.get("category")),
+        "currentMonthLabel": format_month_label(table_first_value(results.get("current_month"), "max_date")),
+        "stats": {
+            "currentMonthRevenue": parse_float(stats_row[0].get("current_month_revenue")) if stats_row else None,
+            "ytdRevenue": parse_float(stats_row[0].get("ytd_revenue")) if stats_row else None,
+            "quarterlyGrowth": parse_float(table_first_value(results.get("quarterly_growth"), "quarterly_growth")),
+            "topRegion": top_region_row[0].get("region") if top_region_row else None,
+        },
+    }
+    return mark_pending_panels(payload, results)
+
+
+def finish_operations_scan(tables: Dict[str, ResultTable]) -> Dict[str, ResultTable]:
+    """Express each store's revenue as a percentage of the best store's."""
+    performance = tables["store_performance"]
+    revenues = [parse_float(revenue) for revenue in performance.column("revenue")]
+    max_revenue = max((revenue for revenue in revenues if revenue is not None), default=None)
+    efficiency = [
+        float(round(100 * revenue / max_revenue)) if revenue is not None and max_revenue else None for revenue in revenues
+    ]
+    scores = [parse_float(score) for score in performance.column("satisfaction")]
+    tables["store_performance"] = ResultTable(
+        ["store", "efficiency", "satisfaction", "throughput"],
+        [
+            performance.column("store"),
+            efficiency,
+            [None if score is None else round(score, 1) for score in scores],
+            performance.column("throughput"),
+        ],
+        performance.num_rows,
+    )
+    return tables
+
+
+def build_operations_payload() -> Optional[Dict[str, Any]]:
+    inventory_by_store_sql = (
+        "SELECT store_name AS store, "
+        "SUM(units) AS available, "
+        "0 AS reserved, "
+        "SUM(single_unit_sales) AS low_stock "
+        "FROM kaustavpaul_demo.dtc_demo.agg_store_sales "
+        "GROUP BY store_name "
+        "ORDER BY store_name"
+    )
+    turnover_sql = (
+        "SELECT month, units AS turnover "
+        "FROM kaustavpaul_demo.dtc_demo.agg_monthly_sales "
+        "ORDER BY month"
+    )
+    critical_items_sql = (
+        "SELECT product_name AS item, SUM(units) AS current_stock, "
+        "10 AS reorder_point, "
+        "CASE WHEN SUM(units) <= 5 THEN 'Critical' ELSE 'Low' END AS status "
+        "FROM kaustavpaul_demo.dtc_demo.agg_category_sales "
+        "GROUP BY product_name "
+        "ORDER BY SUM(units) ASC "
+        "LIMIT 10"
+    )
+    store_performance_sql = (
+        "SELECT store_name AS store, "
+        "ROUND(100 * revenue / max_revenue, 0) AS efficiency, "
+        "ROUND(avg_satisfaction, 1) AS satisfaction, "
+        "units AS throughput "
+        "FROM ("
+        "SELECT store_name, "
+        "SUM(revenue) AS revenue, "
+        "SUM(units) AS units, "
+        "SUM(satisfaction_sum) / NULLIF(SUM(satisfaction_count), 0) AS avg_satisfaction, "
+        "MAX(SUM(revenue)) OVER() AS max_revenue "
+        "FROM kaustavpaul_demo.dtc_demo.agg_store_sales "
+        "GROUP BY store_name"
+        ") t"
+    )
+    metrics_sql = (
+        "SELECT "
+        "SUM(units) AS total_units, "
+        "SUM(single_unit_sales) AS critical_items, "
+        "COUNT(DISTINCT store_id) AS active_stores "
+        "FROM kaustavpaul_demo.dtc_demo.agg_store_sales"
+    )
+    # Without aggregate tables, every panel comes from one scan of vw_sales_enriched
+    sales_scan = ScanPlan(
+        "kaustavpaul_demo.dtc_demo.vw_sales_enriched",
+        dimensions={"month": "date_trunc('month', date)", "store_name": "store_name", "product_name": "product_name"},
+        measures={
+            "units": "SUM(quantity)",
+            "single_unit_sales": "SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END)",
+            "revenue": "SUM(total_amount)",
+            "avg_satisfaction": "AVG(satisfaction_score)",
+            "active_stores": "COUNT(DISTINCT store_id)",
+            "reserved": "0",
+            "reorder_point": "10",
+            "stock_status": "CASE WHEN SUM(quantity) <= 5 THEN 'Critical' ELSE 'Low' END",
+        },
+        panels=[
+            Panel(
+                "inventory_by_store",
+                ["store_name"],
+                {"store": "store_name", "available": "units", "reserved": "reserved", "low_stock": "single_unit_sales"},
+                order_by=[("store", False)],
+            ),
+            Panel("turnover", ["month"], {"month": "month", "turnover": "units"}, order_by=[("month", False)]),
+            Panel(
+                "critical_items",
+                ["product_name"],
+                {"item": "product_name", "current_stock": "units", "reorder_point": "reorder_point", "status": "stock_status"},
+                order_by=[("current_stock", False)],
+                limit=10,
+            ),
+            Panel(
+                "store_performance",
+                ["store_name"],
+                {"store": "store_name", "revenue": "revenue", "satisfaction": "avg_satisfaction", "throughput": "units"},
+            ),
+            Panel(
+                "metrics",
+                [],
+                {"total_units": "units", "critical_items": "single_unit_sales", "active_stores": "active_stores"},
+            ),
+        ],
+        finish=finish_operations_scan,
+    )
+    results = run_dashboard_variants(
+        {
+            "inventory_by_store": inventory_by_store_sql,
+            "turnover": turnover_sql,
+            "critical_items": critical_items_sql,
+            "store_performance": store_performance_sql,
+            "metrics": metrics_sql,
+        },
+        {"sales_scan": sales_scan},
+    )
+    if results is None:
+        return None
+    metrics_row = table_to_dicts(results.get("metrics"))
+    payload = {
+        "inventoryByStore": table_to_dicts(results.get("inventory_by_store")),
+        "stockTurnover": table_to_dicts(results.get("turnover")),
+        "criticalItems": table_to_dicts(results.get("critical_items")),
+        "storePerformance": table_to_dicts(results.get("store_performance")),
+        "metrics": metrics_row[0] if metrics_row else {},
+    }
+    return mark_pending_panels(payload, results)
+
+
+def finish_customers_scan(tables: Dict[str, ResultTable]) -> Dict[str, ResultTable]:
+    """Default the active feedback count to 0 when no Service sales were scanned."""
+    if not tables["active_feedback"].num_rows:
+        tables["active_feedback"] = one_row_table({"active_feedback": 0})
+    return tables
+
+
+def build_customers_payload() -> Optional[Dict[str, Any]]:
+    satisfaction_trend_sql = (
+        "SELECT month, "
+        "satisfaction_sum / NULLIF(satisfaction_count, 0) AS score, "
+        "sales_count AS responses "
+        "FROM kaustavpaul_demo.dtc_demo.agg_monthly_sales "
+        "ORDER BY month"
+    )
+    regional_satisfaction_sql = (
+        "SELECT customer_region AS region, "
+        "satisfaction_sum / NULLIF(satisfaction_count, 0) AS score, "
+        "sales_count AS surveys "
+        "FROM kaustavpaul_demo.dtc_demo.agg_regional_satisfaction "
+        "ORDER BY score DESC"
+    )
+    service_breakdown_sql = (
+        "SELECT product_name AS name, SUM(sales_count) AS value "
+        "FROM kaustavpaul_demo.dtc_demo.agg_category_sales "
+        "WHERE category = 'Service' "
+        "GROUP BY product_name "
+        "ORDER BY value DESC"
+    )
+    nps_breakdown_sql = "SELECT category, count FROM kaustavpaul_demo.dtc_demo.agg_nps_buckets"
+    feedback_topics_sql = (
+        "SELECT category AS topic, "
+        "CASE "
+        "  WHEN category = 'Tire' THEN 'positive' "
+        "  WHEN category = 'Service' AND avg_satisfaction >= 4.0 THEN 'neutral' "
+        "  WHEN category = 'Service' THEN 'negative' "
+        "  WHEN category = 'Wheel' AND avg_satisfaction >= 4.3 THEN 'positive' "
+        "  WHEN category = 'Wheel' THEN 'neutral' "
+        "  WHEN category = 'Accessory' THEN 'neutral' "
+        "  WHEN avg_satisfaction >= 4.5 THEN 'positive' "
+        "  ELSE 'neutral' "
+        "END AS sentiment, "
+        "mentions "
+        "FROM (SELECT category, "
+        "SUM(satisfaction_sum) / NULLIF(SUM(satisfaction_count), 0) AS avg_satisfaction, "
+        "SUM(sales_count) AS mentions "
+        "FROM kaustavpaul_demo.dtc_demo.agg_category_sales "
+        "GROUP BY category) t"
+    )
+    metrics_sql = (
+        "SELECT "
+        "SUM(satisfaction_sum) / NULLIF(SUM(satisfaction_count), 0) AS overall_satisfaction, "
+        "SUM(sales_count) AS total_surveys "
+        "FROM kaustavpaul_demo.dtc_demo.agg_regional_satisfaction"
+    )
+    repeat_rate_sql = (
+        "SELECT "
+        "COUNT(DISTINCT CASE WHEN sales_per_customer > 1 THEN customer_id END) * 1.0 "
+        "/ COUNT(DISTINCT customer_id) AS repeat_rate "
+        "FROM (SELECT customer_id, COUNT(*) AS sales_per_customer "
+        "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
+        "GROUP BY customer_id) t"
+    )
+    active_feedback_sql = (
+        "SELECT COALESCE(SUM(sales_count), 0) AS active_feedback "
+        "FROM kaustavpaul_demo.dtc_demo.agg_category_sales "
+        "WHERE category = 'Service'"
+    )
+    # Without aggregate tables, every other panel comes from one scan of vw_sales_enriched;
+    # the repeat rate stays a nested aggregate so the scan never groups by customer
+    sales_scan = ScanPlan(
+        "kaustavpaul_demo.dtc_demo.vw_sales_enriched",
+        dimensions={
+            "month": "date_trunc('month', date)",
+            "customer_region": "customer_region",
+            "category": "category",
+            "product_name": "product_name",
+            "nps_category": (
+                "CASE WHEN satisfaction_score >= 4.5 THEN 'Promoter' "
+                "WHEN satisfaction_score >= 4.0 THEN 'Passive' "
+                "ELSE 'Detractor' END"
+            ),
+        },
+        measures={
+            "avg_satisfaction": "AVG(satisfaction_score)",
+            "sales_count": "COUNT(*)",
+            "sentiment": (
+                "CASE "
+                # Tire: Always positive (high satisfaction)
+                "  WHEN category = 'Tire' THEN 'positive' "
+                # Service: Neutral to slightly negative (only 1 negative allowed)
+                "  WHEN category = 'Service' AND AVG(satisfaction_score) >= 4.0 THEN 'neutral' "
+                "  WHEN category = 'Service' THEN 'negative' "
+                # Wheel: Positive if high satisfaction, neutral otherwise
+                "  WHEN category = 'Wheel' AND AVG(satisfaction_score) >= 4.3 THEN 'positive' "
+                "  WHEN category = 'Wheel' THEN 'neutral' "
+                # Accessory: Neutral
+                "  WHEN category = 'Accessory' THEN 'neutral' "
+                # Default: positive for high scores, neutral otherwise
+                "  WHEN AVG(satisfaction_score) >= 4.5 THEN 'positive' "
+                "  ELSE 'neutral' "
+                "END"
+            ),
+        },
+        panels=[
+            Panel(
+                "satisfaction_trend",
+                ["month"],
+                {"month": "month", "score": "avg_satisfaction", "responses": "sales_count"},
+                order_by=[("month", False)],
+            ),
+            Panel(
+                "regional_satisfaction",
+                ["customer_region"],
+                {"region": "customer_region", "score": "avg_satisfaction", "surveys": "sales_count"},
+                order_by=[("score", True)],
+            ),
+            Panel(
+                "service_breakdown",
+                ["category", "product_name"],
+                {"name": "product_name", "value": "sales_count"},
+                where={"category": "Service"},
+                order_by=[("value", True)],
+            ),
+            Panel("nps_breakdown", ["nps_category"], {"category": "nps_category", "count": "sales_count"}),
+            Panel(
+                "feedback_topics",
+                ["category"],
+                {"topic": "category", "sentiment": "sentiment", "mentions": "sales_count"},
+            ),
+            Panel("metrics", [], {"overall_satisfaction": "avg_satisfaction", "total_surveys": "sales_count"}),
+            Panel(
+                "active_feedback",
+                ["category"],
+                {"active_feedback": "sales_count"},
+                where={"category": "Service"},
+            ),
+        ],
+        finish=finish_customers_scan,
+    )
+    results = run_dashboard_variants(
+        {
+            "satisfaction_trend": satisfaction_trend_sql,
+            "regional_satisfaction": regional_satisfaction_sql,
+            "service_breakdown": service_breakdown_sql,
+            "nps_breakdown": nps_breakdown_sql,
+            "feedback_topics": feedback_topics_sql,
+            "metrics": metrics_sql,
+            "repeat_rate": repeat_rate_sql,
+            "active_feedback": active_feedback_sql,
+        },
+        {"sales_scan": sales_scan, "repeat_rate": repeat_rate_sql},
+    )
+    if results is None:
+        return None
+    metrics_row = table_to_dicts(results.get("metrics"))
+    payload = {
+        "satisfactionTrend": table_to_dicts(results.get("satisfaction_trend")),
+        "regionalSatisfaction": table_to_dicts(results.get("regional_satisfaction")),
+        "serviceBreakdown": table_to_dicts(results.get("service_breakdown")),
+        "npsBreakdown": table_to_dicts(results.get("nps_breakdown")),
+        "feedbackTopics": table_to_dicts(results.get("feedback_topics")),
+        "metrics": {
+            "overallSatisfaction": parse_float(metrics_row[0].get("overall_satisfaction")) if metrics_row else None,
+            "totalSurveys": parse_float(metrics_row[0].get("total_surveys")) if metrics_row else None,
+            "repeatRate": parse_float(table_first_value(results.get("repeat_rate"), "repeat_rate")),
+            "activeFeedback": parse_float(table_first_value(results.get("active_feedback"), "active_feedback")),
+        },
+    }
+    return mark_pending_panels(payload, results)
+
+
+def build_map_payload() -> Optional[Dict[str, Any]]:
+    store_locations_template = (
+        "WITH sales_rollup AS ({sales_rollup}) "
+        "SELECT st.store_id, st.store_name, st.region AS store_region, st.state, "
+        "COALESCE(sr.revenue, 0) AS revenue, COALESCE(sr.units, 0) AS units, "
+        "CASE st.state "
+        "WHEN 'AZ' THEN 33.4484 WHEN 'TX' THEN 30.2672 WHEN 'CA' THEN 34.0522 "
+        "WHEN 'CO' THEN 39.7392 WHEN 'FL' THEN 27.9944 WHEN 'GA' THEN 33.7490 "
+        "WHEN 'NC' THEN 35.7796 WHEN 'TN' THEN 36.1627 WHEN 'IL' THEN 41.8781 "
+        "WHEN 'OH' THEN 39.9612 ELSE 39.8283 END AS latitude, "
+        "CASE st.state "
+        "WHEN 'AZ' THEN -112.0740 WHEN 'TX' THEN -97.7431 WHEN 'CA' THEN -118.2437 "
+        "WHEN 'CO' THEN -104.9903 WHEN 'FL' THEN -81.7603 WHEN 'GA' THEN -84.3880 "
+        "WHEN 'NC' THEN -78.6382 WHEN 'TN' THEN -86.7816 WHEN 'IL' THEN -87.6298 "
+        "WHEN 'OH' THEN -82.9988 ELSE -98.5795 END AS longitude "
+        "FROM kaustavpaul_demo.dtc_demo.stores st "
+        "LEFT JOIN sales_rollup sr ON st.store_id = sr.store_id "
+        "LIMIT 20"
+    )
+    store_locations_query = AggregateQuery(
+        store_locations_template.format(
+            sales_rollup="SELECT store_id, SUM(revenue) AS revenue, SUM(units) AS units "
+            "FROM kaustavpaul_demo.dtc_demo.agg_store_sales "
+            "GROUP BY store_id"
+        ),
+        fallback_sql=store_locations_template.format(
+            sales_rollup="SELECT store_id, SUM(total_amount) AS revenue, SUM(quantity) AS units "
+            "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
+            "GROUP BY store_id"
+        ),
+    )
+    locations = run_dashboard_sql(store_locations_query)
+    if locations is None:
+        return None
+    payload = {"locations": table_to_dicts(locations)}
+    return payload
+
+
+DASHBOARD_ROUTES = {
+    "/api/dashboard/kpis": ("dashboard:kpis", build_kpis_payload),
+    "/api/dashboard/charts": ("dashboard:charts", build_charts_payload),
+    "/api/dashboard/revenue": ("dashboard:revenue", build_revenue_payload),
+    "/api/dashboard/operations": ("dashboard:operations", build_operations_payload),
+    "/api/dashboard/customers": ("dashboard:customers", build_customers_payload),
+    "/api/dashboard/map": ("dashboard:map", build_map_payload),
+}
+
+# Routes reported by name in request metrics; anything else is grouped
+API_ROUTES = set(DASHBOARD_ROUTES) | {
+    "/api/user",
+    "/api/metrics",
+    "/api/cache/clear",
+    "/api/cache/stats",
+    "/api/cache/invalidate",
+    "/api/genie/query",
+    "/api/genie/stream",
+    "/api/knowledge-assistant",
+}
+
+
+def route_label(path: str) -> str:
+    """Bounded route label for request metrics."""
+    path = path.split("?", 1)[0]
+    if path in API_ROUTES:
+        return path
+    return "/api/other" if path.startswith("/api/") else "static"
+
+
+def observe_request(method: str, path: str, status: int, seconds: float) -> None:
+    """Record one served request."""
+    route = route_label(path)
+    _HTTP_REQUESTS.labels(method, route, status).inc()
+    _HTTP_LATENCY.labels(method, route).observe(seconds)
+
+
+def build_metrics_text() -> str:
+    """Body for GET /api/metrics (Prometheus text format)."""
+    metrics = Exposition()
+    metrics.samples(
+        "dtc_http_requests_total", "counter", "Requests served by method, route and status.",
+        ((labels, counter.value) for labels, counter in _HTTP_REQUESTS.series()),
+    )
+    metrics.histograms(
+        "dtc_http_request_duration_seconds", "Time to handle a request, by method and route.",
+        ((labels, histogram.snapshot()) for labels, histogram in _HTTP_LATENCY.series()),
+    )
+
+    metrics.samples(
+        "dtc_sql_statements_total", "counter", "SQL statements executed (cache misses) by outcome.",
+        ((labels, counter.value) for labels, counter in _SQL_STATEMENTS.series()),
+    )
+    metrics.histograms(
+        "dtc_sql_statement_duration_seconds", "SQL statement execution time.",
+        ((labels, histogram.snapshot()) for labels, histogram in _SQL_LATENCY.series()),
+    )
+    metrics.samples(
+        "dtc_sql_rows_total", "counter", "Rows returned by SQL statements.",
+        ((labels, counter.value) for labels, counter in _SQL_ROWS.series()),
+    )
+    metrics.samples(
+        "dtc_sql_statement_info", "gauge", "Text of each statement label (whitespace collapsed, truncated).",
+        (({"statement": label, "sql": text}, 1) for label, text in list(_SQL_STATEMENT_TEXT.items())),
+    )
+
+    caches = get_cache_stats()
+    for name, kind, help_text, value in (
+        ("dtc_cache_hit_ratio", "gauge", "Fresh and stale hits over lookups.", lambda stats: stats["hit_ratio"]),
+        ("dtc_cache_hits_total", "counter", "Cache hits, fresh or stale.", lambda stats: stats["hits"] + stats["stale_hits"]),
+        ("dtc_cache_misses_total", "counter", "Cache misses.", lambda stats: stats["misses"]),
+        ("dtc_cache_evictions_total", "counter", "Entries evicted for the memory budget.", lambda stats: stats["evictions"]),
+        ("dtc_cache_bytes", "gauge", "Estimated bytes held.", lambda stats: stats["bytes"]),
+        ("dtc_cache_entries", "gauge", "Entries held.", lambda stats: stats["entries"]),
+    ):
+        metrics.samples(name, kind, help_text, (({"cache": cache}, value(stats)) for cache, stats in caches.items()))
+
+    pool = get_sql_pool_status() if _USE_POOL else None
+    if pool is not None:
+        for field in ("pool_size", "open", "available", "in_use", "waiting"):
+            metrics.samples(f"dtc_sql_pool_{field}", "gauge", f"SQL warehouse connection pool {field}.", [({}, pool[field])])
+        metrics.samples(
+            "dtc_sql_pool_rejected_total", "counter", "Checkouts shed with a full wait queue or after waiting too long.",
+            [({"reason": "queue_full"}, pool["rejected"]), ({"reason": "timeout"}, pool["timeouts"])],
+        )
+        metrics.histograms("dtc_sql_pool_wait_seconds", "Time spent waiting for a pooled SQL connection.", [({}, pool["wait_seconds"])])
+
+    genie = get_genie_latency_stats()
+    metrics.histograms(
+        "dtc_genie_phase_duration_seconds", "Genie call latency by phase.",
+        (({"phase": phase}, stats) for phase, stats in genie.items()),
+    )
+    metrics.samples(
+        "dtc_genie_throttled_total", "counter", "Genie calls answered with 429, by phase.",
+        (({"phase": phase}, stats["throttled"]) for phase, stats in genie.items()),
+    )
+    scheduler = _GENIE_SCHEDULER.get_stats()
+    metrics.histograms(
+        "dtc_genie_queue_wait_seconds", "Time Genie jobs waited for admission, by priority.",
+        (({"priority": priority}, stats) for priority, stats in scheduler["wait_seconds"].items()),
+    )
+    metrics.samples(
+        "dtc_genie_queue_depth", "gauge", "Genie jobs waiting for admission, by priority.",
+        (({"priority": priority}, depth) for priority, depth in scheduler["queue_depth"].items()),
+    )
+    metrics.samples("dtc_genie_running", "gauge", "Genie conversations in progress.", [({}, scheduler["running"])])
+    metrics.samples("dtc_genie_rejected_total", "counter", "Genie jobs rejected with a full queue.", [({}, scheduler["rejected"])])
+    return metrics.render()
+
+
+def request_trace(method: str, path: str, request_id: Optional[str] = None) -> ContextManager[Trace]:
+    """Trace one request (context manager yielding the Trace), keeping the client's X-Request-ID if valid."""
+    return trace_request(f"{method} {route_label(path)}", request_id, sink=_TRACE_SINK)
+
+
+def trace_response_headers(trace: Optional[Trace]) -> List[Tuple[str, str]]:
+    """X-Request-ID and Server-Timing headers for a traced response."""
+    return response_headers(trace, server_timing=SERVER_TIMING_ENABLED)
 
 
 class AppHandler(BaseHTTPRequestHandler):
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        # Remembered for request metrics and the trace record
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self) -> None:
+        # Server-Timing covers the work done before the headers went out
+        for name, value in trace_response_headers(current_trace()):
+            self.send_header(name, value)
+        super().end_headers()
+
+    def _observed(self, method: str, route: Callable[[], None]) -> None:
+        """Serve one request with `route`, recording its latency and status and tracing it."""
+        self._status = 500
+        started = time.perf_counter()
+        with request_trace(method, self.path, self.headers.get("X-Request-ID")) as trace:
+            try:
+                route()
+            finally:
+                trace.status = self._status
+                observe_request(method, self.path, self._status, time.perf_counter() - started)
+
     def _send_json(self, status: int, payload: dict) -> None:
-        """Send JSON response with optional gzip compression."""
-        body = json.dumps(payload).encode("utf-8")
-        
-        # Enable compression for responses > 1KB if client supports it
-        accept_encoding = self.headers.get("Accept-Encoding", "")
-        should_compress = "gzip" in accept_encoding and len(body) > 1024
-        
-        if should_compress:
-            compressed_body = gzip.compress(body, compresslevel=6)
-            self.send_response(status)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Content-Encoding", "gzip")
-            self.send_header("Content-Length", str(len(compressed_body)))
+        """Send JSON response with optional gzip/brotli compression."""
+        self._send_encoded(status, EncodedPayload(payload))
+
+    def _send_encoded(
+        self, status: int, encoded: EncodedPayload, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Send a pre-encoded body, picking the variant matching Accept-Encoding."""
+        encoding, body = encoded.select(self.headers.get("Accept-Encoding", ""))
+        self.send_response(status)
+        self.send_header("Content-Type", encoded.content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        if encoded.compressible:
             self.send_header("Vary", "Accept-Encoding")
-            self.end_headers()
-            self.wfile.write(compressed_body)
-            logger.debug(f"Compressed response: {len(body)} -> {len(compressed_body)} bytes ({100 * len(compressed_body) / len(body):.1f}%)")
-        else:
-            self.send_response(status)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Content-Length", str(len(body)))
-            self.end_headers()
-            self.wfile.write(body)
+        self.end_headers()
+        self.wfile.write(body)
+        if encoding:
+            logger.debug(f"Compressed response ({encoding}): {len(encoded.body)} -> {len(body)} bytes ({100 * len(body) / len(encoded.body):.1f}%)")
+
+    def _serve_dashboard(
+        self, cache_key: str, builder: Callable[[], Optional[Dict[str, Any]]], label: str
+    ) -> None:
+        try:
+            encoded = load_dashboard_payload(cache_key, builder)
+            if encoded is None:
+                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
+                return
+            encoded = dashboard_representation(cache_key, encoded, negotiate_media_type(self.headers.get("Accept")))
+            cache_headers = dashboard_cache_headers(cache_key, encoded)
+            if etag_matches(self.headers.get("If-None-Match"), encoded.etag):
+                self.send_response(304)
+                for name, value in cache_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return
+            self._send_encoded(200, encoded, cache_headers)
+        except PoolSaturated as e:
+            logger.warning(f"Shedding {label} request: {e}")
+            self._send_encoded(503, EncodedPayload(SATURATED_PAYLOAD), {"Retry-After": str(e.retry_after)})
+        except Exception:  # pragma: no cover
+            logger.exception(f"Unhandled error in {label} handler.")
+            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
 
     def _send_file(self, file_path: Path) -> None:
         if not file_path.exists():
@@ -583,9 +1958,18 @@ class AppHandler(BaseHTTPRequestHandler):
         self.wfile.write(data)
 
     def do_POST(self) -> None:
+        self._observed("POST", self._route_post)
+
+    def _route_post(self) -> None:
         if self.path == "/api/knowledge-assistant":
             self._handle_knowledge_assistant()
             return
+        if self.path == "/api/genie/stream":
+            self._handle_genie_stream()
+            return
+        if self.path == "/api/cache/invalidate":
+            self._handle_cache_invalidate()
+            return
         if self.path != "/api/genie/query":
             self._send_json(404, {"error": "Not found"})
             return
@@ -598,73 +1982,113 @@ class AppHandler(BaseHTTPRequestHandler):
                 self._send_json(400, {"error": "Question cannot be empty."})
                 return
 
-            host = os.getenv("DATABRICKS_HOST")
-            token = os.getenv("DATABRICKS_TOKEN_FOR_GENIE")
-            space_id = os.getenv("GENIE_SPACE_ID")
-            if not host or not token or not space_id:
-                self._send_json(500, {"error": "Missing Genie configuration env vars."})
+            ndjson = wants_ndjson(self.headers.get("Accept"))
+            cached = get_cached_stream(question)
+            if cached is not None:
+                answer, continuation = cached
+                if ndjson:
+                    events = genie_answer_events(answer, continuation, genie_context(), format_ndjson)
+                    self._send_ndjson(events, {"X-Answer-Cache": "hit"})
+                    return
+                self._send_encoded(200, EncodedPayload(answer), {"X-Answer-Cache": "hit"})
                 return
 
-            base_url = f"https://{host}/api/2.0/genie/spaces/{space_id}"
-            headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+            context = genie_context()
+            if context is None:
+                self._send_json(500, {"error": "Missing Genie configuration env vars."})
+                return
+            base_url, headers = context
 
-            status_code, start_payload = api_request(
-                f"{base_url}/start-conversation", "POST", {"content": question}, headers
-            )
-            if status_code != 200:
-                self._send_json(status_code, {"error": "Failed to start Genie conversation."})
+            try:
+                conversation = run_genie_job(base_url, headers, question, INTERACTIVE)
+            except GenieError as exc:
+                self._send_json(exc.status_code, {"error": str(exc)})
                 return
 
-            conversation_id = start_payload.get("conversation_id")
-            message_id = start_payload.get("message_id")
-            if not conversation_id or not message_id:
-                self._send_json(500, {"error": "Invalid response from Genie."})
+            answer = answer_conversation(question, conversation)
+            if ndjson:
+                self._send_ndjson(genie_answer_events(answer, conversation.query_result, context, format_ndjson))
                 return
+            self._send_json(200, answer)
+        except Exception:  # pragma: no cover
+            logger.exception("Unhandled error processing Genie query.")
+            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
 
-            message_payload = None
-            for _ in range(40):
-                status_code, message_payload = api_request(
-                    f"{base_url}/conversations/{conversation_id}/messages/{message_id}",
-                    "GET",
-                    None,
-                    headers,
-                )
-                if status_code != 200:
-                    self._send_json(status_code, {"error": "Failed to poll Genie status."})
-                    return
-                status = message_payload.get("status")
-                if status in {"COMPLETED", "FAILED"}:
-                    break
-                time.sleep(2)
+    def _send_ndjson(self, events: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """Stream answer_events as NDJSON, fetching later result chunks as they are written."""
+        self.send_response(200)
+        for name, value in {**NDJSON_HEADERS, **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
 
-            if not message_payload or message_payload.get("status") != "COMPLETED":
-                self._send_json(500, {"error": "Genie query failed."})
-                return
+        def emit(line: bytes) -> None:
+            self.wfile.write(line)
+            self.wfile.flush()
 
-            _, query_result = api_request(
-                f"{base_url}/conversations/{conversation_id}/messages/{message_id}/query-result",
-                "GET",
-                None,
-                headers,
-            )
+        try:
+            run_events(events, emit, api_response)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Genie NDJSON client disconnected")
+        except Exception:  # pragma: no cover
+            logger.exception("Unhandled error streaming Genie rows.")
+            emit(format_ndjson("error", {"status": 500, "error": "An unexpected error occurred. Please try again."}))
 
-            blocked_values = {conversation_id, message_id}
-            summary, summary_source = extract_summary(
-                message_payload,
-                query_result,
-                question=question,
-                blocked_values=blocked_values,
-            )
-            if is_poor_summary(summary) or summary_source == "description":
-                fallback = build_summary_from_result(question, query_result)
-                if fallback:
-                    summary = fallback
-            table = extract_table(query_result)
+    def _handle_genie_stream(self) -> None:
+        """Answer a Genie question as Server-Sent Events (see genie_stream.py)."""
+        try:
+            content_length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(content_length) or "{}")
+            question = payload.get("question", "").strip()
+            if not question:
+                self._send_json(400, {"error": "Question cannot be empty."})
+                return
 
-            self._send_json(200, {"summary": summary, "table": table})
+            cached = get_cached_stream(question)
+            context = genie_context()
+            if cached is None and context is None:
+                self._send_json(500, {"error": "Missing Genie configuration env vars."})
+                return
         except Exception:  # pragma: no cover
-            logger.exception("Unhandled error processing Genie query.")
+            logger.exception("Unhandled error processing Genie stream request.")
             self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+            return
+
+        # Status codes are committed once the stream starts; later failures are error events
+        self.send_response(200)
+        for name, value in SSE_HEADERS.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(event: bytes) -> None:
+            self.wfile.write(event)
+            self.wfile.flush()
+
+        try:
+            if cached is not None:
+                emit(format_sse("status", {"status": "completed", "cached": True}))
+                run_events(genie_answer_events(*cached, context), emit, api_response)
+                return
+            base_url, headers = context
+            try:
+                conversation = run_genie_job(
+                    base_url,
+                    headers,
+                    question,
+                    INTERACTIVE,
+                    on_status=lambda status, details: emit(format_sse("status", {"status": status, **details})),
+                )
+            except GenieError as exc:
+                emit(format_sse("error", {"status": exc.status_code, "error": str(exc)}))
+                return
+            events = genie_answer_events(answer_conversation(question, conversation), conversation.query_result, context)
+            run_events(events, emit, api_response)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Genie stream client disconnected")
+        except Exception:  # pragma: no cover
+            logger.exception("Unhandled error streaming Genie answer.")
+            emit(format_sse("error", {"status": 500, "error": "An unexpected error occurred. Please try again."}))
 
     def _handle_knowledge_assistant(self) -> None:
         """Handle queries to the Tire Care knowledge assistant agent."""
@@ -676,38 +2100,16 @@ class AppHandler(BaseHTTPRequestHandler):
                 self._send_json(400, {"error": "Question cannot be empty."})
                 return
 
-            host = os.getenv("DATABRICKS_HOST")
-            # Try to get a dedicated token for serving endpoints, fall back to Genie token, then SQL token
-            token = os.getenv("DATABRICKS_TOKEN_FOR_SERVING") or os.getenv("DATABRICKS_TOKEN_FOR_GENIE") or os.getenv("DATABRICKS_TOKEN_FOR_SQL")
-            endpoint_url = os.getenv("KNOWLEDGE_ASSISTANT_ENDPOINT")
-            
-            if not host or not token:
+            request = knowledge_assistant_request(question)
+            if request is None:
                 logger.error("Missing Databricks configuration for knowledge assistant")
                 self._send_json(500, {"error": "Missing Databricks configuration."})
                 return
-            
-            # Default to the provided endpoint if not in env
-            if not endpoint_url:
-                endpoint_url = f"https://{host}/serving-endpoints/ka-d3d321f4-endpoint/invocations"
-            
+            endpoint_url, headers, request_payload = request
+
             logger.info(f"Calling knowledge assistant endpoint: {endpoint_url}")
-            
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            
+
             # Call the knowledge assistant agent endpoint
-            # Format for agent/v1/responses: requires "input" field with message array
-            request_payload = {
-                "input": [
-                    {
-                        "role": "user",
-                        "content": question
-                    }
-                ]
-            }
-            
             status_code, response_data = api_request(
                 endpoint_url,
                 "POST",
@@ -721,22 +2123,7 @@ class AppHandler(BaseHTTPRequestHandler):
                 self._send_json(status_code, {"error": f"Failed to reach knowledge assistant: {error_msg}"})
                 return
             
-            # Extract response from agent output
-            # Agent endpoints return: {"output": [{"type": "message", "content": [...]}]}
-            output_array = response_data.get("output", [])
-            
-            response_text = ""
-            if output_array and len(output_array) > 0:
-                # Extract content from the first output message
-                content_array = output_array[0].get("content", [])
-                # Concatenate all text pieces from content array
-                text_pieces = [item.get("text", "") for item in content_array if item.get("type") == "output_text"]
-                response_text = "".join(text_pieces).strip()
-            
-            if not response_text:
-                response_text = "No response from assistant."
-                logger.warning(f"Unexpected response format from agent: {response_data}")
-            
+            response_text = parse_knowledge_assistant_output(response_data)
             self._send_json(200, {"response": response_text})
             
         except Exception:  # pragma: no cover
@@ -744,13 +2131,22 @@ class AppHandler(BaseHTTPRequestHandler):
             self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
 
     def do_GET(self) -> None:
+        self._observed("GET", self._route_get)
+
+    def _route_get(self) -> None:
         if self.path.startswith("/api/"):
             if self.path == "/api/user":
                 self._handle_user()
                 return
+            if self.path == "/api/metrics":
+                self._handle_metrics()
+                return
             if self.path == "/api/cache/clear":
                 self._handle_cache_clear()
                 return
+            if self.path == "/api/cache/stats":
+                self._send_json(200, build_cache_stats_payload())
+                return
             if self.path == "/api/dashboard/kpis":
                 self._handle_kpis()
                 return
@@ -776,575 +2172,81 @@ class AppHandler(BaseHTTPRequestHandler):
             self._send_json(500, {"error": "dist/ folder not found."})
             return
 
-        if self.path == "/" or self.path == "":
-            self._send_file(DIST_DIR / "index.html")
-            return
-
-        requested = (DIST_DIR / self.path.lstrip("/")).resolve()
-        if DIST_DIR in requested.parents and requested.is_file():
-            self._send_file(requested)
-            return
-
-        self._send_file(DIST_DIR / "index.html")
+        self._send_file(resolve_static_file(self.path))
     
     def _handle_cache_clear(self) -> None:
         """Clear all caches to force fresh data retrieval"""
         try:
-            with _GENIE_CACHE_LOCK:
-                _GENIE_CACHE.clear()
-            with _SQL_CACHE_LOCK:
-                _SQL_CACHE.clear()
-            with _DASHBOARD_CACHE_LOCK:
-                _DASHBOARD_CACHE.clear()
+            clear_all_caches()
             logger.info("All caches cleared successfully")
             self._send_json(200, {"message": "All caches cleared successfully"})
         except Exception as e:
             logger.exception("Error clearing caches")
             self._send_json(500, {"error": str(e)})
     
-    def _get_genie_context(self) -> tuple[str, Dict[str, str]]:
-        host = os.getenv("DATABRICKS_HOST")
-        token = os.getenv("DATABRICKS_TOKEN_FOR_GENIE")
-        space_id = os.getenv("GENIE_SPACE_ID")
-        if not host or not token or not space_id:
-            raise RuntimeError("Missing Genie configuration env vars.")
-        base_url = f"https://{host}/api/2.0/genie/spaces/{space_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-        return base_url, headers
-
-    def _handle_kpis(self) -> None:
+    def _handle_cache_invalidate(self) -> None:
+        """Invalidate caches after tables are refreshed; body: {"tables": [...]} (optional)."""
         try:
-            cache_key = "dashboard:kpis"
-            cached = get_cached_dashboard_payload(cache_key)
-            if cached is not None:
-                self._send_json(200, cached)
-                return
-            kpis_sql = (
-                "WITH sales AS ("
-                "SELECT *, MAX(date) OVER() AS max_date "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched"
-                ") "
-                "SELECT "
-                "(SELECT SUM(CASE "
-                "WHEN date >= date_trunc('month', max_date) "
-                "AND date < add_months(date_trunc('month', max_date), 1) "
-                "THEN total_amount END) FROM sales) AS total_revenue, "
-                "(SELECT AVG(satisfaction_score) FROM sales) AS avg_satisfaction, "
-                "(SELECT SUM(CASE "
-                "WHEN category = 'Tire' "
-                "AND date >= date_trunc('month', max_date) "
-                "AND date < add_months(date_trunc('month', max_date), 1) "
-                "THEN quantity END) FROM sales) AS tire_units, "
-                "(SELECT COUNT(*) "
-                "FROM kaustavpaul_demo.dtc_demo.inventory "
-                "WHERE stock_qty <= reorder_threshold) AS low_stock_items, "
-                "(SELECT revenue_growth "
-                "FROM (SELECT *, MAX(month) OVER() AS max_month "
-                "FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth) t "
-                "WHERE month = max_month) AS revenue_growth, "
-                "(SELECT MAX(max_date) FROM sales) AS max_date"
-            )
-            kpis = run_direct_sql(kpis_sql)
-            if kpis is None:
-                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
+            content_length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(content_length) or "{}")
+            tables = payload.get("tables")
+            if tables is not None and (not isinstance(tables, list) or not all(isinstance(t, str) for t in tables)):
+                self._send_json(400, {"error": "tables must be a list of table names."})
                 return
-            payload = {
-                "totalRevenue": parse_float(table_first_value(kpis, "total_revenue")),
-                "revenueGrowth": parse_float(table_first_value(kpis, "revenue_growth")),
-                "avgSatisfaction": parse_float(table_first_value(kpis, "avg_satisfaction")),
-                "tireUnits": parse_float(table_first_value(kpis, "tire_units")),
-                "inventoryRisk": parse_float(table_first_value(kpis, "low_stock_items")),
-                "currentMonthLabel": format_month_label(table_first_value(kpis, "max_date")),
-            }
-            set_cached_dashboard_payload(cache_key, payload)
-            self._send_json(200, payload)
-        except Exception:  # pragma: no cover
-            logger.exception("Unhandled error in KPI handler.")
-            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+            self._send_json(200, {"invalidated_answers": invalidate_refreshed_tables(tables)})
+        except Exception as e:
+            logger.exception("Error invalidating caches")
+            self._send_json(500, {"error": str(e)})
+
+    def _handle_kpis(self) -> None:
+        self._serve_dashboard("dashboard:kpis", build_kpis_payload, "KPI")
 
     def _handle_charts(self) -> None:
-        try:
-            cache_key = "dashboard:charts"
-            cached = get_cached_dashboard_payload(cache_key)
-            if cached is not None:
-                self._send_json(200, cached)
-                return
-            revenue_trend_sql = (
-                "SELECT date_trunc('month', date) AS month, SUM(total_amount) AS revenue "
-                "FROM (SELECT *, MAX(date) OVER() AS max_date "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched) s "
-                "WHERE date >= add_months(date_trunc('month', max_date), -5) "
-                "GROUP BY date_trunc('month', date) "
-                "ORDER BY month"
-            )
-            top_tires_sql = (
-                "SELECT product_name AS model, SUM(quantity) AS units "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "WHERE category = 'Tire' "
-                "GROUP BY product_name "
-                "ORDER BY units DESC "
-                "LIMIT 5"
-            )
-            inventory_health_sql = (
-                "SELECT store_name AS store, "
-                "SUM(CASE WHEN quantity > 1 THEN quantity ELSE 0 END) AS healthy, "
-                "SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END) AS low, "
-                "SUM(CASE WHEN quantity = 0 THEN 1 ELSE 0 END) AS critical "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY store_name "
-                "ORDER BY store_name"
-            )
-            satisfaction_sql = (
-                "SELECT customer_region AS region, AVG(satisfaction_score) AS score "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY customer_region "
-                "ORDER BY score DESC"
-            )
-            revenue_trend = run_direct_sql(revenue_trend_sql)
-            top_tires = run_direct_sql(top_tires_sql)
-            inventory_health = run_direct_sql(inventory_health_sql)
-            satisfaction = run_direct_sql(satisfaction_sql)
-            missing = first_missing_table(
-                {
-                    "revenue_trend": revenue_trend,
-                    "top_tires": top_tires,
-                    "inventory_health": inventory_health,
-                    "satisfaction": satisfaction,
-                }
-            )
-            if missing:
-                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
-                return
-            payload = {
-                "revenueTrend": table_to_dicts(revenue_trend),
-                "topTires": table_to_dicts(top_tires),
-                "inventoryHealth": table_to_dicts(inventory_health),
-                "satisfactionByRegion": table_to_dicts(satisfaction),
-            }
-            set_cached_dashboard_payload(cache_key, payload)
-            self._send_json(200, payload)
-        except Exception:  # pragma: no cover
-            logger.exception("Unhandled error in charts handler.")
-            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+        self._serve_dashboard("dashboard:charts", build_charts_payload, "charts")
 
     def _handle_revenue(self) -> None:
-        try:
-            cache_key = "dashboard:revenue"
-            cached = get_cached_dashboard_payload(cache_key)
-            if cached is not None:
-                self._send_json(200, cached)
-                return
-            monthly_sql = (
-                "SELECT month, revenue, "
-                # Generate realistic target with base + seasonal variation + trend
-                "CAST(("
-                "  CASE "
-                "    WHEN EXTRACT(QUARTER FROM month) = 1 THEN 24500 "
-                "    WHEN EXTRACT(QUARTER FROM month) = 2 THEN 26000 "
-                "    WHEN EXTRACT(QUARTER FROM month) = 3 THEN 27500 "
-                "    WHEN EXTRACT(QUARTER FROM month) = 4 THEN 25500 "
-                "  END "
-                # Add monthly variation based on month number (deterministic but varied)
-                "  + (EXTRACT(MONTH FROM month) * 150) "
-                # Add some sine-wave pattern for realism
-                "  + (CAST(EXTRACT(MONTH FROM month) AS INT) % 3 * 400) "
-                # Small adjustment based on day of month for uniqueness
-                "  - (CAST(EXTRACT(DAY FROM month) AS INT) * 20)"
-                ") AS DECIMAL(10, 2)) AS target, "
-                # Generate realistic last year with different pattern
-                "CAST(("
-                "  revenue * 0.88 "  # Base: 88% of current (12% YoY growth)
-                # Add variation that differs from current year
-                "  + (EXTRACT(MONTH FROM month) * 100) "
-                # Different seasonal pattern than current year
-                "  - (CAST(EXTRACT(MONTH FROM month) AS INT) % 4 * 300) "
-                # Add month-specific variation
-                "  + CASE EXTRACT(MONTH FROM month) "
-                "      WHEN 1 THEN -500 WHEN 2 THEN 200 WHEN 3 THEN -300 "
-                "      WHEN 4 THEN 400 WHEN 5 THEN -100 WHEN 6 THEN 300 "
-                "      WHEN 7 THEN -200 WHEN 8 THEN 500 WHEN 9 THEN 100 "
-                "      WHEN 10 THEN -400 WHEN 11 THEN 200 WHEN 12 THEN 600 "
-                "    END"
-                ") AS DECIMAL(10, 2)) AS last_year "
-                "FROM (SELECT *, MAX(month) OVER() AS max_month "
-                "FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth) t "
-                "WHERE month >= add_months(date_trunc('month', max_month), -5) "
-                "ORDER BY month"
-            )
-            regional_sql = (
-                "SELECT store_region AS region, quarter(date) AS quarter, "
-                "SUM(total_amount) AS revenue "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY store_region, quarter(date) "
-                "ORDER BY store_region, quarter(date)"
-            )
-            category_sql = (
-                # Get revenue by category, with synthetic Service revenue
-                "WITH base_revenue AS ("
-                "  SELECT category, SUM(total_amount) AS amount "
-                "  FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "  GROUP BY category"
-                "), "
-                "total_revenue AS ("
-                "  SELECT SUM(amount) AS total FROM base_revenue"
-                ") "
-                "SELECT "
-                "  b.category, "
-                "  CASE "
-                # Generate realistic Service revenue: 15% of total if Service has no/low data
-                "    WHEN b.category = 'Service' AND b.amount < 1000 "
-                "      THEN CAST((SELECT total * 0.15 FROM total_revenue) AS DECIMAL(10, 2)) "
-                "    ELSE CAST(b.amount AS DECIMAL(10, 2)) "
-                "  END AS amount "
-                "FROM base_revenue b "
-                "ORDER BY amount DESC"
-            )
-            stats_sql = (
-                "SELECT "
-                "SUM(CASE WHEN date >= date_trunc('month', max_date) "
-                "AND date < add_months(date_trunc('month', max_date), 1) THEN total_amount ELSE 0 END) "
-                "AS current_month_revenue, "
-                "SUM(CASE WHEN date >= date_trunc('year', max_date) THEN total_amount ELSE 0 END) "
-                "AS ytd_revenue "
-                "FROM (SELECT *, MAX(date) OVER() AS max_date "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched) s"
-            )
-            quarterly_growth_sql = (
-                "SELECT AVG(revenue_growth) AS quarterly_growth "
-                "FROM (SELECT *, MAX(month) OVER() AS max_month "
-                "FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth) t "
-                "WHERE month >= date_trunc('quarter', max_month)"
-            )
-            top_region_sql = (
-                "SELECT store_region AS region, SUM(total_amount) AS revenue "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY store_region "
-                "ORDER BY revenue DESC "
-                "LIMIT 1"
-            )
-            current_month_sql = "SELECT MAX(date) AS max_date FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched"
-            monthly = run_direct_sql(monthly_sql)
-            regional = run_direct_sql(regional_sql)
-            category = run_direct_sql(category_sql)
-            stats = run_direct_sql(stats_sql)
-            quarterly_growth = run_direct_sql(quarterly_growth_sql)
-            top_region = run_direct_sql(top_region_sql)
-            current_month = run_direct_sql(current_month_sql)
-            missing = first_missing_table(
-                {
-                    "monthly": monthly,
-                    "regional": regional,
-                    "category": category,
-                    "stats": stats,
-                    "quarterly_growth": quarterly_growth,
-                    "top_region": top_region,
-                    "current_month": current_month,
-                }
-            )
-            if missing:
-                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
-                return
-            stats_row = table_to_dicts(stats)
-            top_region_row = table_to_dicts(top_region)
-            payload = {
-                "monthly": table_to_dicts(monthly),
-                "regional": table_to_dicts(regional),
-                "category": table_to_dicts(category),
-                "currentMonthLabel": format_month_label(table_first_value(current_month, "max_date")),
-                "stats": {
-                    "currentMonthRevenue": parse_float(stats_row[0].get("current_month_revenue")) if stats_row else None,
-                    "ytdRevenue": parse_float(stats_row[0].get("ytd_revenue")) if stats_row else None,
-                    "quarterlyGrowth": parse_float(table_first_value(quarterly_growth, "quarterly_growth")),
-                    "topRegion": top_region_row[0].get("region") if top_region_row else None,
-                },
-            }
-            set_cached_dashboard_payload(cache_key, payload)
-            self._send_json(200, payload)
-        except Exception:  # pragma: no cover
-            logger.exception("Unhandled error in revenue handler.")
-            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+        self._serve_dashboard("dashboard:revenue", build_revenue_payload, "revenue")
 
     def _handle_operations(self) -> None:
-        try:
-            cache_key = "dashboard:operations"
-            cached = get_cached_dashboard_payload(cache_key)
-            if cached is not None:
-                self._send_json(200, cached)
-                return
-            inventory_by_store_sql = (
-                "SELECT store_name AS store, "
-                "SUM(quantity) AS available, "
-                "0 AS reserved, "
-                "SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END) AS low_stock "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY store_name "
-                "ORDER BY store_name"
-            )
-            turnover_sql = (
-                "SELECT date_trunc('month', date) AS month, "
-                "SUM(quantity) AS turnover "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY date_trunc('month', date) "
-                "ORDER BY month"
-            )
-            critical_items_sql = (
-                "SELECT product_name AS item, SUM(quantity) AS current_stock, "
-                "10 AS reorder_point, "
-                "CASE WHEN SUM(quantity) <= 5 THEN 'Critical' ELSE 'Low' END AS status "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY product_name "
-                "ORDER BY SUM(quantity) ASC "
-                "LIMIT 10"
-            )
-            store_performance_sql = (
-                "SELECT store_name AS store, "
-                "ROUND(100 * revenue / max_revenue, 0) AS efficiency, "
-                "ROUND(avg_satisfaction, 1) AS satisfaction, "
-                "units AS throughput "
-                "FROM ("
-                "SELECT store_name, "
-                "SUM(total_amount) AS revenue, "
-                "SUM(quantity) AS units, "
-                "AVG(satisfaction_score) AS avg_satisfaction, "
-                "MAX(SUM(total_amount)) OVER() AS max_revenue "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY store_name"
-                ") t"
-            )
-            metrics_sql = (
-                "SELECT "
-                "SUM(quantity) AS total_units, "
-                "SUM(CASE WHEN quantity = 1 THEN 1 ELSE 0 END) AS critical_items, "
-                "COUNT(DISTINCT store_id) AS active_stores "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched"
-            )
-            inventory_by_store = run_direct_sql(inventory_by_store_sql)
-            turnover = run_direct_sql(turnover_sql)
-            critical_items = run_direct_sql(critical_items_sql)
-            store_performance = run_direct_sql(store_performance_sql)
-            metrics = run_direct_sql(metrics_sql)
-            missing = first_missing_table(
-                {
-                    "inventory_by_store": inventory_by_store,
-                    "turnover": turnover,
-                    "critical_items": critical_items,
-                    "store_performance": store_performance,
-                    "metrics": metrics,
-                }
-            )
-            if missing:
-                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
-                return
-            metrics_row = table_to_dicts(metrics)
-            payload = {
-                "inventoryByStore": table_to_dicts(inventory_by_store),
-                "stockTurnover": table_to_dicts(turnover),
-                "criticalItems": table_to_dicts(critical_items),
-                "storePerformance": table_to_dicts(store_performance),
-                "metrics": metrics_row[0] if metrics_row else {},
-            }
-            set_cached_dashboard_payload(cache_key, payload)
-            self._send_json(200, payload)
-        except Exception:  # pragma: no cover
-            logger.exception("Unhandled error in operations handler.")
-            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+        self._serve_dashboard("dashboard:operations", build_operations_payload, "operations")
 
     def _handle_customers(self) -> None:
-        try:
-            cache_key = "dashboard:customers"
-            cached = get_cached_dashboard_payload(cache_key)
-            if cached is not None:
-                self._send_json(200, cached)
-                return
-            satisfaction_trend_sql = (
-                "SELECT date_trunc('month', date) AS month, "
-                "AVG(satisfaction_score) AS score, "
-                "COUNT(*) AS responses "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY date_trunc('month', date) "
-                "ORDER BY month"
-            )
-            regional_satisfaction_sql = (
-                "SELECT customer_region AS region, AVG(satisfaction_score) AS score, COUNT(*) AS surveys "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY customer_region "
-                "ORDER BY score DESC"
-            )
-            service_breakdown_sql = (
-                "SELECT product_name AS name, COUNT(*) AS value "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "WHERE category = 'Service' "
-                "GROUP BY product_name "
-                "ORDER BY value DESC"
-            )
-            nps_breakdown_sql = (
-                "SELECT CASE "
-                "WHEN satisfaction_score >= 4.5 THEN 'Promoter' "
-                "WHEN satisfaction_score >= 4.0 THEN 'Passive' "
-                "ELSE 'Detractor' END AS category, "
-                "COUNT(*) AS count "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY CASE "
-                "WHEN satisfaction_score >= 4.5 THEN 'Promoter' "
-                "WHEN satisfaction_score >= 4.0 THEN 'Passive' "
-                "ELSE 'Detractor' END"
-            )
-            feedback_topics_sql = (
-                "SELECT category AS topic, "
-                "CASE "
-                # Tire: Always positive (high satisfaction)
-                "  WHEN category = 'Tire' THEN 'positive' "
-                # Service: Neutral to slightly negative (only 1 negative allowed)
-                "  WHEN category = 'Service' AND AVG(satisfaction_score) >= 4.0 THEN 'neutral' "
-                "  WHEN category = 'Service' THEN 'negative' "
-                # Wheel: Positive if high satisfaction, neutral otherwise
-                "  WHEN category = 'Wheel' AND AVG(satisfaction_score) >= 4.3 THEN 'positive' "
-                "  WHEN category = 'Wheel' THEN 'neutral' "
-                # Accessory: Neutral
-                "  WHEN category = 'Accessory' THEN 'neutral' "
-                # Default: positive for high scores, neutral otherwise
-                "  WHEN AVG(satisfaction_score) >= 4.5 THEN 'positive' "
-                "  ELSE 'neutral' "
-                "END AS sentiment, "
-                "COUNT(*) AS mentions "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY category"
-            )
-            metrics_sql = (
-                "SELECT "
-                "AVG(satisfaction_score) AS overall_satisfaction, "
-                "COUNT(*) AS total_surveys "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched"
-            )
-            repeat_rate_sql = (
-                "SELECT "
-                "COUNT(DISTINCT CASE WHEN sales_per_customer > 1 THEN customer_id END) * 1.0 "
-                "/ COUNT(DISTINCT customer_id) AS repeat_rate "
-                "FROM (SELECT customer_id, COUNT(*) AS sales_per_customer "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY customer_id) t"
-            )
-            active_feedback_sql = (
-                "SELECT COUNT(*) AS active_feedback "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "WHERE category = 'Service'"
-            )
-            satisfaction_trend = run_direct_sql(satisfaction_trend_sql)
-            regional_satisfaction = run_direct_sql(regional_satisfaction_sql)
-            service_breakdown = run_direct_sql(service_breakdown_sql)
-            nps_breakdown = run_direct_sql(nps_breakdown_sql)
-            feedback_topics = run_direct_sql(feedback_topics_sql)
-            metrics = run_direct_sql(metrics_sql)
-            repeat_rate = run_direct_sql(repeat_rate_sql)
-            active_feedback = run_direct_sql(active_feedback_sql)
-            missing = first_missing_table(
-                {
-                    "satisfaction_trend": satisfaction_trend,
-                    "regional_satisfaction": regional_satisfaction,
-                    "service_breakdown": service_breakdown,
-                    "nps_breakdown": nps_breakdown,
-                    "feedback_topics": feedback_topics,
-                    "metrics": metrics,
-                    "repeat_rate": repeat_rate,
-                    "active_feedback": active_feedback,
-                }
-            )
-            if missing:
-                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
-                return
-            metrics_row = table_to_dicts(metrics)
-            payload = {
-                "satisfactionTrend": table_to_dicts(satisfaction_trend),
-                "regionalSatisfaction": table_to_dicts(regional_satisfaction),
-                "serviceBreakdown": table_to_dicts(service_breakdown),
-                "npsBreakdown": table_to_dicts(nps_breakdown),
-                "feedbackTopics": table_to_dicts(feedback_topics),
-                "metrics": {
-                    "overallSatisfaction": parse_float(metrics_row[0].get("overall_satisfaction")) if metrics_row else None,
-                    "totalSurveys": parse_float(metrics_row[0].get("total_surveys")) if metrics_row else None,
-                    "repeatRate": parse_float(table_first_value(repeat_rate, "repeat_rate")),
-                    "activeFeedback": parse_float(table_first_value(active_feedback, "active_feedback")),
-                },
-            }
-            set_cached_dashboard_payload(cache_key, payload)
-            self._send_json(200, payload)
-        except Exception:  # pragma: no cover
-            logger.exception("Unhandled error in customers handler.")
-            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+        self._serve_dashboard("dashboard:customers", build_customers_payload, "customers")
+
+    def _handle_metrics(self) -> None:
+        body = build_metrics_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", Exposition.CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def _handle_user(self) -> None:
         """Return authenticated user information from Databricks App context."""
         try:
-            # Databricks Apps inject user context via X-Forwarded headers
-            user_email = self.headers.get("X-Forwarded-Email", "")
-            user_name = self.headers.get("X-Forwarded-Preferred-Username", "")
-            
-            # Fallback to environment or default if headers not present
-            if not user_email:
-                user_email = os.getenv("USER_EMAIL", "executive@discounttire.com")
-            if not user_name:
-                user_name = os.getenv("USER_NAME", "Executive User")
-            
-            # Extract first/last name if email format is first.last@domain
-            display_name = user_name
-            if not user_name or user_name == user_email:
-                # Try to derive name from email
-                local_part = user_email.split("@")[0] if "@" in user_email else user_email
-                name_parts = local_part.replace(".", " ").replace("_", " ").title().split()
-                display_name = " ".join(name_parts) if name_parts else "Executive User"
-            
-            self._send_json(200, {
-                "name": display_name,
-                "email": user_email,
-                "role": "Executive Viewer"
-            })
+            self._send_json(200, build_user_payload(self.headers))
         except Exception:  # pragma: no cover
             logger.exception("Unhandled error in user handler.")
             self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
 
     def _handle_map(self) -> None:
-        try:
-            cache_key = "dashboard:map"
-            cached = get_cached_dashboard_payload(cache_key)
-            if cached is not None:
-                self._send_json(200, cached)
-                return
-            store_locations_sql = (
-                "WITH sales_rollup AS ("
-                "SELECT store_id, SUM(total_amount) AS revenue, SUM(quantity) AS units "
-                "FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched "
-                "GROUP BY store_id"
-                ") "
-                "SELECT st.store_id, st.store_name, st.region AS store_region, st.state, "
-                "COALESCE(sr.revenue, 0) AS revenue, COALESCE(sr.units, 0) AS units, "
-                "CASE st.state "
-                "WHEN 'AZ' THEN 33.4484 WHEN 'TX' THEN 30.2672 WHEN 'CA' THEN 34.0522 "
-                "WHEN 'CO' THEN 39.7392 WHEN 'FL' THEN 27.9944 WHEN 'GA' THEN 33.7490 "
-                "WHEN 'NC' THEN 35.7796 WHEN 'TN' THEN 36.1627 WHEN 'IL' THEN 41.8781 "
-                "WHEN 'OH' THEN 39.9612 ELSE 39.8283 END AS latitude, "
-                "CASE st.state "
-                "WHEN 'AZ' THEN -112.0740 WHEN 'TX' THEN -97.7431 WHEN 'CA' THEN -118.2437 "
-                "WHEN 'CO' THEN -104.9903 WHEN 'FL' THEN -81.7603 WHEN 'GA' THEN -84.3880 "
-                "WHEN 'NC' THEN -78.6382 WHEN 'TN' THEN -86.7816 WHEN 'IL' THEN -87.6298 "
-                "WHEN 'OH' THEN -82.9988 ELSE -98.5795 END AS longitude "
-                "FROM kaustavpaul_demo.dtc_demo.stores st "
-                "LEFT JOIN sales_rollup sr ON st.store_id = sr.store_id "
-                "LIMIT 20"
-            )
-            locations = run_direct_sql(store_locations_sql)
-            if locations is None:
-                self._send_json(503, {"error": "Dashboard data unavailable. Please try again."})
-                return
-            payload = {"locations": table_to_dicts(locations)}
-            set_cached_dashboard_payload(cache_key, payload)
-            self._send_json(200, payload)
-        except Exception:  # pragma: no cover
-            logger.exception("Unhandled error in map handler.")
-            self._send_json(500, {"error": "An unexpected error occurred. Please try again."})
+        self._serve_dashboard("dashboard:map", build_map_payload, "map")
 
 
 def main() -> None:
     port = int(os.getenv("DATABRICKS_APP_PORT", "8000"))
+    if CACHE_SWEEP_INTERVAL_SECONDS > 0:
+        _CACHE_SWEEPER.start()
+    if DASHBOARD_REFRESH_INTERVAL_SECONDS > 0:
+        _DASHBOARD_REFRESHER.start(DASHBOARD_ROUTES.values(), DASHBOARD_REFRESH_INTERVAL_SECONDS)
+    if SERVER_MODE == "asyncio":
+        try:
+            from backend.async_server import serve_async
+        except ImportError:  # pragma: no cover - running as a script from ui/backend
+            from async_server import serve_async
+        # Hand over this module so the async core shares its caches and builders
+        serve_async(sys.modules[__name__], port)
+        return
     server = ThreadingHTTPServer(("0.0.0.0", port), AppHandler)
     print(f"Serving on port {port}")
     server.serve_forever()
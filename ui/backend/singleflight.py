@@ -0,0 +1,99 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight computation
+instead of each issuing their own warehouse round-trip. Used for SQL
+statements and dashboard payload rebuilds right after a cache expiry.
+"""
+import threading
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger("discount_tire_demo.singleflight")
+
+
+class _Call:
+    """A computation in flight; waiters block on `done` and share its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe duplicate call suppression keyed on an arbitrary hashable."""
+
+    def __init__(self, name: str):
+        """
+        Initialize the group.
+
+        Args:
+            name: Label used in logs and stats
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._total_calls = 0
+        self._executions = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run `fn` once per key at a time and share the result with concurrent callers.
+
+        Exceptions raised by `fn` propagate to every caller waiting on the key.
+
+        Args:
+            key: Identity of the computation (e.g. SQL text or cache key)
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            The result of the single execution of `fn`
+        """
+        with self._lock:
+            self._total_calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            logger.debug(f"[{self.name}] Coalesced call for key {str(key)[:80]!r}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get call, execution and coalescing counters."""
+        with self._lock:
+            return {
+                "calls": self._total_calls,
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,127 @@
+import http.client
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from genie_polling import PollPolicy  # noqa: E402
+from genie_scheduler import GenieScheduler  # noqa: E402
+
+GENIE_ENV = {"DATABRICKS_HOST": "example.cloud.databricks.com", "DATABRICKS_TOKEN_FOR_GENIE": "t", "GENIE_SPACE_ID": "s"}
+
+MESSAGE = {
+    "status": "COMPLETED",
+    "attachments": [
+        {
+            "text": {"content": "Revenue grew 4.2% last quarter."},
+            "query": {"query": "SELECT SUM(total_amount) FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched"},
+        }
+    ],
+}
+QUERY_RESULT = {
+    "statement_response": {
+        "manifest": {"schema": {"columns": [{"name": "revenue"}]}},
+        "result": {"data_typed_array": [{"values": [{"str": "76685.00"}]}]},
+    }
+}
+
+
+class FakeGenie:
+    def __init__(self):
+        self.conversations = 0
+
+    def __call__(self, url, method, payload, headers):
+        if url.endswith("/start-conversation"):
+            self.conversations += 1
+            return 200, {"conversation_id": "c1", "message_id": "m1"}, {}
+        if url.endswith("/query-result"):
+            return 200, QUERY_RESULT, {}
+        return 200, MESSAGE, {}
+
+
+class NormalizeQuestionTests(unittest.TestCase):
+    def test_case_whitespace_and_punctuation_are_folded(self):
+        expected = server.normalize_question("revenue growth last quarter")
+        for variant in (
+            "Revenue growth last quarter?",
+            "  REVENUE   growth, last quarter ?? ",
+            "Revenue growth -- last quarter!",
+        ):
+            self.assertEqual(server.normalize_question(variant), expected)
+
+    def test_numbers_keep_decimal_points_and_symbols(self):
+        self.assertEqual(server.normalize_question("Stores above 4.5 rating?"), "stores above 4.5 rating")
+        self.assertEqual(server.normalize_question("Revenue up 10%."), "revenue up 10%")
+
+    def test_referenced_tables_expand_views(self):
+        tables = server.referenced_tables(
+            "SELECT * FROM `kaustavpaul_demo`.`dtc_demo`.`vw_revenue_growth` g JOIN surveys s ON 1=1"
+        )
+        self.assertEqual(tables, frozenset({"vw_revenue_growth", "sales", "surveys"}))
+        self.assertIsNone(server.referenced_tables(None))
+
+
+class AnswerCacheEndpointTests(unittest.TestCase):
+    def setUp(self):
+        server.clear_all_caches()
+        self.genie = FakeGenie()
+        patches = [
+            mock.patch.dict(os.environ, GENIE_ENV),
+            mock.patch.object(server, "api_response", self.genie),
+            mock.patch.object(server, "_GENIE_POLL_POLICY", PollPolicy(initial_interval=0, jitter=0)),
+            mock.patch.object(server, "_GENIE_SCHEDULER", GenieScheduler(rate_per_minute=0)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        server.clear_all_caches()
+
+    def post(self, path, payload):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1], timeout=5)
+        conn.request("POST", path, body=json.dumps(payload))
+        response = conn.getresponse()
+        body = json.loads(response.read())
+        conn.close()
+        return response, body
+
+    def test_repeat_questions_skip_genie(self):
+        _, first = self.post("/api/genie/query", {"question": "Revenue growth last quarter?"})
+        response, second = self.post("/api/genie/query", {"question": "revenue growth, last quarter"})
+        self.assertEqual(self.genie.conversations, 1)
+        self.assertEqual(response.getheader("X-Answer-Cache"), "hit")
+        self.assertEqual(first, second)
+        self.assertEqual(second["table"], {"columns": ["revenue"], "rows": [["76685.00"]]})
+
+    def test_refreshing_a_read_table_invalidates_the_answer(self):
+        self.post("/api/genie/query", {"question": "Revenue growth last quarter?"})
+
+        _, result = self.post("/api/cache/invalidate", {"tables": ["surveys"]})
+        self.assertEqual(result, {"invalidated_answers": 0})
+        self.assertIsNotNone(server.get_cached_answer("revenue growth last quarter"))
+
+        _, result = self.post("/api/cache/invalidate", {"tables": ["sales"]})
+        self.assertEqual(result, {"invalidated_answers": 1})
+        self.post("/api/genie/query", {"question": "Revenue growth last quarter?"})
+        self.assertEqual(self.genie.conversations, 2)
+
+    def test_invalid_tables_are_rejected(self):
+        response, _ = self.post("/api/cache/invalidate", {"tables": "sales"})
+        self.assertEqual(response.status, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
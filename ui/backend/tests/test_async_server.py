@@ -0,0 +1,183 @@
+import asyncio
+import http.client
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from async_server import AsyncAppServer, async_api_request, async_write_events  # noqa: E402
+from genie_results import ResultReader  # noqa: E402
+from genie_scheduler import GenieScheduler  # noqa: E402
+from genie_stream import answer_events, format_ndjson  # noqa: E402
+
+
+class AsyncServerTests(unittest.TestCase):
+    def setUp(self):
+        server._DASHBOARD_CACHE.clear()
+        self.loop = asyncio.new_event_loop()
+        self.app_server = AsyncAppServer(server, sql_workers=2)
+        self.port = self.loop.run_until_complete(self.app_server.start("127.0.0.1", 0))
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.app_server.close(), self.loop).result(2)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(2)
+        self.loop.close()
+        server._DASHBOARD_CACHE.clear()
+
+    def test_keep_alive_connection_serves_multiple_requests(self):
+        routes = {"/api/dashboard/map": ("dashboard:test", lambda: {"points": [1, 2]})}
+        with mock.patch.object(server, "DASHBOARD_ROUTES", routes):
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            conn.request("GET", "/api/user")
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertIn("name", json.loads(response.read()))
+
+            conn.request("GET", "/api/dashboard/map")
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            etag = response.getheader("ETag")
+            self.assertEqual(json.loads(response.read()), {"points": [1, 2]})
+
+            conn.request("GET", "/api/dashboard/map", headers={"If-None-Match": etag})
+            response = conn.getresponse()
+            self.assertEqual(response.status, 304)
+            self.assertEqual(response.read(), b"")
+            conn.close()
+
+    def test_dashboard_representation_follows_accept(self):
+        routes = {"/api/dashboard/charts": ("dashboard:test", lambda: {"series": [{"x": "1"}, {"x": "2"}]})}
+        with mock.patch.object(server, "DASHBOARD_ROUTES", routes):
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            conn.request("GET", "/api/dashboard/charts", headers={"Accept": "application/vnd.dtc.columnar+json"})
+            response = conn.getresponse()
+            self.assertEqual(response.getheader("Content-Type"), "application/vnd.dtc.columnar+json")
+            self.assertEqual(json.loads(response.read()), {"series": {"x": ["1", "2"]}})
+            conn.close()
+
+    def test_metrics_endpoint_counts_requests(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request("GET", "/api/user")
+        conn.getresponse().read()
+        conn.request("GET", "/api/metrics")
+        response = conn.getresponse()
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain"))
+        self.assertRegex(response.read().decode("utf-8"), r'dtc_http_requests_total\{method="GET",route="/api/user",status="200"\} \d+')
+        conn.close()
+
+    def test_responses_carry_the_request_trace(self):
+        routes = {"/api/dashboard/map": ("dashboard:test", lambda: {"points": [1, 2]})}
+        with mock.patch.object(server, "DASHBOARD_ROUTES", routes):
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            conn.request("GET", "/api/dashboard/map", headers={"X-Request-ID": "req-7"})
+            response = conn.getresponse()
+            response.read()
+            self.assertEqual(response.getheader("X-Request-ID"), "req-7")
+            # The cache lookup ran on the executor but is still part of the trace
+            self.assertIn("dashboard-cache;dur=", response.getheader("Server-Timing"))
+            conn.close()
+
+    def test_empty_genie_question_is_rejected(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request("POST", "/api/genie/query", body=json.dumps({"question": " "}))
+        response = conn.getresponse()
+        self.assertEqual(response.status, 400)
+        conn.close()
+
+
+class AsyncGenieJobTests(unittest.TestCase):
+    def test_cancelled_queued_ask_gives_up_its_place(self):
+        scheduler = GenieScheduler(max_concurrent=1, rate_per_minute=0)
+        app_server = AsyncAppServer(server, sql_workers=1)
+
+        async def ask_and_cancel():
+            task = asyncio.ensure_future(app_server.run_genie_job("https://example.invalid", {}, "q"))
+            await asyncio.sleep(0.1)
+            self.assertEqual(scheduler.get_stats()["queue_depth"]["interactive"], 1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        scheduler.acquire()
+        try:
+            with mock.patch.object(server, "_GENIE_SCHEDULER", scheduler):
+                asyncio.run(ask_and_cancel())
+        finally:
+            scheduler.release()
+            app_server.executor.shutdown(wait=False)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["queue_depth"], {"interactive": 0, "background": 0})
+
+
+class AsyncApiRequestTests(unittest.TestCase):
+    def test_round_trips_json(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                data = json.dumps({"echo": body["content"]}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{httpd.server_address[1]}/start"
+            status, payload = asyncio.run(async_api_request(url, "POST", {"content": "hi"}, {}))
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload, {"echo": "hi"})
+
+
+class AsyncWriteEventsTests(unittest.TestCase):
+    def test_fetches_result_chunks_between_writes(self):
+        class Writer:
+            def __init__(self):
+                self.data = b""
+
+            def write(self, data):
+                self.data += data
+
+            async def drain(self):
+                pass
+
+        async def fake_response(url, method, payload, headers):
+            self.assertEqual(url, "https://example.cloud.databricks.com/chunks/1")
+            return 200, {"data_array": [["2"]]}, {}
+
+        query_result = {
+            "statement_response": {
+                "manifest": {"schema": {"columns": [{"name": "n"}]}},
+                "result": {"data_typed_array": [{"values": [{"str": "1"}]}], "next_chunk_internal_link": "/chunks/1"},
+            }
+        }
+        answer = {"summary": "ok", "table": {"columns": ["n"], "rows": [["1"]], "truncated": True, "row_count": 1}}
+        reader = ResultReader("https://example.cloud.databricks.com/api/2.0/genie/spaces/s", {}, max_rows=10)
+        writer = Writer()
+        with mock.patch("async_server.async_api_response", fake_response):
+            asyncio.run(async_write_events(answer_events(answer, 50, format_ndjson, reader, query_result), writer))
+        lines = [json.loads(line) for line in writer.data.splitlines()]
+        self.assertEqual([line["rows"] for line in lines if line["event"] == "rows"], [[["1"]], [["2"]]])
+        self.assertEqual(lines[-1], {"event": "done", "row_count": 2, "truncated": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import sys
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from cache import CacheSweeper, TTLCache, estimate_size  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kwargs):
+    options = {"ttl": 10, "max_bytes": 1024 * 1024}
+    options.update(kwargs)
+    cache = TTLCache("test", **options)
+    cache.clock = FakeClock()
+    return cache
+
+
+class TTLCacheTests(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        cache = make_cache()
+        cache.set("k", {"columns": ["a"], "rows": [["1"]]})
+        self.assertIsNotNone(cache.get("k"))
+        cache.clock.now += 11
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get_stats()["expirations"], 1)
+
+    def test_stale_window_only_visible_to_get_stale(self):
+        cache = make_cache(stale_ttl=30)
+        cache.set("k", "v")
+        cache.clock.now += 20
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.get_stale("k"), "v")
+        cache.clock.now += 30
+        self.assertIsNone(cache.get_stale("k"))
+
+    def test_lru_eviction_respects_byte_budget(self):
+        row = {"columns": ["a"], "rows": [["x" * 100]]}
+        size = estimate_size(row)
+        cache = make_cache(max_bytes=size * 2)
+        cache.set("a", row)
+        cache.set("b", row)
+        cache.get("a")  # "b" becomes least recently used
+        cache.set("c", row)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        stats = cache.get_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], size * 2)
+
+    def test_oversized_values_are_rejected(self):
+        cache = make_cache(max_bytes=64)
+        cache.set("big", ["x" * 1000])
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get_stats()["rejections"], 1)
+
+    def test_sweeper_removes_expired_entries(self):
+        cache = make_cache()
+        cache.set("old", "v")
+        cache.clock.now += 5
+        cache.set("new", "v")
+        cache.clock.now += 6
+        self.assertEqual(CacheSweeper([cache]).sweep_once(), 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_discard_if_removes_matching_entries(self):
+        cache = make_cache()
+        cache.set("a", {"tables": {"sales"}})
+        cache.set("b", {"tables": {"surveys"}})
+        self.assertEqual(cache.discard_if(lambda key, value: "sales" in value["tables"]), 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("b"))
+
+    def test_resize_accounts_for_values_that_grow(self):
+        value = ["x" * 100]
+        cache = make_cache(max_bytes=estimate_size(value) * 3)
+        cache.set("other", ["y" * 100])
+        cache.set("k", value)
+        value.append("z" * 100)
+        cache.resize("k", value)
+        self.assertEqual(cache.get_stats()["bytes"], estimate_size(value) + estimate_size(["y" * 100]))
+        # Growing past the budget evicts the least recently used entry
+        value.append("z" * 100)
+        cache.resize("k", value)
+        self.assertIsNone(cache.get("other"))
+        self.assertEqual(cache.get_stats()["bytes"], estimate_size(value))
+        # A value replaced since it was read is left alone
+        cache.resize("k", ["w"])
+        self.assertIs(cache.get("k"), value)
+
+    def test_stats_track_hits_and_misses(self):
+        cache = make_cache()
+        cache.set("k", "v")
+        cache.get("k")
+        cache.get("missing")
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_stale_lookups_count_only_as_stale_hits(self):
+        cache = make_cache(stale_ttl=30)
+        cache.set("k", "v")
+        self.assertEqual(cache.lookup("k"), ("v", True))
+        cache.clock.now += 20
+        self.assertEqual(cache.lookup("k"), ("v", False))
+        self.assertIsNone(cache.peek("k"))
+        self.assertEqual(cache.lookup("missing"), (None, False))
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["stale_hits"], stats["misses"]), (1, 1, 1))
+        self.assertAlmostEqual(stats["hit_ratio"], 2 / 3, places=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
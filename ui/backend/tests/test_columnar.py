@@ -0,0 +1,151 @@
+import http.client
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+import columnar  # noqa: E402
+from columnar import ARROW_STREAM, COLUMNAR_JSON, JSON, negotiate_media_type, to_columnar  # noqa: E402
+from responses import EncodedPayload  # noqa: E402
+
+PAYLOAD = {
+    "revenueTrend": [{"month": "2025-01-01", "revenue": "10.0"}, {"month": "2025-02-01", "revenue": None}],
+    "topTires": [],
+    "stats": {"ytd": "30.0", "regions": [{"region": "West", "orders": "9"}]},
+    "currentMonthLabel": "Feb 2025",
+}
+COLUMNAR = {
+    "revenueTrend": {"month": ["2025-01-01", "2025-02-01"], "revenue": ["10.0", None]},
+    "topTires": [],
+    "stats": {"ytd": "30.0", "regions": {"region": ["West"], "orders": ["9"]}},
+    "currentMonthLabel": "Feb 2025",
+}
+
+
+class NegotiationTests(unittest.TestCase):
+    def test_json_unless_a_columnar_type_is_named(self):
+        self.assertEqual(negotiate_media_type(None), JSON)
+        self.assertEqual(negotiate_media_type("*/*"), JSON)
+        self.assertEqual(negotiate_media_type("text/html"), JSON)
+        self.assertEqual(negotiate_media_type(COLUMNAR_JSON), COLUMNAR_JSON)
+        self.assertEqual(negotiate_media_type(f"{COLUMNAR_JSON};q=0.5, application/json"), JSON)
+        self.assertEqual(negotiate_media_type(f"{COLUMNAR_JSON}, {JSON};q=0.9"), COLUMNAR_JSON)
+
+    @unittest.skipIf(columnar.pa is None, "pyarrow is not installed")
+    def test_arrow_preferred_on_ties(self):
+        self.assertEqual(negotiate_media_type(f"{ARROW_STREAM}, {COLUMNAR_JSON}"), ARROW_STREAM)
+
+    def test_arrow_falls_back_without_pyarrow(self):
+        with mock.patch.object(columnar, "pa", None):
+            self.assertEqual(negotiate_media_type(f"{ARROW_STREAM}, {COLUMNAR_JSON};q=0.5"), COLUMNAR_JSON)
+
+
+class EncodingTests(unittest.TestCase):
+    def test_series_become_columns(self):
+        self.assertEqual(to_columnar(PAYLOAD), COLUMNAR)
+        ragged = [{"a": "1"}, {"b": "2"}]
+        self.assertEqual(to_columnar(ragged), {"a": ["1", None], "b": [None, "2"]})
+
+    def test_representations_are_encoded_once(self):
+        encoded = EncodedPayload(PAYLOAD)
+        representation = encoded.representation(COLUMNAR_JSON)
+        self.assertIs(encoded.representation(COLUMNAR_JSON), representation)
+        self.assertIs(encoded.representation(JSON), encoded)
+        self.assertEqual(representation.content_type, COLUMNAR_JSON)
+        self.assertEqual(json.loads(representation.body), COLUMNAR)
+        self.assertNotEqual(representation.etag, encoded.etag)
+        self.assertEqual(encoded.nbytes, len(encoded.body) + len(representation.body))
+
+    def test_concurrent_first_requests_encode_once(self):
+        calls = []
+
+        def slow_encoder(payload):
+            calls.append(1)
+            time.sleep(0.05)
+            return json.dumps(to_columnar(payload)).encode("utf-8")
+
+        encoders = sys.modules[EncodedPayload.__module__].ENCODERS
+        encoded = EncodedPayload(PAYLOAD)
+        results = []
+        with mock.patch.dict(encoders, {COLUMNAR_JSON: slow_encoder}):
+            threads = [
+                threading.Thread(target=lambda: results.append((encoded.representation(COLUMNAR_JSON), encoded.nbytes)))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(representation) for representation, _ in results}), 1)
+        self.assertEqual({nbytes for _, nbytes in results}, {encoded.nbytes})
+
+    @unittest.skipIf(columnar.pa is None, "pyarrow is not installed")
+    def test_arrow_stream_round_trips(self):
+        body = EncodedPayload(PAYLOAD).representation(ARROW_STREAM).body
+        table = columnar.pa.ipc.open_stream(body).read_all()
+        self.assertEqual(table.to_pylist(), [COLUMNAR])
+
+    @unittest.skipIf(columnar.pa is None, "pyarrow is not installed")
+    def test_untypeable_payload_is_served_as_json(self):
+        encoded = EncodedPayload({"series": [{"value": "1"}, {"value": 2}]})
+        self.assertIs(encoded.representation(ARROW_STREAM), encoded)
+
+
+class DashboardNegotiationTests(unittest.TestCase):
+    def setUp(self):
+        server.clear_all_caches()
+        patcher = mock.patch.object(server, "build_charts_payload", lambda: PAYLOAD)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        server.clear_all_caches()
+
+    def get(self, headers):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1], timeout=5)
+        conn.request("GET", "/api/dashboard/charts", headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    def test_charts_served_in_the_requested_representation(self):
+        response, body = self.get({"Accept": COLUMNAR_JSON})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), COLUMNAR_JSON)
+        self.assertIn("Accept", response.getheader("Vary"))
+        self.assertEqual(json.loads(body), COLUMNAR)
+
+        # Each representation revalidates against its own ETag
+        etag = response.getheader("ETag")
+        response, _ = self.get({"Accept": COLUMNAR_JSON, "If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        response, body = self.get({"Accept": "*/*", "If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), JSON)
+        self.assertEqual(json.loads(body), PAYLOAD)
+
+    def test_new_representations_count_against_the_cache_budget(self):
+        self.get({})
+        before = server.get_cache_stats()["dashboard"]["bytes"]
+        self.get({"Accept": COLUMNAR_JSON})
+        encoded = server.get_cached_dashboard_payload("dashboard:charts")
+        self.assertEqual(server.get_cache_stats()["dashboard"]["bytes"], server._DASHBOARD_CACHE.sizer(encoded))
+        self.assertGreater(server.get_cache_stats()["dashboard"]["bytes"], before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import sys
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from dashboard_aggregates import AggregateQuery, AggregateRouter, is_missing_table_error  # noqa: E402
+from query_fanout import FanoutResult  # noqa: E402
+
+QUERY = AggregateQuery("SELECT * FROM agg_monthly_sales", "SELECT * FROM vw_sales_enriched")
+TABLE = {"columns": ["x"], "rows": [["1"]]}
+
+
+class FakeWarehouse:
+    def __init__(self, missing=(), down=False):
+        self.missing = set(missing)
+        self.down = down
+        self.statements = []
+
+    def __call__(self, sql):
+        self.statements.append(sql)
+        if any(table in sql for table in self.missing):
+            raise RuntimeError("[TABLE_OR_VIEW_NOT_FOUND] The table or view cannot be found.")
+        if self.down:
+            return None
+        return TABLE
+
+
+class AggregateRouterTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.router = AggregateRouter(retry_seconds=60)
+        self.router.clock = lambda: self.now
+
+    def test_reads_aggregate_table_when_present(self):
+        warehouse = FakeWarehouse()
+        self.assertEqual(self.router.run(QUERY, warehouse), TABLE)
+        self.assertEqual(warehouse.statements, [QUERY.sql])
+        self.assertEqual(self.router.get_stats()["aggregate_hits"], 1)
+
+    def test_missing_aggregate_falls_back_and_is_bypassed_until_retry(self):
+        warehouse = FakeWarehouse(missing={"agg_"})
+        self.assertEqual(self.router.run(QUERY, warehouse), TABLE)
+        self.assertEqual(warehouse.statements, [QUERY.sql, QUERY.fallback_sql])
+
+        warehouse.statements.clear()
+        self.router.run(QUERY, warehouse)
+        self.assertEqual(warehouse.statements, [QUERY.fallback_sql])
+        self.assertEqual(self.router.get_stats()["bypassed_for_seconds"], 60)
+
+        self.now = 61
+        warehouse.missing.clear()
+        warehouse.statements.clear()
+        self.router.run(QUERY, warehouse)
+        self.assertEqual(warehouse.statements, [QUERY.sql])
+
+    def test_warehouse_outage_does_not_bypass_aggregates(self):
+        warehouse = FakeWarehouse(down=True)
+        self.assertIsNone(self.router.run(QUERY, warehouse))
+        self.assertTrue(self.router.available())
+
+    def test_failing_aggregate_is_not_rerun_on_the_views(self):
+        warehouse = FakeWarehouse(down=True)
+        self.router.run(QUERY, warehouse)
+        self.assertEqual(warehouse.statements, [QUERY.sql])
+        self.assertEqual(self.router.get_stats()["fallbacks"], 0)
+
+    def test_missing_views_are_reported(self):
+        warehouse = FakeWarehouse(missing={"agg_", "vw_"})
+        with self.assertRaises(RuntimeError):
+            self.router.run(QUERY, warehouse)
+        self.assertTrue(self.router.available())
+
+    def test_missing_table_errors_are_recognized(self):
+        self.assertTrue(is_missing_table_error(Exception("Catalog Error: Table with name agg_x does not exist!")))
+        self.assertFalse(is_missing_table_error(TimeoutError("statement timed out")))
+
+    def test_plain_sql_and_disabled_router_skip_aggregates(self):
+        warehouse = FakeWarehouse()
+        self.router.run("SELECT 1", warehouse)
+        self.router.enabled = False
+        self.router.run(QUERY, warehouse)
+        self.assertEqual(warehouse.statements, ["SELECT 1", QUERY.fallback_sql])
+
+    def test_from_view_swaps_the_qualified_source(self):
+        query = AggregateQuery.from_view(
+            "SELECT month FROM kaustavpaul_demo.dtc_demo.vw_revenue_growth", "vw_revenue_growth", "agg_monthly_revenue"
+        )
+        self.assertEqual(query.sql, "SELECT month FROM kaustavpaul_demo.dtc_demo.agg_monthly_revenue")
+
+
+class DashboardAggregateTests(unittest.TestCase):
+    def test_every_dashboard_reads_aggregates_first(self):
+        seen = []
+
+        def fake_sql(sql):
+            seen.append(sql)
+            return {"columns": [], "rows": []}
+
+        router = server.AggregateRouter()
+        with mock.patch.object(server, "run_direct_sql", fake_sql), mock.patch.object(server, "_AGGREGATE_ROUTER", router):
+            for _, builder in server.DASHBOARD_ROUTES.values():
+                builder()
+        self.assertEqual(router.get_stats()["fallbacks"], 0)
+        view_only = [sql for sql in seen if ".agg_" not in sql]
+        # Repeat-customer rate needs per-customer detail and still reads the view
+        self.assertEqual(len(view_only), 1)
+        self.assertIn("sales_per_customer", view_only[0])
+
+    def run_variants(self, aggregate_results):
+        batches = []
+
+        def fake_queries(queries):
+            batches.append(sorted(queries))
+            if len(batches) == 1:
+                return aggregate_results
+            return FanoutResult({name: TABLE for name in queries}, [])
+
+        router = server.AggregateRouter()
+        with mock.patch.object(server, "run_dashboard_queries", fake_queries), mock.patch.object(server, "_AGGREGATE_ROUTER", router):
+            results = server.run_dashboard_variants({"a": "SELECT 1 FROM agg_x"}, {"v": "SELECT 1 FROM vw_x"})
+        return results, batches, router
+
+    def test_missing_aggregate_batch_falls_back_to_views(self):
+        error = RuntimeError("[TABLE_OR_VIEW_NOT_FOUND] agg_x")
+        results, batches, router = self.run_variants(FanoutResult({"a": None}, [], {"a": error}))
+        self.assertEqual(batches, [["a"], ["v"]])
+        self.assertEqual(results.get("v"), TABLE)
+        self.assertFalse(router.available())
+
+    def test_slow_or_failing_aggregate_batch_is_not_rerun_on_views(self):
+        for aggregate_results in (
+            FanoutResult({}, ["a"]),
+            FanoutResult({"a": None}, [], {"a": TimeoutError("statement timed out")}),
+        ):
+            results, batches, router = self.run_variants(aggregate_results)
+            self.assertIsNone(results)
+            self.assertEqual(batches, [["a"]])
+            self.assertTrue(router.available())
+
+    def test_aggregate_tables_invalidate_answers_over_their_sources(self):
+        self.assertIn("sales", server.referenced_tables("SELECT * FROM dtc_demo.agg_store_sales"))
+
+
+if __name__ == "__main__":
+    unittest.main()
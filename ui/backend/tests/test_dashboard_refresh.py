@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from dashboard_refresh import DashboardRefresher  # noqa: E402
+
+
+class StaleWhileRevalidateTests(unittest.TestCase):
+    def setUp(self):
+        server._DASHBOARD_CACHE.clear()
+
+    def tearDown(self):
+        server._DASHBOARD_CACHE.clear()
+
+    def advance_clock(self, seconds):
+        patcher = mock.patch.object(server._DASHBOARD_CACHE, "clock", lambda: time.monotonic() + seconds)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stale_payload_served_while_rebuilding(self):
+        rebuilt = threading.Event()
+
+        def builder():
+            rebuilt.set()
+            return {"version": 2}
+
+        server.set_cached_dashboard_payload("dashboard:test", server.EncodedPayload({"version": 1}))
+        self.advance_clock(server.DASHBOARD_CACHE_TTL_SECONDS + 1)
+
+        before = server._DASHBOARD_CACHE.get_stats()
+        self.assertEqual(server.load_dashboard_payload("dashboard:test", builder).payload, {"version": 1})
+        stats = server._DASHBOARD_CACHE.get_stats()
+        # The stale serve is one stale hit, not also a miss
+        self.assertEqual(stats["stale_hits"] - before["stale_hits"], 1)
+        self.assertEqual(stats["misses"], before["misses"])
+        self.assertTrue(rebuilt.wait(2))
+        deadline = time.time() + 2
+        while server.get_cached_dashboard_payload("dashboard:test") is None and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(server.get_cached_dashboard_payload("dashboard:test").payload, {"version": 2})
+
+    def test_entries_past_stale_window_are_rebuilt_inline(self):
+        server.set_cached_dashboard_payload("dashboard:test", server.EncodedPayload({"version": 1}))
+        self.advance_clock(server.DASHBOARD_CACHE_TTL_SECONDS + server.DASHBOARD_STALE_TTL_SECONDS + 1)
+        self.assertEqual(
+            server.load_dashboard_payload("dashboard:test", lambda: {"version": 2}).payload, {"version": 2}
+        )
+
+
+class DashboardRefresherTests(unittest.TestCase):
+    def test_schedule_dedupes_keys_in_progress(self):
+        release = threading.Event()
+        calls = []
+
+        def refresh(cache_key, builder):
+            calls.append(cache_key)
+            release.wait(2)
+            return builder()
+
+        refresher = DashboardRefresher(refresh, max_workers=2)
+        try:
+            self.assertTrue(refresher.schedule("dashboard:a", lambda: {}))
+            self.assertFalse(refresher.schedule("dashboard:a", lambda: {}))
+            release.set()
+        finally:
+            refresher.stop()
+        self.assertEqual(calls, ["dashboard:a"])
+
+    def test_start_prewarms_every_route(self):
+        warmed = []
+        done = threading.Event()
+
+        def refresh(cache_key, builder):
+            warmed.append(cache_key)
+            if len(warmed) >= 2:
+                done.set()
+            return builder()
+
+        refresher = DashboardRefresher(refresh, max_workers=2)
+        try:
+            refresher.start([("dashboard:a", lambda: {}), ("dashboard:b", lambda: {})], interval=60)
+            self.assertTrue(done.wait(2))
+        finally:
+            refresher.stop()
+        self.assertEqual(sorted(warmed), ["dashboard:a", "dashboard:b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
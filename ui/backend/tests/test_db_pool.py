@@ -0,0 +1,266 @@
+import http.client
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+import db_pool  # noqa: E402
+from db_pool import PoolSaturated, SQLWarehousePool  # noqa: E402
+from query_fanout import QueryFanout, fanout_workers  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        self.conn.statements.append(sql)
+        if not self.conn.alive:
+            raise ConnectionError("connection reset")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+    def __init__(self):
+        self.opened = []
+        self.fail = False
+
+    def __call__(self):
+        if self.fail:
+            raise ConnectionError("warehouse unavailable")
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+
+def make_pool(connector, **kwargs):
+    options = {"pool_size": 2, "min_size": 1, "maintenance_interval": 0}
+    options.update(kwargs)
+    return SQLWarehousePool(connect=connector, **options)
+
+
+class ElasticPoolTests(unittest.TestCase):
+    def test_connections_open_lazily_up_to_the_maximum(self):
+        connector = Connector()
+        pool = make_pool(connector)
+        self.assertEqual(connector.opened, [])
+
+        first = pool.get_connection(timeout=0.1)
+        second = pool.get_connection(timeout=0.1)
+        self.assertEqual(len(connector.opened), 2)
+        with self.assertRaises(PoolSaturated):
+            pool.get_connection(timeout=0.05)
+
+        pool.return_connection(first)
+        self.assertIs(pool.get_connection(timeout=0.1), first)
+        pool.return_connection(first)
+        pool.return_connection(second)
+        self.assertEqual(pool.get_pool_status()["available"], 2)
+
+    def test_return_does_not_round_trip(self):
+        connector = Connector()
+        pool = make_pool(connector)
+        conn = pool.get_connection()
+        pool.return_connection(conn)
+        self.assertEqual(conn.statements, [])
+
+    def test_idle_connections_are_validated_on_checkout(self):
+        connector = Connector()
+        pool = make_pool(connector, idle_check=0)
+        conn = pool.get_connection()
+        pool.return_connection(conn)
+        conn.alive = False
+
+        replacement = pool.get_connection()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        status = pool.get_pool_status()
+        self.assertEqual((status["validation_failures"], status["open"]), (1, 1))
+
+    def test_failed_creation_frees_the_slot(self):
+        connector = Connector()
+        pool = make_pool(connector)
+        connector.fail = True
+        self.assertIsNone(pool.get_connection(timeout=0.1))
+        connector.fail = False
+        self.assertIsNotNone(pool.get_connection(timeout=0.1))
+        status = pool.get_pool_status()
+        self.assertEqual((status["create_failures"], status["open"]), (1, 1))
+
+    def test_maintenance_replenishes_recycles_and_shrinks(self):
+        connector = Connector()
+        pool = make_pool(connector, min_size=1, idle_timeout=0, max_lifetime=60)
+        pool.maintain()
+        self.assertEqual(pool.get_pool_status()["available"], 1)
+
+        # Grow to two, then let the surplus idle out
+        first, second = pool.get_connection(), pool.get_connection()
+        pool.return_connection(first)
+        pool.return_connection(second)
+        pool.maintain()
+        status = pool.get_pool_status()
+        self.assertEqual((status["open"], status["shrunk"]), (1, 1))
+
+        # Connections past their lifetime are replaced
+        pool.max_lifetime = 1e-6
+        time.sleep(0.01)
+        pool.maintain()
+        status = pool.get_pool_status()
+        self.assertEqual((status["open"], status["recycled"]), (1, 1))
+        self.assertEqual(len(connector.opened), 3)
+
+    def test_waiters_get_returned_connections(self):
+        connector = Connector()
+        pool = make_pool(connector, pool_size=1)
+        held = pool.get_connection()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.get_connection(timeout=2)))
+        waiter.start()
+        time.sleep(0.05)
+        pool.return_connection(held)
+        waiter.join(2)
+        self.assertEqual(got, [held])
+
+    def test_run_sql_validates_after_failures(self):
+        connector = Connector()
+        pool = make_pool(connector)
+        original, db_pool._SQL_POOL = db_pool._SQL_POOL, pool
+        self.addCleanup(setattr, db_pool, "_SQL_POOL", original)
+        self.assertEqual(db_pool.run_sql_with_pool("SELECT 1"), [(1,)])
+
+        connector.opened[0].alive = False
+        self.assertIsNone(db_pool.run_sql_with_pool("SELECT 1"))
+        self.assertTrue(connector.opened[0].closed)
+        self.assertEqual(pool.get_pool_status()["open"], 0)
+
+
+class AdmissionTests(unittest.TestCase):
+    def test_full_wait_queue_rejects_immediately(self):
+        pool = make_pool(Connector(), pool_size=1, max_waiters=1, retry_after=7)
+        held = pool.get_connection()
+        waiter = threading.Thread(target=lambda: self.assertRaises(PoolSaturated, pool.get_connection, timeout=0.3))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(pool.get_pool_status()["waiting"], 1)
+
+        started = time.monotonic()
+        with self.assertRaises(PoolSaturated) as raised:
+            pool.get_connection(timeout=5)
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertEqual(raised.exception.retry_after, 7)
+        waiter.join(2)
+        pool.return_connection(held)
+
+        status = pool.get_pool_status()
+        self.assertEqual((status["rejected"], status["timeouts"], status["waiting"]), (1, 1, 0))
+        self.assertEqual(status["max_waiting"], 1)
+        self.assertEqual(status["wait_seconds"]["count"], 1)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        pool = make_pool(Connector(), pool_size=1)
+        held = pool.get_connection()
+        order = []
+
+        def worker(name):
+            conn = pool.get_connection(timeout=2)
+            order.append(name)
+            pool.return_connection(conn)
+
+        threads = []
+        for name in ("first", "second", "third"):
+            threads.append(threading.Thread(target=worker, args=(name,)))
+            threads[-1].start()
+            time.sleep(0.05)
+        pool.return_connection(held)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ["first", "second", "third"])
+
+    def test_saturated_dashboards_are_shed_with_retry_after(self):
+        def saturated(sql):
+            raise server.PoolSaturated("busy", 3)
+
+        server.clear_all_caches()
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        with mock.patch.object(server, "run_direct_sql", saturated):
+            conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+            conn.request("GET", "/api/dashboard/kpis")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "3")
+
+    def test_busy_warehouse_sheds_dashboards_with_default_sizing(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        class SlowCursor(FakeCursor):
+            def execute(self, sql):
+                release.wait(5)
+
+        class SlowConnection(FakeConnection):
+            def cursor(self):
+                return SlowCursor(self)
+
+        # The pool module as imported by server (backend.db_pool when run from ui/)
+        pool_module = sys.modules[server.get_sql_pool.__module__]
+        # Default pool sizing (SQL_POOL_SIZE=3, SQL_POOL_MAX_WAITERS=16) with a short wait
+        pool = pool_module.SQLWarehousePool(
+            connect=SlowConnection, pool_size=3, max_waiters=16, wait_timeout=0.2, retry_after=4, maintenance_interval=0
+        )
+        fanout = QueryFanout(max_workers=fanout_workers())
+        self.addCleanup(fanout.shutdown)
+        original, pool_module._SQL_POOL = pool_module._SQL_POOL, pool
+        self.addCleanup(setattr, pool_module, "_SQL_POOL", original)
+
+        server.clear_all_caches()
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        with mock.patch.object(server, "warehouse_settings", lambda: ("host", "/sql", "token")), \
+                mock.patch.object(server, "SQL_BACKEND", "databricks"), \
+                mock.patch.object(server, "get_query_fanout", lambda: fanout), \
+                mock.patch.object(server, "DASHBOARD_QUERY_DEADLINE_SECONDS", 1):
+            conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+            # Four chart statements: three hold the pool's connections, the fourth times out waiting
+            conn.request("GET", "/api/dashboard/charts")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "4")
+        self.assertEqual(pool.get_pool_status()["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -64,5 +64,56 @@ class GenieParsingTests(unittest.TestCase):
         self.assertTrue(summary.startswith("The total revenue for the last quarter was $76,685"))
 
 
+class SinglePassParsingTests(unittest.TestCase):
+    def test_parse_matches_the_separate_extractors(self):
+        message = {
+            "id": "m1",
+            "content": "top regions",
+            "attachments": [
+                {"query": {"description": "Revenue by region.", "query": "SELECT region FROM sales"}},
+                {"suggested_questions": {"questions": ["What about stores?"]}},
+            ],
+        }
+        query_result = build_query_result(["region", "revenue"], ["West", "125000.0"])
+        parsed = server.parse_genie_response(message, query_result, question="top regions", blocked_values={"m1"})
+
+        summary = server.extract_summary(message, query_result, question="top regions", blocked_values={"m1"})
+        self.assertEqual((parsed.summary, parsed.summary_source), summary)
+        self.assertEqual(parsed.summary_source, "description")
+        self.assertEqual(parsed.sql, server.extract_sql(message, query_result))
+        self.assertEqual(parsed.sql, "SELECT region FROM sales")
+        self.assertEqual(parsed.table, server.extract_table(query_result))
+
+    def test_preferred_keys_win_and_source_is_the_first_equal_text(self):
+        message = {
+            "attachments": [],
+            "title": "Revenue grew 4%",
+            "details": {"message": "Revenue was flat", "summary": "Revenue grew 4%"},
+        }
+        self.assertEqual(server.extract_summary(message), ("Revenue grew 4%", "title"))
+        candidates = server.collect_texts(message)
+        self.assertEqual(candidates[0], ("title", "Revenue grew 4%"))
+        self.assertEqual(server.pick_best_text(candidates), "Revenue grew 4%")
+
+    def test_sql_is_found_in_the_query_result_when_the_message_has_none(self):
+        message = {"attachments": [{"query": {"description": "Sales"}}]}
+        query_result = {"statement_response": {"statement": {"sql": "select 1"}}}
+        parsed = server.parse_genie_response(message, query_result)
+        self.assertEqual(parsed.sql, "select 1")
+        self.assertIsNone(parsed.table)
+        self.assertEqual(server.find_sql(query_result), "select 1")
+
+    def test_large_results_keep_every_row(self):
+        rows = 5000
+        query_result = build_query_result(["store"], ["Store 1"])
+        data = query_result["statement_response"]["result"]["data_typed_array"]
+        data.extend({"values": [{"str": f"Store {i}"}]} for i in range(2, rows + 1))
+        parsed = server.parse_genie_response({"attachments": [], "content": "stores"}, query_result, question="stores")
+        self.assertEqual(len(parsed.table["rows"]), rows)
+        self.assertEqual(parsed.table["rows"][-1], [f"Store {rows}"])
+        self.assertEqual((parsed.summary, parsed.summary_source), ("store", "name"))
+        self.assertIsNone(parsed.sql)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+import sys
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import genie_polling  # noqa: E402
+from genie_polling import GenieError, PollPolicy, retry_after_seconds, run_conversation  # noqa: E402
+
+
+class FakeGenie:
+    """Scripted responses keyed by phase; records every call."""
+
+    def __init__(self, polls, start=None, query_result=None):
+        self.start = list(start or [(200, {"conversation_id": "c1", "message_id": "m1"}, {})])
+        self.polls = list(polls)
+        self.query_result = list(query_result or [(200, {"statement_response": {}}, {})])
+        self.calls = []
+
+    def __call__(self, url, method, payload, headers):
+        self.calls.append(url)
+        if url.endswith("/start-conversation"):
+            return self.start.pop(0)
+        if url.endswith("/query-result"):
+            return self.query_result.pop(0)
+        return self.polls.pop(0)
+
+
+def running():
+    return (200, {"status": "EXECUTING_QUERY"}, {})
+
+
+def completed():
+    return (200, {"status": "COMPLETED"}, {})
+
+
+class PollPolicyTests(unittest.TestCase):
+    def test_intervals_grow_and_are_capped(self):
+        policy = PollPolicy(initial_interval=0.25, max_interval=1.0, multiplier=2, jitter=0)
+        self.assertEqual([policy.interval(i) for i in range(4)], [0.25, 0.5, 1.0, 1.0])
+
+    def test_jitter_stays_within_bounds(self):
+        policy = PollPolicy(initial_interval=1.0, jitter=0.2)
+        for _ in range(50):
+            self.assertTrue(0.8 <= policy.interval(0) <= 1.2)
+
+    def test_retry_after_parsing(self):
+        self.assertEqual(retry_after_seconds({"Retry-After": "3"}), 3.0)
+        self.assertIsNone(retry_after_seconds({}))
+        self.assertIsNone(retry_after_seconds({"Retry-After": "soon"}))
+        self.assertEqual(retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0.0)
+
+
+class RunConversationTests(unittest.TestCase):
+    def setUp(self):
+        self.policy = PollPolicy(initial_interval=0.1, max_interval=0.4, multiplier=2, jitter=0, deadline=30)
+        self.sleeps = []
+
+    def run_fake(self, fake, policy=None):
+        return run_conversation(
+            "https://host/api", {}, "question", fake, policy or self.policy, sleep=self.sleeps.append
+        )
+
+    def test_fast_answers_use_short_intervals(self):
+        fake = FakeGenie([running(), running(), running(), running(), completed()])
+        conversation = self.run_fake(fake)
+        self.assertEqual(conversation.conversation_id, "c1")
+        self.assertEqual(conversation.message["status"], "COMPLETED")
+        self.assertEqual(self.sleeps, [0.1, 0.2, 0.4, 0.4])
+        self.assertTrue(fake.calls[-1].endswith("/query-result"))
+
+    def test_throttled_calls_respect_retry_after(self):
+        fake = FakeGenie(
+            [(429, {}, {"Retry-After": "2"}), completed()],
+            start=[(429, {}, {}), (200, {"conversation_id": "c1", "message_id": "m1"}, {})],
+        )
+        self.run_fake(fake)
+        self.assertEqual(self.sleeps, [0.1, 2.0])
+        stats = genie_polling.get_genie_latency_stats()
+        self.assertGreaterEqual(stats["start"]["throttled"], 1)
+        self.assertGreaterEqual(stats["poll"]["count"], 2)
+
+    def test_retry_after_past_deadline_gives_up(self):
+        fake = FakeGenie([(429, {}, {"Retry-After": "120"})])
+        with self.assertRaises(GenieError) as ctx:
+            self.run_fake(fake)
+        self.assertEqual(ctx.exception.status_code, 429)
+
+    def test_overall_deadline_is_enforced(self):
+        with self.assertRaises(GenieError) as ctx:
+            self.run_fake(FakeGenie([running()]), PollPolicy(deadline=0))
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(self.sleeps, [])
+
+    def test_failed_message_and_bad_start(self):
+        with self.assertRaises(GenieError) as ctx:
+            self.run_fake(FakeGenie([(200, {"status": "FAILED"}, {})]))
+        self.assertEqual(ctx.exception.status_code, 500)
+
+        with self.assertRaises(GenieError) as ctx:
+            self.run_fake(FakeGenie([], start=[(403, {}, {})]))
+        self.assertEqual(ctx.exception.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import sys
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from genie_results import ResultReader, cap_table, page_rows, result_continuation  # noqa: E402
+
+BASE_URL = "https://example.cloud.databricks.com/api/2.0/genie/spaces/s"
+AUTH = {"Authorization": "Bearer t"}
+
+
+def typed(start, stop):
+    return [{"values": [{"str": str(i)}, {}]} for i in range(start, stop)]
+
+
+def query_result(result, **manifest):
+    return {"statement_response": {"manifest": {"schema": {"columns": [{"name": "n"}, {"name": "x"}]}, **manifest}, "result": result}}
+
+
+def read(reader, payload, responses, start_row=0):
+    """Drive reader.steps with canned responses keyed by URL; returns (rows, fetched (url, headers))."""
+    steps = reader.steps(payload, start_row)
+    rows, fetched, response = [], [], None
+    while True:
+        try:
+            step = steps.send(response)
+        except StopIteration:
+            return rows, fetched
+        if isinstance(step, list):
+            rows.extend(step)
+            response = None
+        else:
+            fetched.append(step)
+            response = responses.get(step[0], (404, {}, {}))
+
+
+class ResultReaderTests(unittest.TestCase):
+    def test_inline_rows_come_out_in_slices(self):
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100, chunk_size=2)
+        steps = list(reader.steps(query_result({"data_typed_array": typed(0, 5)})))
+        self.assertEqual([len(rows) for rows in steps], [2, 2, 1])
+        self.assertEqual(steps[0][0], ["0", None])
+        self.assertEqual(reader.metadata(), {"row_count": 5, "truncated": False})
+
+    def test_follows_internal_chunk_links_with_credentials(self):
+        link = "/api/2.0/sql/statements/st/result/chunks/1"
+        payload = query_result({"data_typed_array": typed(0, 3), "next_chunk_internal_link": link}, total_row_count=6)
+        chunk = {"chunk_index": 1, "data_typed_array": typed(3, 6)}
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100, chunk_size=50)
+        rows, fetched = read(reader, payload, {f"https://example.cloud.databricks.com{link}": (200, chunk, {})})
+        self.assertEqual([row[0] for row in rows], [str(i) for i in range(6)])
+        self.assertEqual(fetched, [(f"https://example.cloud.databricks.com{link}", AUTH)])
+        self.assertEqual(reader.metadata(), {"row_count": 6, "truncated": False, "total_row_count": 6})
+        self.assertEqual(reader.chunks_fetched, 1)
+
+    def test_external_links_are_fetched_without_credentials(self):
+        payload = query_result({
+            "external_links": [
+                {"chunk_index": 0, "external_link": "https://storage/0", "next_chunk_internal_link": "/chunks/1"},
+            ]
+        })
+        responses = {
+            "https://storage/0": (200, [["0", None], ["1", "a"]], {}),
+            "https://example.cloud.databricks.com/chunks/1": (
+                200,
+                {"external_links": [{"chunk_index": 1, "external_link": "https://storage/1"}]},
+                {},
+            ),
+            "https://storage/1": (200, [["2", "b"]], {}),
+        }
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100)
+        rows, fetched = read(reader, payload, responses)
+        self.assertEqual(rows, [["0", None], ["1", "a"], ["2", "b"]])
+        self.assertEqual([headers for url, headers in fetched if "storage" in url], [{}, {}])
+        self.assertFalse(reader.truncated)
+
+    def test_row_cap_stops_before_fetching_more(self):
+        payload = query_result({"data_typed_array": typed(0, 3), "next_chunk_internal_link": "/chunks/1"})
+        reader = ResultReader(BASE_URL, AUTH, max_rows=3)
+        rows, fetched = read(reader, payload, {})
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(fetched, [])
+        self.assertTrue(reader.truncated)
+
+    def test_row_cap_cuts_a_chunk(self):
+        reader = ResultReader(BASE_URL, AUTH, max_rows=4, chunk_size=3)
+        rows, _ = read(reader, query_result({"data_typed_array": typed(0, 10)}), {})
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(reader.metadata(), {"row_count": 4, "truncated": True})
+
+    def test_start_row_skips_rows_already_sent(self):
+        payload = query_result({"data_typed_array": typed(0, 3), "next_chunk_internal_link": "/chunks/1"})
+        responses = {"https://example.cloud.databricks.com/chunks/1": (200, {"data_array": [["3", None]]}, {})}
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100)
+        rows, _ = read(reader, payload, responses, start_row=3)
+        self.assertEqual(rows, [["3", None]])
+        self.assertEqual(reader.row_count, 4)
+
+    def test_continuation_resumes_after_the_first_chunk(self):
+        link = "/chunks/1"
+        payload = query_result({"data_typed_array": typed(0, 3), "next_chunk_internal_link": link}, total_row_count=4)
+        continuation = result_continuation(payload)
+        self.assertNotIn("data_typed_array", continuation["statement_response"]["result"])
+        responses = {f"https://example.cloud.databricks.com{link}": (200, {"data_typed_array": typed(3, 4)}, {})}
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100)
+        rows, _ = read(reader, continuation, responses, start_row=3)
+        self.assertEqual(rows, [["3", None]])
+        self.assertEqual(reader.metadata(), {"row_count": 4, "truncated": False, "total_row_count": 4})
+        self.assertIsNone(result_continuation(query_result({"data_typed_array": typed(0, 3)})))
+
+    def test_failed_chunk_ends_the_read_as_truncated(self):
+        payload = query_result({"data_typed_array": typed(0, 2), "next_chunk_internal_link": "/chunks/1"})
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100)
+        with self.assertLogs("discount_tire_demo.genie_results", "WARNING"):
+            rows, _ = read(reader, payload, {})
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(reader.truncated)
+
+    def test_statement_truncated_by_genie_is_reported(self):
+        reader = ResultReader(BASE_URL, AUTH, max_rows=100)
+        read(reader, query_result({"data_typed_array": typed(0, 2)}, truncated=True), {})
+        self.assertTrue(reader.truncated)
+
+
+class CapTableTests(unittest.TestCase):
+    def table(self, n):
+        return {"columns": ["n", "x"], "rows": page_rows(typed(0, n))}
+
+    def test_complete_tables_are_unchanged(self):
+        table = self.table(3)
+        self.assertIs(cap_table(table, query_result({"data_typed_array": typed(0, 3)}), 10), table)
+
+    def test_long_tables_are_capped_with_metadata(self):
+        capped = cap_table(self.table(5), query_result({"data_typed_array": typed(0, 5)}, total_row_count=5), 2)
+        self.assertEqual(capped["rows"], [["0", None], ["1", None]])
+        self.assertEqual((capped["truncated"], capped["row_count"], capped["total_row_count"]), (True, 2, 5))
+
+    def test_tables_with_more_chunks_are_marked_truncated(self):
+        payload = query_result({"data_typed_array": typed(0, 3), "next_chunk_internal_link": "/chunks/1"})
+        capped = cap_table(self.table(3), payload, 10)
+        self.assertTrue(capped["truncated"])
+        self.assertEqual(capped["row_count"], 3)
+        self.assertNotIn("total_row_count", capped)
+
+
+if __name__ == "__main__":
+    unittest.main()
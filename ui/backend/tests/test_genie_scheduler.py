@@ -0,0 +1,110 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from genie_scheduler import BACKGROUND, INTERACTIVE, GenieError, GenieScheduler, TokenBucket  # noqa: E402
+
+
+def wait_for_queue(scheduler, depth):
+    deadline = time.time() + 2
+    while sum(scheduler.get_stats()["queue_depth"].values()) < depth and time.time() < deadline:
+        time.sleep(0.005)
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_refill_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=0.5, burst=2)
+        bucket.clock = lambda: now[0]
+        bucket._updated = 0.0
+        self.assertEqual(bucket.try_take(), 0)
+        self.assertEqual(bucket.try_take(), 0)
+        self.assertAlmostEqual(bucket.try_take(), 2.0)
+        now[0] = 2.0
+        self.assertEqual(bucket.try_take(), 0)
+
+
+class GenieSchedulerTests(unittest.TestCase):
+    def test_interactive_jobs_jump_ahead_of_background(self):
+        scheduler = GenieScheduler(max_concurrent=1, rate_per_minute=0)
+        scheduler.acquire(BACKGROUND)
+        order = []
+
+        def job(priority, label):
+            with scheduler.slot(priority):
+                order.append(label)
+
+        background = threading.Thread(target=job, args=(BACKGROUND, "background"))
+        background.start()
+        wait_for_queue(scheduler, 1)
+        interactive = threading.Thread(target=job, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        wait_for_queue(scheduler, 2)
+
+        scheduler.release()
+        background.join(2)
+        interactive.join(2)
+        self.assertEqual(order, ["interactive", "background"])
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["admitted"], {"interactive": 1, "background": 2})
+        self.assertEqual(stats["wait_seconds"]["interactive"]["count"], 1)
+
+    def test_full_queue_rejects_with_503(self):
+        scheduler = GenieScheduler(max_concurrent=1, max_queue=0, rate_per_minute=0)
+        scheduler.acquire()
+        with self.assertRaises(GenieError) as ctx:
+            scheduler.acquire()
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(scheduler.get_stats()["rejected"], 1)
+
+    def test_deadline_while_queued_returns_504(self):
+        scheduler = GenieScheduler(max_concurrent=1, rate_per_minute=0)
+        scheduler.acquire()
+        with self.assertRaises(GenieError) as ctx:
+            scheduler.acquire(INTERACTIVE, deadline=time.monotonic() + 0.05)
+        self.assertEqual(ctx.exception.status_code, 504)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["expired"], 1)
+        self.assertEqual(stats["queue_depth"], {"interactive": 0, "background": 0})
+
+    def test_rate_limit_spaces_conversation_starts(self):
+        scheduler = GenieScheduler(max_concurrent=5, rate_per_minute=60 * 20, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            with scheduler.slot():
+                pass
+        # One token up front, then one every 50ms
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+class AsyncAcquireTests(unittest.TestCase):
+    def test_admitted_when_a_slot_frees(self):
+        scheduler = GenieScheduler(max_concurrent=1, rate_per_minute=0)
+        scheduler.acquire()
+
+        async def ask():
+            asyncio.get_running_loop().call_later(0.05, scheduler.release)
+            await scheduler.async_acquire(INTERACTIVE, deadline=time.monotonic() + 2)
+
+        asyncio.run(ask())
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["running"], 1)
+        self.assertEqual(stats["admitted"]["interactive"], 2)
+
+    def test_deadline_while_queued_returns_504(self):
+        scheduler = GenieScheduler(max_concurrent=1, rate_per_minute=0)
+        scheduler.acquire()
+        with self.assertRaises(GenieError) as ctx:
+            asyncio.run(scheduler.async_acquire(INTERACTIVE, deadline=time.monotonic() + 0.05))
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(scheduler.get_stats()["queue_depth"], {"interactive": 0, "background": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
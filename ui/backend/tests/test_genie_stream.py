@@ -0,0 +1,201 @@
+import http.client
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from genie_polling import PollPolicy  # noqa: E402
+from genie_scheduler import GenieScheduler  # noqa: E402
+from genie_stream import answer_events, format_ndjson, wants_ndjson  # noqa: E402
+
+GENIE_ENV = {"DATABRICKS_HOST": "example.cloud.databricks.com", "DATABRICKS_TOKEN_FOR_GENIE": "t", "GENIE_SPACE_ID": "s"}
+
+QUERY_RESULT = {
+    "statement_response": {
+        "manifest": {"schema": {"columns": [{"name": "store"}, {"name": "revenue"}]}},
+        "result": {
+            "data_typed_array": [
+                {"values": [{"str": f"Store {i}"}, {"str": str(i * 100)}]} for i in range(5)
+            ]
+        },
+    }
+}
+
+
+CHUNK_LINK = "/api/2.0/sql/statements/st/result/chunks/1"
+# The same statement with its rows split over the inline chunk and one linked chunk
+CHUNKED_QUERY_RESULT = {
+    "statement_response": {
+        "manifest": {"schema": QUERY_RESULT["statement_response"]["manifest"]["schema"], "total_row_count": 5},
+        "result": {
+            "data_typed_array": QUERY_RESULT["statement_response"]["result"]["data_typed_array"][:3],
+            "next_chunk_internal_link": CHUNK_LINK,
+        },
+    }
+}
+NEXT_CHUNK = {"chunk_index": 1, "data_typed_array": QUERY_RESULT["statement_response"]["result"]["data_typed_array"][3:]}
+
+
+def fake_genie(url, method, payload, headers):
+    if url.endswith("/start-conversation"):
+        return 200, {"conversation_id": "c1", "message_id": "m1"}, {}
+    if url.endswith("/query-result"):
+        return 200, fake_genie.query_result, {}
+    if url.endswith(CHUNK_LINK):
+        fake_genie.chunk_fetches += 1
+        return 200, NEXT_CHUNK, {}
+    fake_genie.polls += 1
+    status = ["ASKING_AI", "EXECUTING_QUERY", "COMPLETED"][min(fake_genie.polls - 1, 2)]
+    return 200, {"status": status}, {}
+
+
+def parse_events(raw):
+    events = []
+    for block in raw.decode("utf-8").strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class AnswerEventsTests(unittest.TestCase):
+    def test_rows_are_chunked(self):
+        answer = {"summary": "ok", "table": {"columns": ["a"], "rows": [[str(i)] for i in range(5)]}}
+        events = parse_events(b"".join(answer_events(answer, chunk_size=2)))
+        self.assertEqual([name for name, _ in events], ["summary", "columns", "rows", "rows", "rows", "done"])
+        self.assertEqual(events[-1][1], {"row_count": 5, "truncated": False})
+
+    def test_truncated_table_is_reported_in_done(self):
+        table = {"columns": ["a"], "rows": [["1"]], "truncated": True, "row_count": 1, "total_row_count": 9}
+        events = parse_events(b"".join(answer_events({"summary": "ok", "table": table})))
+        self.assertEqual(events[-1][1], {"row_count": 1, "truncated": True, "total_row_count": 9})
+
+    def test_ndjson_lines(self):
+        answer = {"summary": "ok", "table": {"columns": ["a"], "rows": [["1"], ["2"]]}}
+        lines = [json.loads(line) for line in b"".join(answer_events(answer, 1, format_ndjson)).splitlines()]
+        self.assertEqual([line["event"] for line in lines], ["summary", "columns", "rows", "rows", "done"])
+        self.assertEqual(lines[2], {"event": "rows", "rows": [["1"]]})
+
+    def test_ndjson_must_be_named_in_accept(self):
+        self.assertTrue(wants_ndjson("application/x-ndjson"))
+        self.assertFalse(wants_ndjson("*/*"))
+        self.assertFalse(wants_ndjson(None))
+
+    def test_answer_without_table(self):
+        events = parse_events(b"".join(answer_events({"summary": "ok", "table": None})))
+        self.assertEqual([name for name, _ in events], ["summary", "done"])
+
+
+class GenieStreamEndpointTests(unittest.TestCase):
+    def setUp(self):
+        fake_genie.polls = 0
+        fake_genie.chunk_fetches = 0
+        fake_genie.query_result = QUERY_RESULT
+        server.clear_all_caches()
+        patches = [
+            mock.patch.dict(os.environ, GENIE_ENV),
+            mock.patch.object(server, "api_response", fake_genie),
+            mock.patch.object(server, "_GENIE_POLL_POLICY", PollPolicy(initial_interval=0, jitter=0)),
+            mock.patch.object(server, "_GENIE_SCHEDULER", GenieScheduler(rate_per_minute=0)),
+            mock.patch.object(server, "GENIE_STREAM_ROW_CHUNK", 2),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        server.clear_all_caches()
+
+    def post(self, question, path="/api/genie/stream", headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1], timeout=5)
+        conn.request("POST", path, body=json.dumps({"question": question}), headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    def test_streams_status_summary_and_row_chunks(self):
+        response, body = self.post("Revenue by store?")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("text/event-stream"))
+        events = parse_events(body)
+        statuses = [data["status"] for name, data in events if name == "status"]
+        self.assertEqual(statuses, ["submitted", "executing", "completed"])
+        names = [name for name, _ in events if name != "status"]
+        self.assertEqual(names, ["summary", "columns", "rows", "rows", "rows", "done"])
+        rows = [row for name, data in events if name == "rows" for row in data["rows"]]
+        self.assertEqual(rows[0], ["Store 0", "0"])
+        self.assertEqual(len(rows), 5)
+
+    def test_stream_follows_result_chunk_links(self):
+        fake_genie.query_result = CHUNKED_QUERY_RESULT
+        _, body = self.post("Revenue by store?")
+        events = parse_events(body)
+        rows = [row for name, data in events if name == "rows" for row in data["rows"]]
+        self.assertEqual([row[0] for row in rows], [f"Store {i}" for i in range(5)])
+        self.assertEqual(events[-1], ("done", {"row_count": 5, "truncated": False, "total_row_count": 5}))
+        self.assertEqual(fake_genie.chunk_fetches, 1)
+
+    def test_repeat_stream_resumes_the_cached_result(self):
+        fake_genie.query_result = CHUNKED_QUERY_RESULT
+        first = parse_events(self.post("Revenue by store?")[1])
+        repeat = parse_events(self.post("Revenue by store?")[1])
+        self.assertIn(("status", {"status": "completed", "cached": True}), repeat)
+        self.assertEqual(repeat[-1], first[-1])
+        self.assertEqual(repeat[-1][1]["row_count"], 5)
+        self.assertEqual(
+            [data for name, data in repeat if name == "rows"], [data for name, data in first if name == "rows"]
+        )
+        self.assertEqual(fake_genie.chunk_fetches, 2)
+
+    def test_row_cap_truncates_the_stream(self):
+        fake_genie.query_result = CHUNKED_QUERY_RESULT
+        with mock.patch.object(server, "GENIE_RESULT_MAX_ROWS", 3):
+            _, body = self.post("Revenue by store?")
+        events = parse_events(body)
+        self.assertEqual(events[-1], ("done", {"row_count": 3, "truncated": True, "total_row_count": 5}))
+        self.assertEqual(fake_genie.chunk_fetches, 0)
+
+    def test_query_endpoint_streams_ndjson_on_request(self):
+        fake_genie.query_result = CHUNKED_QUERY_RESULT
+        response, body = self.post("Revenue by store?", "/api/genie/query", {"Accept": "application/x-ndjson"})
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in body.splitlines()]
+        rows = [row for line in lines if line["event"] == "rows" for row in line["rows"]]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(lines[-1]["event"], "done")
+        self.assertFalse(lines[-1]["truncated"])
+
+        # A repeat NDJSON ask is answered from the cache with the same rows
+        response, body = self.post("Revenue by store?", "/api/genie/query", {"Accept": "application/x-ndjson"})
+        self.assertEqual(response.getheader("X-Answer-Cache"), "hit")
+        repeat = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row for line in repeat if line["event"] == "rows" for row in line["rows"]], rows)
+        self.assertEqual(repeat[-1], lines[-1])
+
+        # The plain JSON answer carries the first chunk and says more rows exist
+        response, body = self.post("Revenue by store?", "/api/genie/query")
+        self.assertEqual(response.getheader("X-Answer-Cache"), "hit")
+        table = json.loads(body)["table"]
+        self.assertEqual((len(table["rows"]), table["truncated"], table["total_row_count"]), (3, True, 5))
+
+    def test_empty_question_is_a_plain_json_error(self):
+        response, body = self.post("  ")
+        self.assertEqual(response.status, 400)
+        self.assertEqual(json.loads(body), {"error": "Question cannot be empty."})
+
+
+if __name__ == "__main__":
+    unittest.main()
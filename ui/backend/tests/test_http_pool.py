@@ -0,0 +1,157 @@
+import asyncio
+import http.client
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from http_pool import HTTPConnectionPool  # noqa: E402
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    received = []
+
+    def _closed_without_answer(self):
+        # Like a server closing a keep-alive connection just as the next request arrives
+        self.served = getattr(self, "served", 0) + 1
+        if self.path.startswith("/race") and self.served > 1:
+            self.close_connection = True
+            return True
+        return False
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.received.append(self.path)
+        if self._closed_without_answer():
+            return
+        self.do_GET()
+
+    def do_GET(self):
+        if self.command == "GET" and self._closed_without_answer():
+            return
+        data = json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        # Drop the socket without announcing "Connection: close", like an idle timeout
+        if self.path.startswith("/drop"):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        _EchoHandler.received = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_sequential_requests_reuse_one_connection(self):
+        pool = HTTPConnectionPool(max_idle_per_host=2)
+        for i in range(3):
+            response = pool.request(f"{self.base_url}/poll/{i}", "GET")
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.body), {"path": f"/poll/{i}"})
+        stats = pool.get_stats()
+        self.assertEqual(stats["connections_created"], 1)
+        self.assertEqual(stats["reused"], 2)
+        pool.close_idle()
+
+    def test_idle_connections_past_timeout_are_evicted(self):
+        pool = HTTPConnectionPool(max_idle_per_host=2, idle_timeout=0)
+        pool.request(f"{self.base_url}/a", "GET")
+        pool.request(f"{self.base_url}/b", "GET")
+        stats = pool.get_stats()
+        self.assertEqual(stats["connections_created"], 2)
+        self.assertEqual(stats["idle_evictions"], 1)
+        pool.close_idle()
+
+    def test_connection_closed_by_server_while_idle_is_replaced(self):
+        pool = HTTPConnectionPool(max_idle_per_host=2)
+        pool.request(f"{self.base_url}/drop", "GET")
+        time.sleep(0.05)
+        response = pool.request(f"{self.base_url}/b", "GET")
+        self.assertEqual(response.status, 200)
+        stats = pool.get_stats()
+        self.assertEqual(stats["connections_created"], 2)
+        self.assertEqual(stats["idle_dropped"], 1)
+        self.assertEqual(stats["stale_retries"], 0)
+        pool.close_idle()
+
+    def test_get_on_a_connection_closed_mid_request_is_retried(self):
+        pool = HTTPConnectionPool(max_idle_per_host=2)
+        pool.request(f"{self.base_url}/race/1", "GET")
+        response = pool.request(f"{self.base_url}/race/2", "GET")
+        self.assertEqual(json.loads(response.body), {"path": "/race/2"})
+        stats = pool.get_stats()
+        self.assertEqual(stats["connections_created"], 2)
+        self.assertEqual(stats["stale_retries"], 1)
+        pool.close_idle()
+
+    def test_post_on_a_connection_closed_mid_request_is_not_sent_twice(self):
+        pool = HTTPConnectionPool(max_idle_per_host=2)
+        pool.request(f"{self.base_url}/race/start", "POST", body=b"{}")
+        with self.assertRaises(http.client.RemoteDisconnected):
+            pool.request(f"{self.base_url}/race/start", "POST", body=b"{}")
+        # The server received the second POST without answering it; a retry would make it three
+        self.assertEqual(_EchoHandler.received, ["/race/start", "/race/start"])
+        self.assertEqual(pool.get_stats()["stale_retries"], 0)
+        pool.close_idle()
+
+
+class AsyncRequestTests(unittest.TestCase):
+    def setUp(self):
+        _EchoHandler.received = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.pool = HTTPConnectionPool(max_idle_per_host=2)
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def run_requests(self, *requests):
+        async def run():
+            try:
+                return [await self.pool.async_request(f"{self.base_url}{path}", method) for method, path in requests]
+            finally:
+                self.pool.close_idle()
+
+        return asyncio.run(run())
+
+    def test_sequential_requests_reuse_one_connection(self):
+        responses = self.run_requests(("GET", "/poll/0"), ("GET", "/poll/1"), ("GET", "/poll/2"))
+        self.assertEqual([json.loads(r.body)["path"] for r in responses], ["/poll/0", "/poll/1", "/poll/2"])
+        stats = self.pool.get_stats()
+        self.assertEqual((stats["requests"], stats["connections_created"], stats["reused"]), (3, 1, 2))
+
+    def test_get_on_a_connection_closed_mid_request_is_retried(self):
+        responses = self.run_requests(("GET", "/race/1"), ("GET", "/race/2"))
+        self.assertEqual(json.loads(responses[1].body), {"path": "/race/2"})
+        self.assertEqual(self.pool.get_stats()["stale_retries"], 1)
+
+    def test_post_on_a_connection_closed_mid_request_is_not_sent_twice(self):
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self.run_requests(("POST", "/race/start"), ("POST", "/race/start"))
+        self.assertEqual(_EchoHandler.received, ["/race/start", "/race/start"])
+        self.assertEqual(self.pool.get_stats()["stale_retries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from genie_polling import PollPolicy  # noqa: E402
+from loadtest.driver import RouteStats, percentile  # noqa: E402
+from loadtest.fake_genie import GenieSettings, start_fake_genie  # noqa: E402
+
+
+class FakeGenieTests(unittest.TestCase):
+    def setUp(self):
+        self.genie = start_fake_genie(settings=GenieSettings(latency=0, jitter=0, answer_seconds=0.1, rows=3))
+        self.addCleanup(self.genie.server_close)
+        self.addCleanup(self.genie.shutdown)
+        env = {
+            "DATABRICKS_HOST": f"http://127.0.0.1:{self.genie.server_address[1]}",
+            "DATABRICKS_TOKEN_FOR_GENIE": "loadtest",
+            "GENIE_SPACE_ID": "loadtest",
+        }
+        patcher = mock.patch.dict("os.environ", env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_conversation_completes_against_the_fake(self):
+        base_url, headers = server.genie_context()
+        policy = PollPolicy(initial_interval=0.02, max_interval=0.05, jitter=0, deadline=5)
+        conversation = server.run_conversation(base_url, headers, "Revenue by region", server.api_response, policy)
+        answer, _ = server.parse_genie_answer(
+            "Revenue by region", conversation.conversation_id, conversation.message_id,
+            conversation.message, conversation.query_result,
+        )
+        self.assertEqual(answer["table"]["columns"], ["region", "total_revenue", "revenue_growth", "orders"])
+        self.assertEqual(len(answer["table"]["rows"]), 3)
+        self.assertGreaterEqual(self.genie.get_stats()["calls"]["poll"], 2)
+
+    def test_throttled_calls_are_retried(self):
+        self.genie.settings.throttle_rate = 0.5
+        self.genie.settings.retry_after = 0.01
+        base_url, headers = server.genie_context()
+        policy = PollPolicy(initial_interval=0.02, max_interval=0.05, jitter=0, deadline=10)
+        with mock.patch("random.random", side_effect=[0.1, 0.9] * 50):
+            conversation = server.run_conversation(base_url, headers, "Revenue", server.api_response, policy)
+        self.assertIsNotNone(conversation.query_result)
+        self.assertGreater(self.genie.get_stats()["throttled"], 0)
+
+
+class DriverStatsTests(unittest.TestCase):
+    def test_percentiles_and_outcomes(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 0.5), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 0.99), 4)
+        self.assertIsNone(percentile([], 0.5))
+
+        stats = RouteStats()
+        for status in ("200", "200", "503", "500", "exception"):
+            stats.record(status, 0.1)
+        summary = stats.summary(elapsed=1.0)
+        self.assertEqual((summary["requests"], summary["shed"], summary["errors"]), (5, 1, 2))
+        self.assertEqual(summary["error_rate"], 0.6)
+        self.assertEqual(summary["p50_ms"], 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
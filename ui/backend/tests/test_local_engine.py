@@ -0,0 +1,77 @@
+import re
+import sys
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+import local_engine  # noqa: E402
+
+REPO_DIR = BASE_DIR.parents[1]
+NOTEBOOK = REPO_DIR / "notebooks" / "discount_tire_demo.py"
+
+
+def normalize(sql):
+    return " ".join(sql.split())
+
+
+class NotebookParityTests(unittest.TestCase):
+    def test_views_and_aggregates_match_the_notebook(self):
+        notebook = NOTEBOOK.read_text()
+        views = dict(re.findall(r"CREATE OR REPLACE VIEW (\w+) AS(.*?)\"\"\"", notebook, re.S))
+        self.assertEqual(set(views), set(local_engine.VIEW_SQL))
+        for name, sql in local_engine.VIEW_SQL.items():
+            self.assertEqual(normalize(sql), normalize(views[name]), name)
+
+        aggregates = dict(re.findall(r"\"(agg_\w+)\": \"\"\"(.*?)\"\"\"", notebook, re.S))
+        self.assertEqual(set(aggregates), set(local_engine.AGGREGATE_SQL))
+        for name, sql in local_engine.AGGREGATE_SQL.items():
+            self.assertEqual(normalize(sql), normalize(aggregates[name]), name)
+
+
+@unittest.skipIf(local_engine.duckdb is None, "duckdb is not installed")
+class LocalEngineTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = local_engine.LocalEngine(REPO_DIR / "data")
+
+    def test_answers_qualified_dashboard_sql(self):
+        table = self.engine.execute(
+            "SELECT COUNT(*) AS n FROM kaustavpaul_demo.dtc_demo.vw_sales_enriched WHERE date >= add_months(current_date(), -120)"
+        )
+        self.assertEqual(table["columns"], ["n"])
+        self.assertGreater(int(table["rows"][0][0]), 0)
+
+    def test_failed_statement_returns_none(self):
+        self.assertIsNone(self.engine.execute("SELECT * FROM missing_table"))
+        self.assertEqual(self.engine.get_stats()["errors"], 1)
+
+    def test_missing_data_dir_is_an_error(self):
+        with self.assertRaises(RuntimeError):
+            local_engine.LocalEngine(REPO_DIR / "no-such-dir")
+
+
+@unittest.skipIf(local_engine.duckdb is None, "duckdb is not installed")
+class LocalBackendTests(unittest.TestCase):
+    def setUp(self):
+        server.clear_all_caches()
+
+    def test_dashboards_build_without_a_warehouse(self):
+        router = server.AggregateRouter()
+        with mock.patch.object(server, "SQL_BACKEND", "local"), mock.patch.object(server, "_AGGREGATE_ROUTER", router):
+            for _, builder in server.DASHBOARD_ROUTES.values():
+                self.assertIsNotNone(builder())
+        # The engine builds the notebook's aggregate tables too
+        self.assertEqual(router.get_stats()["fallbacks"], 0)
+
+    def test_databricks_backend_never_runs_locally(self):
+        with mock.patch.object(server, "SQL_BACKEND", "databricks"), mock.patch.object(server, "dbsql", None):
+            self.assertIsNone(server.sql_backend())
+            self.assertIsNone(server.run_direct_sql("SELECT 1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import http.client
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from metrics import CounterFamily, Exposition, Histogram, HistogramFamily  # noqa: E402
+from server import ResultTable  # noqa: E402
+
+
+class ExpositionTests(unittest.TestCase):
+    def test_histogram_and_counter_text(self):
+        histogram = Histogram("h", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        metrics = Exposition()
+        metrics.histograms("demo_seconds", "Demo latency.", [({"route": "/x"}, histogram.snapshot())])
+        metrics.samples("demo_total", "counter", "Demo count.", [({"path": 'a"b\\c'}, 3), ({}, None)])
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE demo_seconds histogram", lines)
+        self.assertIn('demo_seconds_bucket{route="/x",le="0.1"} 1', lines)
+        self.assertIn('demo_seconds_bucket{route="/x",le="1"} 2', lines)
+        self.assertIn('demo_seconds_bucket{route="/x",le="+Inf"} 3', lines)
+        self.assertIn('demo_seconds_count{route="/x"} 3', lines)
+        # Label values are escaped and None samples are skipped
+        self.assertIn('demo_total{path="a\\"b\\\\c"} 3', lines)
+        self.assertEqual(sum(line.startswith("demo_total") for line in lines), 1)
+
+    def test_empty_families_are_omitted(self):
+        metrics = Exposition()
+        metrics.samples("unused_total", "counter", "Nothing yet.", [])
+        metrics.histograms("unused_seconds", "Nothing yet.", [])
+        self.assertEqual(metrics.render(), "\n")
+
+    def test_families_cap_their_series(self):
+        family = CounterFamily("requests_total", ("route",), max_series=2)
+        for route in ("/a", "/b", "/c", "/d"):
+            family.labels(route).inc()
+        series = {labels["route"]: counter.value for labels, counter in family.series()}
+        self.assertEqual(series, {"/a": 1, "/b": 1, "other": 2})
+        self.assertIs(HistogramFamily("h", ("x",)).labels("1").__class__, Histogram)
+
+
+class ServerMetricsTests(unittest.TestCase):
+    def setUp(self):
+        server.clear_all_caches()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get(self, path):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1], timeout=5)
+        conn.request("GET", path)
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    def test_statements_are_recorded_by_label(self):
+        sql = "SELECT 42 AS answer"
+        table = server.observe_statement(sql, "local", lambda: ResultTable(["answer"], [[42, 43]]))
+        self.assertEqual(table.num_rows, 2)
+        server.observe_statement(sql, "local", lambda: None)
+        label = server.statement_label(sql)
+
+        text = server.build_metrics_text()
+        self.assertIn(f'dtc_sql_statements_total{{statement="{label}",backend="local",outcome="ok"}} 1', text)
+        self.assertIn(f'dtc_sql_statements_total{{statement="{label}",backend="local",outcome="error"}} 1', text)
+        self.assertIn(f'dtc_sql_rows_total{{statement="{label}"}} 2', text)
+        self.assertIn(f'dtc_sql_statement_info{{statement="{label}",sql="{sql}"}} 1', text)
+        self.assertIn(f'dtc_sql_statement_duration_seconds_count{{statement="{label}",backend="local"}} 2', text)
+
+    def test_endpoint_reports_routes_caches_and_genie(self):
+        self.get("/api/no-such-route")
+        # The hit ratio is reported once a cache has seen a lookup
+        server.get_cached_dashboard_payload("dashboard:metrics-test")
+        response, body = self.get("/api/metrics")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain; version=0.0.4"))
+        text = body.decode("utf-8")
+        self.assertRegex(text, r'dtc_http_requests_total\{method="GET",route="/api/other",status="404"\} \d+')
+        self.assertIn('dtc_cache_hit_ratio{cache="dashboard"}', text)
+        self.assertIn("# TYPE dtc_genie_phase_duration_seconds histogram", text)
+        self.assertIn('dtc_genie_queue_depth{priority="interactive"} 0', text)
+
+    def test_route_labels_are_bounded(self):
+        self.assertEqual(server.route_label("/api/dashboard/kpis?x=1"), "/api/dashboard/kpis")
+        self.assertEqual(server.route_label("/api/unknown/123"), "/api/other")
+        self.assertEqual(server.route_label("/assets/index.js"), "static")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from benchmarks import genie_parsing  # noqa: E402
+
+
+class PayloadTests(unittest.TestCase):
+    def test_payloads_parse_like_genie_responses(self):
+        message = genie_parsing.build_message()
+        query_result = genie_parsing.build_query_result(40)
+
+        summary, source = server.extract_summary(message, query_result, question=genie_parsing.QUESTION)
+        self.assertEqual(source, "text")
+        self.assertIn("West region", summary)
+        self.assertEqual(server.extract_sql(message, query_result), genie_parsing.SQL)
+
+        table = server.extract_table(query_result)
+        self.assertEqual(table["columns"][:2], ["region", "store_name"])
+        self.assertEqual(len(table["rows"]), 40)
+        self.assertIsNone(table["rows"][0][-1])
+
+    def test_cases_cover_every_parser_at_both_sizes(self):
+        names = [case.name for case in genie_parsing.build_cases(realistic_rows=5, large_rows=10)]
+        self.assertEqual(len(names), len(set(names)))
+        parsers = (
+            "collect_texts",
+            "pick_best_text",
+            "extract_summary/text",
+            "extract_summary/no_text",
+            "find_sql",
+            "extract_table",
+            "parse_genie_response/text",
+            "parse_genie_response/no_text",
+        )
+        for parser in parsers:
+            self.assertIn(f"{parser}/realistic", names)
+            self.assertIn(f"{parser}/large", names)
+
+
+class CompareTests(unittest.TestCase):
+    baseline = {
+        "reference_us": 100.0,
+        "cases": {"find_sql/large": {"best_us": 1000.0, "peak_bytes": 100000}},
+    }
+
+    def results(self, best_us, peak_bytes, reference_us=100.0):
+        return {
+            "reference_us": reference_us,
+            "cases": {
+                "find_sql/large": {"best_us": best_us, "peak_bytes": peak_bytes},
+                "new/case": {"best_us": 1e9, "peak_bytes": 10**9},
+            },
+        }
+
+    def test_within_thresholds_passes(self):
+        self.assertEqual(genie_parsing.compare(self.results(1200.0, 105000), self.baseline), [])
+
+    def test_slower_or_bigger_cases_regress(self):
+        regressions = genie_parsing.compare(self.results(1300.0, 120000), self.baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith("find_sql/large") for message in regressions))
+
+    def test_times_scale_with_the_reference_walk(self):
+        # The whole machine is twice as slow: 2000us is on par with the baseline
+        self.assertEqual(genie_parsing.compare(self.results(2000.0, 100000, reference_us=200.0), self.baseline), [])
+
+    def test_measure_reports_time_and_memory(self):
+        case = genie_parsing.Case("alloc", lambda: [0] * 100000)
+        result = genie_parsing.measure(case, repeat=2, min_time=0.001)
+        self.assertGreater(result["best_us"], 0)
+        self.assertGreaterEqual(result["median_us"], result["best_us"])
+        self.assertGreaterEqual(result["peak_bytes"], 800000)
+
+
+@unittest.skipUnless(os.getenv("RUN_BENCHMARKS"), "set RUN_BENCHMARKS=1 to run the parser benchmarks")
+class ParserBenchmarkTests(unittest.TestCase):
+    def test_no_regressions_against_baseline(self):
+        baseline = genie_parsing.load_baseline(genie_parsing.BASELINE_PATH)
+        if baseline is None:
+            self.skipTest("no saved baseline")
+        results = genie_parsing.run_benchmarks(genie_parsing.build_cases())
+        threshold = float(os.getenv("BENCHMARK_TIME_THRESHOLD", "0.25"))
+        self.assertEqual(genie_parsing.compare(results, baseline, time_threshold=threshold), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from query_fanout import FanoutSaturated, QueryFanout  # noqa: E402
+
+
+class QueryFanoutTests(unittest.TestCase):
+    def setUp(self):
+        self.fanout = QueryFanout(max_workers=4)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.fanout.shutdown()
+
+    def runner(self, sql):
+        if sql == "slow":
+            self.release.wait(5)
+            return {"columns": ["x"], "rows": [["late"]]}
+        if sql == "broken":
+            return None
+        return {"columns": ["sql"], "rows": [[sql]]}
+
+    def test_runs_queries_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def runner(sql):
+            barrier.wait()
+            return {"columns": ["sql"], "rows": [[sql]]}
+
+        started = time.time()
+        result = self.fanout.run({"a": "1", "b": "2", "c": "3"}, runner, deadline=2)
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(result.pending, [])
+        self.assertEqual(result.get("b")["rows"], [["2"]])
+
+    def test_reports_pending_queries_after_deadline(self):
+        result = self.fanout.run({"fast": "select 1", "slow": "slow"}, self.runner, deadline=0.1)
+        self.assertEqual(result.pending, ["slow"])
+        self.assertIn("fast", result.completed)
+        self.assertNotIn("slow", result.completed)
+        self.assertIsNone(result.get("slow"))
+
+    def test_failed_queries_are_completed_as_none(self):
+        result = self.fanout.run({"ok": "select 1", "broken": "broken"}, self.runner, deadline=1)
+        self.assertEqual(result.pending, [])
+        self.assertIsNone(result.completed["broken"])
+
+
+class FanoutBacklogTests(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = []
+        self.fanout = QueryFanout(max_workers=1, max_queued=2, retry_after=5)
+
+    def tearDown(self):
+        self.release.set()
+        self.fanout.shutdown()
+
+    def runner(self, sql):
+        self.started.append(sql)
+        self.release.wait(5)
+        return {"columns": ["sql"], "rows": [[sql]]}
+
+    def test_unstarted_queries_are_cancelled_at_the_deadline(self):
+        result = self.fanout.run({"a": "a", "b": "b", "c": "c"}, self.runner, deadline=0.1)
+        self.assertEqual(sorted(result.pending), ["a", "b", "c"])
+        stats = self.fanout.get_stats()
+        self.assertEqual((stats["queued"], stats["cancelled"]), (0, 2))
+        self.release.set()
+        time.sleep(0.1)
+        # Only the query that was running at the deadline ran
+        self.assertEqual(self.started, ["a"])
+
+    def test_batches_behind_a_deep_backlog_are_rejected(self):
+        blocked = threading.Thread(target=self.fanout.run, args=({"a": "a", "b": "b", "c": "c"}, self.runner, 2))
+        blocked.start()
+        while self.fanout.get_stats()["queued"] < 2:
+            time.sleep(0.01)
+        with self.assertRaises(FanoutSaturated) as raised:
+            self.fanout.run({"d": "d"}, self.runner, deadline=1)
+        self.assertEqual(raised.exception.retry_after, 5)
+        self.assertEqual(self.fanout.get_stats()["rejected"], 1)
+        self.release.set()
+        blocked.join(2)
+        self.assertEqual(self.fanout.get_stats()["queued"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import sys
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+# The classes server.py checks against (backend.query_plan under pytest)
+from server import Panel, ScanPlan  # noqa: E402
+
+
+def make_plan(**kwargs):
+    return ScanPlan(
+        "sales_view",
+        dimensions={"month": "date_trunc('month', date)", "region": "region"},
+        measures={"revenue": "SUM(amount)", "orders": "COUNT(*)"},
+        panels=[
+            Panel("trend", ["month"], {"month": "month", "revenue": "revenue"}, order_by=[("month", False)]),
+            Panel("regions", ["region"], {"region": "region", "orders": "orders"}, order_by=[("orders", True)], limit=2),
+            Panel("west", ["region"], {"orders": "orders"}, where={"region": "West"}),
+            Panel("total", [], {"revenue": "revenue"}),
+        ],
+        **kwargs,
+    )
+
+
+# Rows as the warehouse would return them: month, region, revenue, orders, grouping_set
+RESULT = {
+    "columns": ["month", "region", "revenue", "orders", "grouping_set"],
+    "rows": [
+        ["2025-02-01", None, "20.0", "2", "2"],
+        ["2025-01-01", None, "10.0", "1", "2"],
+        [None, "East", "5.0", "1", "1"],
+        [None, "West", "15.0", "9", "1"],
+        [None, None, "7.0", "12", "1"],
+        [None, "North", "10.0", "2", "1"],
+        [None, None, "30.0", "3", "3"],
+    ],
+}
+
+
+class ScanPlanTests(unittest.TestCase):
+    def test_compiles_one_grouping_sets_statement(self):
+        sql = make_plan().sql
+        self.assertEqual(sql.count("FROM sales_view"), 1)
+        self.assertIn("GROUP BY GROUPING SETS ((month), (region), ())", sql)
+        self.assertIn("date_trunc('month', date) AS month", sql)
+        # Source columns are not projected twice
+        self.assertNotIn("region AS region", sql)
+        self.assertIn("GROUPING(month) * 1 + GROUPING(region) * 2 AS grouping_set", sql)
+
+    def test_split_routes_rows_to_panels(self):
+        tables = make_plan().split(RESULT)
+        self.assertEqual(tables["trend"], {"columns": ["month", "revenue"], "rows": [["2025-01-01", "10.0"], ["2025-02-01", "20.0"]]})
+        # A NULL region is a real group, distinct from the grand total
+        self.assertEqual(tables["regions"]["rows"], [[None, "12"], ["West", "9"]])
+        self.assertEqual(tables["west"]["rows"], [["9"]])
+        self.assertEqual(tables["total"]["rows"], [["30.0"]])
+
+    def test_failed_statement_and_finish(self):
+        self.assertIsNone(make_plan().split(None))
+
+        def finish(tables):
+            tables["total"] = {"columns": ["n"], "rows": [[str(len(tables["trend"]["rows"]))]]}
+            return tables
+
+        self.assertEqual(make_plan(finish=finish).split(RESULT)["total"]["rows"], [["2"]])
+
+    def test_unknown_dimension_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ScanPlan("t", {"a": "a"}, {}, [Panel("p", ["b"], {})])
+
+
+class DashboardScanTests(unittest.TestCase):
+    def test_plan_is_reported_as_its_panels(self):
+        plan = make_plan()
+        with mock.patch.object(server, "run_direct_sql", lambda sql: RESULT if sql == plan.sql else None):
+            results = server.run_dashboard_queries({"scan": plan, "other": "SELECT 1"})
+        self.assertEqual(sorted(results.completed), ["other", "regions", "total", "trend", "west"])
+        self.assertIsNone(results.get("other"))
+        self.assertEqual(results.get("total")["rows"], [["30.0"]])
+
+    def test_view_path_runs_one_statement_per_dashboard(self):
+        statements = []
+
+        def fake_sql(sql):
+            statements.append(sql)
+            return {"columns": ["grouping_set"], "rows": []}
+
+        router = server.AggregateRouter(enabled=False)
+        with mock.patch.object(server, "run_direct_sql", fake_sql), mock.patch.object(server, "_AGGREGATE_ROUTER", router):
+            statements.clear()
+            self.assertIsNotNone(server.build_operations_payload())
+            self.assertEqual(len(statements), 1)
+            statements.clear()
+            self.assertIsNotNone(server.build_customers_payload())
+            # The repeat rate is its own one-row aggregate; the scan never groups by customer
+            self.assertEqual(len(statements), 2)
+            self.assertNotIn("customer_id", next(sql for sql in statements if "GROUPING SETS" in sql))
+            statements.clear()
+            server.build_revenue_payload()
+        # Two panels read vw_revenue_growth; the rest share one scan
+        self.assertEqual(len(statements), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import responses  # noqa: E402
+from responses import EncodedPayload, etag_matches, parse_accept_encoding  # noqa: E402
+
+LARGE_PAYLOAD = {"monthly": [{"month": f"2025-{idx:02d}-01", "revenue": str(idx * 1000.5)} for idx in range(200)]}
+
+
+class EncodedPayloadTests(unittest.TestCase):
+    def test_small_bodies_are_never_compressed(self):
+        encoded = EncodedPayload({"ok": True})
+        self.assertEqual(encoded.select("gzip, br"), (None, b'{"ok": true}'))
+
+    def test_gzip_variant_round_trips(self):
+        encoded = EncodedPayload.precompressed(LARGE_PAYLOAD)
+        encoding, body = encoded.select("gzip, deflate")
+        self.assertEqual(encoding, "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body)), LARGE_PAYLOAD)
+
+    def test_precompressed_variants_are_reused(self):
+        encoded = EncodedPayload.precompressed(LARGE_PAYLOAD)
+        _, first = encoded.select("gzip")
+        _, second = encoded.select("gzip")
+        self.assertIs(first, second)
+
+    def test_identity_when_gzip_refused(self):
+        encoded = EncodedPayload(LARGE_PAYLOAD)
+        self.assertEqual(encoded.select("gzip;q=0"), (None, encoded.body))
+        self.assertEqual(encoded.select(""), (None, encoded.body))
+
+    @unittest.skipUnless(responses.BROTLI_ENABLED, "brotli not installed")
+    def test_brotli_preferred_when_accepted(self):
+        encoding, _ = EncodedPayload(LARGE_PAYLOAD).select("gzip, br")
+        self.assertEqual(encoding, "br")
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding("gzip;q=0.5, br"), {"gzip": 0.5, "br": 1.0})
+
+
+class ETagTests(unittest.TestCase):
+    def test_etag_tracks_body_content(self):
+        first = EncodedPayload({"revenue": 1})
+        self.assertEqual(first.etag, EncodedPayload.precompressed({"revenue": 1}).etag)
+        self.assertNotEqual(first.etag, EncodedPayload({"revenue": 2}).etag)
+        self.assertTrue(first.etag.startswith('W/"'))
+
+    def test_if_none_match_comparison(self):
+        etag = EncodedPayload({"revenue": 1}).etag
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", {etag[2:]}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+# The class server.py checks against (backend.result_table under pytest)
+from server import ResultTable  # noqa: E402
+import result_table  # noqa: E402
+
+COLUMNS = ["month", "revenue", "units"]
+ROWS = [
+    (datetime(2025, 1, 1), Decimal("10.50"), 3),
+    (datetime(2025, 2, 1), None, 4),
+]
+WIRE_ROWS = [["2025-01-01 00:00:00", "10.50", "3"], ["2025-02-01 00:00:00", None, "4"]]
+
+
+class FakeCursor:
+    description = [(name,) for name in COLUMNS]
+
+    def fetchall(self):
+        return ROWS
+
+
+class ResultTableTests(unittest.TestCase):
+    def setUp(self):
+        self.table = ResultTable.from_rows(COLUMNS, ROWS)
+
+    def test_cells_stay_typed_until_the_edge(self):
+        self.assertEqual(self.table.value("revenue"), Decimal("10.50"))
+        self.assertEqual(self.table.column("units"), [3, 4])
+        self.assertEqual(self.table.rows, WIRE_ROWS)
+        self.assertEqual(self.table.to_dicts()[1], {"month": "2025-02-01 00:00:00", "revenue": None, "units": "4"})
+        # Still readable as the {"columns", "rows"} dict run_direct_sql used to return
+        self.assertEqual(self.table, {"columns": COLUMNS, "rows": WIRE_ROWS})
+
+    def test_projection_shares_columns(self):
+        projected = self.table.select({"amount": "revenue"})
+        self.assertEqual(projected.columns, ["amount"])
+        self.assertIs(projected._data[0], self.table._data[1])
+        self.assertEqual(self.table.take([1, 0]).column("units"), [4, 3])
+
+    def test_missing_cells_and_dict_tables(self):
+        self.assertIsNone(self.table.value("missing"))
+        self.assertIsNone(self.table.value("units", row=5))
+        with self.assertRaises(KeyError):
+            self.table.column("missing")
+        coerced = ResultTable.coerce({"columns": ["a"], "rows": [["1"]]})
+        self.assertEqual(coerced.column("a"), ["1"])
+        self.assertIsNone(ResultTable.coerce(None))
+
+    def test_server_helpers_read_typed_tables(self):
+        self.assertEqual(server.parse_float(server.table_first_value(self.table, "revenue")), 10.5)
+        self.assertEqual(server.format_month_label(server.table_first_value(self.table, "month")), "Jan 2025")
+        self.assertEqual(server.table_to_dicts(self.table)[0]["units"], "3")
+        self.assertGreater(self.table.nbytes, 0)
+
+    def test_fetch_without_arrow_uses_fetchall(self):
+        table = result_table.fetch_result_table(FakeCursor())
+        self.assertEqual(table.rows, WIRE_ROWS)
+
+
+@unittest.skipIf(result_table.pa is None, "pyarrow is not installed")
+class ArrowResultTableTests(unittest.TestCase):
+    def setUp(self):
+        pa = result_table.pa
+        arrow = pa.table({name: [row[i] for row in ROWS] for i, name in enumerate(COLUMNS)})
+        self.table = ResultTable.from_arrow(arrow)
+
+    def test_wire_format_matches_row_results(self):
+        self.assertEqual(self.table.rows, WIRE_ROWS)
+        self.assertEqual(self.table.to_dicts(), ResultTable.from_rows(COLUMNS, ROWS).to_dicts())
+
+    def test_projection_and_take_keep_arrow_columns(self):
+        projected = self.table.select(["units"])
+        self.assertIs(projected._data[0], self.table._data[2])
+        self.assertEqual(self.table.take([1]).rows, WIRE_ROWS[1:])
+        self.assertEqual(self.table.nbytes, sum(column.nbytes for column in self.table._data))
+
+
+if __name__ == "__main__":
+    unittest.main()
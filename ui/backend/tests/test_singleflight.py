@@ -0,0 +1,87 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_callers_share_one_execution(self):
+        group = SingleFlight("test")
+        executions = []
+        release = threading.Event()
+
+        def compute():
+            executions.append(1)
+            release.wait(2)
+            return {"value": 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(group.do("k", compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while group.get_stats()["calls"] < 5:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(results, [{"value": 42}] * 5)
+        stats = group.get_stats()
+        self.assertEqual(stats["executions"], 1)
+        self.assertEqual(stats["coalesced"], 4)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_errors_propagate_and_key_is_released(self):
+        group = SingleFlight("test")
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            group.do("k", fail)
+        self.assertEqual(group.do("k", lambda: "ok"), "ok")
+
+
+class DashboardCoalescingTests(unittest.TestCase):
+    def setUp(self):
+        server._DASHBOARD_CACHE.clear()
+
+    def tearDown(self):
+        server._DASHBOARD_CACHE.clear()
+
+    def test_concurrent_misses_trigger_one_rebuild(self):
+        builds = []
+
+        def builder():
+            builds.append(1)
+            time.sleep(0.1)
+            return {"metric": 1}
+
+        threads = [
+            threading.Thread(target=server.load_dashboard_payload, args=("dashboard:test", builder))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(server.get_cached_dashboard_payload("dashboard:test").payload, {"metric": 1})
+
+    def test_partial_payloads_are_not_cached(self):
+        encoded = server.load_dashboard_payload("dashboard:test", lambda: {"metric": 1, "pending": ["slow"]})
+        self.assertEqual(encoded.payload["pending"], ["slow"])
+        self.assertIsNone(server.get_cached_dashboard_payload("dashboard:test"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import http.client
+import json
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import unittest
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import server  # noqa: E402
+from server import JsonlTraceSink, Trace  # noqa: E402
+
+
+def fanout_payload():
+    def runner(sql):
+        with server.span("sql", statement=sql):
+            return sql
+
+    results = server.get_query_fanout().run({"a": "A", "b": "B"}, runner, deadline=5)
+    return {"tables": sorted(results.completed.values())}
+
+
+class TraceTests(unittest.TestCase):
+    def test_spans_outside_a_request_are_dropped(self):
+        with server.span("sql"):
+            pass
+        self.assertIsNone(server.current_trace())
+
+    def test_request_ids_are_kept_only_when_safe(self):
+        self.assertEqual(Trace("GET /", "abc-123").request_id, "abc-123")
+        self.assertEqual(len(Trace("GET /", "bad id\r\nX: y").request_id), 32)
+        self.assertEqual(len(Trace("GET /").request_id), 32)
+
+    def test_server_timing_sums_spans_by_name(self):
+        with server.trace_request("GET /x") as trace:
+            for _ in range(2):
+                with server.span("sql"):
+                    pass
+            with server.span("dashboard cache"):
+                pass
+        timing = trace.server_timing()
+        self.assertTrue(timing.startswith("total;dur="))
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="x2"')
+        self.assertIn("dashboard-cache;dur=", timing)
+
+
+class RequestTracingTests(unittest.TestCase):
+    def setUp(self):
+        server.clear_all_caches()
+        self.trace_file = Path(tempfile.mkdtemp()) / "traces.jsonl"
+        patches = [
+            mock.patch.object(server, "build_charts_payload", fanout_payload),
+            mock.patch.object(server, "_TRACE_SINK", JsonlTraceSink(self.trace_file)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        server.clear_all_caches()
+
+    def get(self, path, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1], timeout=5)
+        conn.request("GET", path, headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    def test_fanout_spans_join_the_request_trace(self):
+        response, body = self.get("/api/dashboard/charts", {"X-Request-ID": "req-42"})
+        self.assertEqual(json.loads(body), {"tables": ["A", "B"]})
+        self.assertEqual(response.getheader("X-Request-ID"), "req-42")
+        timing = response.getheader("Server-Timing")
+        self.assertIn("dashboard-cache;dur=", timing)
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="x2"')
+
+        record = json.loads(self.trace_file.read_text().splitlines()[-1])
+        self.assertEqual((record["request_id"], record["name"], record["status"]), ("req-42", "GET /api/dashboard/charts", 200))
+        sql_spans = [span for span in record["spans"] if span["name"] == "sql"]
+        self.assertEqual(sorted(span["statement"] for span in sql_spans), ["A", "B"])
+        self.assertTrue(all(span["thread"].startswith("sql-fanout") for span in sql_spans))
+
+    def test_every_response_gets_a_request_id(self):
+        response, _ = self.get("/api/no-such-route")
+        self.assertEqual(response.status, 404)
+        self.assertEqual(len(response.getheader("X-Request-ID")), 32)
+
+    def test_server_timing_can_be_disabled(self):
+        with mock.patch.object(server, "SERVER_TIMING_ENABLED", False):
+            response, _ = self.get("/api/user")
+        self.assertIsNone(response.getheader("Server-Timing"))
+        self.assertIsNotNone(response.getheader("X-Request-ID"))
+
+
+if __name__ == "__main__":
+    unittest.main()
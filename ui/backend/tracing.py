@@ -0,0 +1,186 @@
+"""
+Lightweight per-request tracing.
+
+Each request gets a Trace, identified by a request ID (the client's
+X-Request-ID when it sends a usable one) and carried in a context variable,
+so code anywhere below the handler (SQL cache, pool checkout, warehouse
+execution, Genie calls, compression) can open a span without the trace being
+passed around. Outside a request, span() is a no-op.
+
+Thread pools do not inherit context variables: work submitted on behalf of a
+request must run under a copy of the submitting context (see `in_context`),
+which the dashboard fan-out and the asyncio server's executor do.
+
+A finished trace is summarized in the Server-Timing response header (time per
+span name) and can be appended to a JSONL file with every span's offset,
+duration and thread, for offline flame-graph analysis.
+"""
+import contextvars
+import json
+import re
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("discount_tire_demo.tracing")
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+_METRIC_NAME = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ("name", "start", "duration", "thread", "attributes")
+
+    def __init__(self, name: str, start: float, duration: float, attributes: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.thread = threading.current_thread().name
+        self.attributes = attributes
+
+
+class Trace:
+    """Spans recorded while serving one request."""
+
+    def __init__(self, name: str, request_id: Optional[str] = None):
+        """
+        Initialize the trace.
+
+        Args:
+            name: What is being traced (e.g. "GET /api/dashboard/revenue")
+            request_id: Caller-supplied ID; a random one is used if missing or malformed
+        """
+        self.name = name
+        self.request_id = request_id if request_id and _REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        self.started_at = time.time()
+        self.status: Optional[int] = None
+        self._started = time.perf_counter()
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, started: float, duration: float, attributes: Dict[str, Any]) -> None:
+        """Add a span that began at perf_counter() value `started`."""
+        span = Span(name, started - self._started, duration, attributes)
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: total elapsed time, then the summed time per
+        span name in order of first appearance. Spans that ran in parallel are
+        summed, so a name can exceed the total.
+        """
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            entry = totals.setdefault(_METRIC_NAME.sub("-", span.name), [0.0, 0])
+            entry[0] += span.duration
+            entry[1] += 1
+        parts = [f"total;dur={1000 * self.elapsed():.1f}"]
+        for name, (duration, count) in totals.items():
+            parts.append(f'{name};dur={1000 * duration:.1f}' + (f';desc="x{count}"' if count > 1 else ""))
+        return ", ".join(parts)
+
+    def to_record(self) -> Dict[str, Any]:
+        """JSON-serializable form written to the trace sink."""
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "status": self.status,
+            "started_at": round(self.started_at, 6),
+            "duration_ms": round(1000 * self.elapsed(), 3),
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": round(1000 * span.start, 3),
+                    "duration_ms": round(1000 * span.duration, 3),
+                    "thread": span.thread,
+                    **span.attributes,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+class JsonlTraceSink:
+    """Appends finished traces to a file, one JSON object per line."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def write(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_record(), default=str) + "\n"
+        try:
+            with self._lock, self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+        except OSError as e:
+            logger.warning(f"Could not write trace to {self.path}: {e}")
+
+
+_CURRENT: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("dtc_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the request being served in this context, if any."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def trace_request(name: str, request_id: Optional[str] = None, sink: Optional[JsonlTraceSink] = None) -> Iterator[Trace]:
+    """Trace the with-block as one request, writing it to `sink` when it ends."""
+    trace = Trace(name, request_id)
+    token = _CURRENT.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT.reset(token)
+        if sink is not None:
+            sink.write(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Record the with-block as a span of the current trace (no-op outside a request)."""
+    trace = _CURRENT.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.record(name, started, time.perf_counter() - started, attributes)
+
+
+def in_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind `fn` to a copy of the current context, for running it on another thread."""
+    context = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        return context.run(fn, *args, **kwargs)
+
+    return run
+
+
+def response_headers(trace: Optional[Trace], server_timing: bool = True) -> List[Tuple[str, str]]:
+    """X-Request-ID and (optionally) Server-Timing headers for a traced response."""
+    if trace is None:
+        return []
+    headers = [("X-Request-ID", trace.request_id)]
+    if server_timing:
+        headers.append(("Server-Timing", trace.server_timing()))
+    return headers
@@ -3,6 +3,7 @@ import { Header } from "@/app/components/Header";
 import { TabNavigation } from "@/app/components/TabNavigation";
 import { ExecutiveSummary } from "@/app/components/ExecutiveSummary";
 import { GovernanceFooter } from "@/app/components/GovernanceFooter";
+import { readServerSentEvents } from "@/utils/sse";
 
 // Lazy load heavy components for better initial load performance
 const RevenueAnalytics = lazy(() => import("@/app/components/RevenueAnalytics").then(m => ({ default: m.RevenueAnalytics })));
@@ -12,6 +13,7 @@ const MapView = lazy(() => import("@/app/components/MapView").then(m => ({ defau
 const TireCare = lazy(() => import("@/app/components/TireCare").then(m => ({ default: m.TireCare })));
 
 type InputState = "idle" | "listening" | "processing" | "responded";
+type GenieStatus = "submitted" | "executing" | "completed";
 
 type GenieResponse = {
   summary?: string;
@@ -28,6 +30,7 @@ export default function App() {
   const [aiResponse, setAiResponse] = useState<string | null>(null);
   const [aiTable, setAiTable] = useState<GenieResponse["table"]>(null);
   const [aiQuestion, setAiQuestion] = useState<string | null>(null);
+  const [aiStatus, setAiStatus] = useState<GenieStatus | null>(null);
   const [voiceDraft, setVoiceDraft] = useState<string | null>(null);
   const [isSpeaking, setIsSpeaking] = useState(false);
   const recognitionRef = useRef<SpeechRecognition | null>(null);
@@ -36,24 +39,56 @@ export default function App() {
   const handleQuerySubmit = async (query: string) => {
     setInputState("processing");
     setAiQuestion(query);
+    setAiStatus(null);
     setAiResponse(null);
     setAiTable(null);
     setVoiceDraft(null);
 
     try {
-      const response = await fetch("/api/genie/query", {
+      // Streamed variant of /api/genie/query: status updates, then summary, then row chunks
+      const response = await fetch("/api/genie/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ question: query }),
       });
 
-      const payload = (await response.json()) as GenieResponse;
-      if (!response.ok) {
+      const contentType = response.headers.get("Content-Type") || "";
+      if (!response.ok || !response.body || !contentType.includes("text/event-stream")) {
+        const payload = (await response.json()) as GenieResponse;
         throw new Error(payload.error || "Unable to reach Genie.");
       }
 
-      setAiResponse(payload.summary || "No summary returned from Genie.");
-      setAiTable(payload.table || null);
+      const outcome: { error: string | null; summary: boolean } = { error: null, summary: false };
+      await readServerSentEvents(response.body, (event, data) => {
+        const payload = data as Record<string, unknown>;
+        switch (event) {
+          case "status":
+            setAiStatus(payload.status as GenieStatus);
+            break;
+          case "summary":
+            outcome.summary = true;
+            setAiResponse((payload.summary as string) || "No summary returned from Genie.");
+            break;
+          case "columns":
+            setAiTable({ columns: payload.columns as string[], rows: [] });
+            break;
+          case "rows": {
+            const rows = payload.rows as Array<Array<string | null>>;
+            setAiTable((prev) => (prev ? { ...prev, rows: [...prev.rows, ...rows] } : prev));
+            break;
+          }
+          case "error":
+            outcome.error = (payload.error as string) || "Genie query failed.";
+            break;
+        }
+      });
+
+      if (outcome.error) {
+        throw new Error(outcome.error);
+      }
+      if (!outcome.summary) {
+        setAiResponse("No summary returned from Genie.");
+      }
       setInputState("responded");
     } catch (error) {
       const message = error instanceof Error ? error.message : "Unknown error";
@@ -72,6 +107,7 @@ export default function App() {
     setAiResponse(null);
     setAiTable(null);
     setAiQuestion(null);
+    setAiStatus(null);
     setInputState("idle");
   };
 
@@ -250,6 +286,7 @@ export default function App() {
             aiResponse={aiResponse}
             aiTable={aiTable}
             aiQuestion={aiQuestion}
+            aiStatus={aiStatus}
             prefillText={voiceDraft}
             isSpeaking={isSpeaking}
             onQuerySubmit={handleQuerySubmit}
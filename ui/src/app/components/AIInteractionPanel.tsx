@@ -4,6 +4,7 @@ import { Mic, Send, Volume2, VolumeX, Loader2, RotateCcw } from "lucide-react";
 interface AIInteractionPanelProps {
   inputState: "idle" | "listening" | "processing" | "responded";
   aiQuestion?: string | null;
+  aiStatus?: "submitted" | "executing" | "completed" | null;
   aiResponse: string | null;
   aiTable?: {
     columns: string[];
@@ -20,6 +21,7 @@ interface AIInteractionPanelProps {
 export function AIInteractionPanel({
   inputState,
   aiQuestion,
+  aiStatus,
   aiResponse,
   aiTable,
   prefillText,
@@ -31,6 +33,12 @@ export function AIInteractionPanel({
 }: AIInteractionPanelProps) {
   const [inputValue, setInputValue] = useState("");
 
+  const statusMessages = {
+    submitted: "AI is analyzing your request...",
+    executing: "Running the query on the SQL warehouse...",
+    completed: "Preparing results...",
+  };
+
   const renderInline = (text: string) => {
     const parts: Array<JSX.Element | string> = [];
     const regex = /(\*\*[^*]+\*\*|\*[^*]+\*)/g;
@@ -238,7 +246,7 @@ export function AIInteractionPanel({
               <div className="flex flex-col items-center gap-2 text-blue-600">
                 <div className="flex items-center justify-center gap-2">
                   <Loader2 className="w-4 h-4 animate-spin" />
-                  <p className="text-sm font-medium">AI is analyzing your request...</p>
+                  <p className="text-sm font-medium">{statusMessages[aiStatus ?? "submitted"]}</p>
                 </div>
                 <div className="h-2 w-56 overflow-hidden rounded-full bg-blue-100">
                   <div className="h-full w-1/2 bg-blue-500 animate-pulse" />
@@ -7,6 +7,7 @@ interface ExecutiveSummaryProps {
   inputState: "idle" | "listening" | "processing" | "responded";
   aiResponse: string | null;
   aiQuestion?: string | null;
+  aiStatus?: "submitted" | "executing" | "completed" | null;
   aiTable?: {
     columns: string[];
     rows: Array<Array<string | null>>;
@@ -23,6 +24,7 @@ export function ExecutiveSummary({
   inputState,
   aiResponse,
   aiQuestion,
+  aiStatus,
   aiTable,
   prefillText,
   isSpeaking,
@@ -36,6 +38,7 @@ export function ExecutiveSummary({
       <AIInteractionPanel
         inputState={inputState}
         aiQuestion={aiQuestion}
+        aiStatus={aiStatus}
         aiResponse={aiResponse}
         aiTable={aiTable}
         prefillText={prefillText}
@@ -0,0 +1,31 @@
+import { describe, it, expect } from 'vitest';
+import { createSSEParser } from '@/utils/sse';
+
+describe('createSSEParser', () => {
+  it('parses named events with JSON data', () => {
+    const events: Array<[string, unknown]> = [];
+    const push = createSSEParser((event, data) => events.push([event, data]));
+    push('event: status\ndata: {"status": "submitted"}\n\nevent: done\ndata: {"row_count": 2}\n\n');
+    expect(events).toEqual([
+      ['status', { status: 'submitted' }],
+      ['done', { row_count: 2 }],
+    ]);
+  });
+
+  it('buffers events split across chunks', () => {
+    const events: Array<[string, unknown]> = [];
+    const push = createSSEParser((event, data) => events.push([event, data]));
+    push('event: rows\ndata: {"rows": [["a"');
+    expect(events).toEqual([]);
+    push(']]}\n');
+    push('\n');
+    expect(events).toEqual([['rows', { rows: [['a']] }]]);
+  });
+
+  it('defaults the event name and passes non-JSON data through', () => {
+    const events: Array<[string, unknown]> = [];
+    const push = createSSEParser((event, data) => events.push([event, data]));
+    push('data: hello\r\n\r\n');
+    expect(events).toEqual([['message', 'hello']]);
+  });
+});
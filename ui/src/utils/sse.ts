@@ -0,0 +1,66 @@
+/**
+ * Minimal Server-Sent Events reader for fetch() responses
+ * (EventSource only supports GET, the Genie stream is a POST)
+ */
+
+export type SSEHandler = (event: string, data: unknown) => void;
+
+/**
+ * Create an incremental parser that accepts decoded text in arbitrary pieces
+ * @param onEvent - Called with the event name and parsed JSON data of each complete event
+ * @returns Function to feed the next piece of text into the parser
+ */
+export function createSSEParser(onEvent: SSEHandler): (text: string) => void {
+  let buffer = "";
+  return (text: string) => {
+    buffer += text.replace(/\r\n/g, "\n");
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      const dataLines: string[] = [];
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+          dataLines.push(line.slice(5).trimStart());
+        }
+      }
+      if (dataLines.length > 0) {
+        const raw = dataLines.join("\n");
+        let data: unknown = raw;
+        try {
+          data = JSON.parse(raw);
+        } catch {
+          // Non-JSON data is passed through as text
+        }
+        onEvent(event, data);
+      }
+      boundary = buffer.indexOf("\n\n");
+    }
+  };
+}
+
+/**
+ * Read a streamed response body to the end, dispatching each SSE event
+ * @param body - Response body stream
+ * @param onEvent - Event callback
+ */
+export async function readServerSentEvents(
+  body: ReadableStream<Uint8Array>,
+  onEvent: SSEHandler
+): Promise<void> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  const push = createSSEParser(onEvent);
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) {
+      push(decoder.decode());
+      push("\n\n");
+      return;
+    }
+    push(decoder.decode(value, { stream: true }));
+  }
+}